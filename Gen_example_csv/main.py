@@ -1,41 +1,61 @@
-import csv
-import random
-
-
-def generate_vk_id():
-    return random.randint(100000000, 9999999999)
-
-
-with open('negative_users_10000.csv', 'w', newline='', encoding='utf-8-sig') as f:  # ← utf-8-sig!
-    fieldnames = ['id', 'sex', 'age', 'city', 'education_level', 'university',
-                  'main_in_life', 'main_in_people', 'smoking', 'alcohol',
-                  'political']
-
-    writer = csv.DictWriter(f, fieldnames=fieldnames)
-    writer.writeheader()
-
-    used_ids = set()
-
-    for _ in range(10000):
-        while True:
-            vk_id = generate_vk_id()
-            if vk_id not in used_ids:
-                used_ids.add(vk_id)
-                break
-
-        row = {
-            'id': vk_id,
-            'sex': random.choice(['ж', 'м']),
-            'age': random.randint(18, 65),
-            'city': random.choice(['Москва', 'СПб', 'Екатеринбург', 'Уфа', 'Казань']),
-            'education_level': 'высшее',
-            'university': random.choice(['СПбГУ', 'ИТМО', 'УрФУ', 'МГУ']),
-            'main_in_life': random.choice(['карьера', 'деньги', 'власть']),
-            'main_in_people': random.choice(['деньги', 'статус', 'влияние']),
-            'smoking': 'положительное',
-            'alcohol': 'положительное',
-            'political': random.choice(['радикальные', 'экстремистские']),
-        }
-        writer.writerow(row)
-
-print(" Готово! UTF-8-sig файл для Streamlit!")
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ID_RANGE = (100000000, 9999999999)
+
+FIELDNAMES = ['id', 'sex', 'age', 'city', 'education_level', 'university',
+              'main_in_life', 'main_in_people', 'smoking', 'alcohol',
+              'political']
+
+CHOICES = {
+    'sex': ['ж', 'м'],
+    'city': ['Москва', 'СПб', 'Екатеринбург', 'Уфа', 'Казань'],
+    'university': ['СПбГУ', 'ИТМО', 'УрФУ', 'МГУ'],
+    'main_in_life': ['карьера', 'деньги', 'власть'],
+    'main_in_people': ['деньги', 'статус', 'влияние'],
+    'political': ['радикальные', 'экстремистские'],
+}
+
+CONSTANTS = {
+    'education_level': 'высшее',
+    'smoking': 'положительное',
+    'alcohol': 'положительное',
+}
+
+
+def generate_vk_ids(rng, n):
+    # уникальные id одним вызовом (выборка без возвращения), без цикла с отбраковкой
+    low, high = ID_RANGE
+    return rng.choice(high - low + 1, size=n, replace=False) + low
+
+
+def generate_chunk(rng, ids):
+    n = len(ids)
+    data = {'id': ids, 'age': rng.integers(18, 66, size=n)}
+    for col, values in CHOICES.items():
+        data[col] = np.asarray(values, dtype=object)[rng.integers(0, len(values), size=n)]
+    for col, value in CONSTANTS.items():
+        data[col] = value
+    return pd.DataFrame(data, columns=FIELDNAMES)
+
+
+def write_users(path, n_users=10000, seed=None, chunk_size=500_000):
+    rng = np.random.default_rng(seed)
+    ids = generate_vk_ids(rng, n_users)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:  # ← utf-8-sig!
+        for start in range(0, n_users, chunk_size):
+            chunk = generate_chunk(rng, ids[start:start + chunk_size])
+            chunk.to_csv(f, index=False, header=(start == 0))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--users', type=int, default=10000)
+    ap.add_argument('--seed', type=int, default=None)
+    ap.add_argument('--out', default='negative_users_10000.csv')
+    args = ap.parse_args()
+
+    write_users(args.out, n_users=args.users, seed=args.seed)
+    print(" Готово! UTF-8-sig файл для Streamlit!")
@@ -0,0 +1,6 @@
+# benchmarks
+# -------------------------------------------------
+# Воспроизводимые бенчмарки пайплайнов дашборда.
+# Запуск из папки vk_dasboard:
+#   python -m benchmarks.bench_hidden_communities --scales 3000,30000
+# -------------------------------------------------
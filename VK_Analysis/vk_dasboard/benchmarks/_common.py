@@ -0,0 +1,149 @@
+# _common.py
+# -------------------------------------------------
+# Общие утилиты бенчмарков: замер этапов (время + память) и запись JSON
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# модули дашборда импортируются "плоско" (как в app.py)
+MODULES_DIR = Path(__file__).resolve().parent.parent / "modules"
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS процесса (МБ)."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / 1024 ** 2
+    except Exception:
+        return float("nan")
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса за всё время жизни (МБ)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт КБ, macOS — байты
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return current_rss_mb()
+
+
+class StageRecorder:
+    """
+    Замер этапов пайплайна:
+      with rec.stage("knn"):
+          ...
+    Для каждого этапа пишем: seconds, rss_before_mb, rss_after_mb,
+    stage_peak_rss_mb (фоновое семплирование RSS) и process_peak_rss_mb.
+    """
+
+    def __init__(self, sample_interval: float = 0.05):
+        self.sample_interval = sample_interval
+        self.stages: List[dict] = []
+
+    @contextmanager
+    def stage(self, name: str, **extra):
+        rss_before = current_rss_mb()
+        peak = [rss_before]
+        stop = threading.Event()
+
+        def _sampler():
+            while not stop.wait(self.sample_interval):
+                peak[0] = max(peak[0], current_rss_mb())
+
+        th = threading.Thread(target=_sampler, daemon=True)
+        th.start()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            stop.set()
+            th.join()
+            rss_after = current_rss_mb()
+            self.stages.append({
+                "stage": name,
+                "seconds": round(seconds, 4),
+                "rss_before_mb": round(rss_before, 1),
+                "rss_after_mb": round(rss_after, 1),
+                "stage_peak_rss_mb": round(max(peak[0], rss_after), 1),
+                "process_peak_rss_mb": round(peak_rss_mb(), 1),
+                **extra,
+            })
+
+    def as_dict(self) -> Dict[str, dict]:
+        return {s["stage"]: s for s in self.stages}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment_info() -> dict:
+    """Окружение запуска — чтобы сравнивать прогоны между собой."""
+    info = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    for mod in ("numpy", "pandas", "scipy", "sklearn", "networkx", "umap"):
+        try:
+            info[f"{mod}_version"] = __import__(mod).__version__
+        except Exception:
+            info[f"{mod}_version"] = None
+    return info
+
+
+def write_results(payload: dict, out_path: Optional[str], prefix: str) -> Path:
+    """Пишем JSON с результатами (по умолчанию benchmarks/results/<prefix>_<время>.json)."""
+    if out_path:
+        path = Path(out_path)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = RESULTS_DIR / f"{prefix}_{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def parse_scales(text: str) -> List[int]:
+    """'3k,30k,1M' / '3000,30000' -> [3000, 30000, ...]"""
+    mult = {"k": 1_000, "m": 1_000_000}
+    out = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if part[-1] in mult:
+            out.append(int(float(part[:-1]) * mult[part[-1]]))
+        else:
+            out.append(int(part))
+    return out
@@ -0,0 +1,168 @@
+# bench_clustering.py
+# -------------------------------------------------
+# Бенчмарк кластеризации профилей (логика clustering.page без Streamlit).
+# Этапы:
+#   load → detect_columns → prepare → preprocess_fit → transform → kmeans → umap → summary → export
+#
+# Запуск (из папки vk_dasboard):
+#   python -m benchmarks.bench_clustering
+#   python -m benchmarks.bench_clustering --scales 10k,100k --negative-share 0.3
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks._common import (
+    DATA_DIR,
+    StageRecorder,
+    environment_info,
+    parse_scales,
+    peak_rss_mb,
+    write_results,
+)
+from benchmarks.profiles import generate_profiles
+
+DEFAULT_SCALES = "10k,100k,1M,5M"
+
+
+def ensure_profiles(n_rows: int, negative_share: float, tail_share: float, seed: int, data_dir: Path) -> dict:
+    """CSV с синтетическими профилями (генерируется один раз и кэшируется)."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    tag = f"{n_rows}r_neg{negative_share:g}_tail{tail_share:g}_s{seed}"
+    path = data_dir / f"profiles_{tag}.csv"
+    if path.exists():
+        return {"path": path, "generate_seconds": 0.0, "cached": True}
+
+    t0 = time.perf_counter()
+    df = generate_profiles(n_rows, negative_share=negative_share, seed=seed, tail_share=tail_share)
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    return {"path": path, "generate_seconds": round(time.perf_counter() - t0, 3), "cached": False}
+
+
+def run_single(csv_path: str, k: int, umap_max_rows: int, seed: int, features: dict | None = None) -> dict:
+    import pandas as pd
+
+    from clustering_pipeline import (
+        FeatureConfig, feature_matrix_stats,
+        detect_columns, prepare_frame, fit_preprocessor, transform_features,
+        fit_kmeans, compute_umap, summarize_clusters, cluster_risk_maps,
+    )
+    from clustered_export import write_clustered
+
+    rec = StageRecorder()
+
+    with rec.stage("load"):
+        df = pd.read_csv(csv_path, encoding="utf-8-sig")
+
+    with rec.stage("detect_columns"):
+        num_cols, cat_cols = detect_columns(df)
+
+    with rec.stage("prepare"):
+        df_proc = prepare_frame(df, cat_cols)
+
+    with rec.stage("preprocess_fit"):
+        pre = fit_preprocessor(df_proc, num_cols, cat_cols, config=FeatureConfig(**(features or {})))
+
+    with rec.stage("transform"):
+        X = transform_features(pre, df_proc)
+
+    with rec.stage("kmeans"):
+        _, labels = fit_kmeans(X, k, random_state=seed)
+        df_out = df.copy()
+        df_out["cluster_kmeans"] = labels
+
+    umap_skipped = len(df) > umap_max_rows
+    if not umap_skipped:
+        with rec.stage("umap"):
+            compute_umap(X, random_state=seed)
+
+    with rec.stage("summary"):
+        summary_df = summarize_clusters(df_out, len(df_proc))
+
+    with rec.stage("export"):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = write_clustered(df, labels, cluster_risk_maps(summary_df), Path(tmp) / "export.csv")
+            export_bytes = out_path.stat().st_size
+
+    return {
+        "n_rows": len(df),
+        "features": feature_matrix_stats(X),
+        "k": k,
+        "umap_skipped": umap_skipped,
+        "export_bytes": export_bytes,
+        "stages": rec.stages,
+        "total_seconds": round(sum(s["seconds"] for s in rec.stages), 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main(argv=None) -> dict:
+    ap = argparse.ArgumentParser(description="Бенчмарк кластеризации профилей")
+    ap.add_argument("--scales", default=DEFAULT_SCALES, help="число строк через запятую (10k,100k,1M,5M)")
+    ap.add_argument("--k", type=int, default=4, help="количество кластеров (как слайдер на странице)")
+    ap.add_argument("--negative-share", type=float, default=0.2, help="доля профилей из negative_users_10000.csv")
+    ap.add_argument("--tail-share", type=float, default=0.0, help="доля редких city/university (длинный хвост)")
+    ap.add_argument("--encoding", default="onehot", help="onehot | hashing")
+    ap.add_argument("--min-frequency", type=float, default=None)
+    ap.add_argument("--max-categories", type=int, default=None)
+    ap.add_argument("--svd", type=int, default=None, help="TruncatedSVD до N компонент")
+    ap.add_argument("--umap-max-rows", type=int, default=100_000, help="выше этого UMAP пропускается")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--data-dir", default=str(DATA_DIR))
+    ap.add_argument("--out", default=None, help="путь к JSON с результатами")
+    args = ap.parse_args(argv)
+
+    params = {
+        "k": args.k,
+        "negative_share": args.negative_share,
+        "tail_share": args.tail_share,
+        "umap_max_rows": args.umap_max_rows,
+        "seed": args.seed,
+        "features": {
+            "encoding": args.encoding,
+            "min_frequency": args.min_frequency,
+            "max_categories": args.max_categories,
+            "svd_components": args.svd,
+        },
+    }
+    runs = []
+
+    for n_rows in parse_scales(args.scales):
+        print(f"=== {n_rows:,} профилей ===")
+        ds = ensure_profiles(n_rows, args.negative_share, args.tail_share, args.seed, Path(args.data_dir))
+        print(f"Датасет: {ds['path'].name} ({'из кэша' if ds['cached'] else 'сгенерирован'})")
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as ex:
+            result = ex.submit(
+                run_single, str(ds["path"]), args.k, args.umap_max_rows, args.seed, params["features"]
+            ).result()
+
+        result["scale"] = n_rows
+        result["generate_seconds"] = ds["generate_seconds"]
+        runs.append(result)
+
+        for s in result["stages"]:
+            print(f"  {s['stage']:<15} {s['seconds']:>10.3f} c   peak {s['stage_peak_rss_mb']:>9.1f} МБ")
+        if result["umap_skipped"]:
+            print(f"  {'umap':<15} пропущен (> {args.umap_max_rows:,} строк)")
+        print(f"  {'итого':<15} {result['total_seconds']:>10.3f} c   peak {result['peak_rss_mb']:>9.1f} МБ")
+
+    payload = {
+        "benchmark": "clustering",
+        "environment": environment_info(),
+        "params": params,
+        "runs": runs,
+    }
+    path = write_results(payload, args.out, prefix="clustering")
+    print(f"\nРезультаты: {path}")
+    return payload
+
+
+if __name__ == "__main__":
+    main()
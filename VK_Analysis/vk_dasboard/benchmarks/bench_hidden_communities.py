@@ -0,0 +1,191 @@
+# bench_hidden_communities.py
+# -------------------------------------------------
+# Бенчмарк пайплайна скрытых сообществ на синтетике разного масштаба.
+# Этапы замеряются по отдельности:
+#   load → from_edges_df → knn → edges → louvain → analyze → layout → figure
+#
+# Запуск (из папки vk_dasboard):
+#   python -m benchmarks.bench_hidden_communities
+#   python -m benchmarks.bench_hidden_communities --scales 3k,30k --out results/run.json
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks._common import (
+    DATA_DIR,
+    StageRecorder,
+    environment_info,
+    parse_scales,
+    peak_rss_mb,
+    write_results,
+)
+
+DEFAULT_SCALES = "3k,30k,300k,1M"
+
+
+# ---------------------------
+# Датасеты (генерируются один раз и кэшируются на диске)
+# ---------------------------
+
+def ensure_dataset(n_users: int, total_communities: int, seed: int, data_dir: Path, n_jobs: int = 1) -> dict:
+    """
+    Генерирует edges/topics векторизованным генератором synthetic_data (если ещё нет в кэше).
+    Одинаковые (n_users, total_communities, seed) -> одинаковые файлы (при любом n_jobs).
+    """
+    from synthetic_data import write_synthetic_dataset
+
+    tag = f"{n_users}u_{total_communities}c_s{seed}_np"  # _np: не путать с кэшем старого генератора
+    edges_path = data_dir / f"edges_{tag}.csv"
+    topics_path = data_dir / f"topics_{tag}.csv"
+
+    if edges_path.exists() and topics_path.exists():
+        return {"edges": edges_path, "topics": topics_path, "generate_seconds": 0.0, "cached": True}
+
+    info = write_synthetic_dataset(
+        data_dir, n_users, total_communities=total_communities, seed=seed, fmt="csv", n_jobs=n_jobs, tag=tag
+    )
+    return {
+        "edges": info["edges"],
+        "topics": info["topics"],
+        "generate_seconds": info["generate_seconds"],
+        "cached": False,
+    }
+
+
+# ---------------------------
+# Один прогон (в отдельном процессе — чтобы пиковый RSS не смешивался между масштабами)
+# ---------------------------
+
+def run_single(
+    edges_path: str,
+    topics_path: str,
+    threshold: float,
+    k_neighbors: int,
+    max_nodes_plot: int,
+    seed: int,
+) -> dict:
+    import pandas as pd
+
+    from create_ug_matrix import UserCommunityData
+    from build_grap_similarity import compute_knn, build_graph_from_knn
+    from topic_profile import build_topic_profile
+    from e import (
+        normalize_topics_df,
+        build_topic_lookup,
+        detect_hidden_communities,
+        analyze_hidden_communities,
+        compute_plot_layout,
+        build_network_figure,
+    )
+
+    rec = StageRecorder()
+
+    with rec.stage("load"):
+        edges_df = pd.read_csv(edges_path, sep=";", encoding="utf-8-sig", dtype=str)
+        topics_df = normalize_topics_df(pd.read_csv(topics_path, sep=";", encoding="utf-8-sig", dtype=str))
+
+    with rec.stage("from_edges_df"):
+        data = UserCommunityData.from_edges_df(edges_df)
+        topic_lookup = build_topic_lookup(topics_df, data.community_ids)
+
+    with rec.stage("knn"):
+        distances, indices = compute_knn(data, k_neighbors=k_neighbors)
+
+    with rec.stage("edges"):
+        G = build_graph_from_knn(data, distances, indices, threshold=threshold, show_progress=False)
+    del distances, indices
+
+    with rec.stage("louvain"):
+        partition, modularity = detect_hidden_communities(G, random_state=seed)
+
+    with rec.stage("analyze"):
+        profile = build_topic_profile(data, partition, topic_lookup)
+        summary_rows, cluster_info = analyze_hidden_communities(
+            G, partition, {}, topic_lookup.topic_map(), topic_lookup.name_map(),
+            top_n_groups=5, profile=profile,
+        )
+
+    with rec.stage("layout"):
+        H, pos = compute_plot_layout(G, max_nodes_plot=max_nodes_plot)
+
+    with rec.stage("figure"):
+        build_network_figure(H, pos, partition, cluster_info, summary_rows, modularity)
+
+    return {
+        "n_users": len(data.user_ids),
+        "n_communities": len(data.community_ids),
+        "n_memberships": int(data.csr.nnz),
+        "graph_nodes": G.number_of_nodes(),
+        "graph_edges": G.number_of_edges(),
+        "n_hidden_communities": len(summary_rows),
+        "modularity": round(float(modularity), 6),
+        "stages": rec.stages,
+        "total_seconds": round(sum(s["seconds"] for s in rec.stages), 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def main(argv=None) -> dict:
+    ap = argparse.ArgumentParser(description="Бенчмарк пайплайна скрытых сообществ")
+    ap.add_argument("--scales", default=DEFAULT_SCALES, help="число пользователей через запятую (3k,30k,300k,1M)")
+    ap.add_argument("--communities", type=int, default=1200, help="размер каталога сообществ")
+    ap.add_argument("--seed", type=int, default=123)
+    ap.add_argument("--threshold", type=float, default=0.15)
+    ap.add_argument("--k-neighbors", type=int, default=50)
+    ap.add_argument("--max-nodes-plot", type=int, default=2000)
+    ap.add_argument("--data-dir", default=str(DATA_DIR), help="куда кэшировать сгенерированные датасеты")
+    ap.add_argument("--gen-jobs", type=int, default=1, help="процессов для генерации датасета (-1 — все ядра)")
+    ap.add_argument("--out", default=None, help="путь к JSON с результатами")
+    args = ap.parse_args(argv)
+
+    params = {
+        "communities": args.communities,
+        "seed": args.seed,
+        "threshold": args.threshold,
+        "k_neighbors": args.k_neighbors,
+        "max_nodes_plot": args.max_nodes_plot,
+    }
+    runs = []
+
+    for n_users in parse_scales(args.scales):
+        print(f"=== {n_users:,} пользователей ===")
+        ds = ensure_dataset(n_users, args.communities, args.seed, Path(args.data_dir), n_jobs=args.gen_jobs)
+        print(f"Датасет: {ds['edges'].name} ({'из кэша' if ds['cached'] else 'сгенерирован'})")
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as ex:
+            result = ex.submit(
+                run_single,
+                str(ds["edges"]), str(ds["topics"]),
+                args.threshold, args.k_neighbors, args.max_nodes_plot, args.seed,
+            ).result()
+
+        result["scale"] = n_users
+        result["generate_seconds"] = ds["generate_seconds"]
+        runs.append(result)
+
+        for s in result["stages"]:
+            print(f"  {s['stage']:<14} {s['seconds']:>10.3f} c   peak {s['stage_peak_rss_mb']:>9.1f} МБ")
+        print(f"  {'итого':<14} {result['total_seconds']:>10.3f} c   peak {result['peak_rss_mb']:>9.1f} МБ")
+
+    payload = {
+        "benchmark": "hidden_communities",
+        "environment": environment_info(),
+        "params": params,
+        "runs": runs,
+    }
+    path = write_results(payload, args.out, prefix="hidden_communities")
+    print(f"\nРезультаты: {path}")
+    return payload
+
+
+if __name__ == "__main__":
+    main()
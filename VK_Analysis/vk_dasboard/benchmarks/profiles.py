@@ -0,0 +1,120 @@
+# profiles.py
+# -------------------------------------------------
+# Синтетические таблицы профилей в схеме реальных CSV:
+#   vk_users_10000_positive_realistic.csv  (с колонкой synthetic_cluster)
+#   Gen_example_csv/negative_users_10000.csv
+# Распределения колонок берутся из этих файлов (эмпирические частоты),
+# генерация векторная (numpy Generator) — 5M строк за секунды.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+DASHBOARD_DIR = Path(__file__).resolve().parent.parent
+POSITIVE_CSV = DASHBOARD_DIR / "vk_users_10000_positive_realistic.csv"
+NEGATIVE_CSV = DASHBOARD_DIR.parent.parent / "Gen_example_csv" / "negative_users_10000.csv"
+
+PROFILE_COLUMNS = [
+    "id", "sex", "age", "city", "education_level", "university",
+    "main_in_life", "main_in_people", "smoking", "alcohol", "political",
+]
+
+# запасной словарь — если эталонных CSV нет рядом
+_FALLBACK = {
+    "sex": ["ж", "м"],
+    "city": ["Москва", "СПб", "Екатеринбург", "Уфа", "Казань", "Томск", "Омск"],
+    "education_level": ["высшее", "неоконченное высшее", "среднее", "среднее спец.", "нет"],
+    "university": ["МГУ", "СПбГУ", "ИТМО", "УрФУ", "НГУ", "РАНХиГС"],
+    "main_in_life": ["семья и дети", "саморазвитие", "карьера и деньги", "развлечения и отдых"],
+    "main_in_people": ["доброта и честность", "ум и креативность", "власть и богатство"],
+    "smoking": ["негативное", "резко негативное", "компромиссное", "нейтральное", "положительное"],
+    "alcohol": ["негативное", "резко негативное", "компромиссное", "нейтральное", "положительное"],
+    "political": ["Умеренные", "Консервативные", "Индифферентные", "Либеральные"],
+    "synthetic_cluster": ["reliable", "borderline", "risky"],
+}
+
+Distribution = Tuple[np.ndarray, np.ndarray]  # (значения, вероятности)
+
+
+@lru_cache(maxsize=None)
+def column_distributions(kind: str) -> Dict[str, Distribution]:
+    """Эмпирические распределения колонок для kind='positive' | 'negative'."""
+    path = POSITIVE_CSV if kind == "positive" else NEGATIVE_CSV
+    if path.exists():
+        df = pd.read_csv(path, encoding="utf-8-sig")
+    else:
+        df = None
+
+    dists: Dict[str, Distribution] = {}
+    for col in PROFILE_COLUMNS[1:] + ["synthetic_cluster"]:
+        if df is not None and col in df.columns:
+            vc = df[col].value_counts(normalize=True)
+            dists[col] = (vc.index.to_numpy(), vc.to_numpy(dtype=float))
+        elif col == "age":
+            ages = np.arange(18, 66)
+            dists[col] = (ages, np.full(len(ages), 1.0 / len(ages)))
+        elif col in _FALLBACK and not (col == "synthetic_cluster" and kind == "negative"):
+            vals = np.array(_FALLBACK[col], dtype=object)
+            dists[col] = (vals, np.full(len(vals), 1.0 / len(vals)))
+    return dists
+
+
+def _long_tail(rng: np.random.Generator, n: int, prefix: str, cardinality: int) -> np.ndarray:
+    """Zipf-хвост редких значений ('Город #17', ...) — имитация свободного текста ВК."""
+    ranks = np.minimum(rng.zipf(1.3, size=n), cardinality)
+    return np.char.add(prefix, ranks.astype(str)).astype(object)
+
+
+def generate_profiles(
+    n_rows: int,
+    negative_share: float = 0.0,
+    seed: int = 42,
+    tail_share: float = 0.0,
+    tail_cardinality: int = 50_000,
+) -> pd.DataFrame:
+    """
+    Таблица профилей в схеме vk_users_10000_positive_realistic.csv.
+
+    negative_share   : доля строк из "негативного" распределения (negative_users_10000.csv)
+    tail_share       : доля строк с редкими city/university из длинного хвоста
+                       (для проверки высококардинальных колонок)
+    tail_cardinality : сколько различных редких значений в хвосте
+    """
+    rng = np.random.default_rng(seed)
+    n_neg = int(round(n_rows * negative_share))
+    is_neg = np.zeros(n_rows, dtype=bool)
+    is_neg[rng.choice(n_rows, size=n_neg, replace=False)] = True
+
+    pos, neg = column_distributions("positive"), column_distributions("negative")
+    out: Dict[str, np.ndarray] = {"id": rng.permutation(n_rows).astype(np.int64) + 1}
+
+    for col in PROFILE_COLUMNS[1:] + ["synthetic_cluster"]:
+        if col not in pos:
+            continue
+        vals, probs = pos[col]
+        arr = rng.choice(vals, size=n_rows, p=probs)
+        if n_neg and col in neg:
+            nvals, nprobs = neg[col]
+            arr = arr.astype(object)
+            arr[is_neg] = rng.choice(nvals, size=n_neg, p=nprobs)
+        elif n_neg and col == "synthetic_cluster":
+            arr = arr.astype(object)
+            arr[is_neg] = "risky"
+        out[col] = arr
+
+    if tail_share > 0:
+        for col, prefix in (("city", "Город #"), ("university", "Вуз #")):
+            mask = rng.random(n_rows) < tail_share
+            col_arr = out[col].astype(object)
+            col_arr[mask] = _long_tail(rng, int(mask.sum()), prefix, tail_cardinality)
+            out[col] = col_arr
+
+    df = pd.DataFrame(out)
+    df["age"] = df["age"].astype(np.int64)
+    return df
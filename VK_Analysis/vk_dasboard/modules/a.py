@@ -1,17 +1,71 @@
+# a.py
+# -------------------------------------------------
+# Batch-пайплайн скрытых сообществ (без Streamlit), для ночных прогонов:
+#   edges CSV → UserCommunityData → kNN → граф схожести → Louvain → анализ
+#   → partition / summary / topic_profile (CSV или Parquet) [+ HTML-граф по флагу --plot]
+#
+# Пример:
+#   python a.py --edges users_communities_edges.csv --topics community_topics.csv \
+#               --out-dir out --jobs 8 --method sparse --chunk-size 5000 --format parquet
+#
+# Суточные дельты (граф патчится, kNN только для затронутых пользователей):
+#   python a.py --edges users_communities_edges.csv --state-dir state        # первая полная сборка
+#   python a.py --state-dir state --added day_added.csv --removed day_removed.csv
+# Louvain после дельты стартует с прошлого разбиения (state/partition.csv),
+# id скрытых сообществ сохраняются между запусками.
+#
+# Одинаковые наборы подписок (боты/клоны) — kNN только по уникальным наборам:
+#   python a.py --edges users_communities_edges.csv --dedup supernode
+#
+# Граф схожести на диске (memmap CSR, см. disk_graph) — рёбра пишутся из kNN, nx.Graph всего графа не строится:
+#   python a.py --edges users_communities_edges.csv --graph-dir graph
+# Louvain — DiskGraph.louvain на графе блоков (сильнейший сосед + прошлое разбиение из graph/partition.csv),
+# метрики сообществ и узлов (graph_metrics), список рёбер (similarity_edges) — по блокам строк с диска;
+# nx.Graph — только для отрисовываемого подграфа (--plot, не больше --max-nodes-plot узлов).
+#
+# Все уровни Louvain (дендрограмма + уточнение внутри сообществ) — для drill-down, см. louvain_levels:
+#   python a.py --edges users_communities_edges.csv --levels --refine-depth 1
+#
+# Значимость скрытых сообществ (перестановочный тест, см. community_significance):
+#   python a.py --edges users_communities_edges.csv --significance 500 --null-model degree
+#
+# Разрежение графа перед Louvain (см. graph_backbone); --backbone-report — сравнение с полным графом
+# (Louvain ещё и на нём), в run_stats.json — доля рёбер, ΔQ и ARI:
+#   python a.py --edges users_communities_edges.csv --backbone quantile --backbone-param 0.8 --backbone-report
+# -------------------------------------------------
 
-
-"""
 from __future__ import annotations
 
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
-import pandas as pd
-
-from create_ug_matrix import create_user_community_matrix_from_edges  # <-- создаём data корректно из edges
-from build_grap_similarity import build_similarity_graph              # <-- ВАЖНО: импорт отсюда!
-from e import visualize_network_advanced
-from create_ug_matrix import create_user_community_matrix_from_edges
+from typing import Dict, List, Optional
 
+import networkx as nx
+import pandas as pd
+from community import community_louvain
 
+from community_significance import NULL_MODELS, SignificanceResult, permutation_test
+from create_ug_matrix import UserCommunityData
+from build_grap_similarity import KNN_EXECUTORS, KNN_METHODS, compute_knn, build_graph_from_knn
+from disk_graph import DiskGraph, write_disk_graph_from_knn
+from graph_backbone import BACKBONE_METHODS, BACKBONE_PARAMS, BackboneReport, backbone_stage
+from duplicate_users import DEDUP_MODES, DuplicateGroups, build_dedup_similarity_graph
+from incremental_graph import DeltaStats, IncrementalSimilarityGraph
+from louvain_levels import LouvainHierarchy, build_louvain_hierarchy
+from louvain_update import LouvainUpdateStats, stabilize_labels, update_partition
+from topic_profile import build_topic_profile
+from e import (
+    normalize_topics_df,
+    build_topic_lookup,
+    detect_hidden_communities,
+    analyze_hidden_communities,
+    compute_plot_layout,
+    build_network_figure,
+)
 
 
 def load_edges_csv(path: str) -> pd.DataFrame:
@@ -28,59 +82,477 @@ def load_edges_csv(path: str) -> pd.DataFrame:
     return df
 
 
-if __name__ == "__main__":
-    # ---------------------------
-    # Пути к файлам (лежать рядом с a.py)
-    # ---------------------------
-    edges_csv = Path("users_communities_edges.csv")
-    topics_csv = Path("community_topics.csv")
-
-    if not edges_csv.exists():
-        raise FileNotFoundError(f"Не найден файл: {edges_csv.resolve()}")
-    if not topics_csv.exists():
-        raise FileNotFoundError(f"Не найден файл: {topics_csv.resolve()}")
-
-    # ---------------------------
-    # 1) Загружаем edges
-    # ---------------------------
-    df_edges = load_edges_csv(str(edges_csv))
+def write_table(df: pd.DataFrame, path_no_ext: Path, fmt: str) -> Path:
+    """Пишем таблицу в CSV (utf-8-sig, ';' — как входные файлы) или Parquet."""
+    if fmt == "parquet":
+        path = path_no_ext.with_suffix(".parquet")
+        df.to_parquet(path, index=False)
+    else:
+        path = path_no_ext.with_suffix(".csv")
+        df.to_csv(path, index=False, encoding="utf-8-sig", sep=";")
+    return path
+
+
+def load_partition(state_dir: str | Path) -> dict:
+    """Разбиение прошлого запуска из папки состояния (пустой dict, если его нет)."""
+    path = Path(state_dir) / "partition.csv"
+    if not path.exists():
+        return {}
+    df = pd.read_csv(path, sep=";", encoding="utf-8-sig", dtype={"user_id": str, "hidden_comm_id": int})
+    return dict(zip(df["user_id"], df["hidden_comm_id"].astype(int)))
+
+
+def save_partition(partition: dict, state_dir: str | Path) -> Path:
+    path = Path(state_dir) / "partition.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"user_id": list(partition.keys()), "hidden_comm_id": list(partition.values())}).to_csv(
+        path, index=False, encoding="utf-8-sig", sep=";"
+    )
+    return path
+
+
+# ---------------------------
+# Этапы пайплайна
+# ---------------------------
+@dataclass(frozen=True)
+class LoadedInput:
+    """data — матрица user×community; inc/delta — только для суточной дельты (--added/--removed)."""
+    data: UserCommunityData
+    inc: Optional[IncrementalSimilarityGraph] = None
+    delta: Optional[DeltaStats] = None
+
+
+@dataclass(frozen=True)
+class SimilarityStage:
+    G: Optional[nx.Graph]  # None при --graph-dir: граф только на диске (disk)
+    topic_lookup: object
+    inc: Optional[IncrementalSimilarityGraph] = None  # граф с состоянием для дельт (--state-dir)
+    dup_groups: Optional[DuplicateGroups] = None
+    backbone: Optional[BackboneReport] = None
+    # Louvain скелета из --backbone-report (тот же --seed и --resolution, что у этапа Louvain)
+    backbone_partition: Optional[Dict[str, int]] = None
+    disk: Optional[DiskGraph] = None
+
+    @property
+    def n_nodes(self) -> int:
+        return self.disk.n_nodes if self.disk is not None else self.G.number_of_nodes()
+
+    @property
+    def n_edges(self) -> int:
+        return self.disk.n_edges if self.disk is not None else self.G.number_of_edges()
+
+
+@dataclass(frozen=True)
+class LouvainStage:
+    partition: Dict[str, int]
+    modularity: float
+    hierarchy: Optional[LouvainHierarchy] = None
+    louvain_stats: Optional[LouvainUpdateStats] = None
+
+
+@dataclass(frozen=True)
+class AnalysisStage:
+    profile: object
+    summary_rows: List[dict]
+    cluster_info: dict
+    significance: Optional[SignificanceResult] = None
+
+
+def validate_args(args) -> None:
+    """Все проверки файлов и несовместимых флагов — до начала расчётов."""
+    incremental = bool(args.added or args.removed)
+    if not Path(args.edges).exists() and not incremental:
+        raise FileNotFoundError(f"Не найден файл: {Path(args.edges).resolve()}")
+    if not Path(args.topics).exists():
+        raise FileNotFoundError(f"Не найден файл: {Path(args.topics).resolve()}")
+
+    conflicts = [
+        (incremental and not args.state_dir,
+         "--added/--removed требуют --state-dir с состоянием предыдущего запуска."),
+        (args.dedup != "none" and args.state_dir,
+         "--dedup не совместим с --state-dir (инкрементальный граф строится по всем пользователям)."),
+        (args.graph_dir and (args.state_dir or args.dedup != "none"),
+         "--graph-dir работает только с полной сборкой графа (без --state-dir и --dedup)."),
+        (args.graph_dir and (args.levels or args.backbone != "none" or args.significance),
+         "--levels, --backbone и --significance требуют граф в памяти — с --graph-dir они не работают."),
+        (args.backbone_report and args.backbone == "none", "--backbone-report нужен вместе с --backbone."),
+        (args.levels and (args.state_dir or args.dedup == "supernode"),
+         "--levels работает только с полной сборкой графа пользователей (без --state-dir и --dedup supernode)."),
+    ]
+    for bad, message in conflicts:
+        if bad:
+            raise ValueError(message)
+
+
+def stage_load(args, timings: dict) -> LoadedInput:
+    """1-2) edges → UserCommunityData, либо состояние прошлого запуска + суточная дельта."""
+    if args.added or args.removed:
+        t0 = time.perf_counter()
+        inc = IncrementalSimilarityGraph.load(args.state_dir)
+        timings["load"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        delta = inc.apply_delta(
+            added=load_edges_csv(args.added) if args.added else None,
+            removed=load_edges_csv(args.removed) if args.removed else None,
+        )
+        inc.save(args.state_dir)
+        timings["delta"] = time.perf_counter() - t0
+        print(
+            f"Дельта: +{delta.added_edges} / -{delta.removed_edges} строк, "
+            f"изменилось пользователей: {delta.changed_users}, пересчитано: {delta.affected_users}"
+        )
+        return LoadedInput(data=inc.to_user_community_data(), inc=inc, delta=delta)
+
+    t0 = time.perf_counter()
+    df_edges = load_edges_csv(args.edges)
+    timings["load"] = time.perf_counter() - t0
     print(f"Пользователей (уникальных): {df_edges['user_id'].nunique()} | Рёбер: {df_edges.shape[0]}")
 
-    # ---------------------------
-    # 2) Создаём структуру данных (sparse user×community)
-    # ---------------------------
-    #data = create_user_community_matrix_from_edges(df_edges)
-    data = create_user_community_matrix_from_edges(df_edges)
-
-    # ---------------------------
-    # 3) Строим граф схожести
-    # ---------------------------
-    G = build_similarity_graph(   # это параметры плотности графа
-        data=data,
-        threshold=0.15,
-        k_neighbors=50,
-        show_progress=True
+    t0 = time.perf_counter()
+    data = UserCommunityData.from_edges_df(df_edges)
+    timings["from_edges_df"] = time.perf_counter() - t0
+    return LoadedInput(data=data)
+
+
+def _similarity_graph(args, loaded: LoadedInput, timings: dict):
+    """Граф схожести по режиму запуска: (G, inc, dup_groups, disk)."""
+    data, inc = loaded.data, loaded.inc
+    if inc is not None:
+        return inc.G, inc, None, None
+
+    t0 = time.perf_counter()
+    if args.state_dir:
+        # полная сборка с сохранением состояния для суточных дельт (см. --added/--removed)
+        inc = IncrementalSimilarityGraph.build(
+            data, threshold=args.threshold, k_neighbors=args.k_neighbors,
+            n_jobs=args.jobs, chunk_size=args.chunk_size,
+        )
+        inc.save(args.state_dir)
+        timings["knn"] = time.perf_counter() - t0
+        return inc.G, inc, None, None
+    if args.dedup != "none":
+        # kNN по представителям уникальных наборов подписок, дубликаты разворачиваются обратно
+        G, dup_groups = build_dedup_similarity_graph(
+            data, threshold=args.threshold, k_neighbors=args.k_neighbors, mode=args.dedup,
+            n_jobs=args.jobs, method=args.method, chunk_size=args.chunk_size, executor=args.executor,
+        )
+        timings["knn"] = time.perf_counter() - t0
+        return G, None, dup_groups, None
+
+    distances, indices = compute_knn(
+        data,
+        k_neighbors=args.k_neighbors,
+        n_jobs=args.jobs,
+        method=args.method,
+        chunk_size=args.chunk_size,
+        executor=args.executor,
     )
+    timings["knn"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if args.graph_dir:
+        # граф только на диске: дальше всё идёт через DiskGraph, nx.Graph целиком не строится
+        disk = write_disk_graph_from_knn(distances, indices, data.user_ids, args.graph_dir, threshold=args.threshold)
+        timings["edges"] = time.perf_counter() - t0
+        return None, None, None, disk
+    G = build_graph_from_knn(data, distances, indices, threshold=args.threshold, show_progress=False)
+    timings["edges"] = time.perf_counter() - t0
+    return G, None, None, None
 
-    print(f"Граф: узлов={G.number_of_nodes()}, рёбер={G.number_of_edges()}")
-
-    # ---------------------------
-    # 4) Визуализация + анализ скрытых сообществ
-    # ---------------------------
-    partition, summary_rows, cluster_info, fig = visualize_network_advanced(
-        G=G,
-        edges_df=df_edges,                    # <-- исправлено: было edges_df (несуществовало)
-        topics_csv_path=str(topics_csv),
-        title="Анализ скрытых сообществ ВКонтакте",
-        show=True,
-        max_nodes_plot=2000
+
+def stage_graph(args, loaded: LoadedInput, timings: dict) -> SimilarityStage:
+    """3) Граф схожести; тематики готовятся параллельно (от графа они не зависят)."""
+    data = loaded.data
+    with ThreadPoolExecutor(max_workers=1) as side:
+        side_job = side.submit(
+            lambda: build_topic_lookup(
+                normalize_topics_df(pd.read_csv(args.topics, sep=";", encoding="utf-8-sig", dtype=str)),
+                data.community_ids,
+            )
+        )
+        G, inc, dup_groups, disk = _similarity_graph(args, loaded, timings)
+        topic_lookup = side_job.result()
+
+    graph = SimilarityStage(G=G, topic_lookup=topic_lookup, inc=inc, dup_groups=dup_groups, disk=disk)
+    print(f"Граф: узлов={graph.n_nodes}, рёбер={graph.n_edges}")
+    if graph.n_edges == 0:
+        raise ValueError("Граф получился без рёбер: уменьшите --threshold или увеличьте --k-neighbors.")
+    return graph
+
+
+def stage_backbone(args, graph: SimilarityStage, timings: dict) -> SimilarityStage:
+    """Скелет графа: дальше (Louvain, значимость, HTML) работаем на нём."""
+    if args.backbone == "none":
+        return graph
+    t0 = time.perf_counter()
+    name, default = BACKBONE_PARAMS[args.backbone]
+    param = default if args.backbone_param is None else args.backbone_param
+    B, report, partition = backbone_stage(
+        graph.G, method=args.backbone, random_state=args.seed, resolution=args.resolution,
+        compare=args.backbone_report, **{name: param}
+    )
+    timings["backbone"] = time.perf_counter() - t0
+    if report is None:
+        before = graph.G.number_of_edges()
+        print(f"Скелет графа ({args.backbone}, {name}={param}): рёбер {B.number_of_edges()} из {before} "
+              f"(-{1.0 - B.number_of_edges() / before:.0%})")
+        return replace(graph, G=B)
+    print(
+        f"Скелет графа ({args.backbone}, {name}={param}): рёбер {report.edges_after} "
+        f"(-{report.edge_reduction:.0%}), ΔQ={report.modularity_change:+.4f}, ARI={report.ari:.3f}"
     )
+    return replace(graph, G=B, backbone=report, backbone_partition=partition)
 
-    print("\nТОП-5 скрытых сообществ (по значимости):")
+
+def stage_louvain(args, loaded: LoadedInput, graph: SimilarityStage, timings: dict) -> LouvainStage:
+    """4) Louvain: иерархия уровней, тёплый старт после дельты или обычный запуск."""
+    t0 = time.perf_counter()
+    G = graph.G
+    # прошлое разбиение: состояние для дельт или (--graph-dir) разбиение, сохранённое рядом с графом
+    partition_dir = args.state_dir or args.graph_dir
+    prev_partition = load_partition(partition_dir) if partition_dir else None
+    louvain_stats = None
+    hierarchy = None
+    if args.levels:
+        # одна дендрограмма: верхний уровень — то же разбиение, что detect_hidden_communities
+        hierarchy = build_louvain_hierarchy(
+            G, loaded.data, graph.topic_lookup, random_state=args.seed, resolution=args.resolution,
+            refine_depth=args.refine_depth,
+        )
+        partition, modularity = hierarchy.top.partition, hierarchy.top.modularity
+    elif loaded.delta is not None and prev_partition:
+        # тёплый старт: пересобираются только окрестности изменившихся узлов
+        partition, modularity, louvain_stats = update_partition(
+            G, prev_partition, touched=graph.inc.last_touched, random_state=args.seed, resolution=args.resolution
+        )
+    else:
+        if graph.disk is not None:
+            # граф блоков в памяти, полный граф — нет; блоки не пересекают прошлые сообщества
+            disk = graph.disk
+            labels, modularity = disk.louvain(
+                disk.coarse_blocks(prev_partition), random_state=args.seed, resolution=args.resolution
+            )
+            partition = dict(zip(disk.node_ids.tolist(), labels.tolist()))
+        elif graph.backbone_partition is not None:
+            # Louvain на скелете уже посчитан для --backbone-report с теми же seed и resolution
+            partition = graph.backbone_partition
+            modularity = community_louvain.modularity(partition, G, weight="weight")
+        else:
+            partition, modularity = detect_hidden_communities(G, random_state=args.seed, resolution=args.resolution)
+        if prev_partition:
+            # id сообществ сопоставимы с прошлым запуском
+            partition = stabilize_labels(prev_partition, partition)
+    if graph.dup_groups is not None and args.dedup == "supernode":
+        # узлы графа — группы дубликатов: метку получает каждый участник группы
+        partition = graph.dup_groups.expand_partition(partition, loaded.data)
+    if partition_dir:
+        save_partition(partition, partition_dir)
+    timings["louvain"] = time.perf_counter() - t0
+    return LouvainStage(partition=partition, modularity=modularity, hierarchy=hierarchy, louvain_stats=louvain_stats)
+
+
+def stage_analyze(args, loaded: LoadedInput, graph: SimilarityStage, louvain: LouvainStage, timings: dict) -> AnalysisStage:
+    """Сводка скрытых сообществ (+ перестановочный тест по --significance)."""
+    t0 = time.perf_counter()
+    # группы/тематики кластеров — через sparse-произведения (topic_profile)
+    profile = build_topic_profile(loaded.data, louvain.partition, graph.topic_lookup)
+    if louvain.hierarchy is not None:
+        summary_rows, cluster_info = louvain.hierarchy.top.summary_rows, louvain.hierarchy.top.cluster_info
+    else:
+        # --graph-dir: плотность/вес сообществ — по блокам строк с диска, без подграфов nx
+        metrics = graph.disk.community_metrics(louvain.partition) if graph.disk is not None else None
+        summary_rows, cluster_info = analyze_hidden_communities(
+            graph.G, louvain.partition, {}, graph.topic_lookup.topic_map(), graph.topic_lookup.name_map(),
+            top_n_groups=5, profile=profile, metrics=metrics,
+        )
+    timings["analyze"] = time.perf_counter() - t0
+
+    significance = None
+    if args.significance:
+        t0 = time.perf_counter()
+        # узлы графа (в т.ч. представители при --dedup supernode) есть в разбиении;
+        # у графа групп размеры и рёбра считаются с multiplicity — как у развёрнутого графа
+        significance = permutation_test(
+            graph.G, louvain.partition, null_model=args.null_model, n_permutations=args.significance,
+            seed=args.seed, n_jobs=args.jobs,
+        )
+        timings["significance"] = time.perf_counter() - t0
+    return AnalysisStage(profile=profile, summary_rows=summary_rows, cluster_info=cluster_info, significance=significance)
+
+
+def stage_write(
+    args, loaded: LoadedInput, graph: SimilarityStage, louvain: LouvainStage, analysis: AnalysisStage, timings: dict
+) -> Dict[str, str]:
+    """5-6) Таблицы результатов и (по --plot) HTML-граф; возвращает пути файлов."""
+    t0 = time.perf_counter()
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    partition = louvain.partition
+    significance = analysis.significance
+    partition_df = pd.DataFrame({
+        "user_id": list(partition.keys()),
+        "hidden_comm_id": list(partition.values()),
+    })
+    summary_df = pd.DataFrame(analysis.summary_rows)
+    if significance is not None:
+        cols = ["hidden_comm_id", "z_score", "p_value", "q_value"]
+        summary_df = summary_df.merge(significance.table[cols], on="hidden_comm_id", how="left")
+    topics_dist_df = analysis.profile.topic_distribution(normalize=False).reset_index()
+    outputs = {
+        "partition": str(write_table(partition_df, out_dir / "hidden_partition", args.format)),
+        "summary": str(write_table(summary_df, out_dir / "hidden_summary", args.format)),
+        "topic_profile": str(write_table(topics_dist_df, out_dir / "hidden_topic_profile", args.format)),
+    }
+    if graph.disk is not None:
+        outputs["graph_dir"] = str(args.graph_dir)
+        # метрики узлов (степень, PageRank, компонента) и список рёбер — потоково с диска
+        node_metrics = graph.disk.metrics().table.reset_index()
+        outputs["graph_metrics"] = str(write_table(node_metrics, out_dir / "graph_metrics", args.format))
+        outputs["similarity_edges"] = str(graph.disk.export_edges(
+            (out_dir / "similarity_edges").with_suffix(f".{args.format}"), fmt=args.format
+        ))
+    if significance is not None:
+        outputs["significance"] = str(write_table(significance.table, out_dir / "hidden_significance", args.format))
+    if louvain.hierarchy is not None:
+        hierarchy = louvain.hierarchy
+        outputs["partition_levels"] = str(write_table(hierarchy.partition_table(), out_dir / "hidden_partition_levels", args.format))
+        outputs["levels_summary"] = str(write_table(hierarchy.summary_table(), out_dir / "hidden_levels_summary", args.format))
+    if graph.dup_groups is not None:
+        outputs["duplicate_groups"] = str(write_table(graph.dup_groups.table(loaded.data), out_dir / "duplicate_groups", args.format))
+    timings["write"] = time.perf_counter() - t0
+
+    # визуализация — только по запросу (дорогой spring layout)
+    if args.plot:
+        t0 = time.perf_counter()
+        if graph.disk is not None:
+            # nx.Graph — только для отрисовываемых узлов (первые max_nodes_plot, как compute_plot_layout)
+            shown = graph.disk.node_ids[:args.max_nodes_plot]
+            G_plot = graph.disk.to_networkx(shown, max_nodes=args.max_nodes_plot)
+        else:
+            G_plot = graph.G
+        H, pos = compute_plot_layout(G_plot, max_nodes_plot=args.max_nodes_plot)
+        fig = build_network_figure(H, pos, partition, analysis.cluster_info, analysis.summary_rows, louvain.modularity)
+        html_path = out_dir / "hidden_communities.html"
+        fig.write_html(str(html_path))
+        outputs["plot"] = str(html_path)
+        timings["plot"] = time.perf_counter() - t0
+    return outputs
+
+
+def collect_stats(
+    args, loaded: LoadedInput, graph: SimilarityStage, louvain: LouvainStage, analysis: AnalysisStage, outputs: Dict[str, str], timings: dict,
+) -> dict:
+    """Содержимое run_stats.json."""
+    stats = {
+        "users": len(loaded.data.user_ids),
+        "communities": len(loaded.data.community_ids),
+        "graph_edges": graph.n_edges,
+        "hidden_communities": len(analysis.summary_rows),
+        "modularity": round(float(louvain.modularity), 6),
+        "params": {
+            "threshold": args.threshold, "k_neighbors": args.k_neighbors,
+            "method": args.method, "jobs": args.jobs, "chunk_size": args.chunk_size, "executor": args.executor,
+            "dedup": args.dedup, "resolution": args.resolution,
+            "levels": args.levels, "refine_depth": args.refine_depth,
+            "backbone": args.backbone,
+        },
+        "seconds": {k: round(v, 3) for k, v in timings.items()},
+        "outputs": outputs,
+    }
+    if loaded.delta is not None:
+        stats["params"].update(threshold=graph.inc.threshold, k_neighbors=graph.inc.k_neighbors, method="incremental")
+        stats["delta"] = asdict(loaded.delta)
+    if louvain.louvain_stats is not None:
+        stats["louvain_update"] = asdict(louvain.louvain_stats)
+    if graph.dup_groups is not None:
+        stats["duplicates"] = graph.dup_groups.summary()
+    if graph.backbone is not None:
+        stats["backbone"] = graph.backbone.to_dict()
+    significance = analysis.significance
+    if significance is not None:
+        stats["significance"] = {
+            "null_model": significance.null_model,
+            "permutations": significance.n_permutations,
+            "significant_q05": len(significance.significant()),
+            "seconds": significance.seconds,
+        }
+    if louvain.hierarchy is not None:
+        stats["levels"] = louvain.hierarchy.level_table().to_dict(orient="records")
+    return stats
+
+
+def run(args) -> dict:
+    validate_args(args)
+    timings = {}
+    t_all = time.perf_counter()
+
+    loaded = stage_load(args, timings)
+    graph = stage_graph(args, loaded, timings)
+    graph = stage_backbone(args, graph, timings)
+    louvain = stage_louvain(args, loaded, graph, timings)
+    analysis = stage_analyze(args, loaded, graph, louvain, timings)
+    outputs = stage_write(args, loaded, graph, louvain, analysis, timings)
+
+    timings["total"] = time.perf_counter() - t_all
+    stats = collect_stats(args, loaded, graph, louvain, analysis, outputs, timings)
+    out_dir = Path(args.out_dir)
+    (out_dir / "run_stats.json").write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    summary_rows = analysis.summary_rows
+    print(f"\nМодулярность: {louvain.modularity:.4f} | скрытых сообществ: {len(summary_rows)}")
+    print("ТОП-5 скрытых сообществ (по значимости):")
     for r in summary_rows[:5]:
         print(
             f"ID {r['hidden_comm_id']}: score={r['score']} | size={r['size_users']} | "
             f"тематики: {r['top_topics']} | признак: {r['обобщающий_признак']}"
         )
-"""
+    print("\nЭтапы: " + ", ".join(f"{k}={v:.2f}c" for k, v in timings.items()))
+    print(f"Результаты: {out_dir.resolve()}")
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Batch-анализ скрытых сообществ ВК (без Streamlit)")
+    ap.add_argument("--edges", default="users_communities_edges.csv", help="CSV user_id;community_id")
+    ap.add_argument("--topics", default="community_topics.csv", help="CSV community_id;topic;name")
+    ap.add_argument("--out-dir", default="hidden_output")
+    ap.add_argument("--format", choices=("csv", "parquet"), default="csv", help="формат таблиц partition/summary")
+    ap.add_argument("--threshold", type=float, default=0.15, help="минимальная схожесть ребра")
+    ap.add_argument("--k-neighbors", type=int, default=50)
+    ap.add_argument("--method", choices=KNN_METHODS, default="brute", help="алгоритм kNN")
+    ap.add_argument("--jobs", type=int, default=-1, help="число потоков kNN (-1 = все ядра)")
+    ap.add_argument("--chunk-size", type=int, default=2000, help="строк на блок в --method sparse")
+    ap.add_argument(
+        "--executor", choices=KNN_EXECUTORS, default="threads",
+        help="--method sparse: потоки или пул процессов над матрицей в shared memory",
+    )
+    ap.add_argument("--seed", type=int, default=42, help="random_state для Louvain")
+    ap.add_argument("--resolution", type=float, default=1.0, help="детализация Louvain (подбор — resolution_sweep.py)")
+    ap.add_argument("--state-dir", default=None, help="папка состояния графа для инкрементальных обновлений")
+    ap.add_argument("--added", default=None, help="CSV дельты: появившиеся строки user_id;community_id")
+    ap.add_argument("--removed", default=None, help="CSV дельты: пропавшие строки user_id;community_id")
+    ap.add_argument(
+        "--dedup", choices=("none",) + DEDUP_MODES, default="none",
+        help="схлопнуть одинаковые наборы подписок перед kNN: clique — все пользователи, supernode — граф групп",
+    )
+    ap.add_argument("--graph-dir", default=None,
+                    help="граф схожести только на диске (memmap CSR, disk_graph): Louvain на графе блоков, "
+                         "метрики и рёбра — по блокам строк; разбиение сохраняется в graph-dir/partition.csv")
+    ap.add_argument("--levels", action="store_true", help="сохранить все уровни Louvain (hidden_partition_levels)")
+    ap.add_argument("--refine-depth", type=int, default=0, help="--levels: уровней уточнения внутри сообществ")
+    ap.add_argument("--backbone", choices=("none",) + BACKBONE_METHODS, default="none",
+                    help="разрежение графа перед Louvain: disparity filter, взаимный top-k или квантиль весов")
+    ap.add_argument("--backbone-param", type=float, default=None,
+                    help="alpha (disparity) / k (mutual_topk) / q (quantile); по умолчанию — из BACKBONE_PARAMS")
+    ap.add_argument("--backbone-report", action="store_true",
+                    help="сравнить скелет с полным графом (ещё один Louvain на полном графе): ΔQ и ARI в run_stats.json")
+    ap.add_argument("--significance", type=int, default=0, help="перестановок для z-score/p-value сообществ (0 = не считать)")
+    ap.add_argument("--null-model", choices=NULL_MODELS, default="label", help="нулевая модель перестановочного теста")
+    ap.add_argument("--plot", action="store_true", help="сохранить интерактивный граф в HTML")
+    ap.add_argument("--max-nodes-plot", type=int, default=2000)
+    return ap
 
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
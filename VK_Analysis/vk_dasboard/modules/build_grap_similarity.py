@@ -2,14 +2,23 @@
 # -------------------------------------------------
 # Построение графа схожести пользователей по Cosine (для sparse)
 # + поддержка show_progress=True
+# method="sparse" считает блоки строк в потоках или (executor="processes") в пуле процессов,
+# подключённых к нормированной матрице в shared memory (shared_store) — без копии на процесс.
 # -------------------------------------------------
 
 from __future__ import annotations
 
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Tuple
+
 import networkx as nx
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, diags, triu as sparse_triu
 from sklearn.neighbors import NearestNeighbors
 
 from create_ug_matrix import UserCommunityData
+from shared_store import SharedHandle, attach, share_csr
 
 
 def _tqdm(iterable, enabled: bool, **kwargs):
@@ -23,65 +32,246 @@ def _tqdm(iterable, enabled: bool, **kwargs):
         return iterable
 
 
-def build_similarity_graph(
+KNN_METHODS = ("brute", "sparse")
+KNN_EXECUTORS = ("threads", "processes")
+
+
+def normalize_rows(X: csr_matrix) -> csr_matrix:
+    """L2-нормировка строк (пустые строки остаются нулевыми)."""
+    X = csr_matrix(X, dtype=np.float32)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return csr_matrix(diags(1.0 / norms) @ X)
+
+
+def topk_sparse_rows(
+    S, k: int, diag_offset: int | None = None, self_cols: np.ndarray | None = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k по строкам sparse-матрицы схожестей без цикла по строкам:
+    сортируем (строка, -значение) и берём первые k позиций внутри строки.
+    diag_offset: исключить элементы (i, i + diag_offset) — самого пользователя.
+    self_cols  : то же для произвольного набора строк: исключить (i, self_cols[i]).
+    Недостающие позиции: индекс -1, схожесть 0.
+    """
+    n_rows = S.shape[0]
+    S = S.tocoo()
+    rows, cols, vals = S.row, S.col, S.data
+    if diag_offset is not None:
+        not_self = cols != rows + diag_offset
+        rows, cols, vals = rows[not_self], cols[not_self], vals[not_self]
+    if self_cols is not None:
+        not_self = cols != np.asarray(self_cols)[rows]
+        rows, cols, vals = rows[not_self], cols[not_self], vals[not_self]
+
+    order = np.lexsort((-vals, rows))
+    rows, cols, vals = rows[order], cols[order], vals[order]
+
+    row_start = np.searchsorted(rows, np.arange(n_rows))
+    rank = np.arange(len(rows)) - row_start[rows]
+    keep = rank < k
+
+    idx = np.full((n_rows, k), -1, dtype=np.int64)
+    sim = np.zeros((n_rows, k), dtype=np.float32)
+    idx[rows[keep], rank[keep]] = cols[keep]
+    sim[rows[keep], rank[keep]] = vals[keep]
+    return sim, idx
+
+
+def _knn_block(Xn: csr_matrix, XnT: csr_matrix, start: int, chunk_size: int, k: int):
+    stop = min(start + chunk_size, Xn.shape[0])
+    S = Xn[start:stop] @ XnT
+    # сам пользователь уже стоит в 0-й колонке
+    return topk_sparse_rows(S, k, diag_offset=start)
+
+
+_KNN_WORKER: dict = {}
+
+
+def _init_knn_worker(handle: SharedHandle, chunk_size: int, k: int):
+    store = attach(handle)
+    _KNN_WORKER.update(Xn=store.csr(), XnT=store.csr("t_"), chunk_size=chunk_size, k=k)
+
+
+def _knn_worker_block(start: int):
+    w = _KNN_WORKER
+    return _knn_block(w["Xn"], w["XnT"], start, w["chunk_size"], w["k"])
+
+
+def knn_sparse(
+    X: csr_matrix,
+    n_neighbors: int,
+    chunk_size: int = 2000,
+    n_jobs: int = -1,
+    executor: str = "threads",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Точный kNN по Cosine через произведение sparse-матриц (Xn[chunk] @ Xn.T).
+    executor="threads"   : блоки строк в потоках (sparsetools отпускает GIL, top-k — нет)
+    executor="processes" : блоки в пуле процессов; Xn и Xn.T — одна копия в shared memory
+    Формат ответа как у NearestNeighbors: 0-й сосед — сам пользователь.
+    """
+    if executor not in KNN_EXECUTORS:
+        raise ValueError(f"Неизвестный executor={executor!r}. Доступно: {KNN_EXECUTORS}")
+    Xn = normalize_rows(X)
+    XnT = Xn.T.tocsr()
+    n_users = Xn.shape[0]
+    k = n_neighbors - 1
+
+    distances = np.ones((n_users, n_neighbors), dtype=np.float32)
+    indices = np.full((n_users, n_neighbors), -1, dtype=np.int64)
+    distances[:, 0] = 0.0
+    indices[:, 0] = np.arange(n_users)
+
+    def _store(start: int, block):
+        sim, idx = block
+        stop = start + len(sim)
+        distances[start:stop, 1:] = 1.0 - sim
+        indices[start:stop, 1:] = idx
+
+    workers = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, int(n_jobs))
+    starts = list(range(0, n_users, chunk_size))
+    workers = min(workers, len(starts))
+    if workers == 1:
+        for st in starts:
+            _store(st, _knn_block(Xn, XnT, st, chunk_size, k))
+    elif executor == "processes":
+        with share_csr(Xn, extra={"t_": XnT}) as store:
+            initargs = (store.handle, chunk_size, k)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_knn_worker, initargs=initargs) as ex:
+                for st, block in zip(starts, ex.map(_knn_worker_block, starts)):
+                    _store(st, block)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            for st, block in zip(starts, ex.map(lambda st: _knn_block(Xn, XnT, st, chunk_size, k), starts)):
+                _store(st, block)
+
+    return distances, indices
+
+
+def compute_knn(
     data: UserCommunityData,
-    threshold: float = 0.20,
     k_neighbors: int = 40,
-    show_progress: bool = True,
-    **kwargs,  # совместимость на будущее
-) -> nx.Graph:
+    n_jobs: int = -1,
+    method: str = "brute",
+    chunk_size: int = 2000,
+    executor: str = "threads",
+) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Строит граф схожести пользователей на sparse-матрице user×community.
+    Этап 1: поиск k ближайших соседей по Cosine на sparse-матрице user×community.
 
-    """
+    method:
+      - "brute"  : sklearn NearestNeighbors (как раньше)
+      - "sparse" : точное sparse-произведение по блокам chunk_size строк,
+                   дешевле по памяти на больших и очень разреженных матрицах
+    executor (только для "sparse"): "threads" или "processes" — см. knn_sparse()
 
+    Возвращает (distances, indices) формы (n_users × (k_neighbors + 1)),
+    0-й сосед — сам пользователь.
+    """
     X = data.csr
     n_users = X.shape[0]
     if n_users < 2:
         raise ValueError("Нужно минимум 2 пользователя для построения графа.")
+    if method not in KNN_METHODS:
+        raise ValueError(f"Неизвестный method={method!r}. Доступно: {KNN_METHODS}")
 
     n_neighbors = min(k_neighbors + 1, n_users)
 
+    if method == "sparse":
+        return knn_sparse(X, n_neighbors, chunk_size=chunk_size, n_jobs=n_jobs, executor=executor)
+
     # Cosine работает на sparse
     nn = NearestNeighbors(
         n_neighbors=n_neighbors,
         metric="cosine",
         algorithm="brute",
-        n_jobs=-1
+        n_jobs=n_jobs
     )
 
-    print(" Считаю ближайших соседей (kNN, метрика Cosine)...")
     nn.fit(X)
     distances, indices = nn.kneighbors(X)
-    print("kNN готово. Строю рёбра графа...")
+    return distances, indices
+
+
+def knn_to_adjacency(
+    distances: np.ndarray,
+    indices: np.ndarray,
+    threshold: float = 0.20,
+) -> csr_matrix:
+    """
+    Симметричная sparse-матрица смежности (n_users × n_users) из результатов kNN:
+    ребро (i, j) есть, если j среди соседей i (или наоборот) и sim >= threshold;
+    вес — максимальная схожесть из двух направлений.
+    """
+    n_users = indices.shape[0]
+    rows = np.repeat(np.arange(n_users), indices.shape[1] - 1)
+    cols = np.asarray(indices[:, 1:]).ravel()
+    sims = 1.0 - np.asarray(distances[:, 1:], dtype=np.float64).ravel()
+
+    # 0-й сосед — сам пользователь, пустые позиции = -1, петли не нужны
+    mask = (sims >= threshold) & (cols >= 0) & (cols != rows)
+    rows, cols, sims = rows[mask], cols[mask], sims[mask]
+
+    A = coo_matrix((sims, (rows, cols)), shape=(n_users, n_users)).tocsr()
+    A.sum_duplicates()
+    return A.maximum(A.T).tocsr()
+
+
+def build_graph_from_knn(
+    data: UserCommunityData,
+    distances: np.ndarray,
+    indices: np.ndarray,
+    threshold: float = 0.20,
+    show_progress: bool = True,
+) -> nx.Graph:
+    """
+    Этап 2: строит граф схожести из результатов kNN (рёбра с sim >= threshold).
+    Если ребро находится из обоих концов — остаётся максимальный вес.
+    """
+    A = sparse_triu(knn_to_adjacency(distances, indices, threshold=threshold), k=1).tocoo()
 
     G = nx.Graph()
 
     # Добавляем узлы заранее
-    for uid in data.user_ids:
-        G.add_node(uid, type="user")
+    G.add_nodes_from(data.user_ids, type="user")
 
-    iterator = _tqdm(range(n_users), enabled=show_progress, desc="Построение рёбер", unit="user")
+    user_ids = data.user_ids
+    iterator = _tqdm(
+        zip(A.row.tolist(), A.col.tolist(), A.data.tolist()),
+        enabled=show_progress, desc="Построение рёбер", unit="edge", total=A.nnz,
+    )
+    G.add_weighted_edges_from((user_ids[i], user_ids[j], w) for i, j, w in iterator)
+
+    return G
 
-    for i in iterator:
-        u = data.user_ids[i]
 
-        # 0-й сосед — сам пользователь (distance=0), пропускаем
-        neigh_idx = indices[i][1:]
-        neigh_dist = distances[i][1:]
+def build_similarity_graph(
+    data: UserCommunityData,
+    threshold: float = 0.20,
+    k_neighbors: int = 40,
+    show_progress: bool = True,
+    **kwargs,  # совместимость на будущее
+) -> nx.Graph:
+    """
+    Строит граф схожести пользователей на sparse-матрице user×community.
 
-        for j, dist in zip(neigh_idx, neigh_dist):
-            sim = 1.0 - float(dist)
-            if sim >= threshold:
-                v = data.user_ids[int(j)]
-                if u == v:
-                    continue
+    Этапы (kNN и построение рёбер) доступны отдельно:
+    compute_knn() и build_graph_from_knn().
+    kwargs: n_jobs, method ("brute" | "sparse"), chunk_size, executor — см. compute_knn().
+    """
 
-                # Если ребро уже есть — оставим максимальный вес
-                if G.has_edge(u, v):
-                    if sim > G[u][v].get("weight", 0):
-                        G[u][v]["weight"] = sim
-                else:
-                    G.add_edge(u, v, weight=sim)
+    print(" Считаю ближайших соседей (kNN, метрика Cosine)...")
+    distances, indices = compute_knn(
+        data,
+        k_neighbors=k_neighbors,
+        n_jobs=kwargs.get("n_jobs", -1),
+        method=kwargs.get("method", "brute"),
+        chunk_size=kwargs.get("chunk_size", 2000),
+        executor=kwargs.get("executor", "threads"),
+    )
+    print("kNN готово. Строю рёбра графа...")
 
-    return G
+    return build_graph_from_knn(
+        data, distances, indices, threshold=threshold, show_progress=show_progress
+    )
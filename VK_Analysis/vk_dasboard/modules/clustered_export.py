@@ -0,0 +1,216 @@
+# clustered_export.py
+# -------------------------------------------------
+# Экспорт кластеризованных профилей без копии всей таблицы в памяти:
+#   - CSV пишется по чанкам строк прямо в файл (без df.copy() и без to_csv() -> str -> bytes)
+#   - Parquet пишется по row group'ам (pyarrow)
+#   - готовый файл кэшируется во временной папке по отпечатку (датасет + метки + риски)
+#     и переиспользуется, пока кластеризация не изменилась
+#   - папка общая для всех сессий: каждый писатель пишет в свой временный файл, свежие файлы
+#     (моложе grace_seconds) не вытесняются — чужая сессия могла только что получить их путь
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_CACHE_DIR = Path(tempfile.gettempdir()) / "vk_dashboard_exports"
+
+# колонки, которые добавляются к профилю при экспорте: имя -> ключ в risk_maps
+EXPORT_RISK_COLUMNS = {
+    "risk_score_0_100": "risk_score",
+    "risk_level_ru": "risk_level",
+    "main_risk_factor": "main_factor",
+}
+
+
+def export_fingerprint(dataset_key: str, labels: np.ndarray, risk_maps: dict, fmt: str = "csv") -> str:
+    """
+    Отпечаток экспорта: меняется, только если поменялся датасет, метки кластеров
+    или сводка рисков. По нему переиспользуется готовый файл.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(dataset_key).encode("utf-8"))
+    h.update(fmt.encode("utf-8"))
+    h.update(np.ascontiguousarray(labels, dtype=np.int64).tobytes())
+    h.update(json.dumps(
+        {k: {str(c): v for c, v in m.items()} for k, m in risk_maps.items()},
+        ensure_ascii=False, sort_keys=True, default=str,
+    ).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _chunk_with_labels(
+    df: pd.DataFrame, labels: np.ndarray, risk_maps: dict, start: int, stop: int, label_col: str
+) -> pd.DataFrame:
+    """Чанк профилей + кластер + риск (копируется только этот чанк)."""
+    part = df.iloc[start:stop]
+    lab = pd.Series(np.asarray(labels[start:stop], dtype=int), index=part.index)
+    extra = {label_col: lab}
+    for col, key in EXPORT_RISK_COLUMNS.items():
+        extra[col] = lab.map(risk_maps[key])
+    return part.assign(**extra)
+
+
+def _part_file(path: Path, mode: str, **kwargs):
+    """Временный файл рядом с path, уникальный для писателя (параллельные сессии с тем же отпечатком)."""
+    return tempfile.NamedTemporaryFile(mode, dir=path.parent, prefix=f".{path.name}.", suffix=".part", delete=False, **kwargs)
+
+
+def _discard(tmp: Path):
+    try:
+        os.unlink(tmp)
+    except OSError:
+        pass
+
+
+def write_clustered_csv(
+    df: pd.DataFrame,
+    labels: np.ndarray,
+    risk_maps: dict,
+    path: str | Path,
+    chunk_size: int = 200_000,
+    label_col: str = "cluster_kmeans",
+) -> Path:
+    """Пишет CSV (utf-8-sig, как раньше отдавала страница) по чанкам строк."""
+    path = Path(path)
+    f = _part_file(path, "w", encoding="utf-8-sig", newline="")
+    tmp = Path(f.name)
+    try:
+        with f:
+            for start in range(0, max(len(df), 1), chunk_size):
+                chunk = _chunk_with_labels(df, labels, risk_maps, start, start + chunk_size, label_col)
+                chunk.to_csv(f, index=False, header=(start == 0))
+        os.replace(tmp, path)  # атомарно: недописанный файл никогда не попадёт в кэш
+    except BaseException:
+        _discard(tmp)
+        raise
+    return path
+
+
+def write_clustered_parquet(
+    df: pd.DataFrame,
+    labels: np.ndarray,
+    risk_maps: dict,
+    path: str | Path,
+    chunk_size: int = 200_000,
+    label_col: str = "cluster_kmeans",
+) -> Path:
+    """Пишет Parquet по row group'ам (нужен pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    with _part_file(path, "wb") as f:
+        tmp = Path(f.name)  # пишет ParquetWriter, файл нужен только как уникальное имя
+    writer = None
+    try:
+        try:
+            for start in range(0, max(len(df), 1), chunk_size):
+                chunk = _chunk_with_labels(df, labels, risk_maps, start, start + chunk_size, label_col)
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp, path)
+    except BaseException:
+        _discard(tmp)
+        raise
+    return path
+
+
+def write_clustered(
+    df: pd.DataFrame,
+    labels: np.ndarray,
+    risk_maps: dict,
+    path: str | Path,
+    fmt: str = "csv",
+    chunk_size: int = 200_000,
+    label_col: str = "cluster_kmeans",
+) -> Path:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта {fmt!r}. Доступно: {EXPORT_FORMATS}")
+    if len(labels) != len(df):
+        raise ValueError("Длина labels должна совпадать с числом строк df.")
+    writer = write_clustered_parquet if fmt == "parquet" else write_clustered_csv
+    return writer(df, labels, risk_maps, path, chunk_size=chunk_size, label_col=label_col)
+
+
+class ExportCache:
+    """
+    Файловый кэш готовых экспортов: <cache_dir>/<fingerprint>.<fmt>.
+    Файл создаётся лениво (при первом запросе) и отдаётся по пути.
+    Вытесняются только файлы старше grace_seconds сверх keep_last самых свежих;
+    попадание в кэш обновляет mtime файла.
+    """
+
+    def __init__(self, cache_dir: str | Path = EXPORT_CACHE_DIR, keep_last: int = 4, grace_seconds: float = 600.0):
+        self.cache_dir = Path(cache_dir)
+        self.keep_last = keep_last
+        self.grace_seconds = grace_seconds
+
+    def path_for(self, fingerprint: str, fmt: str) -> Path:
+        return self.cache_dir / f"{fingerprint}.{fmt}"
+
+    def get(self, fingerprint: str, fmt: str) -> Optional[Path]:
+        p = self.path_for(fingerprint, fmt)
+        try:
+            os.utime(p)  # файл нужен — не даём вытеснить его другим сессиям
+        except OSError:
+            return None
+        return p
+
+    def get_or_create(
+        self,
+        df: pd.DataFrame,
+        labels: np.ndarray,
+        risk_maps: dict,
+        dataset_key: str,
+        fmt: str = "csv",
+        chunk_size: int = 200_000,
+    ) -> Path:
+        fp = export_fingerprint(dataset_key, labels, risk_maps, fmt)
+        cached = self.get(fp, fmt)
+        if cached is not None:
+            return cached
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = write_clustered(df, labels, risk_maps, self.path_for(fp, fmt), fmt=fmt, chunk_size=chunk_size)
+        self._evict()
+        return path
+
+    def _evict(self):
+        """Оставляем keep_last самых свежих файлов и все, что моложе grace_seconds."""
+        files = []
+        for p in self.cache_dir.glob("*"):
+            if p.suffix not in {f".{f}" for f in EXPORT_FORMATS}:
+                continue
+            try:
+                files.append((p.stat().st_mtime, p))
+            except OSError:
+                continue  # уже удалён другой сессией
+        files.sort(key=lambda item: item[0], reverse=True)
+        cutoff = time.time() - self.grace_seconds
+        for mtime, p in files[self.keep_last:]:
+            if mtime >= cutoff:
+                continue
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        files = list(self.cache_dir.glob("*")) if self.cache_dir.exists() else []
+        return {"files": len(files), "bytes": sum(p.stat().st_size for p in files)}
@@ -1,35 +1,29 @@
-
-import numpy as np # Математика, массивы
 import pandas as pd  # таблицы красивые
 import streamlit as st # библа для веб-интерфеса
 import plotly.express as px # Интерактивные графики
 
 from pathlib import Path # пути к файлам
-from io import BytesIO# Чтение CSV из байтов
 
-# Sklearn: предобработка + кластеризация
-from sklearn.compose import ColumnTransformer #
-from sklearn.preprocessing import OneHotEncoder, StandardScaler #
-from sklearn.cluster import MiniBatchKMeans, DBSCAN #
-from sklearn.metrics import silhouette_score # силует для поиска кол-ва кластеров к-means
+from sklearn.cluster import DBSCAN #
 
-import umap
+# Вычисления (признаки, KMeans, UMAP, сводка рисков, экспорт) — без Streamlit
+from clustering_pipeline import (
+    SUMMARY_VIEW_COLS,
+    FeatureConfig, FEATURE_ENCODINGS, feature_matrix_stats,
+    detect_columns, prepare_frame, fit_preprocessor, transform_features,
+    fit_kmeans, compute_umap,
+    build_text_report, summarize_clusters, cluster_risk_maps,
+)
+from clustered_export import EXPORT_FORMATS, ExportCache
+from data_loader import get_registry
 
 
 # ============================================================
 # CONFIG
 # ============================================================
 
-# константы
-
-DEFAULT_DATA_PATHS = [              # ищу откуда подтянуть csv с данными
-    Path("vk_users_10000.csv"),
-    Path("data/vk_users_10000.csv"),
-    Path("datasets/vk_users_10000.csv"),
-]
-
-DROP_COLS = {"id", "synthetic_cluster", "cluster_kmeans", "cluster_dbscan"}
-NUM_COLS_CANDIDATES = ["age"]
+# Датасеты ищет и кэширует общий реестр (data_loader): профили по умолчанию —
+# vk_users_10000_positive_realistic.csv в папке приложения (или data/, datasets/)
 
 
 # ============================================================
@@ -38,232 +32,8 @@ NUM_COLS_CANDIDATES = ["age"]
 
 # функция поиска пути к файлу дадасету
 def find_default_csv() -> Path | None:
-    for p in DEFAULT_DATA_PATHS:
-        if p.exists():
-            return p
-    return None
-
-
-# совместимость с разными версиями библиотеки sklearn --> экземпляр OneHot создастся в любом случае
-def safe_onehot():
-    try:
-        return OneHotEncoder(handle_unknown="ignore", sparse_output=True)
-    except TypeError:
-        return OneHotEncoder(handle_unknown="ignore", sparse=True)
-
-# декоратор нужен для быстрой загруки в Streamlit
-@st.cache_data(show_spinner=False) # ← Декоратор кэширования в Streamlit
-def read_csv_from_path(path: str) -> pd.DataFrame:
-    return pd.read_csv(path, encoding="utf-8-sig") # возвращает DataFrame
-
-
-@st.cache_data(show_spinner=False)
-def read_csv_from_bytes(b: bytes) -> pd.DataFrame:
-    return pd.read_csv(BytesIO(b), encoding="utf-8-sig")
-
-
-# разделяет датасет на числовые и категориальные колонки
-def detect_columns(df: pd.DataFrame):
-    num_cols = [c for c in NUM_COLS_CANDIDATES if c in df.columns] # тут числовые
-    cat_cols = [c for c in df.columns if c not in DROP_COLS and c not in num_cols]
-    cat_cols = [c for c in cat_cols if df[c].dtype == "object"] # тут лежат категориальные
-    return num_cols, cat_cols
-
-# кешируем объект - результат функции
-#@st.cache_resource(show_spinner=False)
-def fit_preprocessor(df: pd.DataFrame, num_cols, cat_cols) -> ColumnTransformer:
-    pre = ColumnTransformer(
-        transformers=[
-            ("num", StandardScaler(), num_cols), # страндартизиреум признаки
-            ("cat", safe_onehot(), cat_cols), # ван хот для категориальных
-        ],
-        remainder="drop",
-    )
-    pre.fit(df) # запуск методов
-    return pre
-
-
-# предобработка данных (ванхот, скалер и тд)
-#@st.cache_resource(show_spinner=False)
-def transform_features(_pre: ColumnTransformer, df: pd.DataFrame):
-    return _pre.transform(df)
-
-
-# ============================================================
-# Risk / Explanation helpers
-# ============================================================
-def share_positive(series: pd.Series) -> float:
-    """Доля 'положительного' отношения."""
-    if series is None or series.empty:
-        return 0.0
-    s = series.fillna("").astype(str).str.lower()
-    return float(s.str.contains("полож").mean())
-
-
-def share_is(series: pd.Series, keywords: list[str]) -> float:
-    """Доля строк, где значение содержит хотя бы одно ключевое слово."""
-    if series is None or series.empty:
-        return 0.0
-    s = series.fillna("").astype(str).str.lower()
-    mask = False
-    for kw in keywords:
-        mask = mask | s.str.contains(kw)
-    return float(mask.mean())
-
-
-def ideological_risk_share(series: pd.Series) -> float:
-    """
-    Идеологический риск (для режимного предприятия):
-    либеральные / либертарианские / индифферентные.
-    """
-    if series is None or series.empty:
-        return 0.0
-    s = series.fillna("").astype(str).str.lower()
-    return float(
-        (s.str.contains("либерал") | s.str.contains("либертариан") | s.str.contains("индиффер")).mean()
-    )
-
-
-def top_value(series: pd.Series) -> str:
-    if series is None or series.empty:
-        return "—"
-    vc = series.fillna("—").astype(str).value_counts()
-    return str(vc.index[0])
-
-
-def top_n(series: pd.Series, n=3) -> str:
-    if series is None or series.empty:
-        return "—"
-    vc = series.fillna("").astype(str).value_counts(normalize=True).head(n)
-    items = []
-    for name, share in vc.items():
-        if name == "":
-            continue
-        items.append(f"{name} ({share*100:.0f}%)")
-    return ", ".join(items) if items else "—"
-
-
-def risk_drivers(part: pd.DataFrame) -> dict:
-    """Считаем доли факторов риска в кластере."""
-    alc_pos = share_positive(part["alcohol"]) if "alcohol" in part.columns else 0.0
-    smk_pos = share_positive(part["smoking"]) if "smoking" in part.columns else 0.0
-
-    edu_low = share_is(part["education_level"], ["нет", "среднее"]) if "education_level" in part.columns else 0.0
-    life_hed = share_is(part["main_in_life"], ["развлеч", "слава", "влияние"]) if "main_in_life" in part.columns else 0.0
-    ppl_money = share_is(part["main_in_people"], ["власть", "богат"]) if "main_in_people" in part.columns else 0.0
-
-    pol_liberal = ideological_risk_share(part["political"]) if "political" in part.columns else 0.0
-
-    return {
-        "alc_pos": alc_pos,
-        "smk_pos": smk_pos,
-        "edu_low": edu_low,
-        "life_hed": life_hed,
-        "ppl_money": ppl_money,
-        "pol_liberal": pol_liberal,
-    }
-
-#   тут можно настривать чувсвительность системы 
-def risk_score_0_100(alc, smk, pol, edu):
-    """
-    Итоговый риск кластера (0–100).
-    Приоритет:
-    - алкоголь (45%)
-    - либеральные/либертарианские/индифферентные (25%)
-    - курение (20%)
-    - низкое образование (10%)
-    """
-    return float(
-        round(
-            100 * (
-                0.45 * alc +
-                0.20 * smk +
-                0.25 * pol +
-                0.10 * edu
-            ),
-            1
-        )
-    )
-
-
-def risk_level_ru(score: float) -> str:
-    if score >= 60:
-        return "ВЫСОКИЙ"
-    if score >= 30:
-        return "СРЕДНИЙ"
-    return "НИЗКИЙ"
-
-
-def main_risk_factor(dr: dict) -> str:
-    """
-    Главный фактор риска — выбираем фактор с максимальным вкладом в итоговый score.
-    """
-    factors = {
-        "Положительное отношение к алкоголю": dr["alc_pos"] * 0.45,
-        "Либеральные политические взгляды": dr["pol_liberal"] * 0.25,
-        "Положительное отношение к курению": dr["smk_pos"] * 0.20,
-        "Низкий уровень образования": dr["edu_low"] * 0.10,
-    }
-    return max(factors, key=factors.get)
-
-
-def why_danger_ru(alcohol_pos: float, smoking_pos: float, pol_liberal: float, edu_low: float, top_life: str) -> str:
-    reasons = []
-    if alcohol_pos >= 0.45:
-        reasons.append("высокая доля положительного отношения к алкоголю")
-    if smoking_pos >= 0.45:
-        reasons.append("высокая доля положительного отношения к курению")
-    if pol_liberal >= 0.45:
-        reasons.append("преобладание либеральных/либертарианских/индифферентных взглядов")
-    if edu_low >= 0.45:
-        reasons.append("высокая доля низкого уровня образования")
-    if isinstance(top_life, str) and (("развлеч" in top_life.lower()) or ("слава" in top_life.lower())):
-        reasons.append("ценности смещены в сторону развлечений/влияния")
-    return "; ".join(reasons) if reasons else "выраженных риск-факторов не обнаружено"
-
-
-def cluster_type_ru(dr: dict, top_edu: str, top_life: str) -> str:
-    if dr["alc_pos"] > 0.50 and dr["pol_liberal"] > 0.40:
-        return "Рисковый: алкоголь + идеология"
-    if dr["alc_pos"] > 0.50:
-        return "Рисковый: вредные привычки"
-    if dr["pol_liberal"] > 0.50:
-        return "Рисковый: идеологический профиль"
-    if dr["edu_low"] > 0.45:
-        return "Рисковый: низкое образование"
-    if "высш" in str(top_edu).lower() and ("семья" in str(top_life).lower() or "саморазвит" in str(top_life).lower()):
-        return "Надёжный: социально устойчивый"
-    return "Смешанный: требует внимания"
-
-
-def recommendation_ru(level: str) -> str:
-    if level == "ВЫСОКИЙ":
-        return "Рекомендуется углублённая проверка (сообщества/контент/окружение)."
-    if level == "СРЕДНИЙ":
-        return "Рекомендуется точечная проверка (аномалии, окружение 1–2 уровня)."
-    return "Фоновый контроль (без приоритета)."
-
-
-def build_text_report(summary_df: pd.DataFrame, total_n: int) -> str:
-    lines = []
-    lines.append("ОТЧЁТ ПО КЛАСТЕРИЗАЦИИ ОКРУЖЕНИЯ ВК")
-    lines.append("=" * 70)
-    lines.append(f"Всего профилей: {total_n}")
-    lines.append("")
-
-    for _, r in summary_df.iterrows():
-        lines.append(f"Кластер {r['Кластер']} — {r['Тип кластера']}")
-        lines.append(f"  Уровень риска: {r['Уровень риска']} | Риск: {r['Риск, % (0-100)']} / 100")
-        lines.append(f"  Главный фактор риска: {r['Главный фактор риска']}")
-        lines.append(f"  Размер: {r['Количество']} ({r['Доля, %']}%)")
-        lines.append(f"  Ключевые признаки: {r['Ключевые признаки']}")
-        lines.append(f"  Почему важен: {r['Почему важен']}")
-        lines.append(f"  Рекомендация: {r['Рекомендация']}")
-        lines.append(f"  Основной город: {r['Основной город']}")
-        lines.append(f"  Основной вуз: {r['Основной вуз']}")
-        lines.append("-" * 70)
-
-    return "\n".join(lines)
+    source = get_registry().find("profiles")
+    return source.path if source else None
 
 
 # ============================================================
@@ -275,35 +45,57 @@ def page(card=None):
     # -------------------------
     # 1) Автозагрузка CSV (без лишнего file_uploader, если файл найден)
     # -------------------------
-    default_path = find_default_csv()
-    df = None
+    # файл разбирается один раз на процесс (память + Parquet-кэш), страницы делят один DataFrame
+    registry = get_registry()
+    source = registry.find("profiles")
 
-    if default_path:
-        df = read_csv_from_path(str(default_path))
-        st.caption(f"Датасет загружен автоматически: **{default_path.as_posix()}**")
+    if source:
+        st.caption(f"Датасет загружен автоматически: **{source.label}**")
     else:
-        st.warning("Файл vk_users_10000.csv не найден. Загрузите CSV вручную:")
+        st.warning("Файл vk_users_10000_positive_realistic.csv не найден. Загрузите CSV вручную:")
         uploaded = st.file_uploader("CSV файл", type=["csv"])
         if uploaded is None:
             return
-        df = read_csv_from_bytes(uploaded.getvalue())
+        source = registry.source_for_upload("profiles", uploaded.getvalue(), uploaded.name)
+
+    df = registry.load(source)
+    dataset_key = source.fingerprint
 
     # Сырые данные НЕ показываем
 
     # -------------------------
     # 2) Признаки и X
     # -------------------------
+    with st.expander("Параметры признаков (для больших датасетов)", expanded=False):
+        encoding = st.radio(
+            "Кодирование категорий", FEATURE_ENCODINGS, horizontal=True,
+            help="hashing — фиксированная ширина матрицы при десятках тысяч городов/вузов",
+        )
+        min_freq = st.number_input("Мин. частота категории (0 — без порога)", 0, 100_000, 0, 10)
+        max_cat = st.number_input("Макс. категорий на колонку (0 — без ограничения)", 0, 10_000, 0, 10)
+        svd_k = st.number_input("TruncatedSVD: компонент (0 — без SVD)", 0, 512, 0, 8)
+
+    feature_cfg = FeatureConfig(
+        encoding=encoding,
+        min_frequency=int(min_freq) or None,
+        max_categories=int(max_cat) or None,
+        svd_components=int(svd_k) or None,
+    )
+
     num_cols, cat_cols = detect_columns(df)
-    df_proc = df.copy()
-    for c in cat_cols:
-        df_proc[c] = df_proc[c].fillna("")
+    df_proc = prepare_frame(df, cat_cols)
 
-    pre = fit_preprocessor(df_proc, num_cols, cat_cols)
+    pre = fit_preprocessor(df_proc, num_cols, cat_cols, config=feature_cfg)
     X = transform_features(pre, df_proc)
+    fstats = feature_matrix_stats(X)
 
     st.markdown("### Настройки")
     total_n = len(df_proc)
     st.write(f"Всего профилей: **{total_n:,}**")
+    st.caption(
+        f"Матрица признаков: {fstats['rows']:,} × {fstats['cols']:,}, "
+        f"nnz={fstats['nnz']:,}, {fstats['memory_mb']} МБ"
+    )
 
     k = st.slider("Количество кластеров", 2, 10, 4)
 
@@ -311,80 +103,20 @@ def page(card=None):
     # 3) KMeans
     # -------------------------
     with st.spinner("Выполняю K-Means кластеризацию..."):
-        km = MiniBatchKMeans(n_clusters=int(k), random_state=42, batch_size=1024)
+        km, labels = fit_kmeans(X, k, random_state=42)
         df_out = df.copy()
-        df_out["cluster_kmeans"] = km.fit_predict(X).astype(int)
+        df_out["cluster_kmeans"] = labels
 
     # -------------------------
     # 4) UMAP
     # -------------------------
     with st.spinner("Строю UMAP-проекцию..."):
-        reducer = umap.UMAP(
-            n_neighbors=25,
-            min_dist=0.10,
-            n_components=2,
-            metric="cosine",
-            random_state=42
-        )
-        emb = reducer.fit_transform(X)
+        emb = compute_umap(X, n_neighbors=25, min_dist=0.10, random_state=42)
 
     # -------------------------
     # 5) Интеллектуальная сводка
     # -------------------------
-    summary_rows = []
-    for cl in sorted(df_out["cluster_kmeans"].unique()):
-        part = df_out[df_out["cluster_kmeans"] == cl]
-        dr = risk_drivers(part)
-
-        score = risk_score_0_100(dr["alc_pos"], dr["smk_pos"], dr["pol_liberal"], dr["edu_low"])
-        lvl = risk_level_ru(score)
-
-        top_city = top_value(part["city"]) if "city" in part.columns else "—"
-        top_uni = top_value(part["university"]) if "university" in part.columns else "—"
-        top_life = top_value(part["main_in_life"]) if "main_in_life" in part.columns else "—"
-        top_people = top_value(part["main_in_people"]) if "main_in_people" in part.columns else "—"
-        top_edu = top_value(part["education_level"]) if "education_level" in part.columns else "—"
-        top_pol = top_value(part["political"]) if "political" in part.columns else "—"
-
-        size = int(len(part))
-        share_pct = (size / total_n) * 100.0
-
-        # ключевые признаки (коротко)
-        key_facts = []
-        key_facts.append(f"алк+ {dr['alc_pos']*100:.0f}%")
-        key_facts.append(f"кур+ {dr['smk_pos']*100:.0f}%")
-        key_facts.append(f"либ/индиф {dr['pol_liberal']*100:.0f}%")
-        key_facts.append(f"низк.обр {dr['edu_low']*100:.0f}%")
-        key_facts = ", ".join(key_facts)
-
-        ctype = cluster_type_ru(dr, str(top_edu), str(top_life))
-        main_factor = main_risk_factor(dr)
-        why = why_danger_ru(dr["alc_pos"], dr["smk_pos"], dr["pol_liberal"], dr["edu_low"], str(top_life))
-
-        summary_rows.append({
-            "Кластер": int(cl),
-            "Тип кластера": ctype,
-            "Уровень риска": lvl,
-            "Риск, % (0-100)": round(score, 1),
-            "Доля, %": round(share_pct, 2),
-            "Количество": size,
-            "Главный фактор риска": main_factor,
-            "Ключевые признаки": key_facts,
-            "Почему важен": why,
-            "Рекомендация": recommendation_ru(lvl),
-            "Основной город": str(top_city),
-            "Основной вуз": str(top_uni),
-            "Ценности (топ)": str(top_life),
-            "В людях (топ)": str(top_people),
-            "Образование (топ)": str(top_edu),
-            "Политика (топ)": str(top_pol),
-        })
-
-    summary_df = pd.DataFrame(summary_rows)
-
-    order = {"ВЫСОКИЙ": 2, "СРЕДНИЙ": 1, "НИЗКИЙ": 0}
-    summary_df["_ord"] = summary_df["Уровень риска"].map(order).fillna(0).astype(int)
-    summary_df = summary_df.sort_values(["_ord", "Риск, % (0-100)", "Количество"], ascending=[False, False, False]).drop(columns=["_ord"])
+    summary_df = summarize_clusters(df_out, total_n)
 
     st.markdown("### Оперативная сводка по кластерам")
 
@@ -450,25 +182,17 @@ def page(card=None):
         return sty
 
     st.dataframe(
-        style_summary(summary_df[[
-            "Кластер", "Тип кластера",
-            "Уровень риска", "Риск, % (0-100)",
-            "Доля, %", "Количество",
-            "Главный фактор риска",
-            "Ключевые признаки",
-            "Почему важен",
-            "Рекомендация",
-            "Основной город", "Основной вуз"
-        ]]),
+        style_summary(summary_df[SUMMARY_VIEW_COLS]),
         use_container_width=True
     )
 
     # -------------------------
     # 6) UMAP график (SOC colors + белая легенда + скрытые оси)
     # -------------------------
-    risk_level_map = dict(zip(summary_df["Кластер"], summary_df["Уровень риска"]))
-    risk_score_map = dict(zip(summary_df["Кластер"], summary_df["Риск, % (0-100)"]))
-    main_factor_map = dict(zip(summary_df["Кластер"], summary_df["Главный фактор риска"]))
+    risk_maps = cluster_risk_maps(summary_df)
+    risk_level_map = risk_maps["risk_level"]
+    risk_score_map = risk_maps["risk_score"]
+    main_factor_map = risk_maps["main_factor"]
 
     vis = df_out.copy()
     vis["umap_x"] = emb[:, 0]
@@ -581,13 +305,6 @@ def page(card=None):
     # Экспорт CSV
     # ===============================
 
-    df_export = df_out.copy()
-    df_export["risk_score_0_100"] = df_export["cluster_kmeans"].map(risk_score_map)
-    df_export["risk_level_ru"] = df_export["cluster_kmeans"].map(risk_level_map)
-    df_export["main_risk_factor"] = df_export["cluster_kmeans"].map(main_factor_map)
-
-    csv_bytes = df_export.to_csv(index=False, encoding="utf-8-sig").encode("utf-8-sig")
-
     st.markdown(
         """
         <div class="card accent-purple" style="margin-top:14px;">
@@ -604,11 +321,23 @@ def page(card=None):
         unsafe_allow_html=True
     )
 
+    # Файл формируется только по клику (callable в download_button), пишется по чанкам
+    # во временную папку и переиспользуется, пока не изменились датасет/метки/риски.
+    export_fmt = st.radio("Формат выгрузки", EXPORT_FORMATS, horizontal=True, key="export_fmt")
+    labels_out = df_out["cluster_kmeans"].to_numpy()
+
+    def _export_file():
+        # Streamlit всё равно читает выгрузку целиком в bytes; читаем сами и сразу закрываем файл
+        # (eviction в ExportCache не трогает свежие файлы — grace_seconds)
+        path = ExportCache().get_or_create(df, labels_out, risk_maps, dataset_key, fmt=export_fmt)
+        with open(path, "rb") as f:
+            return f.read()
+
     st.download_button(
-        "Скачать CSV с метками кластеров",
-        data=csv_bytes,
-        file_name="vk_users_10000_clustered.csv",
-        mime="text/csv",
+        "Скачать CSV с метками кластеров" if export_fmt == "csv" else "Скачать Parquet с метками кластеров",
+        data=_export_file,
+        file_name=f"vk_users_10000_clustered.{export_fmt}",
+        mime="text/csv" if export_fmt == "csv" else "application/octet-stream",
         key="export_clusters",
         use_container_width=True
     )
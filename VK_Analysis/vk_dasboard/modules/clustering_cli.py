@@ -0,0 +1,120 @@
+# clustering_cli.py
+# -------------------------------------------------
+# Batch-кластеризация профилей без Streamlit:
+#   CSV/Parquet → ClusteringPipeline (fit → predict → summarize) → CSV с метками + TXT отчёт
+#
+# Пример:
+#   python modules/clustering_cli.py vk_users_10000_positive_realistic.csv --out-dir out --k 4 --jobs 8
+#   python modules/clustering_cli.py big.parquet --fit-sample 500000 --chunk-size 1000000
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from clustering_pipeline import FEATURE_ENCODINGS, ClusteringPipeline, FeatureConfig
+
+
+def read_profiles(path: str | Path) -> pd.DataFrame:
+    """CSV (utf-8-sig, как на странице) или Parquet — по расширению файла."""
+    path = Path(path)
+    if path.suffix.lower() in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, encoding="utf-8-sig")
+
+
+def run(args) -> dict:
+    t_all = time.perf_counter()
+
+    t0 = time.perf_counter()
+    df = read_profiles(args.input)
+    t_load = time.perf_counter() - t0
+    n = len(df)
+    print(f"Загружено профилей: {n:,} ({t_load:.2f} c)")
+
+    features = FeatureConfig(
+        encoding=args.encoding,
+        min_frequency=args.min_frequency,
+        max_categories=args.max_categories,
+        n_hash_features=args.hash_features,
+        svd_components=args.svd,
+        random_state=args.seed,
+    )
+    pipe = ClusteringPipeline(
+        k=args.k, random_state=args.seed, n_jobs=args.jobs, with_umap=args.umap, features=features
+    )
+
+    # обучаемся на выборке (если задана), метки считаем для всех строк
+    fit_df = df.sample(n=args.fit_sample, random_state=args.seed) if args.fit_sample and args.fit_sample < n else df
+    t0 = time.perf_counter()
+    pipe.fit(fit_df)
+    t_fit = time.perf_counter() - t0
+    print(f"fit: {len(fit_df):,} строк за {t_fit:.2f} c")
+    fs = pipe.feature_stats_
+    print(f"Матрица признаков: {fs['rows']:,} × {fs['cols']:,}, nnz={fs['nnz']:,}, {fs['memory_mb']} МБ")
+
+    t0 = time.perf_counter()
+    labels = pipe.labels_ if fit_df is df else pipe.predict(df, chunk_size=args.chunk_size)
+    t_predict = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    paths = pipe.export(df, args.out_dir, labels=labels, csv_name=args.csv_name, report_name=args.report_name)
+    t_export = time.perf_counter() - t0
+
+    total = time.perf_counter() - t_all
+    stats = {
+        "input": str(args.input),
+        "rows": n,
+        "k": args.k,
+        "jobs": args.jobs,
+        "seconds": {
+            "load": round(t_load, 3),
+            "fit": round(t_fit, 3),
+            "predict": round(t_predict, 3),
+            "export": round(t_export, 3),
+            "total": round(total, 3),
+            **{f"fit_{k}": round(v, 3) for k, v in pipe.timings_.items()},
+        },
+        "rows_per_second": round(n / total, 1) if total > 0 else None,
+        "features": pipe.feature_stats_,
+        "outputs": {k: str(v) for k, v in paths.items()},
+    }
+
+    print(f"CSV с метками: {paths['csv']}")
+    print(f"Отчёт: {paths['report']}")
+    print(f"Пропускная способность: {stats['rows_per_second']:,} профилей/с (всего {total:.2f} c)")
+
+    if args.stats_json:
+        Path(args.stats_json).write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Batch-кластеризация профилей ВК (без Streamlit)")
+    ap.add_argument("input", help="CSV или Parquet с профилями")
+    ap.add_argument("--out-dir", default="clustering_output", help="куда писать CSV и отчёт")
+    ap.add_argument("--k", type=int, default=4, help="количество кластеров")
+    ap.add_argument("--jobs", type=int, default=-1, help="число потоков (-1 = все ядра)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--fit-sample", type=int, default=None, help="обучать KMeans на случайной выборке из N строк")
+    ap.add_argument("--chunk-size", type=int, default=1_000_000, help="размер чанка для predict")
+    ap.add_argument("--encoding", choices=FEATURE_ENCODINGS, default="onehot", help="кодирование категорий")
+    ap.add_argument("--min-frequency", type=float, default=None, help="порог частоты категории (onehot)")
+    ap.add_argument("--max-categories", type=int, default=None, help="максимум категорий на колонку (onehot)")
+    ap.add_argument("--hash-features", type=int, default=2 ** 12, help="ширина hashing-пространства")
+    ap.add_argument("--svd", type=int, default=None, help="TruncatedSVD до N компонент перед KMeans/UMAP")
+    ap.add_argument("--umap", action="store_true", help="дополнительно посчитать UMAP-проекцию")
+    ap.add_argument("--csv-name", default="vk_users_clustered.csv")
+    ap.add_argument("--report-name", default="vk_clusters_report.txt")
+    ap.add_argument("--stats-json", default=None, help="сохранить тайминги/throughput в JSON")
+    return ap
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
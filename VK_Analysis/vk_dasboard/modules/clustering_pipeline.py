@@ -0,0 +1,593 @@
+# clustering_pipeline.py
+# -------------------------------------------------
+# Вычислительная часть кластеризации профилей (без Streamlit):
+#   detect_columns → ColumnTransformer → MiniBatchKMeans → UMAP → сводка рисков → экспорт
+# Страница clustering.page() и бенчмарки вызывают одни и те же функции.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from sklearn.compose import ColumnTransformer
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.pipeline import Pipeline as SkPipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+from sklearn.cluster import MiniBatchKMeans
+from threadpoolctl import threadpool_limits
+
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+DROP_COLS = {"id", "synthetic_cluster", "cluster_kmeans", "cluster_dbscan"}
+NUM_COLS_CANDIDATES = ["age"]
+
+# колонки сводки, которые показываются в таблице на странице
+SUMMARY_VIEW_COLS = [
+    "Кластер", "Тип кластера",
+    "Уровень риска", "Риск, % (0-100)",
+    "Доля, %", "Количество",
+    "Главный фактор риска",
+    "Ключевые признаки",
+    "Почему важен",
+    "Рекомендация",
+    "Основной город", "Основной вуз"
+]
+
+
+# ============================================================
+# Признаки
+# ============================================================
+
+# совместимость с разными версиями библиотеки sklearn --> экземпляр OneHot создастся в любом случае
+def safe_onehot(**kwargs):
+    try:
+        return OneHotEncoder(handle_unknown="ignore", sparse_output=True, **kwargs)
+    except TypeError:
+        return OneHotEncoder(handle_unknown="ignore", sparse=True, **kwargs)
+
+
+# разделяет датасет на числовые и категориальные колонки
+def detect_columns(df: pd.DataFrame):
+    num_cols = [c for c in NUM_COLS_CANDIDATES if c in df.columns] # тут числовые
+    cat_cols = [c for c in df.columns if c not in DROP_COLS and c not in num_cols]
+    # тут лежат категориальные (в pandas >= 3 строки имеют dtype "str", а не object)
+    cat_cols = [
+        c for c in cat_cols
+        if pd.api.types.is_object_dtype(df[c]) or pd.api.types.is_string_dtype(df[c])
+    ]
+    return num_cols, cat_cols
+
+
+def prepare_frame(df: pd.DataFrame, cat_cols) -> pd.DataFrame:
+    """Копия датасета с заполненными пропусками в категориальных колонках."""
+    df_proc = df.copy()
+    for c in cat_cols:
+        df_proc[c] = df_proc[c].fillna("")
+    return df_proc
+
+
+@dataclass(frozen=True)
+class FeatureConfig:
+    """
+    Настройки признаков для высококардинальных колонок (city, university, ...).
+
+    encoding       : "onehot" — OneHotEncoder; "hashing" — hashing trick (ширина фиксирована)
+    min_frequency  : редкие категории (реже порога) схлопываются в infrequent (только onehot);
+                     >= 1 — число строк, (0, 1) — доля строк
+    max_categories : максимум категорий на колонку, включая infrequent (только onehot)
+    n_hash_features: ширина hashing-пространства (только hashing)
+    svd_components : если задано — TruncatedSVD до этой размерности перед KMeans/UMAP
+    """
+    encoding: str = "onehot"
+    min_frequency: Optional[float] = None
+    max_categories: Optional[int] = None
+    n_hash_features: int = 2 ** 12
+    svd_components: Optional[int] = None
+    random_state: int = 42
+
+
+FEATURE_ENCODINGS = ("onehot", "hashing")
+
+
+def _columns_as_tokens(X) -> List[tuple]:
+    """DataFrame категорий -> кортежи токенов "колонка=значение" для FeatureHasher."""
+    X = pd.DataFrame(X)
+    per_col = [(f"{c}=" + X[c].astype(str)).tolist() for c in X.columns]
+    return list(zip(*per_col))
+
+
+def _categorical_encoder(config: FeatureConfig):
+    if config.encoding == "hashing":
+        return SkPipeline([
+            ("tokens", FunctionTransformer(_columns_as_tokens, validate=False)),
+            ("hash", FeatureHasher(n_features=int(config.n_hash_features), input_type="string", alternate_sign=False)),
+        ])
+    if config.encoding != "onehot":
+        raise ValueError(f"Неизвестный encoding={config.encoding!r}. Доступно: {FEATURE_ENCODINGS}")
+
+    kwargs = {}
+    if config.min_frequency is not None:
+        # >= 1 — абсолютное число строк, (0, 1) — доля строк
+        mf = config.min_frequency
+        kwargs["min_frequency"] = int(mf) if mf >= 1 else float(mf)
+    if config.max_categories is not None:
+        kwargs["max_categories"] = int(config.max_categories)
+    if kwargs:
+        kwargs["handle_unknown"] = "infrequent_if_exist"
+        try:
+            return OneHotEncoder(sparse_output=True, **kwargs)
+        except TypeError:
+            return OneHotEncoder(sparse=True, **kwargs)
+    return safe_onehot()
+
+
+def fit_preprocessor(df: pd.DataFrame, num_cols, cat_cols, config: Optional[FeatureConfig] = None):
+    """
+    ColumnTransformer (скалер + кодирование категорий), при config.svd_components —
+    дополнительно TruncatedSVD. Без config поведение прежнее (полный one-hot).
+    """
+    config = config or FeatureConfig()
+    pre = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), num_cols), # страндартизиреум признаки
+            ("cat", _categorical_encoder(config), cat_cols), # ван хот / hashing для категориальных
+        ],
+        remainder="drop",
+    )
+    if config.svd_components:
+        pre = SkPipeline([
+            ("encode", pre),
+            ("svd", TruncatedSVD(n_components=int(config.svd_components), random_state=config.random_state)),
+        ])
+    pre.fit(df) # запуск методов
+    return pre
+
+
+# предобработка данных (ванхот, скалер и тд)
+def transform_features(_pre, df: pd.DataFrame):
+    return _pre.transform(df)
+
+
+def feature_matrix_stats(X) -> dict:
+    """Форма, nnz и объём матрицы признаков — чтобы сравнивать настройки по скорости/памяти."""
+    n_rows, n_cols = X.shape
+    if sp.issparse(X):
+        nnz = int(X.nnz)
+        nbytes = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    else:
+        nnz = int(np.count_nonzero(X))
+        nbytes = X.nbytes
+    return {
+        "rows": int(n_rows),
+        "cols": int(n_cols),
+        "nnz": nnz,
+        "density": round(nnz / max(n_rows * n_cols, 1), 6),
+        "sparse": bool(sp.issparse(X)),
+        "memory_mb": round(nbytes / 1024 ** 2, 2),
+    }
+
+
+def build_features(df: pd.DataFrame, config: Optional[FeatureConfig] = None):
+    """
+    detect_columns → prepare_frame → fit_preprocessor → transform.
+    Возвращает (X, preprocessor, stats).
+    """
+    num_cols, cat_cols = detect_columns(df)
+    df_proc = prepare_frame(df, cat_cols)
+    pre = fit_preprocessor(df_proc, num_cols, cat_cols, config=config)
+    X = transform_features(pre, df_proc)
+    return X, pre, feature_matrix_stats(X)
+
+
+# ============================================================
+# Кластеризация и проекция
+# ============================================================
+
+def fit_kmeans(X, k: int, random_state: int = 42, batch_size: int = 1024) -> tuple[MiniBatchKMeans, np.ndarray]:
+    """MiniBatchKMeans: возвращает (модель, метки кластеров)."""
+    km = MiniBatchKMeans(n_clusters=int(k), random_state=random_state, batch_size=batch_size)
+    labels = km.fit_predict(X).astype(int)
+    return km, labels
+
+
+def compute_umap(X, n_neighbors: int = 25, min_dist: float = 0.10, random_state: int | None = 42, n_jobs: int = -1) -> np.ndarray:
+    """2D UMAP-проекция (только для визуализации)."""
+    import umap  # тяжёлый импорт — только когда проекция реально нужна
+
+    reducer = umap.UMAP(
+        n_neighbors=n_neighbors,
+        min_dist=min_dist,
+        n_components=2,
+        metric="cosine",
+        random_state=random_state,
+        n_jobs=n_jobs,
+    )
+    return reducer.fit_transform(X)
+
+
+# ============================================================
+# Risk / Explanation helpers
+# ============================================================
+def share_positive(series: pd.Series) -> float:
+    """Доля 'положительного' отношения."""
+    if series is None or series.empty:
+        return 0.0
+    s = series.fillna("").astype(str).str.lower()
+    return float(s.str.contains("полож").mean())
+
+
+def share_is(series: pd.Series, keywords: list[str]) -> float:
+    """Доля строк, где значение содержит хотя бы одно ключевое слово."""
+    if series is None or series.empty:
+        return 0.0
+    s = series.fillna("").astype(str).str.lower()
+    mask = False
+    for kw in keywords:
+        mask = mask | s.str.contains(kw)
+    return float(mask.mean())
+
+
+def ideological_risk_share(series: pd.Series) -> float:
+    """
+    Идеологический риск (для режимного предприятия):
+    либеральные / либертарианские / индифферентные.
+    """
+    if series is None or series.empty:
+        return 0.0
+    s = series.fillna("").astype(str).str.lower()
+    return float(
+        (s.str.contains("либерал") | s.str.contains("либертариан") | s.str.contains("индиффер")).mean()
+    )
+
+
+def top_value(series: pd.Series) -> str:
+    if series is None or series.empty:
+        return "—"
+    vc = series.fillna("—").astype(str).value_counts()
+    return str(vc.index[0])
+
+
+def top_n(series: pd.Series, n=3) -> str:
+    if series is None or series.empty:
+        return "—"
+    vc = series.fillna("").astype(str).value_counts(normalize=True).head(n)
+    items = []
+    for name, share in vc.items():
+        if name == "":
+            continue
+        items.append(f"{name} ({share*100:.0f}%)")
+    return ", ".join(items) if items else "—"
+
+
+def risk_drivers(part: pd.DataFrame) -> dict:
+    """Считаем доли факторов риска в кластере."""
+    alc_pos = share_positive(part["alcohol"]) if "alcohol" in part.columns else 0.0
+    smk_pos = share_positive(part["smoking"]) if "smoking" in part.columns else 0.0
+
+    edu_low = share_is(part["education_level"], ["нет", "среднее"]) if "education_level" in part.columns else 0.0
+    life_hed = share_is(part["main_in_life"], ["развлеч", "слава", "влияние"]) if "main_in_life" in part.columns else 0.0
+    ppl_money = share_is(part["main_in_people"], ["власть", "богат"]) if "main_in_people" in part.columns else 0.0
+
+    pol_liberal = ideological_risk_share(part["political"]) if "political" in part.columns else 0.0
+
+    return {
+        "alc_pos": alc_pos,
+        "smk_pos": smk_pos,
+        "edu_low": edu_low,
+        "life_hed": life_hed,
+        "ppl_money": ppl_money,
+        "pol_liberal": pol_liberal,
+    }
+
+#   тут можно настривать чувсвительность системы 
+def risk_score_0_100(alc, smk, pol, edu):
+    """
+    Итоговый риск кластера (0–100).
+    Приоритет:
+    - алкоголь (45%)
+    - либеральные/либертарианские/индифферентные (25%)
+    - курение (20%)
+    - низкое образование (10%)
+    """
+    return float(
+        round(
+            100 * (
+                0.45 * alc +
+                0.20 * smk +
+                0.25 * pol +
+                0.10 * edu
+            ),
+            1
+        )
+    )
+
+
+def risk_level_ru(score: float) -> str:
+    if score >= 60:
+        return "ВЫСОКИЙ"
+    if score >= 30:
+        return "СРЕДНИЙ"
+    return "НИЗКИЙ"
+
+
+def main_risk_factor(dr: dict) -> str:
+    """
+    Главный фактор риска — выбираем фактор с максимальным вкладом в итоговый score.
+    """
+    factors = {
+        "Положительное отношение к алкоголю": dr["alc_pos"] * 0.45,
+        "Либеральные политические взгляды": dr["pol_liberal"] * 0.25,
+        "Положительное отношение к курению": dr["smk_pos"] * 0.20,
+        "Низкий уровень образования": dr["edu_low"] * 0.10,
+    }
+    return max(factors, key=factors.get)
+
+
+def why_danger_ru(alcohol_pos: float, smoking_pos: float, pol_liberal: float, edu_low: float, top_life: str) -> str:
+    reasons = []
+    if alcohol_pos >= 0.45:
+        reasons.append("высокая доля положительного отношения к алкоголю")
+    if smoking_pos >= 0.45:
+        reasons.append("высокая доля положительного отношения к курению")
+    if pol_liberal >= 0.45:
+        reasons.append("преобладание либеральных/либертарианских/индифферентных взглядов")
+    if edu_low >= 0.45:
+        reasons.append("высокая доля низкого уровня образования")
+    if isinstance(top_life, str) and (("развлеч" in top_life.lower()) or ("слава" in top_life.lower())):
+        reasons.append("ценности смещены в сторону развлечений/влияния")
+    return "; ".join(reasons) if reasons else "выраженных риск-факторов не обнаружено"
+
+
+def cluster_type_ru(dr: dict, top_edu: str, top_life: str) -> str:
+    if dr["alc_pos"] > 0.50 and dr["pol_liberal"] > 0.40:
+        return "Рисковый: алкоголь + идеология"
+    if dr["alc_pos"] > 0.50:
+        return "Рисковый: вредные привычки"
+    if dr["pol_liberal"] > 0.50:
+        return "Рисковый: идеологический профиль"
+    if dr["edu_low"] > 0.45:
+        return "Рисковый: низкое образование"
+    if "высш" in str(top_edu).lower() and ("семья" in str(top_life).lower() or "саморазвит" in str(top_life).lower()):
+        return "Надёжный: социально устойчивый"
+    return "Смешанный: требует внимания"
+
+
+def recommendation_ru(level: str) -> str:
+    if level == "ВЫСОКИЙ":
+        return "Рекомендуется углублённая проверка (сообщества/контент/окружение)."
+    if level == "СРЕДНИЙ":
+        return "Рекомендуется точечная проверка (аномалии, окружение 1–2 уровня)."
+    return "Фоновый контроль (без приоритета)."
+
+
+def build_text_report(summary_df: pd.DataFrame, total_n: int) -> str:
+    lines = []
+    lines.append("ОТЧЁТ ПО КЛАСТЕРИЗАЦИИ ОКРУЖЕНИЯ ВК")
+    lines.append("=" * 70)
+    lines.append(f"Всего профилей: {total_n}")
+    lines.append("")
+
+    for _, r in summary_df.iterrows():
+        lines.append(f"Кластер {r['Кластер']} — {r['Тип кластера']}")
+        lines.append(f"  Уровень риска: {r['Уровень риска']} | Риск: {r['Риск, % (0-100)']} / 100")
+        lines.append(f"  Главный фактор риска: {r['Главный фактор риска']}")
+        lines.append(f"  Размер: {r['Количество']} ({r['Доля, %']}%)")
+        lines.append(f"  Ключевые признаки: {r['Ключевые признаки']}")
+        lines.append(f"  Почему важен: {r['Почему важен']}")
+        lines.append(f"  Рекомендация: {r['Рекомендация']}")
+        lines.append(f"  Основной город: {r['Основной город']}")
+        lines.append(f"  Основной вуз: {r['Основной вуз']}")
+        lines.append("-" * 70)
+
+    return "\n".join(lines)
+
+
+
+# ============================================================
+# Сводка по кластерам
+# ============================================================
+
+def summarize_clusters(df_out: pd.DataFrame, total_n: int, label_col: str = "cluster_kmeans") -> pd.DataFrame:
+    """
+    Интеллектуальная сводка: по одной строке на кластер, отсортировано по риску.
+    """
+    summary_rows = []
+    for cl in sorted(df_out[label_col].unique()):
+        part = df_out[df_out[label_col] == cl]
+        dr = risk_drivers(part)
+
+        score = risk_score_0_100(dr["alc_pos"], dr["smk_pos"], dr["pol_liberal"], dr["edu_low"])
+        lvl = risk_level_ru(score)
+
+        top_city = top_value(part["city"]) if "city" in part.columns else "—"
+        top_uni = top_value(part["university"]) if "university" in part.columns else "—"
+        top_life = top_value(part["main_in_life"]) if "main_in_life" in part.columns else "—"
+        top_people = top_value(part["main_in_people"]) if "main_in_people" in part.columns else "—"
+        top_edu = top_value(part["education_level"]) if "education_level" in part.columns else "—"
+        top_pol = top_value(part["political"]) if "political" in part.columns else "—"
+
+        size = int(len(part))
+        share_pct = (size / total_n) * 100.0
+
+        # ключевые признаки (коротко)
+        key_facts = []
+        key_facts.append(f"алк+ {dr['alc_pos']*100:.0f}%")
+        key_facts.append(f"кур+ {dr['smk_pos']*100:.0f}%")
+        key_facts.append(f"либ/индиф {dr['pol_liberal']*100:.0f}%")
+        key_facts.append(f"низк.обр {dr['edu_low']*100:.0f}%")
+        key_facts = ", ".join(key_facts)
+
+        ctype = cluster_type_ru(dr, str(top_edu), str(top_life))
+        main_factor = main_risk_factor(dr)
+        why = why_danger_ru(dr["alc_pos"], dr["smk_pos"], dr["pol_liberal"], dr["edu_low"], str(top_life))
+
+        summary_rows.append({
+            "Кластер": int(cl),
+            "Тип кластера": ctype,
+            "Уровень риска": lvl,
+            "Риск, % (0-100)": round(score, 1),
+            "Доля, %": round(share_pct, 2),
+            "Количество": size,
+            "Главный фактор риска": main_factor,
+            "Ключевые признаки": key_facts,
+            "Почему важен": why,
+            "Рекомендация": recommendation_ru(lvl),
+            "Основной город": str(top_city),
+            "Основной вуз": str(top_uni),
+            "Ценности (топ)": str(top_life),
+            "В людях (топ)": str(top_people),
+            "Образование (топ)": str(top_edu),
+            "Политика (топ)": str(top_pol),
+        })
+
+    summary_df = pd.DataFrame(summary_rows)
+
+    order = {"ВЫСОКИЙ": 2, "СРЕДНИЙ": 1, "НИЗКИЙ": 0}
+    summary_df["_ord"] = summary_df["Уровень риска"].map(order).fillna(0).astype(int)
+    summary_df = summary_df.sort_values(["_ord", "Риск, % (0-100)", "Количество"], ascending=[False, False, False]).drop(columns=["_ord"])
+    return summary_df
+
+
+def cluster_risk_maps(summary_df: pd.DataFrame) -> dict:
+    """cluster -> уровень / score / главный фактор (для графика и экспорта)."""
+    return {
+        "risk_level": dict(zip(summary_df["Кластер"], summary_df["Уровень риска"])),
+        "risk_score": dict(zip(summary_df["Кластер"], summary_df["Риск, % (0-100)"])),
+        "main_factor": dict(zip(summary_df["Кластер"], summary_df["Главный фактор риска"])),
+    }
+
+
+# ============================================================
+# Headless API: fit / predict / summarize / export
+# ============================================================
+
+@dataclass
+class ClusteringPipeline:
+    """
+    Пайплайн кластеризации профилей без UI (для batch-запусков):
+
+        pipe = ClusteringPipeline(k=4, n_jobs=8).fit(df)
+        labels = pipe.predict(df_big, chunk_size=500_000)
+        summary_df = pipe.summarize(df_big, labels)
+        paths = pipe.export(df_big, "out/", labels=labels)
+
+    k            : количество кластеров (слайдер на странице)
+    n_jobs       : число потоков BLAS/OpenMP для KMeans и UMAP (-1 = все ядра)
+    with_umap    : считать ли UMAP-проекцию при fit (нужна только для графика)
+    features     : FeatureConfig (порог частоты, hashing, SVD)
+    """
+    k: int = 4
+    random_state: int = 42
+    batch_size: int = 1024
+    n_jobs: int = -1
+    with_umap: bool = False
+    features: FeatureConfig = field(default_factory=FeatureConfig)
+
+    num_cols_: List[str] = field(default_factory=list, init=False)
+    cat_cols_: List[str] = field(default_factory=list, init=False)
+    preprocessor_: Optional[object] = field(default=None, init=False)
+    kmeans_: Optional[MiniBatchKMeans] = field(default=None, init=False)
+    labels_: Optional[np.ndarray] = field(default=None, init=False)
+    embedding_: Optional[np.ndarray] = field(default=None, init=False)
+    summary_df_: Optional[pd.DataFrame] = field(default=None, init=False)
+    feature_stats_: Dict[str, object] = field(default_factory=dict, init=False)
+    timings_: Dict[str, float] = field(default_factory=dict, init=False)
+
+    def _limits(self):
+        return threadpool_limits(limits=None if self.n_jobs in (None, -1) else int(self.n_jobs))
+
+    def _check_fitted(self):
+        if self.preprocessor_ is None or self.kmeans_ is None:
+            raise RuntimeError("ClusteringPipeline не обучен: сначала вызовите fit().")
+
+    def fit(self, df: pd.DataFrame) -> ClusteringPipeline:
+        """Признаки + MiniBatchKMeans (+ UMAP, если with_umap)."""
+        t0 = time.perf_counter()
+        self.num_cols_, self.cat_cols_ = detect_columns(df)
+        df_proc = prepare_frame(df, self.cat_cols_)
+        self.preprocessor_ = fit_preprocessor(df_proc, self.num_cols_, self.cat_cols_, config=self.features)
+        X = transform_features(self.preprocessor_, df_proc)
+        self.feature_stats_ = feature_matrix_stats(X)
+        self.timings_["features"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with self._limits():
+            self.kmeans_, self.labels_ = fit_kmeans(
+                X, self.k, random_state=self.random_state, batch_size=self.batch_size
+            )
+        self.timings_["kmeans"] = time.perf_counter() - t0
+
+        if self.with_umap:
+            t0 = time.perf_counter()
+            # детерминированный UMAP однопоточный — при n_jobs != 1 отказываемся от seed
+            seed = self.random_state if self.n_jobs == 1 else None
+            self.embedding_ = compute_umap(X, random_state=seed, n_jobs=self.n_jobs)
+            self.timings_["umap"] = time.perf_counter() - t0
+
+        self.summary_df_ = None
+        return self
+
+    def predict(self, df: pd.DataFrame, chunk_size: Optional[int] = None) -> np.ndarray:
+        """Метки кластеров для новых профилей (по чанкам — чтобы X не рос на весь файл)."""
+        self._check_fitted()
+        n = len(df)
+        step = int(chunk_size) if chunk_size else max(n, 1)
+
+        out = np.empty(n, dtype=int)
+        with self._limits():
+            for start in range(0, n, step):
+                part = prepare_frame(df.iloc[start:start + step], self.cat_cols_)
+                X = transform_features(self.preprocessor_, part)
+                out[start:start + step] = self.kmeans_.predict(X)
+        return out
+
+    def summarize(self, df: pd.DataFrame, labels: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Сводка рисков по кластерам (та же таблица, что на странице)."""
+        labels = self.labels_ if labels is None else labels
+        if labels is None or len(labels) != len(df):
+            raise ValueError("Нужны метки той же длины, что и df (fit(df) или predict(df)).")
+        df_out = df.assign(cluster_kmeans=np.asarray(labels, dtype=int))
+        self.summary_df_ = summarize_clusters(df_out, len(df_out))
+        return self.summary_df_
+
+    def export(
+        self,
+        df: pd.DataFrame,
+        out_dir: str | Path,
+        labels: Optional[np.ndarray] = None,
+        csv_name: str = "vk_users_clustered.csv",
+        report_name: str = "vk_clusters_report.txt",
+    ) -> Dict[str, Path]:
+        """
+        Пишет то же, что страница отдаёт через st.download_button:
+        CSV с метками и риском + текстовый отчёт (csv_name *.parquet — Parquet).
+        """
+        from clustered_export import write_clustered
+
+        labels = self.labels_ if labels is None else labels
+        summary_df = self.summarize(df, labels)
+
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        # потоковая запись по чанкам — без копии всей таблицы
+        csv_path = write_clustered(
+            df, np.asarray(labels, dtype=int), cluster_risk_maps(summary_df), out_dir / csv_name,
+            fmt="parquet" if Path(csv_name).suffix.lower() == ".parquet" else "csv",
+        )
+
+        report_path = out_dir / report_name
+        report_path.write_text(build_text_report(summary_df, len(df)), encoding="utf-8")
+
+        return {"csv": csv_path, "report": report_path}
@@ -0,0 +1,294 @@
+# community_significance.py
+# -------------------------------------------------
+# Статистическая значимость скрытых сообществ: перестановочный тест для significance_score.
+#
+# significance_score = density * avg_wdeg * log(n+1) (e._community_subgraph_metrics) растёт с размером,
+# поэтому крупное рыхлое сообщество может обогнать маленькое, но плотное. Здесь для каждого сообщества
+# считается, насколько его метрики выше, чем у случайного набора узлов того же размера:
+#
+#   null_model="label"  : метки сообществ перемешиваются по всем узлам (размеры сохраняются)
+#   null_model="degree" : метки перемешиваются внутри страт по взвешенной степени —
+#                         сохраняются и размеры, и распределение степеней каждого сообщества
+#
+# Пачка из b перестановок считается разом: индикатор P (n × b·k, по одной единице на строку и перестановку),
+# внутренний вес и число рёбер — суммы по столбцам P ∘ (A @ P). Пачки — в пуле процессов,
+# матрица — одна копия в shared memory (shared_store).
+# Граф групп дубликатов (атрибут multiplicity, duplicate_users.supernode_graph) считается как развёрнутый:
+# размер — сумма multiplicity, ребро — m_a·m_b рёбер, петля — m(m-1)/2.
+# Итог по сообществу: z-score и p-value (доля перестановок со score не ниже наблюдаемого),
+# q-value — поправка Бенджамини–Хохберга на число сообществ.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from graph_analytics import graph_to_adjacency
+from shared_store import SharedHandle, attach, share_csr
+
+NULL_MODELS = ("label", "degree")
+SIGNIFICANCE_COLUMNS = [
+    "hidden_comm_id", "size_users", "score", "null_mean", "null_std", "z_score", "p_value", "q_value",
+    "density_z", "avg_wdeg_z",
+]
+
+
+# ---------------------------
+# Метрики через индикаторные произведения
+# ---------------------------
+def _split_loops(A: csr_matrix) -> Tuple[csr_matrix, np.ndarray]:
+    """A без диагонали (для P ∘ (A @ P)) и веса петель — петля внутри сообщества всегда."""
+    A = csr_matrix(A, dtype=np.float64, copy=True)
+    loops = A.diagonal().copy()
+    A.setdiag(0)
+    A.eliminate_zeros()
+    return A, loops
+
+
+def _multiplicity(G: nx.Graph, nodes: List[Hashable]) -> Optional[np.ndarray]:
+    """Число пользователей за каждым узлом (None — обычный граф, узел = пользователь)."""
+    mult = nx.get_node_attributes(G, "multiplicity")
+    if not mult:
+        return None
+    return np.fromiter((mult.get(n, 1) for n in nodes), dtype=np.float64, count=len(nodes))
+
+
+def _edge_counts(A: csr_matrix, loops: np.ndarray, mult: Optional[np.ndarray]) -> Tuple[csr_matrix, np.ndarray]:
+    """S — число рёбер за каждым элементом A (1 или m_a·m_b), и число рёбер петель (1 или m(m-1)/2)."""
+    S = A.copy()
+    if mult is None:
+        S.data = np.ones_like(S.data)
+        return S, (loops > 0).astype(np.float64)
+    rows = np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+    S.data = mult[rows] * mult[A.indices]
+    return S, np.where(loops > 0, mult * (mult - 1) / 2.0, 0.0)
+
+
+def _sizes(labels: np.ndarray, k: int, mult: Optional[np.ndarray]) -> np.ndarray:
+    """Размеры сообществ в пользователях для пачки разметок (b × k)."""
+    labels = np.atleast_2d(labels)
+    return np.vstack([np.bincount(row, weights=mult, minlength=k) for row in labels]).astype(np.float64)
+
+
+def _indicator(labels: np.ndarray, k: int) -> csr_matrix:
+    """labels (b × n) → P (n × b·k): столбец r·k + c — узлы сообщества c в перестановке r."""
+    b, n = labels.shape
+    cols = (labels + (np.arange(b, dtype=np.int64) * k)[:, None]).T.ravel()
+    indptr = np.arange(0, n * b + 1, b, dtype=np.int64)
+    return csr_matrix((np.ones(n * b), cols, indptr), shape=(n, b * k))
+
+
+def batch_metrics(
+    A: csr_matrix, S: csr_matrix, loops: np.ndarray, labels: np.ndarray, k: int,
+    loop_edges: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Внутренний вес (каждое ребро один раз) и число внутренних рёбер для пачки разметок.
+    A / S — матрицы весов и числа рёбер без диагонали (_edge_counts), labels — (b × n).
+    loop_edges — число рёбер за петлёй узла (по умолчанию 1). Возвращает два массива b × k.
+    """
+    labels = np.atleast_2d(labels)
+    b = labels.shape[0]
+    P = _indicator(labels, k)
+    inner = np.asarray(P.multiply(A @ P).sum(axis=0)).ravel() / 2.0
+    edges = np.asarray(P.multiply(S @ P).sum(axis=0)).ravel() / 2.0
+    inner, edges = inner.reshape(b, k), edges.reshape(b, k)
+    if loops.any():
+        if loop_edges is None:
+            loop_edges = (loops > 0).astype(np.float64)
+        for r in range(b):
+            inner[r] += np.bincount(labels[r], weights=loops, minlength=k)
+            edges[r] += np.bincount(labels[r], weights=loop_edges, minlength=k)
+    return inner, edges
+
+
+def _scores(inner: np.ndarray, edges: np.ndarray, size: np.ndarray):
+    """density, avg_wdeg, score — формулы _community_subgraph_metrics."""
+    max_edges = np.where(size > 1, size * (size - 1) / 2.0, 1.0)
+    density = edges / max_edges
+    avg_wdeg = np.divide(2.0 * inner, size, out=np.zeros_like(inner), where=size > 0)
+    return density, avg_wdeg, density * avg_wdeg * np.log(size + 1)
+
+
+# ---------------------------
+# Нулевые модели
+# ---------------------------
+def degree_strata(A: csr_matrix, n_bins: int = 10) -> np.ndarray:
+    """Номер страты узла: квантильные корзины взвешенной степени."""
+    strength = np.asarray(A.sum(axis=1)).ravel()
+    edges = np.unique(np.quantile(strength, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    return np.searchsorted(edges, strength, side="right").astype(np.int64)
+
+
+def permute_labels(labels: np.ndarray, rng: np.random.Generator, b: int, strata: Optional[np.ndarray] = None) -> np.ndarray:
+    """b перестановок labels; со strata — метки меняются местами только внутри страты."""
+    n = len(labels)
+    keys = rng.random((b, n))
+    if strata is not None:
+        keys += strata[None, :]  # сортировка по (страта, случайный ключ) — перемешивание внутри страты
+        base = np.argsort(strata, kind="stable")
+    else:
+        base = np.arange(n)
+    order = np.argsort(keys, axis=1)
+    # i-я по порядку позиция получает метку i-го узла своей страты в исходном порядке
+    out = np.empty((b, n), dtype=np.int64)
+    rows = np.arange(b)[:, None]
+    out[rows, order] = labels[base][None, :]
+    return out
+
+
+_WORKER: dict = {}
+
+
+def _init_worker(handle: SharedHandle, labels, strata, loops, mult, k, seed):
+    A = attach(handle).csr()
+    S, loop_edges = _edge_counts(A, loops, mult)
+    _WORKER.update(A=A, S=S, labels=labels, strata=strata, loops=loops, loop_edges=loop_edges, mult=mult, k=k, seed=seed)
+
+
+def _null_batch(A, S, loops, loop_edges, mult, labels, strata, k, seed, batch_index: int, b: int):
+    # генератор на пачку: результат не зависит от числа процессов
+    rng = np.random.default_rng([seed, batch_index])
+    perm = permute_labels(labels, rng, b, strata)
+    # с multiplicity размеры сообществ в пользователях меняются от перестановки к перестановке
+    return (*batch_metrics(A, S, loops, perm, k, loop_edges), _sizes(perm, k, mult))
+
+
+def _worker_batch(task: Tuple[int, int]):
+    w = _WORKER
+    return _null_batch(w["A"], w["S"], w["loops"], w["loop_edges"], w["mult"], w["labels"], w["strata"],
+                       w["k"], w["seed"], *task)
+
+
+# ---------------------------
+# Тест
+# ---------------------------
+@dataclass(frozen=True)
+class SignificanceResult:
+    """
+    table : по скрытым сообществам (SIGNIFICANCE_COLUMNS), по убыванию z_score
+    null  : score в каждой перестановке (n_permutations × число сообществ, столбцы — как comm_ids)
+    """
+    table: pd.DataFrame
+    null: np.ndarray
+    comm_ids: List[int]
+    null_model: str
+    n_permutations: int
+    seconds: float
+    n_jobs: int
+
+    def significant(self, alpha: float = 0.05) -> pd.DataFrame:
+        return self.table[self.table["q_value"] <= alpha]
+
+    def by_comm(self) -> Dict[int, dict]:
+        return self.table.set_index("hidden_comm_id").to_dict(orient="index")
+
+
+def _bh(p: np.ndarray) -> np.ndarray:
+    """q-value Бенджамини–Хохберга."""
+    m = len(p)
+    if m == 0:
+        return p
+    order = np.argsort(p)
+    ranked = p[order] * m / np.arange(1, m + 1)
+    q = np.minimum.accumulate(ranked[::-1])[::-1]
+    out = np.empty(m)
+    out[order] = np.minimum(q, 1.0)
+    return out
+
+
+def _zscore(obs: np.ndarray, null: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    mean, std = null.mean(axis=0), null.std(axis=0)
+    z = np.divide(obs - mean, std, out=np.zeros_like(obs), where=std > 0)
+    return mean, std, z
+
+
+def permutation_test(
+    G: nx.Graph,
+    partition: Dict[Hashable, int],
+    null_model: str = "label",
+    n_permutations: int = 200,
+    seed: int = 42,
+    n_jobs: int = 1,
+    batch_size: Optional[int] = None,
+    n_bins: int = 10,
+    weight: str = "weight",
+) -> SignificanceResult:
+    """
+    z-score / p-value significance_score каждого скрытого сообщества против нулевой модели.
+    n_jobs > 1 (или -1) — пачки перестановок в пуле процессов; результат от n_jobs не зависит.
+    batch_size=None — подбирается так, чтобы A @ P пачки занимало порядка 4 млн ненулевых элементов.
+    """
+    if null_model not in NULL_MODELS:
+        raise ValueError(f"Неизвестная нулевая модель {null_model!r}. Доступно: {NULL_MODELS}")
+    if n_permutations < 1:
+        raise ValueError("n_permutations должно быть >= 1.")
+
+    A_full, nodes = graph_to_adjacency(G, weight=weight)
+    missing = [n for n in nodes if n not in partition]
+    if missing:
+        raise ValueError(f"{len(missing)} узлов графа нет в разбиении (например, {missing[0]}).")
+    comm_ids, labels = np.unique(np.fromiter((partition[n] for n in nodes), dtype=np.int64, count=len(nodes)),
+                                 return_inverse=True)
+    labels = labels.astype(np.int64)
+    k = len(comm_ids)
+    A, loops = _split_loops(A_full)
+    mult = _multiplicity(G, nodes)
+    S, loop_edges = _edge_counts(A, loops, mult)
+    strata = degree_strata(A_full, n_bins) if null_model == "degree" else None
+
+    t0 = time.perf_counter()
+    size = _sizes(labels, k, mult)[0]
+    obs_inner, obs_edges = batch_metrics(A, S, loops, labels[None, :], k, loop_edges)
+    obs_density, obs_wdeg, obs_score = (x[0] for x in _scores(obs_inner, obs_edges, size))
+
+    b = batch_size or int(np.clip(4_000_000 // max(A.nnz, 1), 1, 64))
+    tasks = [(i, min(b, n_permutations - i * b)) for i in range((n_permutations + b - 1) // b)]
+    workers = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, int(n_jobs))
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        parts = [_null_batch(A, S, loops, loop_edges, mult, labels, strata, k, seed, *t) for t in tasks]
+    else:
+        with share_csr(A) as store:
+            initargs = (store.handle, labels, strata, loops, mult, k, seed)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as ex:
+                parts = list(ex.map(_worker_batch, tasks))
+    null_inner = np.vstack([p[0] for p in parts])
+    null_edges = np.vstack([p[1] for p in parts])
+    null_size = np.vstack([p[2] for p in parts])
+    null_density, null_wdeg, null_score = _scores(null_inner, null_edges, null_size)
+
+    mean, std, z = _zscore(obs_score, null_score)
+    p_value = (1.0 + (null_score >= obs_score[None, :] - 1e-12).sum(axis=0)) / (n_permutations + 1.0)
+    table = pd.DataFrame({
+        "hidden_comm_id": comm_ids,
+        "size_users": size.astype(np.int64),
+        "score": np.round(obs_score, 6),
+        "null_mean": np.round(mean, 6),
+        "null_std": np.round(std, 6),
+        "z_score": np.round(z, 3),
+        "p_value": p_value,
+        "q_value": _bh(p_value),
+        "density_z": np.round(_zscore(obs_density, null_density)[2], 3),
+        "avg_wdeg_z": np.round(_zscore(obs_wdeg, null_wdeg)[2], 3),
+    }, columns=SIGNIFICANCE_COLUMNS).sort_values(["z_score", "score"], ascending=False, ignore_index=True)
+
+    return SignificanceResult(
+        table=table,
+        null=null_score,
+        comm_ids=comm_ids.tolist(),
+        null_model=null_model,
+        n_permutations=int(n_permutations),
+        seconds=round(time.perf_counter() - t0, 3),
+        n_jobs=workers,
+    )
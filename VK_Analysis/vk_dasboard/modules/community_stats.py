@@ -0,0 +1,129 @@
+# community_stats.py
+# -------------------------------------------------
+# Статистика по сообществам из суммы столбцов sparse-матрицы user × community:
+#   популярность (подписчиков у сообщества) = np.asarray(X.sum(0))
+#   топ-N                                     = argpartition (без полной сортировки)
+#   число уникальных сообществ, членств       = по тем же суммам
+#   суммы по тематикам                        = bincount(topic_codes, weights=popularity)
+#
+# Вместо Counter по сплющенному списку communities_list.
+# Результат кэшируется на датасет: d.py и h.py берут одни и те же суммы.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from create_ug_matrix import UserCommunityData
+from topic_profile import top_n_indices
+
+
+@dataclass(frozen=True)
+class CommunityStats:
+    """
+    community_ids : значения сообществ по столбцам (как в данных: строки или числа)
+    members       : подписчиков в каждом сообществе (сумма столбца)
+    n_users       : пользователей (строк матрицы)
+    topic_totals  : членств по тематикам (если передан TopicLookup)
+    """
+    community_ids: np.ndarray
+    members: np.ndarray
+    n_users: int
+    topic_totals: Optional[pd.Series] = None
+
+    @property
+    def n_communities(self) -> int:
+        """Уникальных сообществ, в которых есть хотя бы один подписчик."""
+        return int(np.count_nonzero(self.members))
+
+    @property
+    def n_memberships(self) -> int:
+        return int(self.members.sum())
+
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int]]:
+        """[(сообщество, подписчиков), ...] — как Counter.most_common(n) (при равенстве — порядок первого появления)."""
+        idx = top_n_indices(self.members, n)
+        return [(self.community_ids[j], int(self.members[j])) for j in idx]
+
+    def popularity(self) -> pd.Series:
+        return pd.Series(self.members, index=pd.Index(self.community_ids, name="community_id"), name="members")
+
+
+def community_stats(data: UserCommunityData, topic_lookup=None) -> CommunityStats:
+    """Статистика по готовой матрице UserCommunityData (topic_lookup — e.TopicLookup, опционально)."""
+    return _stats_from_csr(data.csr, np.asarray(data.community_ids, dtype=object), topic_lookup)
+
+
+def csr_from_communities_list(df: pd.DataFrame, column: str = "communities_list") -> Tuple[csr_matrix, np.ndarray]:
+    """
+    user × community csr из колонки со списками сообществ.
+    Столбцы — в порядке первого появления, значения сообществ сохраняют исходный тип.
+    """
+    # RangeIndex: после explode индекс строки = номер пользователя
+    flat = pd.Series(df[column].to_numpy(), dtype=object).explode().dropna()
+    codes, uniques = pd.factorize(flat, sort=False)
+    rows = flat.index.to_numpy()
+    X = csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (rows, codes)),
+        shape=(len(df), len(uniques)),
+    )
+    return X, np.asarray(uniques, dtype=object)
+
+
+def community_stats_from_lists(df: pd.DataFrame, column: str = "communities_list") -> CommunityStats:
+    X, community_ids = csr_from_communities_list(df, column)
+    return _stats_from_csr(X, community_ids, None)
+
+
+def _stats_from_csr(X: csr_matrix, community_ids: np.ndarray, topic_lookup=None) -> CommunityStats:
+    members = np.asarray(X.sum(axis=0)).ravel().astype(np.int64)
+
+    topic_totals = None
+    if topic_lookup is not None:
+        codes = np.asarray(topic_lookup.topic_codes)
+        has = codes >= 0
+        totals = np.bincount(codes[has], weights=members[has], minlength=topic_lookup.n_topics)
+        topic_totals = pd.Series(totals.astype(np.int64), index=list(topic_lookup.topics), name="members")
+        topic_totals = topic_totals.sort_values(ascending=False, kind="stable")
+
+    return CommunityStats(
+        community_ids=community_ids,
+        members=members,
+        n_users=int(X.shape[0]),
+        topic_totals=topic_totals,
+    )
+
+
+# ---------------------------
+# Кэш на датасет
+# ---------------------------
+_STATS_CACHE: "OrderedDict[Hashable, Tuple[object, CommunityStats]]" = OrderedDict()
+_STATS_CACHE_SIZE = 8
+
+
+def get_community_stats(source, key: Optional[Hashable] = None, topic_lookup=None) -> CommunityStats:
+    """
+    Статистика с кэшем: source — UserCommunityData или DataFrame с communities_list.
+    key — отпечаток датасета (путь:mtime, хэш загрузки); без него кэш работает по объекту.
+    """
+    cache_key = key if key is not None else ("id", id(source), id(topic_lookup))
+    hit = _STATS_CACHE.get(cache_key)
+    if hit is not None and (key is not None or hit[0] is source):
+        _STATS_CACHE.move_to_end(cache_key)
+        return hit[1]
+
+    if isinstance(source, UserCommunityData):
+        stats = community_stats(source, topic_lookup)
+    else:
+        stats = community_stats_from_lists(source)
+
+    _STATS_CACHE[cache_key] = (source, stats)
+    while len(_STATS_CACHE) > _STATS_CACHE_SIZE:
+        _STATS_CACHE.popitem(last=False)
+    return stats
@@ -9,6 +9,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, List
 
+import numpy as np
 import pandas as pd
 from scipy.sparse import csr_matrix
 
@@ -82,4 +83,26 @@ class UserCommunityData:
             user_index=user_index,
             comm_index=comm_index,
             edges_df=df
-        )
\ No newline at end of file
+        )
+
+    def take_rows(self, rows) -> UserCommunityData:
+        """
+        Подвыборка строк rows (в этом порядке); столбцы не меняются (TopicLookup остаётся выровненным).
+        edges_df собирается по ненулевым элементам подматрицы — без фильтрации всего edge-list.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        csr = self.csr[rows]
+        user_ids = [str(self.user_ids[r]) for r in rows.tolist()]  # user_ids может быть массивом (shared_store)
+        coo = csr.tocoo()
+        edges_df = pd.DataFrame({
+            "user_id": np.asarray(user_ids, dtype=object)[coo.row],
+            "community_id": np.asarray(self.community_ids, dtype=object)[coo.col],
+        })
+        return UserCommunityData(
+            csr=csr,
+            user_ids=user_ids,
+            community_ids=self.community_ids,
+            user_index={u: i for i, u in enumerate(user_ids)},
+            comm_index=self.comm_index,
+            edges_df=edges_df,
+        )
@@ -1,27 +1,19 @@
 
 
-from collections import Counter
+from community_stats import get_community_stats
 # Анализ наиболее влиятельных сообществ
 
 def find_most_common_communities(df, top_n=10):
     # top_n - сколько топовых сообществ выводим
-    #extend() - добавляет все элементы списка в общий список (в отличие от append(), который добавил бы весь список как один элемент)
+    # Популярность сообщества — сумма столбца sparse-матрицы user × community
+    # (строится один раз на датасет и кэшируется — те же суммы использует h.generate_report)
 
+    stats = get_community_stats(df)
 
-    # Собираем все сообщества
-    all_communities = []
-    for communities in df['communities_list']:
-        all_communities.extend(communities)
+    # Топ-N самых популярных: argpartition вместо полной сортировки
+    top_communities = stats.top(top_n)
 
-    # Считаем частоты
-    community_counts = Counter(all_communities)
-
-    # Топ-N самых популярных
-    top_communities = community_counts.most_common(top_n)
-
-    # most_common(top_n) - метод Counter, который возвращает: список кортежей (сообщество, количество) отсортированный по убыванию частоты
+    # возвращает список кортежей (сообщество, количество), отсортированный по убыванию частоты —
+    # как Counter.most_common(top_n)
 
     return top_communities
-
-
-
@@ -0,0 +1,269 @@
+# data_loader.py
+# -------------------------------------------------
+# Единый слой загрузки данных для всех страниц дашборда.
+#
+# Реестр датасетов (DatasetRegistry):
+#   - discover     : ищет известные файлы (профили, рёбра user->community, тематики) в папках проекта
+#   - fingerprint  : путь + размер + mtime (файл) или blake2b содержимого (загрузка через file_uploader)
+#   - parse once   : CSV разбирается один раз на отпечаток; дальше — тот же объект DataFrame из памяти
+#   - disk cache   : разобранная таблица сохраняется в Parquet во временной папке —
+#                    после перезапуска приложения CSV не разбирается заново
+#
+# Реестр — один на процесс (get_registry()): переключение страниц и rerun не перечитывают файлы.
+# Возвращаемые DataFrame общие для всех страниц — их нельзя менять на месте (делайте .copy()).
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from e import normalize_topics_df
+
+APP_DIR = Path(__file__).resolve().parent.parent  # vk_dasboard
+DATASET_CACHE_DIR = Path(tempfile.gettempdir()) / "vk_dashboard_datasets"
+
+DATASET_KINDS = ("profiles", "edges", "topics")
+
+# имена файлов по умолчанию (первый найденный — датасет по умолчанию)
+DEFAULT_FILES: Dict[str, List[str]] = {
+    "profiles": ["vk_users_10000_positive_realistic.csv", "vk_users_10000.csv"],
+    "edges": ["users_communities_edges.csv"],
+    "topics": ["community_topics.csv"],
+}
+
+# где искать: рабочая папка, папка приложения и её data/, datasets/, modules/, родительская папка
+DEFAULT_SEARCH_DIRS = [
+    Path("."),
+    APP_DIR,
+    APP_DIR / "data",
+    APP_DIR / "datasets",
+    APP_DIR / "modules",
+    APP_DIR.parent,
+]
+
+
+def _read_profiles(buf) -> pd.DataFrame:
+    return pd.read_csv(buf, encoding="utf-8-sig")
+
+
+def _read_edges(buf) -> pd.DataFrame:
+    return pd.read_csv(buf, sep=";", encoding="utf-8-sig", dtype=str)
+
+
+def _read_topics(buf) -> pd.DataFrame:
+    return normalize_topics_df(pd.read_csv(buf, sep=";", encoding="utf-8-sig", dtype=str))
+
+
+PARSERS: Dict[str, Callable[..., pd.DataFrame]] = {
+    "profiles": _read_profiles,
+    "edges": _read_edges,
+    "topics": _read_topics,
+}
+
+
+@dataclass(frozen=True)
+class DatasetSource:
+    """
+    kind        : profiles / edges / topics
+    fingerprint : ключ кэша (меняется при изменении файла)
+    label       : что показать пользователю (путь или имя загруженного файла)
+    path        : путь к файлу (None — загрузка из памяти)
+    """
+    kind: str
+    fingerprint: str
+    label: str
+    path: Optional[Path] = None
+
+
+def file_fingerprint(path: Path) -> str:
+    st = path.stat()
+    return f"{path.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def bytes_fingerprint(raw: bytes) -> str:
+    return "upload:" + hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _check_kind(kind: str):
+    if kind not in DATASET_KINDS:
+        raise ValueError(f"Неизвестный тип датасета {kind!r}. Доступно: {DATASET_KINDS}")
+
+
+class DatasetRegistry:
+    """
+    Реестр датасетов: поиск файлов, отпечатки и кэш разобранных таблиц (память + Parquet на диске).
+    Потокобезопасен: одновременные сессии Streamlit разбирают один файл один раз.
+    Разбор идёт под замком своего ключа — общий замок держится только на словарях,
+    поэтому разные датасеты грузятся параллельно.
+    """
+
+    def __init__(
+        self,
+        search_dirs: Optional[List[Path]] = None,
+        cache_dir: Optional[str | Path] = DATASET_CACHE_DIR,
+        max_items: int = 16,
+    ):
+        self.search_dirs = [Path(d) for d in (search_dirs or DEFAULT_SEARCH_DIRS)]
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_items = max_items
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._uploads: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "parsed": 0}
+
+    # ---------------------------
+    # Поиск и отпечатки
+    # ---------------------------
+    def discover(self) -> Dict[str, List[DatasetSource]]:
+        """Все найденные файлы по типам (без дублей одного и того же файла)."""
+        found: Dict[str, List[DatasetSource]] = {}
+        for kind, names in DEFAULT_FILES.items():
+            seen = set()
+            found[kind] = []
+            for name in names:
+                for d in self.search_dirs:
+                    p = d / name
+                    if p.is_file() and p.resolve() not in seen:
+                        seen.add(p.resolve())
+                        found[kind].append(self.source_for_path(kind, p))
+        return found
+
+    def find(self, kind: str) -> Optional[DatasetSource]:
+        """Датасет по умолчанию для kind (первый найденный) или None."""
+        _check_kind(kind)
+        for name in DEFAULT_FILES[kind]:
+            for d in self.search_dirs:
+                p = d / name
+                if p.is_file():
+                    return self.source_for_path(kind, p)
+        return None
+
+    def source_for_path(self, kind: str, path: str | Path) -> DatasetSource:
+        _check_kind(kind)
+        path = Path(path)
+        return DatasetSource(kind=kind, fingerprint=file_fingerprint(path), label=path.as_posix(), path=path)
+
+    def source_for_upload(self, kind: str, raw: bytes, name: str = "upload") -> DatasetSource:
+        """Источник из загруженных байтов (file_uploader); сами байты хранятся до разбора."""
+        _check_kind(kind)
+        fp = bytes_fingerprint(raw)
+        with self._lock:
+            if self._key(kind, fp) not in self._frames:
+                self._uploads[fp] = raw
+        return DatasetSource(kind=kind, fingerprint=fp, label=name)
+
+    # ---------------------------
+    # Загрузка
+    # ---------------------------
+    @staticmethod
+    def _key(kind: str, fingerprint: str) -> str:
+        return f"{kind}|{fingerprint}"
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / (hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".parquet")
+
+    def _read_disk(self, key: str) -> Optional[pd.DataFrame]:
+        p = self._disk_path(key)
+        if p is None or not p.exists():
+            return None
+        try:
+            return pd.read_parquet(p)
+        except Exception:
+            return None  # битый/несовместимый кэш — просто разбираем CSV заново
+
+    def _write_disk(self, key: str, df: pd.DataFrame):
+        p = self._disk_path(key)
+        if p is None:
+            return
+        try:
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_suffix(".parquet.part")
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, p)
+        except Exception:
+            pass  # кэш на диске — только ускорение
+
+    def _cached(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self.stats["memory_hits"] += 1
+            return df
+
+    def load(self, source: DatasetSource) -> pd.DataFrame:
+        """DataFrame датасета: память → Parquet-кэш → разбор CSV (один раз на отпечаток)."""
+        key = self._key(source.kind, source.fingerprint)
+        df = self._cached(key)
+        if df is not None:
+            return df
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # пока ждали замок, тот же файл мог разобрать другой поток
+            df = self._cached(key)
+            if df is not None:
+                return df
+
+            df = self._read_disk(key)
+            hit = "disk_hits"
+            if df is None:
+                hit = "parsed"
+                if source.path is not None:
+                    df = PARSERS[source.kind](source.path)
+                else:
+                    with self._lock:
+                        raw = self._uploads.get(source.fingerprint)
+                    if raw is None:
+                        raise KeyError(f"Данные загрузки {source.label} больше недоступны — загрузите файл снова")
+                    df = PARSERS[source.kind](BytesIO(raw))
+                self._write_disk(key, df)
+
+            with self._lock:
+                self.stats[hit] += 1
+                self._uploads.pop(source.fingerprint, None)
+                self._frames[key] = df
+                while len(self._frames) > self.max_items:
+                    self._frames.pop(next(iter(self._frames)))
+                self._key_locks.pop(key, None)
+            return df
+
+    def load_default(self, kind: str) -> Optional[pd.DataFrame]:
+        source = self.find(kind)
+        return None if source is None else self.load(source)
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._frames.clear()
+            self._uploads.clear()
+            if disk and self.cache_dir is not None and self.cache_dir.exists():
+                for p in self.cache_dir.glob("*.parquet"):
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+
+
+_REGISTRY: Optional[DatasetRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> DatasetRegistry:
+    """Общий реестр процесса: одни и те же DataFrame для всех страниц и сессий."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = DatasetRegistry()
+        return _REGISTRY
@@ -0,0 +1,567 @@
+# disk_graph.py
+# -------------------------------------------------
+# Граф схожести на диске — для графов, которые не помещаются в память как nx.Graph
+# (dict-of-dicts: сотни байт на ребро; 1M пользователей × 50 соседей — десятки ГБ).
+#
+# Формат — папка с .npy файлами, открываются через np.load(mmap_mode="r"):
+#   indptr.npy   int64   (n + 1)     симметричная CSR (каждое ребро — в обеих строках)
+#   indices.npy  int32   (nnz)       соседи строки, по возрастанию
+#   weights.npy  float32 (nnz)       схожесть
+#   node_ids.npy str     (n)         user_id строки
+#   id_order.npy int64   (n)         argsort(node_ids) — поиск id через searchsorted, без dict
+#   meta.json                        n_nodes, n_edges, threshold, ...
+#
+# Сборка прямо из kNN (write_disk_graph_from_knn) — по блокам строк, без nx и без COO в памяти:
+#   ребро i–j из списка i, если j не видит i в своём списке (иначе его запишет j) — дублей нет,
+#   вес — максимум из двух направлений (как knn_to_adjacency).
+#
+# Работает прямо на memmap, по блокам строк:
+#   степени / PageRank / компоненты / плотность → GraphMetrics (без betweenness)
+#   induced_graph(labels) / modularity(labels) / louvain(blocks) — Louvain на графе блоков;
+#   coarse_blocks(previous) — блоки по умолчанию: компоненты графа «сильнейший сосед» (один шаг
+#   огрубления, как первый проход Louvain), разрезанные по прошлому разбиению
+#   community_metrics(labels) — метрики скрытых сообществ (как e._community_subgraph_metrics)
+#   adjacency() → ego_network.extract_ego_network(source="graph")
+#   export_edges() → CSV / Parquet (source;target;weight)
+#   to_networkx(nodes) — только для небольших подграфов (отрисовка)
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components as sparse_components
+
+from graph_analytics import GraphMetrics
+
+DISK_GRAPH_VERSION = 1
+EDGE_EXPORT_FORMATS = ("csv", "parquet")
+MAX_NX_NODES = 20_000
+_FILES = ("indptr", "indices", "weights", "node_ids", "id_order")
+
+
+def _row_blocks(n: int, chunk_rows: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, n, chunk_rows):
+        yield start, min(start + chunk_rows, n)
+
+
+# ---------------------------
+# Сборка
+# ---------------------------
+def _knn_block_edges(
+    distances: np.ndarray, indices: np.ndarray, start: int, stop: int, threshold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Рёбра, которые пишет блок строк [start, stop): (rows, cols, w, mirror).
+    mirror — писать ли и обратное направление (j не видит i со схожестью >= threshold).
+    """
+    k = indices.shape[1] - 1
+    idx = np.asarray(indices[start:stop, 1:], dtype=np.int64)
+    sim = 1.0 - np.asarray(distances[start:stop, 1:], dtype=np.float64)
+    rows = np.repeat(np.arange(start, stop), k)
+    cols, sims = idx.ravel(), sim.ravel()
+    keep = (sims >= threshold) & (cols >= 0) & (cols != rows)
+    rows, cols, sims = rows[keep], cols[keep], sims[keep]
+
+    # есть ли i в списке j (со схожестью выше порога) — и с каким весом
+    eq = np.asarray(indices[cols, 1:]) == rows[:, None]
+    pos = eq.argmax(axis=1)
+    back_sim = 1.0 - np.asarray(distances[cols, pos + 1], dtype=np.float64)
+    seen = eq[np.arange(len(pos)), pos] & (back_sim >= threshold)
+    w = np.where(seen, np.maximum(sims, back_sim), sims)
+    return rows, cols, w.astype(np.float32), ~seen
+
+
+def _emit(rows, cols, w, mirror):
+    """Направленные записи блока: (i→j) всегда, (j→i) — если j не запишет его сам."""
+    return (
+        np.concatenate([rows, cols[mirror]]),
+        np.concatenate([cols, rows[mirror]]),
+        np.concatenate([w, w[mirror]]),
+    )
+
+
+def _write_meta(directory: Path, meta: dict):
+    tmp = directory / "meta.json.part"
+    tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, directory / "meta.json")
+
+
+def _write_ids(directory: Path, node_ids: Sequence[str]):
+    ids = np.asarray(node_ids, dtype=str)
+    np.save(directory / "node_ids.npy", ids)
+    np.save(directory / "id_order.npy", np.argsort(ids, kind="stable"))
+
+
+def _sort_rows(directory: Path, n: int, chunk_rows: int):
+    """Соседи каждой строки — по возрастанию (поблочно, на месте в memmap)."""
+    indptr = np.load(directory / "indptr.npy", mmap_mode="r")
+    indices = np.load(directory / "indices.npy", mmap_mode="r+")
+    weights = np.load(directory / "weights.npy", mmap_mode="r+")
+    for start, stop in _row_blocks(n, chunk_rows):
+        a, b = int(indptr[start]), int(indptr[stop])
+        if a == b:
+            continue
+        local = np.repeat(np.arange(stop - start, dtype=np.int64), np.diff(indptr[start:stop + 1]))
+        order = np.argsort(local * n + indices[a:b])  # ключи уникальны: (строка, сосед)
+        indices[a:b] = indices[a:b][order]
+        weights[a:b] = weights[a:b][order]
+    indices.flush()
+    weights.flush()
+
+
+def write_disk_graph_from_knn(
+    distances: np.ndarray,
+    indices: np.ndarray,
+    node_ids: Sequence[str],
+    directory: str | Path,
+    threshold: float = 0.20,
+    chunk_rows: int = 50_000,
+) -> DiskGraph:
+    """
+    Граф схожести из результатов compute_knn() сразу на диск (без nx.Graph).
+    Два прохода по блокам строк: степени → раскладка рёбер по строкам; затем сортировка соседей.
+    distances / indices могут быть memmap.
+    """
+    n = indices.shape[0]
+    if len(node_ids) != n:
+        raise ValueError(f"node_ids: {len(node_ids)} id на {n} строк kNN.")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    deg = np.zeros(n, dtype=np.int64)
+    for start, stop in _row_blocks(n, chunk_rows):
+        r, c, _ = _emit(*_knn_block_edges(distances, indices, start, stop, threshold))
+        deg += np.bincount(r, minlength=n)
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(deg, out=indptr[1:])
+    nnz = int(indptr[-1])
+    np.save(directory / "indptr.npy", indptr)
+    col_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+    out_idx = np.lib.format.open_memmap(directory / "indices.npy", mode="w+", dtype=col_dtype, shape=(nnz,))
+    out_w = np.lib.format.open_memmap(directory / "weights.npy", mode="w+", dtype=np.float32, shape=(nnz,))
+
+    cursor = indptr[:-1].copy()
+    for start, stop in _row_blocks(n, chunk_rows):
+        r, c, w = _emit(*_knn_block_edges(distances, indices, start, stop, threshold))
+        order = np.argsort(r, kind="stable")
+        r, c, w = r[order], c[order], w[order]
+        first = np.searchsorted(r, r)  # первая позиция строки внутри блока
+        pos = cursor[r] + (np.arange(len(r)) - first)
+        out_idx[pos] = c
+        out_w[pos] = w
+        cursor += np.bincount(r, minlength=n)
+    out_idx.flush()
+    out_w.flush()
+    del out_idx, out_w
+
+    _sort_rows(directory, n, chunk_rows)
+    _write_ids(directory, node_ids)
+    _write_meta(directory, {
+        "version": DISK_GRAPH_VERSION,
+        "n_nodes": int(n),
+        "n_edges": nnz // 2,
+        "nnz": nnz,
+        "threshold": float(threshold),
+        "k_neighbors": int(indices.shape[1] - 1),
+    })
+    return DiskGraph.open(directory)
+
+
+def write_disk_graph(A: csr_matrix, node_ids: Sequence[str], directory: str | Path, **meta) -> DiskGraph:
+    """Готовая симметричная матрица смежности (в памяти) → формат на диске."""
+    A = csr_matrix(A, dtype=np.float32)
+    A.setdiag(0)
+    A.eliminate_zeros()
+    A.sort_indices()
+    if len(node_ids) != A.shape[0]:
+        raise ValueError(f"node_ids: {len(node_ids)} id на {A.shape[0]} строк матрицы.")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    col_dtype = np.int32 if A.shape[0] < np.iinfo(np.int32).max else np.int64
+    np.save(directory / "indptr.npy", A.indptr.astype(np.int64))
+    np.save(directory / "indices.npy", A.indices.astype(col_dtype))
+    np.save(directory / "weights.npy", A.data.astype(np.float32))
+    _write_ids(directory, node_ids)
+    _write_meta(directory, {
+        "version": DISK_GRAPH_VERSION, "n_nodes": int(A.shape[0]), "n_edges": int(A.nnz // 2), "nnz": int(A.nnz),
+        **meta,
+    })
+    return DiskGraph.open(directory)
+
+
+def write_disk_graph_from_networkx(G: nx.Graph, directory: str | Path, weight: str = "weight") -> DiskGraph:
+    nodes = list(G.nodes())
+    A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=weight, format="csr", dtype=np.float32)
+    return write_disk_graph(csr_matrix(A), [str(u) for u in nodes], directory)
+
+
+# ---------------------------
+# Граф на диске
+# ---------------------------
+class DiskGraph:
+    """
+    Неориентированный взвешенный граф поверх memmap CSR.
+    Всё, что проходит по рёбрам, идёт блоками строк (chunk_rows) — в памяти O(n) векторов, а не O(nnz).
+    """
+
+    def __init__(self, directory: Path, arrays: Dict[str, np.ndarray], meta: dict):
+        self.directory = directory
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.weights = arrays["weights"]
+        self.node_ids = arrays["node_ids"]
+        self._id_order = arrays["id_order"]
+        self.meta = meta
+
+    @classmethod
+    def open(cls, directory: str | Path) -> DiskGraph:
+        directory = Path(directory)
+        if not (directory / "meta.json").exists():
+            raise FileNotFoundError(f"В {directory} нет графа (meta.json не найден)")
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != DISK_GRAPH_VERSION:
+            raise ValueError(f"Неподдерживаемая версия графа на диске: {meta.get('version')}")
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in _FILES}
+        return cls(directory, arrays, meta)
+
+    # ---------------------------
+    # Основное
+    # ---------------------------
+    @property
+    def n_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices) // 2
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(a.nbytes for a in (self.indptr, self.indices, self.weights, self.node_ids, self._id_order)))
+
+    def adjacency(self) -> csr_matrix:
+        """csr_matrix поверх memmap (без копии) — для срезов строк A[rows] и A @ x."""
+        A = csr_matrix((self.weights, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes), copy=False)
+        A.has_sorted_indices = True
+        return A
+
+    def positions(self, user_ids: Sequence) -> np.ndarray:
+        """Номера строк для user_id (searchsorted по отсортированным id); неизвестный id — KeyError."""
+        ids = np.asarray([str(u).strip() for u in user_ids], dtype=self.node_ids.dtype)
+        sorted_ids = self.node_ids[self._id_order]
+        at = np.searchsorted(sorted_ids, ids)
+        at = np.minimum(at, self.n_nodes - 1)
+        found = sorted_ids[at] == ids
+        if not found.all():
+            raise KeyError(f"Пользователь {ids[~found][0]} не найден")
+        return np.asarray(self._id_order[at], dtype=np.int64)
+
+    def neighbors(self, user_id) -> pd.DataFrame:
+        i = int(self.positions([user_id])[0])
+        a, b = int(self.indptr[i]), int(self.indptr[i + 1])
+        return pd.DataFrame({
+            "user_id": self.node_ids[self.indices[a:b]].astype(object),
+            "weight": np.asarray(self.weights[a:b], dtype=np.float64),
+        }).sort_values("weight", ascending=False, ignore_index=True)
+
+    def iter_blocks(self, chunk_rows: int = 200_000) -> Iterator[Tuple[int, int, csr_matrix]]:
+        """(start, stop, A[start:stop]) — блоки строк, каждый читается с диска один раз."""
+        A = self.adjacency()
+        for start, stop in _row_blocks(self.n_nodes, chunk_rows):
+            yield start, stop, A[start:stop]
+
+    # ---------------------------
+    # Метрики
+    # ---------------------------
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr).astype(np.int64)
+
+    def strength(self, chunk_rows: int = 200_000) -> np.ndarray:
+        out = np.zeros(self.n_nodes)
+        for start, stop, block in self.iter_blocks(chunk_rows):
+            out[start:stop] = np.asarray(block.sum(axis=1)).ravel()
+        return out
+
+    def density(self) -> float:
+        n = self.n_nodes
+        return float(len(self.indices) / (n * (n - 1))) if n > 1 else 0.0
+
+    def pagerank(
+        self, alpha: float = 0.85, tol: float = 1.0e-6, max_iter: int = 100, chunk_rows: int = 200_000
+    ) -> np.ndarray:
+        """Как graph_analytics.pagerank; A симметрична, поэтому P.T @ x = A @ (x / strength) по блокам."""
+        n = self.n_nodes
+        if n == 0:
+            return np.zeros(0)
+        out_w = self.strength(chunk_rows)
+        dangling = out_w == 0
+        inv = np.divide(1.0, out_w, out=np.zeros(n), where=~dangling)
+
+        x = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            x_prev = x
+            y = x_prev * inv
+            x = np.empty(n)
+            for start, stop, block in self.iter_blocks(chunk_rows):
+                x[start:stop] = block @ y
+            x = alpha * (x + x_prev[dangling].sum() / n) + (1.0 - alpha) / n
+            if np.abs(x - x_prev).sum() < n * tol:
+                return x
+        raise nx.PowerIterationFailedConvergence(max_iter)
+
+    def connected_components(self, chunk_rows: int = 200_000) -> Tuple[int, np.ndarray, np.ndarray]:
+        """
+        Компоненты распространением минимальной метки по блокам строк (без загрузки графа целиком).
+        Итераций ~ диаметр графа (у kNN-графов — единицы-десятки).
+        """
+        n = self.n_nodes
+        labels = np.arange(n, dtype=np.int64)
+        while True:
+            changed = False
+            for start, stop in _row_blocks(n, chunk_rows):
+                a, b = int(self.indptr[start]), int(self.indptr[stop])
+                if a == b:
+                    continue
+                counts = np.diff(self.indptr[start:stop + 1])
+                nb = labels[np.asarray(self.indices[a:b])]
+                nonempty = np.flatnonzero(counts > 0)
+                offsets = (np.asarray(self.indptr[start:stop])[nonempty] - a)
+                best = np.minimum.reduceat(nb, offsets)
+                rows = start + nonempty
+                upd = best < labels[rows]
+                if upd.any():
+                    labels[rows[upd]] = best[upd]
+                    changed = True
+            if not changed:
+                break
+            labels = labels[labels]  # сжатие путей: метка метки
+        roots, comp = np.unique(labels, return_inverse=True)
+        return len(roots), comp.astype(np.int64), np.bincount(comp, minlength=len(roots))
+
+    def metrics(self, chunk_rows: int = 200_000) -> GraphMetrics:
+        """GraphMetrics как у compute_graph_metrics(..., with_betweenness=False), по блокам с диска."""
+        deg = self.degree()
+        n = self.n_nodes
+        n_comp, labels, sizes = self.connected_components(chunk_rows)
+        table = pd.DataFrame(
+            {
+                "degree": deg,
+                "degree_centrality": deg / (n - 1) if n > 1 else np.ones(n),
+                "pagerank": self.pagerank(chunk_rows=chunk_rows),
+                "component": labels,
+            },
+            index=pd.Index(self.node_ids.astype(object), name="user_id"),
+        )
+        return GraphMetrics(
+            table=table,
+            n_nodes=n,
+            n_edges=self.n_edges,
+            density=self.density(),
+            n_components=n_comp,
+            component_sizes=sizes,
+        )
+
+    # ---------------------------
+    # Louvain: граф блоков
+    # ---------------------------
+    def _labels_array(self, labels) -> Tuple[np.ndarray, np.ndarray]:
+        """labels: массив по строкам или dict user_id -> метка. Возвращает (коды 0..B-1, исходные метки)."""
+        if isinstance(labels, dict):
+            arr = np.asarray([labels.get(u, -1) for u in self.node_ids.tolist()], dtype=np.int64)
+        else:
+            arr = np.asarray(labels, dtype=np.int64)
+        if len(arr) != self.n_nodes or (arr < 0).any():
+            raise ValueError("Метки нужны для всех узлов графа.")
+        uniq, codes = np.unique(arr, return_inverse=True)
+        return codes.astype(np.int64), uniq
+
+    def strongest_neighbor(self, chunk_rows: int = 200_000) -> np.ndarray:
+        """Сосед с наибольшим весом для каждой строки (при равенстве — меньший номер); без соседей — сама строка."""
+        best = np.arange(self.n_nodes, dtype=np.int64)
+        for start, stop, block in self.iter_blocks(chunk_rows):
+            counts = np.diff(block.indptr)
+            nonempty = np.flatnonzero(counts > 0)
+            if len(nonempty) == 0:
+                continue
+            row_max = np.full(stop - start, -np.inf)
+            row_max[nonempty] = np.maximum.reduceat(np.asarray(block.data), block.indptr[:-1][nonempty])
+            rows = np.repeat(np.arange(stop - start), counts)
+            hits = np.flatnonzero(np.asarray(block.data) == row_max[rows])
+            # indices строки отсортированы — первое совпадение и есть меньший номер
+            first_rows, first = np.unique(rows[hits], return_index=True)
+            best[start + first_rows] = np.asarray(block.indices)[hits[first]]
+        return best
+
+    def coarse_blocks(self, previous: Optional[Dict[str, int]] = None, chunk_rows: int = 200_000) -> np.ndarray:
+        """
+        Блоки для louvain(): компоненты графа «каждый узел — к сильнейшему соседу» (O(n) рёбер в памяти).
+        previous — прошлое разбиение (user_id -> метка): блок не пересекает два прошлых сообщества,
+        новые пользователи — в блоках без прошлой метки.
+        """
+        n = self.n_nodes
+        best = self.strongest_neighbor(chunk_rows)
+        link = csr_matrix((np.ones(n), (np.arange(n), best)), shape=(n, n))
+        _, blocks = sparse_components(link, directed=False)
+        if not previous:
+            return blocks.astype(np.int64)
+        prev = np.asarray([previous.get(u, -1) for u in self.node_ids.tolist()], dtype=np.int64)
+        _, codes = np.unique(np.stack([prev, blocks.astype(np.int64)]), axis=1, return_inverse=True)
+        return codes.ravel().astype(np.int64)
+
+    def community_metrics(self, labels, chunk_rows: int = 200_000) -> Dict[int, dict]:
+        """
+        Метрики каждого сообщества по блокам строк — те же ключи и формулы, что e._community_subgraph_metrics:
+        size, edges, density, avg_internal_weighted_degree, significance_score.
+        """
+        codes, uniq = self._labels_array(labels)
+        k = len(uniq)
+        size = np.bincount(codes, minlength=k).astype(np.float64)
+        inner = np.zeros(k)
+        edges = np.zeros(k)
+        for start, stop, block in self.iter_blocks(chunk_rows):
+            rows = np.repeat(np.arange(start, stop), np.diff(block.indptr))
+            same = codes[rows] == codes[np.asarray(block.indices)]
+            inner += np.bincount(codes[rows][same], weights=np.asarray(block.data, dtype=np.float64)[same], minlength=k)
+            edges += np.bincount(codes[rows][same], minlength=k)
+        edges /= 2.0  # каждое ребро — в обеих строках
+        max_edges = np.where(size > 1, size * (size - 1) / 2.0, 1.0)
+        density = edges / max_edges
+        avg_wdeg = inner / size  # сумма взвешенных степеней внутри = 2·вес рёбер = inner
+        score = density * avg_wdeg * np.log(size + 1)
+        return {
+            int(c): {
+                "size": int(size[i]),
+                "edges": int(edges[i]),
+                "density": float(density[i]),
+                "avg_internal_weighted_degree": float(avg_wdeg[i]),
+                "significance_score": float(score[i]),
+            }
+            for i, c in enumerate(uniq.tolist())
+        }
+
+    def block_matrix(self, codes: np.ndarray, n_blocks: int, chunk_rows: int = 200_000) -> csr_matrix:
+        """M = B.T @ A @ B по блокам строк: сумма весов между блоками (диагональ — внутри, дважды)."""
+        B = csr_matrix((np.ones(self.n_nodes), (np.arange(self.n_nodes), codes)), shape=(self.n_nodes, n_blocks))
+        M = csr_matrix((n_blocks, n_blocks))
+        for start, stop, block in self.iter_blocks(chunk_rows):
+            M = M + B[start:stop].T @ (block @ B)
+        return csr_matrix(M)
+
+    def induced_graph(self, labels, chunk_rows: int = 200_000) -> nx.Graph:
+        """nx-граф блоков (как community_louvain.induced_graph) — узлы 0..B-1 в порядке возрастания меток."""
+        from louvain_update import block_graph
+
+        codes, uniq = self._labels_array(labels)
+        M = self.block_matrix(codes, len(uniq), chunk_rows)
+        return block_graph(M, np.zeros(len(uniq)), len(uniq))
+
+    def modularity(self, labels, chunk_rows: int = 200_000) -> float:
+        """Модулярность разбиения (как community_louvain.modularity), без графа в памяти."""
+        codes, uniq = self._labels_array(labels)
+        M = self.block_matrix(codes, len(uniq), chunk_rows)
+        two_m = float(M.sum())
+        if two_m == 0:
+            return 0.0
+        tot = np.asarray(M.sum(axis=1)).ravel()
+        return float(M.diagonal().sum() / two_m - ((tot / two_m) ** 2).sum())
+
+    def louvain(
+        self, blocks=None, random_state: Optional[int] = 42, resolution: float = 1.0, chunk_rows: int = 200_000
+    ) -> Tuple[np.ndarray, float]:
+        """
+        Louvain на графе блоков: узлы одного блока двигаются вместе (blocks — coarse_blocks(),
+        прошлое разбиение и т.п.; None — coarse_blocks()). Граф блоков помещается в память, даже если исходный — нет.
+        Возвращает (метка на строку, модулярность на полном графе).
+        """
+        from community import community_louvain
+
+        if blocks is None:
+            blocks = self.coarse_blocks(chunk_rows=chunk_rows)
+        codes, uniq = self._labels_array(blocks)
+        H = self.induced_graph(codes, chunk_rows)
+        if H.number_of_edges() == 0:
+            labels = codes
+        else:
+            part = community_louvain.best_partition(
+                H, partition={b: b for b in range(len(uniq))}, random_state=random_state, resolution=resolution,
+            )
+            labels = np.asarray([part[b] for b in range(len(uniq))], dtype=np.int64)[codes]
+        return labels, self.modularity(labels, chunk_rows=chunk_rows)
+
+    # ---------------------------
+    # Подграфы и экспорт
+    # ---------------------------
+    def to_networkx(self, user_ids: Optional[Sequence] = None, max_nodes: Optional[int] = MAX_NX_NODES) -> nx.Graph:
+        """
+        nx.Graph индуцированного подграфа (для отрисовки). user_ids=None — весь граф;
+        больше max_nodes узлов — ValueError (nx на таком графе не поместится / не отрисуется).
+        """
+        rows = np.arange(self.n_nodes) if user_ids is None else np.unique(self.positions(user_ids))
+        if max_nodes is not None and len(rows) > max_nodes:
+            raise ValueError(
+                f"Подграф из {len(rows):,} узлов больше max_nodes={max_nodes:,}. "
+                "Для больших графов используйте методы DiskGraph (metrics, induced_graph, export_edges)."
+            )
+        sub = self.adjacency()[rows][:, rows].tocoo()
+        upper = sub.row < sub.col
+        ids = self.node_ids[rows].tolist()
+        G = nx.Graph()
+        G.add_nodes_from(ids, type="user")
+        G.add_weighted_edges_from(
+            (ids[i], ids[j], float(w)) for i, j, w in zip(sub.row[upper], sub.col[upper], sub.data[upper])
+        )
+        return G
+
+    def iter_edges(self, chunk_rows: int = 200_000) -> Iterator[pd.DataFrame]:
+        """Рёбра source < target по блокам строк: DataFrame source, target, weight."""
+        for start, stop, block in self.iter_blocks(chunk_rows):
+            coo = block.tocoo()
+            rows = coo.row.astype(np.int64) + start
+            upper = rows < coo.col
+            yield pd.DataFrame({
+                "source": self.node_ids[rows[upper]],
+                "target": self.node_ids[coo.col[upper]],
+                "weight": coo.data[upper],
+            })
+
+    def export_edges(self, path: str | Path, fmt: str = "csv", chunk_rows: int = 200_000) -> Path:
+        """Список рёбер в CSV (utf-8-sig, ';') или Parquet — потоково, по блокам строк."""
+        if fmt not in EDGE_EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат {fmt!r}. Доступно: {EDGE_EXPORT_FORMATS}")
+        import pyarrow as pa
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".part")
+        if fmt == "csv":
+            import pyarrow.csv as pa_csv
+
+            opts = pa_csv.WriteOptions(include_header=False, delimiter=";", quoting_style="none")
+            with open(tmp, "wb") as f:
+                f.write("source;target;weight\n".encode("utf-8-sig"))
+                for chunk in self.iter_edges(chunk_rows):
+                    pa_csv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), f, opts)
+        else:
+            import pyarrow.parquet as pq
+
+            writer = None
+            try:
+                for chunk in self.iter_edges(chunk_rows):
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        os.replace(tmp, path)
+        return path
@@ -0,0 +1,253 @@
+# duplicate_users.py
+# -------------------------------------------------
+# Пользователи с одинаковым набором подписок (боты, клоны, свежие регистрации):
+#   1) хэш строки csr — сумма и XOR случайных 64-битных весов её столбцов (cumsum по indices, без циклов)
+#   2) группы по (степень, хэш1, хэш2) + точная сверка indices с представителем (коллизии не склеиваются)
+#   3) kNN и граф — только по представителям (по одному на уникальный набор)
+#   4) обратно — двумя способами:
+#        "clique"    : все пользователи; дубликаты группы — клика с весом 1.0 (большие группы — звезда
+#                      вокруг представителя), внешние рёбра — между представителями
+#        "supernode" : узел на группу (атрибут multiplicity), петля m(m-1)/2, ребро w·m_a·m_b —
+#                      та же модулярность, что у графа, где дубликаты взаимозаменяемы; Louvain на нём,
+#                      разбиение разворачивается на всех участников группы
+#
+# Пустые строки (нет подписок) никогда не склеиваются: схожесть у них не определена.
+# Сводка по группам дубликатов — сама по себе признак бот-ферм.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from build_grap_similarity import build_graph_from_knn, compute_knn
+from create_ug_matrix import UserCommunityData
+
+DEDUP_MODES = ("clique", "supernode")
+_HASH_SEED = 20240611
+
+
+def _binary_rows(X: csr_matrix) -> csr_matrix:
+    """0/1 копия с отсортированными indices (дубли строк edge-list не влияют на набор)."""
+    B = csr_matrix(X, dtype=np.int8, copy=True)
+    B.sum_duplicates()
+    B.data[:] = 1
+    B.sort_indices()
+    return B
+
+
+def row_hashes(X: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Два независимых 64-битных хэша множества столбцов каждой строки.
+    Сумма по модулю 2^64 — через разность cumsum на границах indptr; XOR — через reduceat.
+    """
+    rng = np.random.default_rng(_HASH_SEED)
+    w1 = rng.integers(0, np.iinfo(np.uint64).max, size=X.shape[1], dtype=np.uint64, endpoint=True)
+    w2 = rng.integers(0, np.iinfo(np.uint64).max, size=X.shape[1], dtype=np.uint64, endpoint=True)
+
+    v1 = w1[X.indices]
+    cs = np.zeros(len(v1) + 1, dtype=np.uint64)
+    np.cumsum(v1, dtype=np.uint64, out=cs[1:])
+    h1 = cs[X.indptr[1:]] - cs[X.indptr[:-1]]  # переполнение uint64 = арифметика по модулю 2^64
+
+    h2 = np.zeros(X.shape[0], dtype=np.uint64)
+    nonempty = np.diff(X.indptr) > 0
+    if nonempty.any():
+        h2[nonempty] = np.bitwise_xor.reduceat(w2[X.indices], X.indptr[:-1][nonempty])
+    return h1, h2
+
+
+@dataclass(frozen=True)
+class DuplicateGroups:
+    """
+    group_of       : номер группы (уникального набора) для каждой строки исходной матрицы
+    rep_rows       : строка-представитель каждой группы (первая по порядку), по возрастанию
+    multiplicity   : размер каждой группы
+    degree         : число сообществ в наборе группы
+    """
+    group_of: np.ndarray
+    rep_rows: np.ndarray
+    multiplicity: np.ndarray
+    degree: np.ndarray
+
+    @property
+    def n_users(self) -> int:
+        return len(self.group_of)
+
+    @property
+    def n_unique(self) -> int:
+        return len(self.rep_rows)
+
+    def summary(self) -> Dict[str, float]:
+        dup = self.multiplicity >= 2
+        return {
+            "users": self.n_users,
+            "unique_sets": self.n_unique,
+            "duplicate_users": int(self.n_users - self.n_unique),
+            "duplicate_groups": int(dup.sum()),
+            "users_in_duplicate_groups": int(self.multiplicity[dup].sum()),
+            "largest_group": int(self.multiplicity.max()) if self.n_unique else 0,
+            "reduction": round(self.n_users / max(self.n_unique, 1), 4),
+        }
+
+    def members(self, group: int) -> np.ndarray:
+        return np.flatnonzero(self.group_of == group)
+
+    def table(self, data: UserCommunityData, min_size: int = 2, sample: int = 10) -> pd.DataFrame:
+        """Группы дубликатов по убыванию размера: group, size, n_communities, user_ids (первые sample)."""
+        groups = np.flatnonzero(self.multiplicity >= min_size)
+        groups = groups[np.argsort(-self.multiplicity[groups], kind="stable")]
+        order = np.argsort(self.group_of, kind="stable")
+        starts = np.searchsorted(self.group_of[order], groups)
+        user_ids = np.asarray(data.user_ids, dtype=object)
+        samples = [
+            ", ".join(user_ids[order[s:s + min(sample, int(m))]])
+            for s, m in zip(starts, self.multiplicity[groups])
+        ]
+        return pd.DataFrame({
+            "group": groups,
+            "size": self.multiplicity[groups],
+            "n_communities": self.degree[groups],
+            "user_ids": samples,
+        })
+
+    def reduce(self, data: UserCommunityData) -> UserCommunityData:
+        """UserCommunityData только из представителей (столбцы те же)."""
+        return data.take_rows(self.rep_rows)
+
+    def expand_partition(self, partition: Dict[str, int], data: UserCommunityData) -> Dict[str, int]:
+        """Разбиение представителей → разбиение всех пользователей (участник группы = метка представителя)."""
+        rep_labels = np.array([partition.get(data.user_ids[r], -1) for r in self.rep_rows], dtype=np.int64)
+        labels = rep_labels[self.group_of]
+        return {u: int(c) for u, c in zip(data.user_ids, labels) if c >= 0}
+
+
+def find_duplicate_rows(data: UserCommunityData) -> DuplicateGroups:
+    """Группы одинаковых строк csr (одинаковых наборов сообществ)."""
+    X = _binary_rows(data.csr)
+    n = X.shape[0]
+    deg = np.diff(X.indptr).astype(np.int64)
+    h1, h2 = row_hashes(X)
+
+    # пустые строки — каждая в своей группе
+    h1 = h1.copy()
+    empty = np.flatnonzero(deg == 0)
+    h1[empty] = np.arange(len(empty), dtype=np.uint64)
+    h2 = h2.copy()
+    h2[empty] = np.iinfo(np.uint64).max
+
+    order = np.lexsort((h2, h1, deg))  # устойчиво: внутри группы — по номеру строки
+    new = np.ones(n, dtype=bool)
+    new[1:] = (deg[order][1:] != deg[order][:-1]) | (h1[order][1:] != h1[order][:-1]) | (h2[order][1:] != h2[order][:-1])
+    gid_sorted = np.cumsum(new) - 1
+    rep = np.empty(n, dtype=np.int64)  # представитель каждой строки
+    rep[order] = order[new][gid_sorted]
+
+    # точная сверка с представителем: строки с коллизией хэша получают свои группы
+    rows = np.flatnonzero(rep != np.arange(n))
+    if len(rows):
+        lens = deg[rows]
+        within = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens)
+        a = X.indices[np.repeat(X.indptr[rows], lens) + within]
+        b = X.indices[np.repeat(X.indptr[rep[rows]], lens) + within]
+        bad = np.unique(np.repeat(rows, lens)[a != b])
+        if len(bad):
+            rep[bad] = bad
+
+    # номера групп — в порядке представителей (первого появления набора)
+    rep_rows, group_of = np.unique(rep, return_inverse=True)
+    multiplicity = np.bincount(group_of, minlength=len(rep_rows))
+    return DuplicateGroups(
+        group_of=group_of.astype(np.int64),
+        rep_rows=rep_rows.astype(np.int64),
+        multiplicity=multiplicity.astype(np.int64),
+        degree=deg[rep_rows],
+    )
+
+
+# ---------------------------
+# Разворачивание графа
+# ---------------------------
+def supernode_graph(G_reduced: nx.Graph, groups: DuplicateGroups, reduced: UserCommunityData) -> nx.Graph:
+    """
+    Граф представителей с весами групп: узел — multiplicity, петля — m(m-1)/2 (клика с весом 1.0),
+    ребро — w·m_a·m_b. Модулярность разбиения здесь = модулярности развёрнутого графа.
+    """
+    m = dict(zip(reduced.user_ids, groups.multiplicity.tolist()))
+    H = nx.Graph()
+    H.add_nodes_from((u, {"type": "user", "multiplicity": m[u]}) for u in reduced.user_ids)
+    H.add_weighted_edges_from(
+        (a, b, float(w) * m[a] * m[b]) for a, b, w in G_reduced.edges(data="weight", default=1.0)
+    )
+    H.add_weighted_edges_from((u, u, k * (k - 1) / 2.0) for u, k in m.items() if k > 1)
+    return H
+
+
+def expand_clique_graph(
+    G_reduced: nx.Graph, groups: DuplicateGroups, data: UserCommunityData, max_clique: int = 100
+) -> nx.Graph:
+    """
+    Граф на всех пользователях: внешние рёбра — между представителями,
+    дубликаты — клика с весом 1.0 (группа больше max_clique — звезда вокруг представителя).
+    """
+    G = G_reduced.copy()
+    G.add_nodes_from(data.user_ids, type="user")
+    user_ids = np.asarray(data.user_ids, dtype=object)
+    order = np.argsort(groups.group_of, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(groups.multiplicity)])
+    for g in np.flatnonzero(groups.multiplicity >= 2):
+        members = user_ids[order[starts[g]:starts[g + 1]]].tolist()
+        if len(members) <= max_clique:
+            G.add_edges_from(
+                ((members[i], members[j]) for i in range(len(members)) for j in range(i + 1, len(members))),
+                weight=1.0,
+            )
+        else:
+            G.add_edges_from(((members[0], v) for v in members[1:]), weight=1.0)
+    return G
+
+
+def build_dedup_similarity_graph(
+    data: UserCommunityData,
+    threshold: float = 0.20,
+    k_neighbors: int = 40,
+    mode: str = "clique",
+    show_progress: bool = False,
+    max_clique: int = 100,
+    **kwargs,
+) -> Tuple[nx.Graph, DuplicateGroups]:
+    """
+    Граф схожести с kNN только по уникальным наборам подписок.
+    mode: "clique" — граф на всех пользователях; "supernode" — граф групп (разбиение потом
+    разворачивается через DuplicateGroups.expand_partition).
+    kwargs: n_jobs, method, chunk_size, executor — см. compute_knn().
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Неизвестный mode={mode!r}. Доступно: {DEDUP_MODES}")
+
+    groups = find_duplicate_rows(data)
+    reduced = groups.reduce(data) if groups.n_unique < groups.n_users else data
+    print(f" Уникальных наборов подписок: {groups.n_unique} из {groups.n_users} пользователей")
+
+    if reduced.csr.shape[0] < 2:
+        G_reduced = nx.Graph()
+        G_reduced.add_nodes_from(reduced.user_ids, type="user")
+    else:
+        distances, indices = compute_knn(
+            reduced,
+            k_neighbors=k_neighbors,
+            n_jobs=kwargs.get("n_jobs", -1),
+            method=kwargs.get("method", "brute"),
+            chunk_size=kwargs.get("chunk_size", 2000),
+            executor=kwargs.get("executor", "threads"),
+        )
+        G_reduced = build_graph_from_knn(reduced, distances, indices, threshold=threshold, show_progress=show_progress)
+
+    if mode == "supernode":
+        return supernode_graph(G_reduced, groups, reduced), groups
+    return expand_clique_graph(G_reduced, groups, data, max_clique=max_clique), groups
@@ -51,18 +51,53 @@ from __future__ import annotations # это просто для анотаций
 
 import math
 from collections import Counter, defaultdict # для работы с коллекцияим
-from typing import Dict, List, Tuple # для анотации типов(удобно)
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple # для анотации типов(удобно)
 
 import networkx as nx #
+import numpy as np
 import plotly.graph_objects as go # для создания графика
 import pandas as pd
 from community import community_louvain  # лувенкий метод
 
+from topic_profile import TopicProfile, build_topic_profile
+
 
 # ---------------------------
 # Загрузка тематик сообществ
 # ---------------------------
 
+def normalize_topics_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Чистим BOM/пробелы в заголовках и проверяем обязательные колонки topics-таблицы."""
+    df = df.copy()
+    df.columns = df.columns.str.replace("\ufeff", "", regex=False).str.strip()
+
+    required = {"community_id", "topic"}
+    if not required.issubset(df.columns):
+        raise ValueError(f"topics CSV должен иметь колонки {required}. Есть: {list(df.columns)}")
+
+    df["community_id"] = df["community_id"].astype(str).str.strip()
+    df["topic"] = df["topic"].astype(str)
+    if "name" in df.columns:
+        df["name"] = df["name"].astype(str)
+    return df
+
+
+def topics_maps_from_df(df: pd.DataFrame) -> tuple[Dict[str, str], Dict[str, str]]:
+    """
+    То же, что load_topics_maps, но из уже загруженной таблицы (без диска).
+    """
+    df = normalize_topics_df(df)
+    topic_map = dict(zip(df["community_id"], df["topic"]))
+
+    if "name" in df.columns:
+        name_map = dict(zip(df["community_id"], df["name"]))
+    else:
+        name_map = {}
+
+    return topic_map, name_map
+
+
 def load_topics_maps(topics_csv_path: str) -> tuple[Dict[str, str], Dict[str, str]]:
     """
     Загружаем community_topics.csv (community_id;topic;name)
@@ -71,20 +106,66 @@ def load_topics_maps(topics_csv_path: str) -> tuple[Dict[str, str], Dict[str, st
       - name_map : community_id -> name (для красоты в hover/панели)
     """
     df = pd.read_csv(topics_csv_path, sep=";", encoding="utf-8-sig", dtype=str)
-    df.columns = df.columns.str.replace("\ufeff", "", regex=False).str.strip()
+    return topics_maps_from_df(df)
 
-    required = {"community_id", "topic"}
-    if not required.issubset(df.columns):
-        raise ValueError(f"topics CSV должен иметь колонки {required}. Есть: {list(df.columns)}")
 
-    topic_map = dict(zip(df["community_id"].astype(str), df["topic"].astype(str)))
+@dataclass(frozen=True)
+class TopicLookup:
+    """
+    Тематики, выровненные по столбцам UserCommunityData (community_ids):
+
+    topic_codes : int32-массив длины n_communities, код тематики или -1 (нет в справочнике)
+    topics      : код -> название тематики
+    names       : массив имён сообществ ("" если нет)
 
+    Позволяет считать тематики векторно: np.bincount(topic_codes[cols]) и т.п.
+    """
+    topic_codes: np.ndarray
+    topics: List[str]
+    names: np.ndarray
+    community_ids: List[str]
+
+    @property
+    def n_topics(self) -> int:
+        return len(self.topics)
+
+    def topic_map(self) -> Dict[str, str]:
+        """community_id -> topic (совместимость со старым API)."""
+        return {
+            cid: self.topics[code]
+            for cid, code in zip(self.community_ids, self.topic_codes.tolist())
+            if code >= 0
+        }
+
+    def name_map(self) -> Dict[str, str]:
+        """community_id -> name (совместимость со старым API)."""
+        return {cid: nm for cid, nm in zip(self.community_ids, self.names.tolist()) if nm}
+
+
+def build_topic_lookup(topics_df: pd.DataFrame, community_ids: List[str]) -> TopicLookup:
+    """
+    Превращает topics-таблицу в целочисленный lookup, выровненный по community_ids
+    (порядок столбцов матрицы user×community).
+    """
+    df = normalize_topics_df(topics_df).drop_duplicates("community_id", keep="last")
+
+    pos = pd.Index(df["community_id"]).get_indexer(pd.Index(community_ids, dtype=object))
+    found = pos >= 0
+
+    codes, uniques = pd.factorize(df["topic"], sort=True)
+    topic_codes = np.full(len(community_ids), -1, dtype=np.int32)
+    topic_codes[found] = codes[pos[found]]
+
+    names = np.full(len(community_ids), "", dtype=object)
     if "name" in df.columns:
-        name_map = dict(zip(df["community_id"].astype(str), df["name"].astype(str)))
-    else:
-        name_map = {}
+        names[found] = df["name"].to_numpy(dtype=object)[pos[found]]
 
-    return topic_map, name_map
+    return TopicLookup(
+        topic_codes=topic_codes,
+        topics=[str(t) for t in uniques],
+        names=names,
+        community_ids=list(community_ids),
+    )
 
 
 # ---------------------------
@@ -98,13 +179,21 @@ def _community_subgraph_metrics(G: nx.Graph, nodes: List[str], weight: str = "we
 
     """
     sub = G.subgraph(nodes) #  создаем подграф графа G, переданного в функцию --> просто метод из библы граф
-    n = sub.number_of_nodes() # возращаем кол-во узлов в графе
-    m = sub.number_of_edges() # возращаем кол-во ребер в графе
+    mult = nx.get_node_attributes(sub, "multiplicity")
+    if mult:
+        # граф групп дубликатов (duplicate_users.supernode_graph): узел — mult пользователей,
+        # ребро — mult_a*mult_b рёбер между ними, петля — клика группы из m(m-1)/2 рёбер
+        n = sum(mult.get(u, 1) for u in sub)
+        m = sum(mult.get(a, 1) * mult.get(b, 1) if a != b else mult.get(a, 1) * (mult.get(a, 1) - 1) // 2
+                for a, b in sub.edges())
+    else:
+        n = sub.number_of_nodes() # возращаем кол-во узлов в графе
+        m = sub.number_of_edges() # возращаем кол-во ребер в графе
 
     max_edges = n * (n - 1) / 2 if n > 1 else 1 # вычисляется максимальное возможное количество рёбер в подграфе
     density = (m / max_edges) if max_edges > 0 else 0.0 # вычисляется плотность подграфа (density), которая равна отношению количества рёбер к максимальному возможному количеству рёбер.
 
-    wdeg = dict(sub.degree(weight=weight)) # вычисляется взвешенная степень каждого узла
+    wdeg = dict(sub.degree(weight=weight)) # вычисляется взвешенная степень каждого узла (петля считается дважды — как клика)
     avg_wdeg = (sum(wdeg.values()) / n) if n > 0 else 0.0 # вычисляется средняя взвешенная степень (avg_wdeg), которая равна сумме всех взвешенных степеней, деленной на количество узлов.
 
     score = density * avg_wdeg * math.log(n + 1) # значимость подграфа( у нас это значимость скрытого со-ва вк)
@@ -128,9 +217,11 @@ def build_user_to_groups_from_edges(edges_df: pd.DataFrame) -> Dict[str, List[st
     Функция build_user_to_groups_from_edges создает словарь, где ключами являются user_id,
      а значениями — списки community_id, к которым принадлежит пользователь.
     """
+    # groupby вместо iterrows: порядок сообществ внутри пользователя сохраняется
+    users = edges_df["user_id"].astype(str)
+    groups = edges_df["community_id"].astype(str)
     user_to_groups: Dict[str, List[str]] = defaultdict(list)
-    for _, r in edges_df.iterrows():
-        user_to_groups[str(r["user_id"])].append(str(r["community_id"]))
+    user_to_groups.update(groups.groupby(users, sort=False).agg(list).to_dict())
     return user_to_groups
 
 #  находит топ-n сообществ, к которым принадлежат пользователи в кластере
@@ -158,7 +249,7 @@ def _top_topics_inside_cluster(user_to_groups: Dict[str, List[str]],cluster_user
 # Анализ скрытых сообществ (таблица + информация для hover)
 # ---------------------------
 #
-def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_groups: Dict[str, List[str]],topic_map: Dict[str, str],name_map: Dict[str, str],top_n_groups: int = 5):
+def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_groups: Dict[str, List[str]],topic_map: Dict[str, str],name_map: Dict[str, str],top_n_groups: int = 5, profile: Optional[TopicProfile] = None, metrics: Optional[Dict[int, dict]] = None):
     """
     Принимает: G: граф,
                 partition: словарь, где ключами являются id пользователей, а значениями — id сообществ, к которым они принадлежат.
@@ -166,6 +257,10 @@ def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_gr
                 topic_map: словарь, где ключами являются id сообществ, а значениями — их тематики.
                 name_map: словарь, где ключами являются id сообществ, а значениями — их имена.
                 top_n_groups: количество топ-сообществ, которые нужно найти (по умолчанию 5).
+                profile: TopicProfile (topic_profile.build_topic_profile) — если передан, топ групп/тематик
+                         берутся из sparse-произведений, а user_to_groups/topic_map не нужны.
+                metrics: cid -> метрики подграфа, уже посчитанные без nx (disk_graph.DiskGraph.community_metrics);
+                         тогда G не нужен (можно None).
     Возвращает:
       - summary_rows: список строк (для панели и вывода)
       - cluster_info: cluster_id -> метрики и строки
@@ -182,13 +277,16 @@ def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_gr
     # Для каждого сообщества (cid) вычисляются метрики подграфа с помощью функции _community_subgraph_metrics.
     # met — это словарь с метриками, такими как размер, плотность, средняя взвешенная степень и значимость.
     for cid, users in clusters.items():
-        met = _community_subgraph_metrics(G, users, weight="weight")
+        met = metrics[cid] if metrics is not None else _community_subgraph_metrics(G, users, weight="weight")
 
 
 
         # Вычисляются топ-n сообществ внутри кластера с помощью функции _top_groups_inside_cluster.
         # Формируется строка top_groups_str, которая содержит информацию о топ-сообществах, включая их идентификаторы, количество вхождений и имена (если они есть)
-        top_groups = _top_groups_inside_cluster(user_to_groups, users, top_n=top_n_groups)
+        if profile is not None:
+            top_groups = profile.top_groups(cid, top_n=top_n_groups)
+        else:
+            top_groups = _top_groups_inside_cluster(user_to_groups, users, top_n=top_n_groups)
         # красиво: community_id (count) + (name) если есть
 
 
@@ -203,7 +301,10 @@ def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_gr
                 top_groups_str_parts.append(f"{g} ({c})")
         top_groups_str = "<br>".join(top_groups_str_parts) if top_groups_str_parts else "нет данных"
 
-        top_topics = _top_topics_inside_cluster(user_to_groups, users, topic_map, top_n=5)
+        if profile is not None:
+            top_topics = profile.top_topics(cid, top_n=5)
+        else:
+            top_topics = _top_topics_inside_cluster(user_to_groups, users, topic_map, top_n=5)
         top_topics_str = ", ".join([f"{t} ({c})" for t, c in top_topics]) if top_topics else "нет данных"
 
         cluster_info[cid] = {
@@ -213,6 +314,9 @@ def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_gr
             "top_topics": top_topics,
             "top_topics_str": top_topics_str,
         }
+        if profile is not None:
+            # полное распределение тематик кластера (для drill-down)
+            cluster_info[cid]["topic_counts"] = profile.topic_counts_dict(cid)
 
         summary_rows.append({
             "hidden_comm_id": cid,
@@ -229,46 +333,46 @@ def analyze_hidden_communities(G: nx.Graph, partition: Dict[str, int],user_to_gr
 
 
 # ---------------------------
-# Основная визуализация
+# Этапы пайплайна (доступны по отдельности — для бенчмарков и batch-запусков)
 # ---------------------------
 
-def visualize_network_advanced(
+def detect_hidden_communities(
     G: nx.Graph,
-    edges_df: pd.DataFrame,
-    topics_csv_path: str,
-    title: str = "Анализ скрытых сообществ ВКонтакте",
-    show: bool = True,
-    max_nodes_plot: int = 2500
-):
+    weight: str = "weight",
+    random_state=None,
+    init_partition: Optional[Dict[str, int]] = None,
+    resolution: float = 1.0,
+) -> Tuple[Dict[str, int], float]:
     """
-    Интерактивная визуализация:
-
+    Louvain: разбиение графа на скрытые сообщества.
+    resolution — детализация (подбор по сетке — resolution_sweep.run_resolution_sweep).
+    init_partition — начальное разбиение (тёплый старт с прошлого запуска);
+    локальный пересчёт только изменившихся окрестностей — louvain_update.update_partition.
+    Возвращает (partition, modularity).
     """
-
-    if G.number_of_edges() == 0:
-        raise ValueError(
-            "Граф получился без рёбер.\n"
-            "Проверьте параметры build_similarity_graph:\n"
-            "- уменьшить threshold (например 0.15)\n"
-            "- увеличиить k_neighbors (например 50)\n"
-            "Также проверьте, что communities не пустые."
-        )
-
-    # Тематики и имена сообществ
-    topic_map, name_map = load_topics_maps(topics_csv_path)
-
-    # Louvain
-    partition = community_louvain.best_partition(G, weight="weight")
-    modularity = community_louvain.modularity(partition, G, weight="weight")
-
-    # user_id -> list[community_id]
-    user_to_groups = build_user_to_groups_from_edges(edges_df)
-
-    # Анализ значимости
-    summary_rows, cluster_info = analyze_hidden_communities(
-        G, partition, user_to_groups, topic_map, name_map, top_n_groups=5
+    if init_partition is not None:
+        # узлы, которых не было в прошлом разбиении, стартуют отдельными сообществами
+        next_id = max(init_partition.values(), default=-1) + 1
+        init = {}
+        for n in G.nodes():
+            if n in init_partition:
+                init[n] = init_partition[n]
+            else:
+                init[n] = next_id
+                next_id += 1
+        init_partition = init
+    partition = community_louvain.best_partition(
+        G, partition=init_partition, weight=weight, random_state=random_state, resolution=resolution
     )
+    modularity = community_louvain.modularity(partition, G, weight=weight)
+    return partition, modularity
+
 
+def compute_plot_layout(G: nx.Graph, max_nodes_plot: int = 2500):
+    """
+    Ограничивает граф для Plotly и считает spring layout.
+    Возвращает (H, pos): подграф для отрисовки и координаты узлов.
+    """
     # Ограничим количество узлов для Plotly (иначе тяжело)
     nodes_all = list(G.nodes())
     if len(nodes_all) > max_nodes_plot:
@@ -279,7 +383,21 @@ def visualize_network_advanced(
 
     # Layout
     pos = nx.spring_layout(H, k=0.7, iterations=30, weight="weight", seed=42)
+    return H, pos
+
 
+def build_network_figure(
+    H: nx.Graph,
+    pos: dict,
+    partition: Dict[str, int],
+    cluster_info: dict,
+    summary_rows: List[dict],
+    modularity: float,
+    title: str = "Анализ скрытых сообществ ВКонтакте",
+) -> go.Figure:
+    """
+    Собирает Plotly-фигуру: узлы, рёбра и панель ТОП скрытых сообществ.
+    """
     # Узлы
     node_x, node_y, node_text, node_color, node_size = [], [], [], [], []
     degrees = dict(H.degree())
@@ -383,6 +501,82 @@ def visualize_network_advanced(
         height=820,
     )
 
+    return fig
+
+
+# ---------------------------
+# Основная визуализация
+# ---------------------------
+
+def visualize_network_advanced(
+    G: nx.Graph,
+    edges_df: pd.DataFrame,
+    topics_csv_path: Optional[str] = None,
+    title: str = "Анализ скрытых сообществ ВКонтакте",
+    show: bool = True,
+    max_nodes_plot: int = 2500,
+    topics_df: Optional[pd.DataFrame] = None,
+    topic_lookup: Optional[TopicLookup] = None,
+    data=None,
+    hierarchy=None,
+):
+    """
+    Интерактивная визуализация:
+
+    Тематики можно передать тремя способами (по приоритету):
+      topic_lookup (готовый TopicLookup) → topics_df (таблица в памяти) → topics_csv_path.
+    Если есть и topic_lookup, и data (UserCommunityData), профили кластеров
+    считаются векторно через topic_profile (без user_to_groups).
+    hierarchy (louvain_levels.LouvainHierarchy) — готовые уровни Louvain: берётся верхний уровень,
+    Louvain и анализ не пересчитываются.
+    """
+
+    if G.number_of_edges() == 0:
+        raise ValueError(
+            "Граф получился без рёбер.\n"
+            "Проверьте параметры build_similarity_graph:\n"
+            "- уменьшить threshold (например 0.15)\n"
+            "- увеличиить k_neighbors (например 50)\n"
+            "Также проверьте, что communities не пустые."
+        )
+
+    # Тематики и имена сообществ
+    if topic_lookup is not None:
+        topic_map, name_map = topic_lookup.topic_map(), topic_lookup.name_map()
+    elif topics_df is not None:
+        topic_map, name_map = topics_maps_from_df(topics_df)
+    elif topics_csv_path is not None:
+        topic_map, name_map = load_topics_maps(topics_csv_path)
+    else:
+        raise ValueError("Нужно передать topic_lookup, topics_df или topics_csv_path.")
+
+    if hierarchy is not None:
+        # уровни посчитаны заранее (build_louvain_hierarchy) — верхний совпадает с best_partition
+        top = hierarchy.levels[0]
+        partition, modularity = top.partition, top.modularity
+        summary_rows, cluster_info = top.summary_rows, top.cluster_info
+    else:
+        # Louvain
+        partition, modularity = detect_hidden_communities(G, weight="weight")
+
+        if topic_lookup is not None and data is not None:
+            # группы/тематики кластеров — sparse-произведения P.T @ X (@ T)
+            profile = build_topic_profile(data, partition, topic_lookup)
+            user_to_groups = {}
+        else:
+            profile = None
+            # user_id -> list[community_id]
+            user_to_groups = build_user_to_groups_from_edges(edges_df)
+
+        # Анализ значимости
+        summary_rows, cluster_info = analyze_hidden_communities(
+            G, partition, user_to_groups, topic_map, name_map, top_n_groups=5, profile=profile
+        )
+
+    H, pos = compute_plot_layout(G, max_nodes_plot=max_nodes_plot)
+
+    fig = build_network_figure(H, pos, partition, cluster_info, summary_rows, modularity, title=title)
+
     if show:
         fig.show()
 
@@ -0,0 +1,343 @@
+# ego_batch.py
+# -------------------------------------------------
+# Пакетная проверка списка профилей (очередь проверок службы безопасности):
+#   для каждого user_id из списка — режим цели (ego_network): окружение 1–2 уровня → граф → Louvain
+#   → риск, и всё это параллельно в пуле процессов.
+#
+#   - матрицы X / XT (user × community и обратный индекс) и id кладутся в shared memory один раз
+#     (shared_store); процессы пула подключаются к ним без копирования, в задачу уходит только user_id
+#   - итог: ранжированная таблица целей + текстовый отчёт по каждой цели в формате build_text_report
+#   - пропускная способность — целей в минуту
+#
+# Пример:
+#   python ego_batch.py --targets targets.txt --edges users_communities_edges.csv \
+#                       --topics community_topics.csv --out-dir ego_batch_output --jobs 8
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from clustering_pipeline import build_text_report
+from create_ug_matrix import UserCommunityData
+from ego_network import EgoReport, analyze_ego_network, extract_ego_network
+from overlap_index import CommunityOverlapIndex
+from shared_store import SharedHandle, attach, attach_user_data, share_csr
+
+# колонки ранжированной таблицы (по убыванию приоритета проверки)
+RANK_COLUMNS = [
+    "target", "found", "risk_pct", "risk_level", "target_suspicious", "cluster_suspicious_share",
+    "target_cluster", "cluster_size", "n_clusters", "n_users", "hop1", "hop2", "modularity", "seconds", "error",
+]
+
+
+# ---------------------------
+# Одна цель
+# ---------------------------
+@dataclass(frozen=True)
+class EgoBatchParams:
+    hops: int = 2
+    min_shared: int = 3
+    max_per_hop: int = 300
+    threshold: float = 0.15
+    k_neighbors: int = 30
+    random_state: Optional[int] = 42
+
+
+def build_ego_text_report(report: EgoReport) -> str:
+    """Отчёт по одной цели: шапка окружения + сводка риска (build_text_report) + скрытые сообщества."""
+    ego = report.ego
+    counts = ego.hop_counts()
+    lines = [f"ЦЕЛЬ: {ego.target}"]
+    lines.append(f"Окружение: {ego.n_users} пользователей (1-й уровень: {counts.get(1, 0)}, 2-й уровень: {counts.get(2, 0)})")
+    lines.append(f"Скрытых сообществ: {len(report.summary_rows)} | Модулярность: {report.modularity:.4f}")
+    lines.append(f"Сообщество цели: {report.target_cluster}")
+    lines.append(f"Подозрительных членств у цели: {int(report.members['suspicious_memberships'].iloc[0])}")
+    lines.append("")
+
+    if report.risk_summary is not None:
+        lines.append(build_text_report(report.risk_summary, int(report.risk_summary["Количество"].sum())))
+    else:
+        lines.append("Анкеты окружения не найдены — риск по анкетам не считался.")
+    lines.append("")
+
+    lines.append("СКРЫТЫЕ СООБЩЕСТВА ОКРУЖЕНИЯ")
+    lines.append("=" * 70)
+    for r in report.summary_rows:
+        mark = " (цель)" if r["hidden_comm_id"] == report.target_cluster else ""
+        lines.append(f"Сообщество {r['hidden_comm_id']}{mark} — {r['size_users']} пользователей, score={r['score']}")
+        lines.append(f"  Тематики: {r['top_topics']}")
+        lines.append(f"  Обобщающий признак: {r['обобщающий_признак']}")
+        lines.append("-" * 70)
+    return "\n".join(lines)
+
+
+def _rank_row(report: EgoReport, seconds: float) -> dict:
+    cid = report.target_cluster
+    members = report.members
+    in_cluster = members["hidden_comm_id"] == cid
+    row = report.target_row() or {}
+
+    risk_pct, risk_level = np.nan, "—"
+    if report.risk_summary is not None:
+        hit = report.risk_summary[report.risk_summary["Кластер"] == cid]
+        if len(hit):
+            risk_pct, risk_level = float(hit["Риск, % (0-100)"].iloc[0]), str(hit["Уровень риска"].iloc[0])
+
+    counts = report.ego.hop_counts()
+    return {
+        "target": report.ego.target,
+        "found": True,
+        "risk_pct": risk_pct,
+        "risk_level": risk_level,
+        "target_suspicious": int(members["suspicious_memberships"].iloc[0]),
+        "cluster_suspicious_share": round(float((members.loc[in_cluster, "suspicious_memberships"] > 0).mean()), 4)
+        if in_cluster.any() else 0.0,
+        "target_cluster": cid,
+        "cluster_size": int(row.get("size_users", in_cluster.sum())),
+        "n_clusters": len(report.summary_rows),
+        "n_users": report.ego.n_users,
+        "hop1": counts.get(1, 0),
+        "hop2": counts.get(2, 0),
+        "modularity": round(report.modularity, 4),
+        "seconds": round(seconds, 3),
+        "error": "",
+    }
+
+
+def investigate_target(
+    data: UserCommunityData,
+    index: CommunityOverlapIndex,
+    topic_lookup,
+    target: str,
+    params: EgoBatchParams = EgoBatchParams(),
+    profiles: Optional[pd.DataFrame] = None,
+) -> Tuple[dict, str]:
+    """(строка ранжированной таблицы, текстовый отчёт) для одной цели; ненайденная цель — строка с error."""
+    t0 = time.perf_counter()
+    try:
+        ego = extract_ego_network(
+            data, target, hops=params.hops, index=index,
+            min_shared=params.min_shared, max_per_hop=params.max_per_hop,
+        )
+    except KeyError as e:
+        row = {c: None for c in RANK_COLUMNS}
+        row.update(target=str(target), found=False, error=str(e).strip("'"))
+        return row, f"ЦЕЛЬ: {target}\n{row['error']}"
+
+    report = analyze_ego_network(
+        ego, topic_lookup, threshold=params.threshold, k_neighbors=params.k_neighbors,
+        random_state=params.random_state, profiles=profiles,
+    )
+    return _rank_row(report, time.perf_counter() - t0), build_ego_text_report(report)
+
+
+# ---------------------------
+# Пул процессов
+# ---------------------------
+_WORKER: dict = {}
+
+
+def _init_worker(handle: SharedHandle, topic_lookup, profiles, params):
+    data = attach_user_data(handle)
+    XT = attach(handle).csr("t_")
+    _WORKER.update(
+        data=data,
+        index=CommunityOverlapIndex.from_matrices(data, data.csr, XT),
+        topic_lookup=topic_lookup,
+        profiles=profiles,
+        params=params,
+    )
+
+
+def _worker_target(target: str) -> Tuple[dict, str]:
+    w = _WORKER
+    return investigate_target(w["data"], w["index"], w["topic_lookup"], target, w["params"], w["profiles"])
+
+
+@dataclass(frozen=True)
+class EgoBatchResult:
+    """
+    table   : ранжированная таблица (RANK_COLUMNS), сначала самые рискованные цели
+    reports : target -> текстовый отчёт
+    """
+    table: pd.DataFrame
+    reports: Dict[str, str]
+    seconds: float
+    n_jobs: int
+    stats: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def targets_per_minute(self) -> float:
+        return round(len(self.table) / self.seconds * 60.0, 1) if self.seconds > 0 else float("inf")
+
+    def combined_report(self) -> str:
+        lines = ["ОТЧЁТ ПО ПАКЕТНОЙ ПРОВЕРКЕ ПРОФИЛЕЙ", "=" * 70]
+        lines.append(f"Целей: {len(self.table)} | Найдено: {int(self.table['found'].sum())} | "
+                     f"{self.targets_per_minute} целей/мин")
+        lines.append("")
+        for target in self.table["target"]:
+            lines.append(self.reports[target])
+            lines.append("")
+        return "\n".join(lines)
+
+
+def rank_targets(rows: List[dict]) -> pd.DataFrame:
+    """Приоритет: риск кластера цели по анкетам → подозрительные членства цели → доля таких в её кластере."""
+    table = pd.DataFrame(rows, columns=RANK_COLUMNS)
+    table["found"] = table["found"].astype(bool)
+    for col in ("target_suspicious", "target_cluster", "cluster_size", "n_clusters", "n_users", "hop1", "hop2"):
+        table[col] = table[col].astype("Int64")  # ненайденные цели — пустые ячейки, а не float
+    order = table.sort_values(
+        ["found", "risk_pct", "target_suspicious", "cluster_suspicious_share"],
+        ascending=[False, False, False, False], na_position="last", kind="stable",
+    ).index
+    return table.loc[order].reset_index(drop=True)
+
+
+def run_ego_batch(
+    data: UserCommunityData,
+    topic_lookup,
+    targets: Sequence,
+    profiles: Optional[pd.DataFrame] = None,
+    params: EgoBatchParams = EgoBatchParams(),
+    n_jobs: int = -1,
+    index: Optional[CommunityOverlapIndex] = None,
+) -> EgoBatchResult:
+    """
+    Проверка списка целей. n_jobs=1 — в текущем процессе; иначе пул процессов,
+    X / XT — в shared memory (одна копия на все процессы).
+    """
+    targets = list(dict.fromkeys(str(t).strip() for t in targets if str(t).strip()))
+    if not targets:
+        raise ValueError("Список целей пуст.")
+    workers = (os.cpu_count() or 1) if n_jobs is None or n_jobs < 1 else int(n_jobs)
+    workers = max(1, min(workers, len(targets)))
+    index = index or CommunityOverlapIndex(data)
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        results = [investigate_target(data, index, topic_lookup, t, params, profiles) for t in targets]
+    else:
+        # X и XT (+ id) — одна копия в shared memory на все процессы
+        with share_csr(index.X, data.user_ids, data.community_ids, extra={"t_": index.XT}) as store:
+            initargs = (store.handle, topic_lookup, profiles, params)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as ex:
+                results = list(ex.map(_worker_target, targets, chunksize=max(1, len(targets) // (workers * 4))))
+    seconds = time.perf_counter() - t0
+
+    rows = [r for r, _ in results]
+    reports = {r["target"]: text for r, text in results}
+    table = rank_targets(rows)
+    found = table["found"]
+    return EgoBatchResult(
+        table=table,
+        reports=reports,
+        seconds=seconds,
+        n_jobs=workers,
+        stats={
+            "targets": len(table),
+            "found": int(found.sum()),
+            "mean_ego_users": round(float(table.loc[found, "n_users"].mean()), 1) if found.any() else 0.0,
+            "mean_target_seconds": round(float(table.loc[found, "seconds"].mean()), 3) if found.any() else 0.0,
+        },
+    )
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def read_targets(path: str | Path) -> List[str]:
+    """Файл целей: по user_id на строку, либо CSV с колонкой user_id / id."""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        df = pd.read_csv(path, sep=None, engine="python", encoding="utf-8-sig", dtype=str)
+        col = next((c for c in ("user_id", "id", "target") if c in df.columns), df.columns[0])
+        return df[col].dropna().tolist()
+    return [line.strip() for line in path.read_text(encoding="utf-8-sig").splitlines() if line.strip()]
+
+
+def report_file_name(rank: int, target: str) -> str:
+    """Имя файла отчёта: место в ранжировании + id без символов пути (id из файла целей — не доверенный ввод)."""
+    slug = re.sub(r"[^0-9A-Za-z_-]+", "_", str(target)).strip("_")[:64] or "target"
+    return f"{rank:05d}_{slug}.txt"
+
+
+def export_batch(result: EgoBatchResult, out_dir: str | Path) -> Dict[str, Path]:
+    out = Path(out_dir)
+    (out / "reports").mkdir(parents=True, exist_ok=True)
+    paths = {"table": out / "ego_batch_ranked.csv", "report": out / "ego_batch_report.txt"}
+    result.table.to_csv(paths["table"], index=False, encoding="utf-8-sig")
+    paths["report"].write_text(result.combined_report(), encoding="utf-8")
+    for rank, target in enumerate(result.table["target"], start=1):
+        (out / "reports" / report_file_name(rank, target)).write_text(result.reports[target], encoding="utf-8")
+    return paths
+
+
+def run(args) -> dict:
+    from data_loader import PARSERS
+    from e import build_topic_lookup
+
+    t0 = time.perf_counter()
+    data = UserCommunityData.from_edges_df(PARSERS["edges"](args.edges))
+    topic_lookup = build_topic_lookup(PARSERS["topics"](args.topics), data.community_ids)
+    profiles = PARSERS["profiles"](args.profiles) if args.profiles else None
+    targets = read_targets(args.targets)
+    t_load = time.perf_counter() - t0
+    print(f"Загружено: {len(data.user_ids):,} пользователей, {len(targets):,} целей ({t_load:.2f} c)")
+
+    params = EgoBatchParams(
+        hops=args.hops, min_shared=args.min_shared, max_per_hop=args.max_per_hop,
+        threshold=args.threshold, k_neighbors=args.k_neighbors, random_state=args.seed,
+    )
+    result = run_ego_batch(data, topic_lookup, targets, profiles=profiles, params=params, n_jobs=args.jobs)
+    paths = export_batch(result, args.out_dir)
+
+    stats = {
+        "targets": args.targets,
+        "jobs": result.n_jobs,
+        "seconds": {"load": round(t_load, 3), "batch": round(result.seconds, 3)},
+        "targets_per_minute": result.targets_per_minute,
+        **result.stats,
+        "outputs": {k: str(v) for k, v in paths.items()},
+    }
+    print(f"Ранжированная таблица: {paths['table']}")
+    print(f"Отчёт: {paths['report']}")
+    print(f"Пропускная способность: {result.targets_per_minute:,} целей/мин "
+          f"({result.seconds:.2f} c, процессов: {result.n_jobs})")
+    if args.stats_json:
+        Path(args.stats_json).write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Пакетная проверка окружения списка профилей ВК (без Streamlit)")
+    ap.add_argument("--targets", required=True, help="TXT (user_id на строку) или CSV с колонкой user_id")
+    ap.add_argument("--edges", default="users_communities_edges.csv", help="CSV user_id;community_id")
+    ap.add_argument("--topics", default="community_topics.csv", help="CSV community_id;topic;name")
+    ap.add_argument("--profiles", default=None, help="CSV анкет (колонка id) для оценки риска")
+    ap.add_argument("--out-dir", default="ego_batch_output")
+    ap.add_argument("--jobs", type=int, default=-1, help="число процессов (-1 = все ядра)")
+    ap.add_argument("--hops", type=int, choices=(1, 2), default=2)
+    ap.add_argument("--min-shared", type=int, default=3, help="мин. общих групп для связи в окружении")
+    ap.add_argument("--max-per-hop", type=int, default=300, help="максимум пользователей на уровень")
+    ap.add_argument("--threshold", type=float, default=0.15, help="минимальная схожесть ребра")
+    ap.add_argument("--k-neighbors", type=int, default=30)
+    ap.add_argument("--seed", type=int, default=42, help="random_state для Louvain")
+    ap.add_argument("--stats-json", default=None, help="сохранить тайминги/throughput в JSON")
+    return ap
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
@@ -0,0 +1,263 @@
+# ego_network.py
+# -------------------------------------------------
+# Режим цели: анализ только окружения одного профиля (1–2 уровня), а не всей выборки.
+#
+#   1) окружение — sparse BFS по CSR, фронт за фронтом:
+#        source="communities" : соседи = пользователи с >= min_shared общими группами
+#                               (X[фронт] @ XT по инвертированному индексу, граф схожести не нужен)
+#        source="graph"       : соседи по готовой матрице смежности графа схожести (A[фронт])
+#      на каждом уровне остаются max_per_hop самых сильных связей — размер окружения ограничен
+#      независимо от размера датасета
+#   2) на подвыборке: kNN → граф → Louvain → тематики кластеров → подозрительные сообщества
+#      (+ риск по анкетам, если переданы профили с теми же id)
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from build_grap_similarity import build_graph_from_knn, compute_knn
+from create_ug_matrix import UserCommunityData
+from e import analyze_hidden_communities, detect_hidden_communities
+from overlap_index import CommunityOverlapIndex
+from suspicious_detector import SuspiciousMatcher, SuspiciousReport, detect_suspicious
+from topic_profile import build_topic_profile, top_n_indices
+
+EGO_SOURCES = ("communities", "graph")
+
+
+def _strongest(cand: np.ndarray, strength: np.ndarray, limit: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Сильнейшая связь на кандидата (max по фронту) и top-limit кандидатов по ней."""
+    if len(cand) == 0:
+        return cand, strength
+    uniq, inv = np.unique(cand, return_inverse=True)
+    best = np.zeros(len(uniq), dtype=np.float64)
+    np.maximum.at(best, inv, strength)
+    if limit is not None and len(uniq) > limit:
+        keep = top_n_indices(best, limit)
+        uniq, best = uniq[keep], best[keep]
+    return uniq, best
+
+
+def bfs_hops(
+    neighbors,
+    start: int,
+    n_nodes: int,
+    hops: int = 2,
+    max_per_hop: Optional[int] = 500,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    BFS по уровням: neighbors(frontier) -> (кандидаты, сила связи) — по одной паре на ненулевой элемент.
+    Возвращает (узлы, уровень, сила связи с предыдущим уровнем); start — уровень 0.
+    """
+    level = np.full(n_nodes, -1, dtype=np.int8)
+    level[start] = 0
+    nodes, hop, weight = [np.array([start])], [np.array([0])], [np.array([np.inf])]
+    frontier = np.array([start])
+    for h in range(1, hops + 1):
+        cand, strength = neighbors(frontier)
+        new = level[cand] < 0
+        cand, best = _strongest(cand[new], strength[new], max_per_hop)
+        if len(cand) == 0:
+            break
+        level[cand] = h
+        nodes.append(cand)
+        hop.append(np.full(len(cand), h))
+        weight.append(best)
+        frontier = cand
+    return np.concatenate(nodes), np.concatenate(hop), np.concatenate(weight)
+
+
+def _graph_neighbors(A: csr_matrix, min_weight: float = 0.0):
+    def neighbors(frontier: np.ndarray):
+        sub = A[frontier]
+        keep = sub.data >= min_weight
+        return sub.indices[keep], sub.data[keep].astype(np.float64)
+    return neighbors
+
+
+def _membership_neighbors(index: CommunityOverlapIndex, min_shared: int = 2):
+    def neighbors(frontier: np.ndarray):
+        shared = (index.X[frontier] @ index.XT).tocsr()  # общих групп у каждой пары (фронт, пользователь)
+        keep = shared.data >= min_shared
+        return shared.indices[keep], shared.data[keep].astype(np.float64)
+    return neighbors
+
+
+@dataclass(frozen=True)
+class EgoNetwork:
+    """
+    target   : user_id цели
+    rows     : строки исходной UserCommunityData (цель — первая)
+    hop      : уровень каждой строки (0 — цель)
+    strength : сила связи с предыдущим уровнем (общих групп / вес ребра)
+    data     : подвыборка UserCommunityData (те же столбцы, что у исходной)
+    """
+    target: str
+    rows: np.ndarray
+    hop: np.ndarray
+    strength: np.ndarray
+    data: UserCommunityData
+    source: str
+
+    @property
+    def n_users(self) -> int:
+        return len(self.rows)
+
+    def hop_counts(self) -> Dict[int, int]:
+        return {int(h): int(c) for h, c in zip(*np.unique(self.hop, return_counts=True))}
+
+
+def extract_ego_network(
+    data: UserCommunityData,
+    target,
+    hops: int = 2,
+    source: str = "communities",
+    index: Optional[CommunityOverlapIndex] = None,
+    adjacency: Optional[csr_matrix] = None,
+    min_shared: int = 2,
+    min_weight: float = 0.0,
+    max_per_hop: Optional[int] = 500,
+) -> EgoNetwork:
+    """
+    Окружение target на hops уровней.
+    source="communities" — по общим группам (index: CommunityOverlapIndex, строится, если не передан);
+    source="graph"       — по adjacency (csr n_users × n_users, строки — как у data;
+                           DiskGraph.adjacency() подходит напрямую).
+    """
+    if source not in EGO_SOURCES:
+        raise ValueError(f"Неизвестный source={source!r}. Доступно: {EGO_SOURCES}")
+    if hops < 1:
+        raise ValueError("hops должно быть >= 1.")
+    start = data.user_index.get(str(target).strip())
+    if start is None:
+        raise KeyError(f"Пользователь {target} не найден")
+
+    if source == "graph":
+        if adjacency is None:
+            raise ValueError("Для source='graph' нужна матрица смежности adjacency.")
+        A = adjacency if isinstance(adjacency, csr_matrix) else csr_matrix(adjacency)  # memmap (DiskGraph) — без копии
+        if A.shape[0] != data.csr.shape[0]:
+            raise ValueError(f"adjacency: {A.shape[0]} строк, а пользователей {data.csr.shape[0]}.")
+        neighbors = _graph_neighbors(A, min_weight=min_weight)
+    else:
+        neighbors = _membership_neighbors(index or CommunityOverlapIndex(data), min_shared=max(int(min_shared), 1))
+
+    rows, hop, strength = bfs_hops(neighbors, start, data.csr.shape[0], hops=hops, max_per_hop=max_per_hop)
+    return EgoNetwork(
+        target=str(data.user_ids[start]),
+        rows=rows,
+        hop=hop,
+        strength=strength,
+        data=data.take_rows(rows),
+        source=source,
+    )
+
+
+# ---------------------------
+# Анализ окружения
+# ---------------------------
+@dataclass(frozen=True)
+class EgoReport:
+    """
+    graph         : граф схожести внутри окружения
+    partition     : user_id -> скрытое сообщество (внутри окружения)
+    summary_rows  : как analyze_hidden_communities (по убыванию score)
+    members       : user_id, hop, strength, hidden_comm_id, suspicious_memberships
+    risk_summary  : summarize_clusters по анкетам окружения (если нашлись профили с теми же id)
+    """
+    ego: EgoNetwork
+    graph: nx.Graph
+    partition: Dict[str, int]
+    modularity: float
+    summary_rows: List[dict]
+    cluster_info: dict
+    suspicious: SuspiciousReport
+    members: pd.DataFrame
+    risk_summary: Optional[pd.DataFrame] = None
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def target_cluster(self) -> Optional[int]:
+        return self.partition.get(self.ego.target)
+
+    def target_row(self) -> Optional[dict]:
+        cid = self.target_cluster
+        return next((r for r in self.summary_rows if r["hidden_comm_id"] == cid), None)
+
+
+def analyze_ego_network(
+    ego: EgoNetwork,
+    topic_lookup,
+    threshold: float = 0.15,
+    k_neighbors: int = 30,
+    random_state: Optional[int] = 42,
+    matcher: Optional[SuspiciousMatcher] = None,
+    profiles: Optional[pd.DataFrame] = None,
+    profile_id_col: str = "id",
+) -> EgoReport:
+    """kNN + Louvain + тематики + подозрительные сообщества только по пользователям окружения."""
+    seconds: Dict[str, float] = {}
+    sub = ego.data
+
+    t0 = time.perf_counter()
+    if sub.csr.shape[0] >= 2:
+        distances, indices = compute_knn(sub, k_neighbors=k_neighbors, n_jobs=1)
+        G = build_graph_from_knn(sub, distances, indices, threshold=threshold, show_progress=False)
+    else:
+        G = nx.Graph()
+        G.add_nodes_from(sub.user_ids, type="user")
+    seconds["graph"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if G.number_of_edges():
+        partition, modularity = detect_hidden_communities(G, random_state=random_state)
+    else:
+        partition, modularity = {u: i for i, u in enumerate(sub.user_ids)}, 0.0
+    seconds["louvain"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    profile = build_topic_profile(sub, partition, topic_lookup)
+    summary_rows, cluster_info = analyze_hidden_communities(
+        G, partition, {}, topic_lookup.topic_map(), topic_lookup.name_map(), top_n_groups=5, profile=profile,
+    )
+    suspicious = detect_suspicious(sub, matcher=matcher, topic_lookup=topic_lookup)
+    seconds["analyze"] = time.perf_counter() - t0
+
+    members = pd.DataFrame({
+        "user_id": sub.user_ids,
+        "hop": ego.hop,
+        "strength": ego.strength,
+        "hidden_comm_id": [partition.get(u, -1) for u in sub.user_ids],
+        "suspicious_memberships": suspicious.user_counts,
+    })
+
+    risk_summary = None
+    if profiles is not None and profile_id_col in profiles.columns:
+        from clustering_pipeline import summarize_clusters
+
+        ids = profiles[profile_id_col].astype(str)
+        matched = profiles[ids.isin(set(sub.user_ids))].copy()
+        if len(matched):
+            matched["hidden_comm_id"] = matched[profile_id_col].astype(str).map(partition).fillna(-1).astype(int)
+            risk_summary = summarize_clusters(matched, len(matched), label_col="hidden_comm_id")
+
+    return EgoReport(
+        ego=ego,
+        graph=G,
+        partition=partition,
+        modularity=float(modularity),
+        summary_rows=summary_rows,
+        cluster_info=cluster_info,
+        suspicious=suspicious,
+        members=members,
+        risk_summary=risk_summary,
+        seconds={k: round(v, 3) for k, v in seconds.items()},
+    )
@@ -4,31 +4,23 @@
 
 from collections import Counter
 
+from suspicious_detector import SuspiciousMatcher
 
-def detect_suspicious_patterns(df, graph):
-    """Анализ на предмет деструктивных/радикальных сообществ"""
-
-    suspicious_keywords = [
-        'радикал', 'экстремизм', 'ненависть', 'противостояние',
-        'революция', 'сопротивление', 'подполье', 'анархия',
-        'независимость', 'протест', 'свержение'
-    ]
 
-    suspicious_communities = []
+def detect_suspicious_patterns(df, graph, matcher=None):
+    """Анализ на предмет деструктивных/радикальных сообществ"""
 
-    for communities in df['communities_list']:
-        for community in communities:
-            # Преобразуем в строку, если это число
-            if isinstance(community, (int, float)):
-                community_str = str(community)
-            else:
-                community_str = str(community)
+    # ключевые слова — в SuspiciousMatcher (DEFAULT_SUSPICIOUS_KEYWORDS), расширяются через add_keywords()
+    matcher = matcher or SuspiciousMatcher()
 
-            community_lower = community_str.lower()
+    # Считаем, сколько раз встречается каждое уникальное сообщество (explode + value_counts, без цикла по членствам)
+    memberships = df['communities_list'].explode().dropna()
+    community_counts = memberships.astype(str).value_counts(sort=False)
 
-            if any(keyword in community_lower for keyword in suspicious_keywords):
-                suspicious_communities.append(community_str)
+    # Каждое уникальное сообщество проверяем один раз
+    matched = matcher.match(community_counts.index.tolist())
+    suspicious = community_counts[matched != ""]
 
-    suspicious_counts = Counter(suspicious_communities)
+    suspicious_counts = Counter(dict(zip(suspicious.index, suspicious.to_numpy().tolist())))
 
     return suspicious_counts
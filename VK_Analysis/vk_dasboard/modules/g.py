@@ -1,26 +1,27 @@
 
 # анализ вовлеченности
-import networkx as nx
+from graph_analytics import compute_graph_metrics
 
-def analyze_engagement(df, graph):
+def analyze_engagement(df, graph, n_jobs=1, seed=None):
     """Анализ вовлеченности пользователей"""
 
-    # Степень центральности
-    degree_centrality = nx.degree_centrality(graph) # подается граф и расчитвыется степь его ценральности
+    # Степень центральности, betweenness (важность узла как моста) и PageRank —
+    # на sparse-матрице смежности; betweenness по выборке из 100 источников (как k=100 в networkx)
+    metrics = compute_graph_metrics(graph, betweenness_k=min(100, graph.number_of_nodes()), seed=seed, n_jobs=n_jobs)
 
-    # Междуness centrality (важность узла как моста)
-    betweenness = nx.betweenness_centrality(graph, k=min(100, len(graph.nodes())))
+    degree_centrality = metrics.table["degree_centrality"].to_dict()
+    betweenness = metrics.table["betweenness"].to_dict()
 
     # Наиболее связанные пользователи
-    top_connected = sorted(degree_centrality.items(),
-                           key=lambda x: x[1], reverse=True)[:10]
+    top_connected = metrics.top("degree_centrality", 10)
+
+    # user_id -> communities_list: индекс строится один раз, без скана df на каждого пользователя
+    communities_by_user = df.drop_duplicates("user_id").set_index("user_id")["communities_list"]
 
     print("\nСамые связанные пользователи:")
-    for user, centrality in top_connected:
-        user_communities = df[df['user_id'] == user]['communities_list'].iloc[0]
+    for user, centrality in top_connected["degree_centrality"].items():
+        user_communities = communities_by_user.get(user, [])
         print(f" {user}: центральность {centrality:.4f}")
         print(f"   Сообщества: {user_communities[:5]}...")
 
     return degree_centrality, betweenness
-
-
@@ -0,0 +1,269 @@
+# graph_analytics.py
+# -------------------------------------------------
+# Метрики графа схожести на sparse-матрице смежности (вместо циклов networkx):
+#   - степень и degree centrality     : разности indptr
+#   - PageRank                         : степенной метод на csr (как nx.pagerank)
+#   - компоненты связности             : scipy.sparse.csgraph
+#   - плотность                        : 2m / (n(n-1))
+#   - приближённая betweenness         : Brandes по выборке источников, BFS по уровням
+#                                        сразу для пачки источников (A @ F), пачки — в пуле процессов,
+#                                        матрица — одна копия в shared memory (shared_store)
+#
+# Результат — таблица, проиндексированная по user_id: поиск пользователя — по индексу, а не сканом.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Hashable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import csgraph, csr_matrix
+
+from shared_store import SharedHandle, attach, share_csr
+
+GRAPH_METRICS = ("degree", "degree_centrality", "betweenness", "pagerank", "component")
+
+
+def graph_to_adjacency(G: nx.Graph, weight: Optional[str] = "weight") -> Tuple[csr_matrix, List[Hashable]]:
+    """Симметричная csr-матрица смежности и порядок узлов (строки матрицы)."""
+    nodes = list(G.nodes())
+    A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=weight, format="csr", dtype=np.float64)
+    return csr_matrix(A), nodes
+
+
+def _structure(A: csr_matrix) -> csr_matrix:
+    """Невзвешенная копия без петель — для степеней, BFS и компонент."""
+    S = csr_matrix(A, dtype=np.float64, copy=True)
+    S.setdiag(0)
+    S.eliminate_zeros()
+    S.data[:] = 1.0
+    return S
+
+
+def degree_centrality(A: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """(степень, степень / (n - 1)) — как nx.degree_centrality."""
+    S = _structure(A)
+    deg = np.diff(S.indptr).astype(np.int64)
+    n = S.shape[0]
+    return deg, (deg / (n - 1) if n > 1 else np.ones(n))
+
+
+def density(A: csr_matrix) -> float:
+    S = _structure(A)
+    n = S.shape[0]
+    return float(S.nnz / (n * (n - 1))) if n > 1 else 0.0
+
+
+def connected_components(A: csr_matrix) -> Tuple[int, np.ndarray, np.ndarray]:
+    """(число компонент, метка компоненты на узел, размеры компонент)."""
+    n_comp, labels = csgraph.connected_components(A, directed=False)
+    return int(n_comp), labels, np.bincount(labels, minlength=n_comp)
+
+
+def pagerank(
+    A: csr_matrix, alpha: float = 0.85, tol: float = 1.0e-6, max_iter: int = 100
+) -> np.ndarray:
+    """
+    Степенной метод, те же правила, что у nx.pagerank:
+    вес ребра = доля исходящего веса, висячие узлы раздают ранг равномерно,
+    сходимость — sum|x - x_prev| < n * tol.
+    """
+    n = A.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out_w = np.asarray(A.sum(axis=1)).ravel()
+    dangling = out_w == 0
+    inv = np.divide(1.0, out_w, out=np.zeros(n), where=~dangling)
+    # P.T @ x, где P — построчно нормированная A
+    PT = csr_matrix(A.multiply(inv[:, None]).T)
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        x_prev = x
+        x = alpha * (PT @ x_prev + x_prev[dangling].sum() / n) + (1.0 - alpha) / n
+        if np.abs(x - x_prev).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+# ---------------------------
+# Betweenness (Brandes по пачкам источников)
+# ---------------------------
+def _brandes_batch(S: csr_matrix, sources: np.ndarray) -> np.ndarray:
+    """
+    Вклад источников sources в betweenness (без нормировки).
+    Все массивы n × len(sources): один столбец на источник, уровень BFS — одно A @ F.
+    """
+    n, b = S.shape[0], len(sources)
+    cols = np.arange(b)
+    sigma = np.zeros((n, b))
+    dist = np.full((n, b), -1, dtype=np.int32)
+    sigma[sources, cols] = 1.0
+    dist[sources, cols] = 0
+
+    frontier = sigma.copy()
+    depth = 0
+    while True:
+        nxt = S @ frontier  # число кратчайших путей через соседей фронта
+        new = (nxt > 0) & (dist < 0)
+        if not new.any():
+            break
+        depth += 1
+        dist[new] = depth
+        sigma[new] = nxt[new]
+        frontier = np.where(new, sigma, 0.0)
+
+    delta = np.zeros((n, b))
+    safe_sigma = np.where(sigma > 0, sigma, 1.0)
+    for level in range(depth, 0, -1):
+        coef = np.where(dist == level, (1.0 + delta) / safe_sigma, 0.0)
+        delta += np.where(dist == level - 1, sigma * (S @ coef), 0.0)
+
+    delta[sources, cols] = 0.0  # сам источник не считается
+    return delta.sum(axis=1)
+
+
+_WORKER_S: Optional[csr_matrix] = None
+
+
+def _init_worker(handle: SharedHandle):
+    global _WORKER_S
+    _WORKER_S = attach(handle).csr()
+
+
+def _worker_batch(sources: np.ndarray) -> np.ndarray:
+    return _brandes_batch(_WORKER_S, sources)
+
+
+def _rescale_betweenness(bc: np.ndarray, n: int, sources: Optional[np.ndarray], normalized: bool) -> np.ndarray:
+    """Тот же масштаб, что у nx.betweenness_centrality(endpoints=False), включая выборку k."""
+    N = n - 1
+    if N < 2:
+        return bc
+    k = None if sources is None else len(sources)
+    if k is None:
+        scale = 1.0 / (N * (N - 1)) if normalized else 0.5
+        return bc * scale
+
+    if normalized:
+        scale_source = 1.0 / ((k - 1) * (N - 1)) if k > 1 else math.nan
+        scale_other = 1.0 / (k * (N - 1))
+    else:
+        scale_source = N / ((k - 1) * 2) if k > 1 else math.nan
+        scale_other = N / (k * 2)
+    out = bc * scale_other
+    out[sources] = bc[sources] * scale_source
+    return out
+
+
+def approx_betweenness(
+    A: csr_matrix,
+    k: Optional[int] = 100,
+    seed: Optional[int] = None,
+    normalized: bool = True,
+    n_jobs: int = 1,
+    batch_size: int = 32,
+) -> np.ndarray:
+    """
+    Betweenness (невзвешенная, как nx.betweenness_centrality(G, k=...)) по k случайным источникам.
+    k=None или k >= n — точное значение по всем источникам.
+    n_jobs > 1 (или -1) — пачки источников считаются в пуле процессов.
+    """
+    S = _structure(A)
+    n = S.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    if k is None or k >= n:
+        sources, sampled = np.arange(n), None
+    else:
+        rng = np.random.default_rng(seed)
+        sources = np.sort(rng.choice(n, size=int(k), replace=False))
+        sampled = sources
+
+    batches = [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+    workers = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, int(n_jobs))
+    workers = min(workers, len(batches))
+
+    bc = np.zeros(n)
+    if workers <= 1:
+        for batch in batches:
+            bc += _brandes_batch(S, batch)
+    else:
+        # процессы подключаются к матрице в shared memory (без pickle копии на каждый процесс)
+        with share_csr(S) as store:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store.handle,)) as ex:
+                for part in ex.map(_worker_batch, batches):
+                    bc += part
+
+    return _rescale_betweenness(bc, n, sampled, normalized)
+
+
+# ---------------------------
+# Сводка по графу
+# ---------------------------
+@dataclass(frozen=True)
+class GraphMetrics:
+    """
+    table : DataFrame по узлам (index = user_id) с колонками GRAPH_METRICS
+    """
+    table: pd.DataFrame
+    n_nodes: int
+    n_edges: int
+    density: float
+    n_components: int
+    component_sizes: np.ndarray
+
+    @property
+    def largest_component(self) -> int:
+        return int(self.component_sizes.max()) if len(self.component_sizes) else 0
+
+    def top(self, metric: str = "degree_centrality", n: int = 10) -> pd.DataFrame:
+        if metric not in self.table.columns:
+            raise ValueError(f"Неизвестная метрика {metric!r}. Доступно: {list(self.table.columns)}")
+        return self.table.nlargest(n, metric)
+
+    def user(self, user_id) -> pd.Series:
+        """Метрики одного пользователя — поиск по индексу."""
+        return self.table.loc[user_id]
+
+
+def compute_graph_metrics(
+    G: nx.Graph,
+    weight: Optional[str] = "weight",
+    betweenness_k: Optional[int] = 100,
+    seed: Optional[int] = None,
+    n_jobs: int = 1,
+    with_betweenness: bool = True,
+) -> GraphMetrics:
+    """Все метрики за один проход по матрице смежности графа G."""
+    A, nodes = graph_to_adjacency(G, weight=weight)
+    deg, deg_c = degree_centrality(A)
+    n_comp, labels, sizes = connected_components(A)
+
+    table = pd.DataFrame(
+        {
+            "degree": deg,
+            "degree_centrality": deg_c,
+            "pagerank": pagerank(A) if len(nodes) else np.zeros(0),
+            "component": labels,
+        },
+        index=pd.Index(nodes, name="user_id"),
+    )
+    if with_betweenness:
+        table["betweenness"] = approx_betweenness(A, k=betweenness_k, seed=seed, n_jobs=n_jobs)
+
+    return GraphMetrics(
+        table=table,
+        n_nodes=len(nodes),
+        n_edges=int(_structure(A).nnz // 2),
+        density=density(A),
+        n_components=n_comp,
+        component_sizes=sizes,
+    )
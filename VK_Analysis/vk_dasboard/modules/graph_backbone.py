@@ -0,0 +1,255 @@
+# graph_backbone.py
+# -------------------------------------------------
+# Разрежение графа схожести между build_similarity_graph и Louvain («скелет» графа).
+# В плотных тематических сегментах kNN с threshold=0.15, k=50 даёт почти клики — Louvain, layout
+# и отрисовка тратят время на рёбра, которые структуру не меняют.
+#
+#   disparity   : disparity filter (Serrano, Boguñá, Vespignani 2009) — ребро остаётся, если его доля
+#                 в силе узла значима на уровне alpha хотя бы для одного конца: (1 - w/s)^(k-1) < alpha
+#   mutual_topk : ребро остаётся, если оно среди top-k по весу у обоих концов (mutual=False — у любого)
+#   quantile    : рёбра с весом не ниже квантиля q
+#
+# Всё — маски по ненулевым элементам csr (без циклов по узлам); узлы графа сохраняются все.
+# Петли не фильтруются: в графе групп дубликатов (--dedup supernode) петля — клика группы
+# (вес m(m-1)/2), а не ребро kNN; backbone_adjacency возвращает диагональ A как есть.
+# keep_strongest=True — самое сильное ребро каждого узла остаётся всегда: без него на почти равных
+# весах (плотные сегменты) фильтры оставляют много изолированных узлов, и каждый становится
+# отдельным «сообществом». compare_backbone — доля удалённых рёбер, модулярность и ARI разбиений до/после.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+from community import community_louvain
+from scipy.sparse import csr_matrix, diags, triu as sparse_triu
+from sklearn.metrics import adjusted_rand_score
+
+from graph_analytics import graph_to_adjacency
+
+BACKBONE_METHODS = ("disparity", "mutual_topk", "quantile")
+# параметр метода и значение по умолчанию
+BACKBONE_PARAMS = {"disparity": ("alpha", 0.05), "mutual_topk": ("k", 10), "quantile": ("q", 0.5)}
+
+
+def _without_loops(A: csr_matrix) -> csr_matrix:
+    A = csr_matrix(A, dtype=np.float64, copy=True)
+    A.setdiag(0)
+    A.eliminate_zeros()
+    A.sort_indices()
+    return A
+
+
+def _entry_rows(A: csr_matrix) -> np.ndarray:
+    return np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+
+
+def _symmetric_mask(A: csr_matrix, keep_entry: np.ndarray, both: bool) -> csr_matrix:
+    """Маска по элементам строк → симметричная: both=True — нужны оба конца, иначе любой."""
+    M = csr_matrix((keep_entry.astype(np.float64), A.indices, A.indptr), shape=A.shape)
+    M = M.minimum(M.T) if both else M.maximum(M.T)
+    return A.multiply(M).tocsr()
+
+
+# ---------------------------
+# Фильтры
+# ---------------------------
+def disparity_filter(A: csr_matrix, alpha: float = 0.05) -> csr_matrix:
+    """
+    Disparity filter: p = w_ij / s_i, alpha_ij = (1 - p)^(k_i - 1).
+    У узла степени 1 ребро по его стороне незначимо — остаётся, только если значимо для соседа.
+    """
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha должно быть в (0, 1].")
+    A = _without_loops(A)
+    rows = _entry_rows(A)
+    degree = np.diff(A.indptr).astype(np.float64)
+    strength = np.asarray(A.sum(axis=1)).ravel()
+    p = A.data / strength[rows]
+    pvalue = np.power(1.0 - p, degree[rows] - 1.0)
+    return _symmetric_mask(A, (pvalue < alpha) & (degree[rows] > 1), both=False)
+
+
+def mutual_topk(A: csr_matrix, k: int = 10, mutual: bool = True) -> csr_matrix:
+    """Ребро в top-k по весу у обоих концов (mutual=True) или хотя бы у одного."""
+    if k < 1:
+        raise ValueError("k должно быть >= 1.")
+    A = _without_loops(A)
+    rows = _entry_rows(A)
+    # ранг элемента внутри строки по убыванию веса
+    order = np.lexsort((-A.data, rows))
+    rank = np.empty(A.nnz, dtype=np.int64)
+    rank[order] = np.arange(A.nnz) - A.indptr[rows[order]]
+    return _symmetric_mask(A, rank < k, both=mutual)
+
+
+def quantile_prune(A: csr_matrix, q: float = 0.5) -> csr_matrix:
+    """Рёбра с весом >= квантиля q весов рёбер."""
+    if not 0 <= q < 1:
+        raise ValueError("q должно быть в [0, 1).")
+    A = _without_loops(A)
+    if A.nnz == 0:
+        return A
+    cut = np.quantile(sparse_triu(A, k=1).data, q)
+    B = A.copy()
+    B.data = np.where(B.data >= cut, B.data, 0.0)
+    B.eliminate_zeros()
+    return B
+
+
+def strongest_edges(A: csr_matrix) -> csr_matrix:
+    """Самое сильное ребро каждого узла (симметрично) — то же, что mutual_topk(k=1, mutual=False)."""
+    return mutual_topk(A, k=1, mutual=False)
+
+
+def backbone_adjacency(A: csr_matrix, method: str = "disparity", keep_strongest: bool = True, **params) -> csr_matrix:
+    if method == "disparity":
+        B = disparity_filter(A, alpha=params.get("alpha", BACKBONE_PARAMS["disparity"][1]))
+    elif method == "mutual_topk":
+        B = mutual_topk(A, k=int(params.get("k", BACKBONE_PARAMS["mutual_topk"][1])),
+                        mutual=params.get("mutual", True))
+    elif method == "quantile":
+        B = quantile_prune(A, q=params.get("q", BACKBONE_PARAMS["quantile"][1]))
+    else:
+        raise ValueError(f"Неизвестный метод разрежения {method!r}. Доступно: {BACKBONE_METHODS}")
+    if keep_strongest:
+        B = B.maximum(strongest_edges(A)).tocsr()
+    # фильтры работают без петель (_without_loops) — возвращаем их с исходными весами
+    loops = csr_matrix(A).diagonal()
+    if loops.any():
+        B = (B + diags(loops, format="csr")).tocsr()
+    return B
+
+
+def adjacency_to_graph(B: csr_matrix, nodes: List[Hashable], G: Optional[nx.Graph] = None, weight: str = "weight") -> nx.Graph:
+    """nx.Graph по csr; узлы (и их атрибуты из G) — все, даже без рёбер; диагональ — петли."""
+    H = nx.Graph()
+    H.add_nodes_from(G.nodes(data=True) if G is not None else nodes)
+    U = sparse_triu(B, k=0).tocoo()
+    H.add_weighted_edges_from(
+        ((nodes[i], nodes[j], w) for i, j, w in zip(U.row.tolist(), U.col.tolist(), U.data.tolist())), weight=weight
+    )
+    return H
+
+
+def extract_backbone(
+    G: nx.Graph, method: str = "disparity", keep_strongest: bool = True, weight: str = "weight", **params
+) -> nx.Graph:
+    """Разреженная копия G тем же методом/параметрами, что backbone_adjacency."""
+    A, nodes = graph_to_adjacency(G, weight=weight)
+    return adjacency_to_graph(backbone_adjacency(A, method, keep_strongest, **params), nodes, G, weight=weight)
+
+
+# ---------------------------
+# Сравнение до/после
+# ---------------------------
+@dataclass(frozen=True)
+class BackboneReport:
+    """
+    modularity_before   : разбиение полного графа на полном графе
+    modularity_after    : разбиение скелета, оценённое на полном графе (сколько структуры сохранилось)
+    modularity_backbone : разбиение скелета на самом скелете
+    ari                 : согласие разбиений до/после (1.0 — совпадают)
+    """
+    method: str
+    params: Dict[str, object]
+    edges_before: int
+    edges_after: int
+    isolated_nodes: int
+    communities_before: int
+    communities_after: int
+    modularity_before: float
+    modularity_after: float
+    modularity_backbone: float
+    ari: float
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def edge_reduction(self) -> float:
+        return 1.0 - self.edges_after / self.edges_before if self.edges_before else 0.0
+
+    @property
+    def modularity_change(self) -> float:
+        return self.modularity_after - self.modularity_before
+
+    def to_dict(self) -> dict:
+        out = asdict(self)
+        out.update(edge_reduction=round(self.edge_reduction, 4), modularity_change=round(self.modularity_change, 6))
+        return out
+
+
+def compare_backbone(
+    G: nx.Graph,
+    B: nx.Graph,
+    method: str = "",
+    params: Optional[Dict[str, object]] = None,
+    partition_before: Optional[Dict[Hashable, int]] = None,
+    partition_after: Optional[Dict[Hashable, int]] = None,
+    random_state=42,
+    resolution: float = 1.0,
+    weight: str = "weight",
+    seconds: Optional[Dict[str, float]] = None,
+) -> Tuple[BackboneReport, Dict[Hashable, int]]:
+    """
+    Louvain на G и B (если разбиения не переданы) и сравнение.
+    Возвращает (отчёт, разбиение скелета) — его можно сразу использовать дальше в пайплайне.
+    """
+    seconds = dict(seconds or {})
+    t0 = time.perf_counter()
+    if partition_before is None:
+        partition_before = community_louvain.best_partition(
+            G, weight=weight, random_state=random_state, resolution=resolution
+        )
+    if partition_after is None:
+        partition_after = community_louvain.best_partition(
+            B, weight=weight, random_state=random_state, resolution=resolution
+        )
+    seconds["louvain"] = time.perf_counter() - t0
+
+    nodes = list(G.nodes())
+    report = BackboneReport(
+        method=method,
+        params=dict(params or {}),
+        edges_before=G.number_of_edges(),
+        edges_after=B.number_of_edges(),
+        isolated_nodes=sum(1 for _ in nx.isolates(B)),
+        communities_before=len(set(partition_before.values())),
+        communities_after=len(set(partition_after.values())),
+        modularity_before=round(float(community_louvain.modularity(partition_before, G, weight=weight)), 6),
+        modularity_after=round(float(community_louvain.modularity(partition_after, G, weight=weight)), 6),
+        modularity_backbone=round(float(community_louvain.modularity(partition_after, B, weight=weight)), 6)
+        if B.number_of_edges() else 0.0,
+        ari=round(float(adjusted_rand_score([partition_before[n] for n in nodes], [partition_after[n] for n in nodes])), 4),
+        seconds={k: round(v, 3) for k, v in seconds.items()},
+    )
+    return report, partition_after
+
+
+def backbone_stage(
+    G: nx.Graph,
+    method: str = "disparity",
+    keep_strongest: bool = True,
+    random_state=42,
+    resolution: float = 1.0,
+    compare: bool = True,
+    weight: str = "weight",
+    **params,
+) -> Tuple[nx.Graph, Optional[BackboneReport], Optional[Dict[Hashable, int]]]:
+    """
+    Этап пайплайна: скелет графа (+ отчёт сравнения и разбиение скелета, если compare=True).
+    """
+    t0 = time.perf_counter()
+    B = extract_backbone(G, method=method, keep_strongest=keep_strongest, weight=weight, **params)
+    seconds = {"filter": time.perf_counter() - t0}
+    if not compare:
+        return B, None, None
+    name, default = BACKBONE_PARAMS[method]
+    report, partition = compare_backbone(
+        G, B, method=method, params={name: params.get(name, default), "keep_strongest": keep_strongest},
+        random_state=random_state, resolution=resolution, weight=weight, seconds=seconds,
+    )
+    return B, report, partition
@@ -1,19 +1,24 @@
 
 
-import networkx as nx
+from community_stats import get_community_stats
+from graph_analytics import connected_components, density, graph_to_adjacency
+
 def generate_report(df, graph, top_communities, suspicious_communities):
     """Генерация полного отчета"""
 
+    # матрица смежности один раз: плотность и компоненты считаются по ней (scipy.sparse.csgraph)
+    adjacency, _ = graph_to_adjacency(graph)
+
     print("=" * 60)
     print("АНАЛИТИЧЕСКИЙ ОТЧЕТ ПО СООБЩЕСТВАМ ВК")
     print("=" * 60)
 
     print(f"\nОбщая статистика:")
     print(f"   Всего пользователей: {len(df)}")
-    print \
-        (f"   Всего уникальных сообществ: {len(set([item for sublist in df['communities_list'] for item in sublist]))}")
+    # уникальные сообщества — из кэшированных сумм столбцов (community_stats), без сплющивания списков
+    print(f"   Всего уникальных сообществ: {get_community_stats(df).n_communities}")
     print(f"   Связей в графе: {graph.number_of_edges()}")
-    print(f"   Плотность графа: {nx.density(graph):.4f}")
+    print(f"   Плотность графа: {density(adjacency):.4f}")
 
     print(f"\n Топ-5 самых популярных сообществ:")
     for i, (comm, count) in enumerate(top_communities[:5], 1):
@@ -25,7 +30,7 @@ def generate_report(df, graph, top_communities, suspicious_communities):
             print(f" {comm}: {count} подписчиков")
 
     # Анализ компонент связности
-    components = list(nx.connected_components(graph))
-    print(f"\n Компоненты связности: {len(components)}")
-    print(f"   Размер самой большой компоненты: {len(max(components, key=len))}")
+    n_components, _, component_sizes = connected_components(adjacency)
+    print(f"\n Компоненты связности: {n_components}")
+    print(f"   Размер самой большой компоненты: {component_sizes.max()}")
 
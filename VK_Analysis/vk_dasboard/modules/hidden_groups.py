@@ -1,54 +1,457 @@
 import streamlit as st
 import pandas as pd
-import networkx as nx
-from e import visualize_network_advanced
+from e import (
+    analyze_hidden_communities,
+    build_network_figure,
+    build_topic_lookup,
+    compute_plot_layout,
+    visualize_network_advanced,
+)
+from community_significance import NULL_MODELS, SignificanceResult, permutation_test
 from create_ug_matrix import UserCommunityData
 from build_grap_similarity import build_similarity_graph
-from collections import Counter
-from pathlib import Path
-import tempfile
-import os
-# TODO:  теперь загрузка осуществляется через элемент управления Streamlit — компонент file_uploader, позволяя пользователям выбирать файлы вручную.
+from data_loader import get_registry
+from duplicate_users import DuplicateGroups, build_dedup_similarity_graph
+from graph_backbone import BACKBONE_METHODS, BACKBONE_PARAMS, backbone_stage
+from ego_network import EGO_SOURCES, analyze_ego_network, extract_ego_network
+from louvain_levels import LouvainHierarchy, build_louvain_hierarchy, refine_hierarchy
+from resolution_sweep import DEFAULT_RESOLUTIONS, DEFAULT_SEEDS, ResolutionSweep, run_resolution_sweep
+from topic_profile import build_topic_profile
+from overlap_index import CommunityOverlapIndex
+from suspicious_detector import SuspiciousMatcher, detect_suspicious
+# Рёбра и тематики берутся из общего реестра датасетов (data_loader): файлы проекта подхватываются
+# автоматически, file_uploader — только чтобы подменить их своими.
+# Разбор CSV и производные структуры кэшируются по отпечатку файла: rerun и переключение страниц ничего не перечитывают.
+# Граф схожести и все уровни Louvain тоже кэшируются — переключение уровня/поддерева только фильтрует готовое.
 
 
+@st.cache_resource(show_spinner=False)
+def _user_community_data(edges_fp: str, _edges_df: pd.DataFrame) -> UserCommunityData:
+    return UserCommunityData.from_edges_df(_edges_df)
+
+
+@st.cache_resource(show_spinner=False)
+def _topic_lookup(topics_fp: str, edges_fp: str, _topics_df: pd.DataFrame, _data: UserCommunityData):
+    # lookup выровнен по столбцам матрицы — поэтому ключ зависит от обоих файлов
+    return build_topic_lookup(_topics_df, _data.community_ids)
+
+
+@st.cache_resource(show_spinner=False)
+def _overlap_index(edges_fp: str, _data: UserCommunityData) -> CommunityOverlapIndex:
+    return CommunityOverlapIndex(_data)
+
+
+@st.cache_resource(show_spinner=False)
+def _similarity_graph(dataset_key: str, dedup: bool, _data: UserCommunityData):
+    if dedup:
+        return build_dedup_similarity_graph(_data, threshold=0.15, k_neighbors=50)
+    return build_similarity_graph(_data, threshold=0.15, k_neighbors=50), None
+
+
+@st.cache_resource(show_spinner="Разрежаю граф...")
+def _backbone(dataset_key: str, dedup: bool, method: str, param: float, compare: bool, _G):
+    # compare=True — ещё два Louvain (полный граф и скелет) только ради отчёта
+    name, _ = BACKBONE_PARAMS[method]
+    B, report, _ = backbone_stage(_G, method=method, compare=compare, **{name: param})
+    return B, report
+
+
+@st.cache_resource(show_spinner="Считаю уровни Louvain...")
+def _louvain_hierarchy(dataset_key: str, dedup: bool, _G, _data: UserCommunityData, _topic_lookup) -> LouvainHierarchy:
+    # только уровни дендрограммы; уточнение (Louvain внутри каждого сообщества) — _refined_hierarchy, по запросу
+    return build_louvain_hierarchy(_G, _data, _topic_lookup)
+
+
+@st.cache_resource(show_spinner="Дроблю сообщества Louvain внутри себя...")
+def _refined_hierarchy(dataset_key: str, dedup: bool, _hierarchy: LouvainHierarchy, _G, _data: UserCommunityData,
+                       _topic_lookup) -> LouvainHierarchy:
+    return refine_hierarchy(_hierarchy, _G, _data, _topic_lookup, refine_depth=1)
+
+
+@st.cache_resource(show_spinner=False)
+def _overview(dataset_key: str, dedup: bool, _G, _edges_df, _topic_lookup, _data, _hierarchy):
+    # тематики передаём в памяти (без временного CSV на диске)
+    return visualize_network_advanced(
+        G=_G, edges_df=_edges_df, topic_lookup=_topic_lookup, data=_data, hierarchy=_hierarchy,
+        title="Анализ скрытых сообществ ВКонтакте", show=False, max_nodes_plot=2000
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _subtree_layout(dataset_key: str, dedup: bool, within, _G, _nodes):
+    # раскладка зависит только от набора узлов поддерева, а не от уровня раскраски
+    H = _G if within is None else _G.subgraph(_nodes)
+    return compute_plot_layout(H, max_nodes_plot=2000)
+
+
+@st.cache_resource(show_spinner="Перебираю resolution...")
+def _resolution_sweep(dataset_key: str, dedup: bool, resolutions: tuple, seeds: tuple, _G) -> ResolutionSweep:
+    # каждое разбиение перебора хранится — слайдер только переключает готовые результаты
+    return run_resolution_sweep(_G, resolutions=resolutions, seeds=seeds, n_jobs=-1)
+
+
+@st.cache_resource(show_spinner=False)
+def _sweep_analysis(dataset_key: str, dedup: bool, resolutions: tuple, seeds: tuple, resolution: float,
+                    _sweep: ResolutionSweep, _G, _data, _topic_lookup):
+    partition = _sweep.partition(resolution)
+    profile = build_topic_profile(_data, partition, _topic_lookup)
+    summary_rows, cluster_info = analyze_hidden_communities(
+        _G, partition, {}, _topic_lookup.topic_map(), _topic_lookup.name_map(), top_n_groups=5, profile=profile,
+    )
+    return partition, summary_rows, cluster_info
+
+
+@st.cache_resource(show_spinner="Перестановочный тест...")
+def _significance(dataset_key: str, dedup: bool, null_model: str, n_permutations: int, _G, _partition) -> SignificanceResult:
+    return permutation_test(_G, _partition, null_model=null_model, n_permutations=n_permutations, n_jobs=-1)
+
+
+def overlap_search(index: CommunityOverlapIndex, topic_lookup):
+    """Поиск «кто ещё состоит в этих группах» по инвертированному индексу (без графа)."""
+    with st.expander("🔎 Поиск по общим группам", expanded=False):
+        name_map = topic_lookup.name_map()
+
+        col1, col2, col3 = st.columns([3, 1, 1])
+        user_id = col1.text_input("user_id профиля", key="overlap_user")
+        min_shared = col2.number_input("Мин. общих групп", min_value=1, value=3, step=1)
+        top_k = col3.number_input("Сколько показать", min_value=1, value=20, step=5)
+        if user_id.strip():
+            try:
+                similar = index.similar_users(user_id, min_shared=int(min_shared), top_k=int(top_k))
+            except KeyError as e:
+                st.warning(str(e))
+            else:
+                st.caption(f"Групп у профиля: {len(index.groups_of(user_id))}, найдено похожих: {len(similar)}")
+                st.dataframe(similar, use_container_width=True)
+
+        other_id = st.text_input("Сравнить с user_id", key="overlap_other")
+        if user_id.strip() and other_id.strip():
+            try:
+                n_common, common = index.co_membership(user_id, other_id)
+            except KeyError as e:
+                st.warning(str(e))
+            else:
+                st.write(f"Общих групп: **{n_common}**")
+                if common:
+                    st.write(", ".join(f"{c} — {name_map.get(c, '')}" for c in common[:50]))
+
+        groups_raw = st.text_input("community_id через запятую: кто состоит в этих группах", key="overlap_groups")
+        groups = [g for g in groups_raw.replace(";", ",").split(",") if g.strip()]
+        if groups:
+            mode = st.radio("Условие", ["any", "all"], horizontal=True,
+                            format_func=lambda m: "хотя бы в одной" if m == "any" else "во всех")
+            try:
+                members = index.members_of(groups, mode=mode)
+            except KeyError as e:
+                st.warning(str(e))
+            else:
+                st.caption(f"Участников: {len(members)}")
+                st.dataframe(members.head(1000), use_container_width=True)
+
 
 # Функция загрузки данных
 def load_data():
-    # Пользователи загружают CSV с ребрами и тематическими метками сообществ
-    edges_csv = st.file_uploader("Выберите файл с ребрами (User-Community)", type=["csv"])
-    topics_csv = st.file_uploader("Выберите файл с темой сообществ", type=["csv"])
+    registry = get_registry()
+    edges_src, topics_src = registry.find("edges"), registry.find("topics")
 
-    if edges_csv is not None and topics_csv is not None:
-        edges_df = pd.read_csv(edges_csv, sep=";", encoding="utf-8-sig", dtype=str)
-        topics_df = pd.read_csv(topics_csv, sep=";", encoding="utf-8-sig", dtype=str)
+    # Свои файлы — по желанию; без них работаем на датасете проекта
+    with st.expander("Загрузить свои файлы", expanded=edges_src is None or topics_src is None):
+        edges_csv = st.file_uploader("Выберите файл с ребрами (User-Community)", type=["csv"])
+        topics_csv = st.file_uploader("Выберите файл с темой сообществ", type=["csv"])
+    if edges_csv is not None:
+        edges_src = registry.source_for_upload("edges", edges_csv.getvalue(), edges_csv.name)
+    if topics_csv is not None:
+        topics_src = registry.source_for_upload("topics", topics_csv.getvalue(), topics_csv.name)
 
-        # Формируем структуру данных
-        user_community_data = UserCommunityData.from_edges_df(edges_df)
-        return edges_df, topics_df, user_community_data
-    else:
-        return None, None, None
+    if edges_src is None or topics_src is None:
+        st.info("Файлы users_communities_edges.csv / community_topics.csv не найдены — загрузите их вручную.")
+        return None, None, None, None, None
+
+    st.caption(f"Рёбра: **{edges_src.label}** • Тематики: **{topics_src.label}**")
+    edges_df = registry.load(edges_src)
+    topics_df = registry.load(topics_src)
+
+    # Формируем структуру данных
+    user_community_data = _user_community_data(edges_src.fingerprint, edges_df)
+    topic_lookup = _topic_lookup(topics_src.fingerprint, edges_src.fingerprint, topics_df, user_community_data)
+    overlap_index = _overlap_index(edges_src.fingerprint, user_community_data)
+    dataset_key = f"{edges_src.fingerprint}:{topics_src.fingerprint}"
+    return edges_df, topic_lookup, user_community_data, overlap_index, dataset_key
 
 # Анализ и визуализация данных
 def analyze_and_visualize():
-    edges_df, topics_df, user_community_data = load_data()
+    edges_df, topic_lookup, user_community_data, overlap_index, dataset_key = load_data()
+
+    if edges_df is not None and topic_lookup is not None:
+        # запросы по общим группам работают сразу, без построения графа
+        overlap_search(overlap_index, topic_lookup)
+
+        mode = st.radio("Область анализа", ["all", "ego"], horizontal=True, key="analysis_scope",
+                        format_func=lambda m: "Вся выборка" if m == "all" else "Окружение профиля")
+        if mode == "ego":
+            ego_section(user_community_data, topic_lookup, overlap_index)
+            return
+
+        dedup = st.checkbox(
+            "Схлопнуть одинаковые наборы подписок перед kNN", value=False, key="dedup_rows",
+            help="kNN считается по одному представителю на набор, дубликаты связываются кликой с весом 1.0",
+        )
+        G, dup_groups = _similarity_graph(dataset_key, dedup, user_community_data)
+        if dup_groups is not None:
+            duplicates_section(dup_groups, user_community_data)
+        if G.number_of_edges() == 0:
+            st.warning("Граф схожести получился без рёбер — скрытые сообщества не найдены.")
+            return
+        # дальше всё кэшируется по ключу графа: полный или скелет с конкретным методом/параметром
+        graph_key, G = backbone_section(G, dataset_key, dedup)
+
+        hierarchy = _louvain_hierarchy(graph_key, dedup, G, user_community_data, topic_lookup)
+        partition, summary_rows, cluster_info, fig = _overview(
+            graph_key, dedup, G, edges_df, topic_lookup, user_community_data, hierarchy
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        # drill-down: полное распределение тематик выбранного скрытого сообщества
+        cids = [r["hidden_comm_id"] for r in summary_rows]
+        if cids:
+            cid = st.selectbox("Тематики скрытого сообщества", cids)
+            topic_counts = cluster_info[cid].get("topic_counts", {})
+            if topic_counts:
+                st.bar_chart(pd.Series(topic_counts, name="членств").sort_values(ascending=False))
+
+        significance_section(G, partition, summary_rows, graph_key, dedup)
+        levels_section(hierarchy, G, graph_key, dedup, user_community_data, topic_lookup)
+        resolution_section(G, user_community_data, topic_lookup, graph_key, dedup)
+        suspicious_section(user_community_data, topic_lookup, partition)
+
+
+def backbone_section(G, dataset_key: str, dedup: bool):
+    """Необязательное разрежение графа перед Louvain. Возвращает (ключ кэша графа, граф)."""
+    labels = {"none": "без разрежения", "disparity": "disparity filter",
+              "mutual_topk": "взаимный top-k", "quantile": "квантиль весов"}
+    col1, col2 = st.columns([2, 1])
+    method = col1.selectbox("Разрежение графа перед Louvain", ("none",) + BACKBONE_METHODS,
+                            key="backbone_method", format_func=labels.get)
+    if method == "none":
+        return dataset_key, G
+
+    name, default = BACKBONE_PARAMS[method]
+    if method == "mutual_topk":
+        param = float(col2.number_input("k", min_value=1, max_value=200, value=int(default), step=1, key="backbone_k"))
+    elif method == "disparity":
+        param = col2.number_input("alpha", min_value=0.001, max_value=1.0, value=float(default), step=0.05,
+                                  key="backbone_alpha")
+    else:
+        param = col2.number_input("q", min_value=0.0, max_value=0.99, value=float(default), step=0.05,
+                                  key="backbone_q")
+
+    compare = st.checkbox("Сравнить с полным графом (модулярность, ARI)", value=False, key="backbone_report",
+                          help="Louvain считается ещё и на полном графе — заметно дольше")
+    B, report = _backbone(dataset_key, dedup, method, param, compare, G)
+    if report is None:
+        before = G.number_of_edges()
+        st.metric("Рёбер", f"{B.number_of_edges():,}", delta=f"-{1.0 - B.number_of_edges() / before:.0%}",
+                  delta_color="off")
+        return f"{dataset_key}|{method}={param}", B
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Рёбер", f"{report.edges_after:,}", delta=f"-{report.edge_reduction:.0%}", delta_color="off")
+    c2.metric("Модулярность на полном графе", f"{report.modularity_after:.4f}",
+              delta=f"{report.modularity_change:+.4f}")
+    c3.metric("ARI с разбиением полного графа", f"{report.ari:.3f}")
+    c4.metric("Сообществ", report.communities_after, delta=report.communities_after - report.communities_before,
+              delta_color="off")
+    return f"{dataset_key}|{method}={param}", B
+
+
+def significance_section(G, partition, summary_rows, dataset_key: str, dedup: bool):
+    """z-score и p-value significance_score против перемешанных меток (крупное ≠ значимое)."""
+    with st.expander("📊 Значимость скрытых сообществ (перестановочный тест)", expanded=False):
+        col1, col2 = st.columns([2, 1])
+        null_model = col1.radio(
+            "Нулевая модель", NULL_MODELS, horizontal=True, key="significance_null",
+            format_func=lambda m: "перемешать метки" if m == "label" else "перемешать внутри страт степени",
+        )
+        n_perm = col2.number_input("Перестановок", min_value=50, max_value=5000, value=200, step=50,
+                                   key="significance_perm")
+        if not st.checkbox("Посчитать", key="significance_run"):
+            return
+
+        result = _significance(dataset_key, dedup, null_model, int(n_perm), G, partition)
+        topics = {r["hidden_comm_id"]: r["top_topics"] for r in summary_rows}
+        table = result.table.assign(top_topics=result.table["hidden_comm_id"].map(topics))
+        st.caption(
+            f"Значимых при q ≤ 0.05: **{len(result.significant())}** из {len(table)} • "
+            f"{result.n_permutations} перестановок за {result.seconds:.1f} c"
+        )
+        st.dataframe(table, use_container_width=True)
+
+
+def levels_section(hierarchy: LouvainHierarchy, G, dataset_key: str, dedup: bool, data: UserCommunityData,
+                   topic_lookup):
+    """Drill-down по уровням Louvain: от макро-сообществ к под-сообществам выбранного поддерева."""
+    with st.expander(f"🧬 Уровни скрытых сообществ: {hierarchy.n_levels}", expanded=False):
+        # дендрограмма из одного уровня — уточнение Louvain внутри сообществ, только если его попросили
+        refine = hierarchy.n_levels == 1 and st.checkbox(
+            "Дробить сообщества Louvain внутри себя", key="levels_refine",
+            help="Louvain на подграфе каждого сообщества — заметно дольше основного расчёта",
+        )
+        if refine:
+            hierarchy = _refined_hierarchy(dataset_key, dedup, hierarchy, G, data, topic_lookup)
+        st.dataframe(hierarchy.level_table(), use_container_width=True)
+        if hierarchy.n_levels == 1:
+            if refine:
+                st.caption("Сообщества не дробятся дальше: внутри них нет устойчивой структуры.")
+            return
+
+        depth = st.select_slider(
+            "Уровень детализации", options=list(range(hierarchy.n_levels)), key="levels_depth",
+            format_func=lambda d: f"{d}: {hierarchy.levels[d].n_communities} сообществ",
+        )
+        within = None
+        if depth > 0:
+            parent = hierarchy.levels[depth - 1]
+            sizes = parent.sizes()
+            options = ["all"] + [r["hidden_comm_id"] for r in parent.summary_rows]
+            choice = st.selectbox(
+                f"Внутри сообщества уровня {depth - 1}", options, key=f"levels_parent_{depth}",
+                format_func=lambda c: "все" if c == "all" else f"{c} ({sizes[c]} польз.)",
+            )
+            if choice != "all":
+                within = (depth - 1, int(choice))
+
+        level = hierarchy.levels[depth]
+        nodes, partition, summary_rows, cluster_info = hierarchy.view(depth, within)
+        H, pos = _subtree_layout(dataset_key, dedup, within, G, nodes)
+        title = f"Уровень {depth}" + (f", сообщество {within[1]} уровня {within[0]}" if within else "")
+        fig = build_network_figure(H, pos, partition, cluster_info, summary_rows, level.modularity, title=title)
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(pd.DataFrame(summary_rows), use_container_width=True)
+
 
-    if edges_df is not None and topics_df is not None:
-        # Создаем временный CSV файл из DataFrame
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8-sig') as tmp:
-            topics_df.to_csv(tmp.name, sep=';', index=False)
-            topics_csv_path = tmp.name
+def resolution_section(G, data: UserCommunityData, topic_lookup, dataset_key: str, dedup: bool):
+    """Перебор resolution × seed в пуле процессов; слайдер переключает уже посчитанные разбиения."""
+    with st.expander("🎚️ Подбор детализации (resolution)", expanded=False):
+        col1, col2 = st.columns([3, 1])
+        res_raw = col1.text_input("Значения resolution через запятую", key="sweep_resolutions",
+                                  value=", ".join(f"{r:g}" for r in DEFAULT_RESOLUTIONS))
+        n_seeds = col2.number_input("Seed на значение", min_value=1, max_value=10, value=len(DEFAULT_SEEDS), step=1,
+                                    key="sweep_seeds")
+        try:
+            resolutions = tuple(sorted({float(x) for x in res_raw.replace(";", ",").split(",") if x.strip()}))
+        except ValueError:
+            st.warning("resolution — числа через запятую.")
+            return
+        seeds = tuple(range(int(n_seeds)))
+        if st.button("Запустить перебор", key="sweep_run"):
+            st.session_state["sweep_args"] = (resolutions, seeds)
+        if "sweep_args" not in st.session_state:
+            st.caption("Louvain считается для каждой пары resolution × seed; результаты кэшируются.")
+            return
 
-        G = build_similarity_graph(user_community_data, threshold=0.15, k_neighbors=50)
+        resolutions, seeds = st.session_state["sweep_args"]
+        try:
+            sweep = _resolution_sweep(dataset_key, dedup, resolutions, seeds, G)
+        except ValueError as e:
+            st.warning(str(e))
+            return
+        table = sweep.table()
+        st.caption(f"Запусков: {len(sweep.runs)} за {sweep.seconds:.1f} c, процессов: {sweep.n_jobs}")
+        st.dataframe(table, use_container_width=True)
+        st.line_chart(table.set_index("resolution")[["communities"]])
+        st.line_chart(table.set_index("resolution")[["modularity", "ari_mean"]])
 
-        partition, summary_rows, cluster_info, fig = visualize_network_advanced(
-            G=G, edges_df=edges_df, topics_csv_path=topics_csv_path,
-            title="Анализ скрытых сообществ ВКонтакте", show=True, max_nodes_plot=2000
+        default = min(sweep.resolutions, key=lambda r: abs(r - 1.0))
+        resolution = st.select_slider("resolution", options=sweep.resolutions, value=default, key="sweep_resolution")
+        partition, summary_rows, cluster_info = _sweep_analysis(
+            dataset_key, dedup, resolutions, seeds, resolution, sweep, G, data, topic_lookup
         )
+        best = sweep.run(resolution)
+        H, pos = _subtree_layout(dataset_key, dedup, None, G, None)
+        fig = build_network_figure(H, pos, partition, cluster_info, summary_rows, best.modularity,
+                                   title=f"resolution = {resolution:g} (seed {best.seed})")
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(pd.DataFrame(summary_rows), use_container_width=True)
+
+
+def ego_section(data: UserCommunityData, topic_lookup, index: CommunityOverlapIndex):
+    """Режим цели: граф, Louvain и риск только по 1–2 уровням окружения одного профиля."""
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    target = col1.text_input("user_id цели", key="ego_target")
+    hops = col2.selectbox("Уровней", [1, 2], index=1, key="ego_hops")
+    min_shared = col3.number_input("Мин. общих групп", min_value=1, value=3, step=1, key="ego_min_shared")
+    max_per_hop = col4.number_input("Макс. на уровень", min_value=10, value=300, step=50, key="ego_max_per_hop")
+    if not target.strip():
+        st.info("Введите user_id — анализ построится только по его окружению.")
+        return
+
+    try:
+        ego = extract_ego_network(data, target, hops=int(hops), source=EGO_SOURCES[0], index=index,
+                                  min_shared=int(min_shared), max_per_hop=int(max_per_hop))
+    except KeyError as e:
+        st.warning(str(e))
+        return
+    profiles = get_registry().load_default("profiles")
+    report = analyze_ego_network(ego, topic_lookup, profiles=profiles)
+
+    counts = ego.hop_counts()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Пользователей в окружении", f"{ego.n_users:,}")
+    c2.metric("1-й / 2-й уровень", f"{counts.get(1, 0)} / {counts.get(2, 0)}")
+    c3.metric("Скрытых сообществ", len(report.summary_rows))
+    c4.metric("Сообщество цели", report.target_cluster if report.target_cluster is not None else "—")
+    st.caption("Время, с: " + ", ".join(f"{k} {v}" for k, v in report.seconds.items()))
+
+    if report.graph.number_of_edges():
+        H, pos = compute_plot_layout(report.graph, max_nodes_plot=2000)
+        fig = build_network_figure(H, pos, report.partition, report.cluster_info, report.summary_rows,
+                                   report.modularity, title=f"Окружение профиля {ego.target}")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("В окружении нет рёбер выше порога схожести.")
+
+    st.dataframe(pd.DataFrame(report.summary_rows), use_container_width=True)
+    if report.risk_summary is not None:
+        st.markdown("**Риск по анкетам окружения**")
+        st.dataframe(report.risk_summary, use_container_width=True)
+    if not report.suspicious.communities.empty:
+        st.markdown("**Подозрительные сообщества в окружении**")
+        st.dataframe(report.suspicious.by_cluster(report.partition), use_container_width=True)
+    st.markdown("**Участники окружения**")
+    st.dataframe(report.members, use_container_width=True)
+
+
+def duplicates_section(groups: DuplicateGroups, data: UserCommunityData):
+    """Группы пользователей с одинаковым набором подписок — признак бот-ферм и клонов."""
+    summary = groups.summary()
+    with st.expander(f"🤖 Одинаковые наборы подписок: {summary['duplicate_users']}", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Уникальных наборов", f"{summary['unique_sets']:,}")
+        col2.metric("Групп дубликатов", f"{summary['duplicate_groups']:,}")
+        col3.metric("Крупнейшая группа", f"{summary['largest_group']:,}")
+        if summary["duplicate_groups"]:
+            st.dataframe(groups.table(data).head(1000), use_container_width=True)
+
+
+def suspicious_section(data: UserCommunityData, topic_lookup, partition):
+    """Подозрительные сообщества: каждое сообщество проверяется один раз, счётчики — X @ mask."""
+    with st.expander("⚠️ Подозрительные сообщества", expanded=False):
+        extra = st.text_input("Дополнительные ключевые слова (через запятую)", key="suspicious_extra")
+        matcher = SuspiciousMatcher().add_keywords(*extra.split(","))
+        st.caption("Ключевые слова: " + ", ".join(matcher.keywords))
+
+        report = detect_suspicious(data, matcher=matcher, topic_lookup=topic_lookup)
+        if report.communities.empty:
+            st.info("Подозрительных сообществ не найдено.")
+            return
+        st.write(f"Сообществ: **{len(report.communities)}**, пользователей с такими членствами: "
+                 f"**{int((report.user_counts > 0).sum())}**")
+        st.dataframe(report.communities, use_container_width=True)
+        st.markdown("**По скрытым сообществам**")
+        st.dataframe(report.by_cluster(partition), use_container_width=True)
 
-        os.unlink(topics_csv_path)  # Cleanup
 # Структура страницы
 def page(card):
     st.markdown("## 🕵️ Латентные интересы и группы")
     st.write("Этот инструмент помогает выявить скрытые группы и сообщества, основываясь на взаимодействии пользователей.")
 
-    analyze_and_visualize()
\ No newline at end of file
+    analyze_and_visualize()
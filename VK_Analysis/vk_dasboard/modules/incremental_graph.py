@@ -0,0 +1,502 @@
+# incremental_graph.py
+# -------------------------------------------------
+# Инкрементальное обновление графа схожести по суточным дельтам краулера:
+#   added   : строки user_id;community_id, которые появились
+#   removed : строки user_id;community_id, которые пропали
+#
+# Вместо полного kNN по всем пользователям:
+#   1) дельта применяется к хранимой CSR (user × community)
+#   2) кандидаты = все, кто делит сообщество с изменившимися пользователями
+#      (через инвертированный индекс community → users, т.е. CSC / Xn.T)
+#   3) списки соседей пересчитываются для изменившихся и тех кандидатов,
+#      чей top-k реально может поменяться
+#   4) матрица смежности графа патчится на месте (только строки затронутых узлов и их соседей)
+#
+# Строки X, нормированной Xn и инвертированного индекса Xn.T заменяются только для изменившихся
+# пользователей и их сообществ — без арифметики по всей матрице.
+# Состояние (матрица, списки соседей, смежность графа) сохраняется между запусками;
+# nx.Graph собирается из смежности только при обращении к G (Louvain, анализ).
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix, load_npz, save_npz, triu as sparse_triu
+
+from create_ug_matrix import UserCommunityData
+from build_grap_similarity import knn_sparse, knn_to_adjacency, normalize_rows, topk_sparse_rows
+
+
+@dataclass(frozen=True)
+class DeltaStats:
+    """Итог применения одной дельты."""
+    added_edges: int
+    removed_edges: int
+    new_users: int
+    new_communities: int
+    changed_users: int
+    candidate_users: int
+    affected_users: int
+    graph_edges_removed: int
+    graph_edges_added: int
+    seconds: float
+
+
+def _normalize_delta(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Приводим дельту к двум строковым колонкам без дублей."""
+    if df is None or len(df) == 0:
+        return pd.DataFrame({"user_id": pd.Series(dtype=object), "community_id": pd.Series(dtype=object)})
+    if "user_id" not in df.columns or "community_id" not in df.columns:
+        raise ValueError(f"Нужны колонки user_id и community_id. Сейчас: {list(df.columns)}")
+    out = df[["user_id", "community_id"]].astype(str)
+    out = out.apply(lambda s: s.str.strip())
+    return out.drop_duplicates(ignore_index=True)
+
+
+def _replace_rows(M: csr_matrix, rows: np.ndarray, new: csr_matrix) -> csr_matrix:
+    """
+    Копия M, где строки rows (по возрастанию) заменены строками new (len(rows) × M.shape[1]).
+    Остальные строки копируются срезами indices/data как есть.
+    """
+    new = csr_matrix(new, dtype=M.dtype)
+    lengths = np.diff(M.indptr)
+    lengths[rows] = np.diff(new.indptr)
+    indptr = np.zeros(M.shape[0] + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+
+    idx_parts, data_parts = [], []
+    prev = 0
+    for j, r in enumerate(rows.tolist()):
+        lo, hi = M.indptr[prev], M.indptr[r]
+        idx_parts += [M.indices[lo:hi], new.indices[new.indptr[j]:new.indptr[j + 1]]]
+        data_parts += [M.data[lo:hi], new.data[new.indptr[j]:new.indptr[j + 1]]]
+        prev = r + 1
+    idx_parts.append(M.indices[M.indptr[prev]:])
+    data_parts.append(M.data[M.indptr[prev]:])
+    indices = np.concatenate(idx_parts).astype(M.indices.dtype, copy=False)
+    return csr_matrix((np.concatenate(data_parts), indices, indptr), shape=M.shape)
+
+
+def _pair_keys(rows: np.ndarray, cols: np.ndarray, weights: np.ndarray, n: int):
+    """Неориентированные пары (min * n + max) без повторов и их веса."""
+    keys = np.minimum(rows, cols) * n + np.maximum(rows, cols)
+    keys, first = np.unique(keys, return_index=True)
+    return keys, weights[first]
+
+
+class IncrementalSimilarityGraph:
+    """
+    Граф схожести пользователей с поддержкой дельт.
+
+    Хранит:
+      X          : csr (n_users × n_communities), как UserCommunityData.csr
+      distances  : (n_users × (k_neighbors + 1)) — формат compute_knn, 0-й сосед — сам пользователь
+      indices    : (n_users × (k_neighbors + 1)), пустые позиции = -1
+      A          : csr (n_users × n_users) — смежность графа, как knn_to_adjacency на этих списках
+      G          : nx.Graph по A (собирается при первом обращении) — тот же, что build_graph_from_knn
+
+    Пользователи, у которых не осталось ни одного сообщества, в G не попадают,
+    но их строка в матрице сохраняется (индексы стабильны между дельтами).
+    """
+
+    def __init__(
+        self,
+        X: csr_matrix,
+        user_ids: List[str],
+        community_ids: List[str],
+        distances: np.ndarray,
+        indices: np.ndarray,
+        A: csr_matrix,
+        threshold: float = 0.15,
+        k_neighbors: int = 50,
+        chunk_size: int = 2000,
+    ):
+        self.X = X
+        self.user_ids = list(user_ids)
+        self.community_ids = list(community_ids)
+        self.user_index: Dict[str, int] = {u: i for i, u in enumerate(self.user_ids)}
+        self.comm_index: Dict[str, int] = {c: j for j, c in enumerate(self.community_ids)}
+        self.distances = distances
+        self.indices = indices
+        self.A = csr_matrix(A, dtype=np.float64)
+        self._G: Optional[nx.Graph] = None
+        self.threshold = float(threshold)
+        self.k_neighbors = int(k_neighbors)
+        self.chunk_size = int(chunk_size)
+
+        self.last_touched: set = set()  # узлы, у которых после последней дельты поменялись рёбра
+        self._Xn = normalize_rows(X)
+        self._XnT = self._Xn.T.tocsr()  # инвертированный индекс: строка = сообщество, indices = его участники
+
+    @property
+    def G(self) -> nx.Graph:
+        """nx.Graph по смежности A; после дельты собирается заново при следующем обращении."""
+        if self._G is None:
+            uid = self.user_ids
+            live = np.flatnonzero(np.diff(self.X.indptr) > 0)
+            U = sparse_triu(self.A, k=1).tocoo()
+            G = nx.Graph()
+            G.add_nodes_from((uid[i] for i in live.tolist()), type="user")
+            G.add_weighted_edges_from(
+                (uid[i], uid[j], w) for i, j, w in zip(U.row.tolist(), U.col.tolist(), U.data.tolist())
+            )
+            self._G = G
+        return self._G
+
+    # ---------------------------
+    # Построение
+    # ---------------------------
+    @classmethod
+    def build(
+        cls,
+        data: UserCommunityData,
+        threshold: float = 0.15,
+        k_neighbors: int = 50,
+        n_jobs: int = -1,
+        chunk_size: int = 2000,
+        show_progress: bool = False,
+    ) -> IncrementalSimilarityGraph:
+        """Полная сборка (один раз): точный sparse-kNN + граф."""
+        n_users = data.csr.shape[0]
+        if n_users < 2:
+            raise ValueError("Нужно минимум 2 пользователя для построения графа.")
+
+        distances, indices = knn_sparse(data.csr, min(k_neighbors + 1, n_users), chunk_size=chunk_size, n_jobs=n_jobs)
+        distances, indices = cls._pad(distances, indices, k_neighbors)
+        A = knn_to_adjacency(distances, indices, threshold=threshold)
+        return cls(
+            data.csr, data.user_ids, data.community_ids, distances, indices, A,
+            threshold=threshold, k_neighbors=k_neighbors, chunk_size=chunk_size,
+        )
+
+    @staticmethod
+    def _pad(distances: np.ndarray, indices: np.ndarray, k_neighbors: int):
+        """Дополняем до k_neighbors + 1 колонок (когда пользователей меньше k)."""
+        width = k_neighbors + 1
+        if distances.shape[1] >= width:
+            return distances, indices
+        n = distances.shape[0]
+        d = np.ones((n, width), dtype=np.float32)
+        i = np.full((n, width), -1, dtype=np.int64)
+        d[:, :distances.shape[1]] = distances
+        i[:, :indices.shape[1]] = indices
+        return d, i
+
+    # ---------------------------
+    # Дельта
+    # ---------------------------
+    def _grow(self, users: pd.Series, comms: pd.Series) -> tuple[int, int]:
+        """Регистрируем новых пользователей/сообщества (новые строки/столбцы в конце)."""
+        new_users = [u for u in users.drop_duplicates() if u not in self.user_index]
+        new_comms = [c for c in comms.drop_duplicates() if c not in self.comm_index]
+
+        for u in new_users:
+            self.user_index[u] = len(self.user_ids)
+            self.user_ids.append(u)
+        for c in new_comms:
+            self.comm_index[c] = len(self.community_ids)
+            self.community_ids.append(c)
+
+        if new_users:
+            n_old = self.distances.shape[0]
+            n_new = len(new_users)
+            d = np.ones((n_new, self.distances.shape[1]), dtype=self.distances.dtype)
+            i = np.full((n_new, self.indices.shape[1]), -1, dtype=self.indices.dtype)
+            d[:, 0] = 0.0
+            i[:, 0] = np.arange(n_old, n_old + n_new)
+            self.distances = np.vstack([self.distances, d])
+            self.indices = np.vstack([self.indices, i])
+
+        if new_users or new_comms:
+            shape = (len(self.user_ids), len(self.community_ids))
+            X = self.X.copy()
+            X.resize(shape)
+            self.X = X
+            # новые строки/столбцы пустые — Xn, Xn.T и A только расширяются
+            self._Xn.resize(shape)
+            self._XnT.resize(shape[::-1])
+            self.A.resize((shape[0], shape[0]))
+        return len(new_users), len(new_comms)
+
+    def _delta_matrix(self, df: pd.DataFrame) -> csr_matrix:
+        """Бинарная матрица дельты в координатах self.X (неизвестные id отбрасываются)."""
+        rows = df["user_id"].map(self.user_index)
+        cols = df["community_id"].map(self.comm_index)
+        ok = (rows.notna() & cols.notna()).to_numpy()
+        rows = rows[ok].astype(np.int64).to_numpy()
+        cols = cols[ok].astype(np.int64).to_numpy()
+        D = csr_matrix((np.ones(len(rows), dtype=self.X.dtype), (rows, cols)), shape=self.X.shape)
+        D.data[:] = 1  # дубли не накапливаются
+        return D
+
+    def _candidate_users(self, changed: np.ndarray, X_old: csr_matrix) -> np.ndarray:
+        """
+        Все, кто делит сообщество с изменившимися пользователями до или после дельты.
+        Строки остальных пользователей не менялись, поэтому участников сообществ
+        достаточно брать из новой матрицы (инвертированный индекс _XnT).
+        """
+        cols = np.union1d(X_old[changed].indices, self.X[changed].indices)
+        members = self._XnT[cols].indices if cols.size else np.empty(0, dtype=np.int64)
+        return np.setdiff1d(members, changed).astype(np.int64)
+
+    def _affected_users(self, changed: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """
+        Из кандидатов пересчитываем только тех, чей top-k может поменяться:
+          - в текущем списке есть изменившийся пользователь (его схожесть поменялась), или
+          - новая схожесть с изменившимся пользователем не ниже k-го соседа (может войти в список).
+        Проверка — маленькое произведение Xn[candidates] @ Xn[changed].T, а не на всю базу.
+        """
+        if candidates.size == 0:
+            return changed
+        is_changed = np.zeros(self.X.shape[0], dtype=bool)
+        is_changed[changed] = True
+
+        nb = self.indices[candidates, 1:]
+        in_list = (is_changed[np.where(nb >= 0, nb, 0)] & (nb >= 0)).any(axis=1)
+
+        kth = np.where(nb[:, -1] >= 0, 1.0 - self.distances[candidates, -1].astype(np.float64), 0.0)
+        best = np.zeros(len(candidates))
+        XcT = self._Xn[changed].T.tocsr()
+        for start in range(0, len(candidates), self.chunk_size):
+            block = candidates[start:start + self.chunk_size]
+            best[start:start + len(block)] = (self._Xn[block] @ XcT).max(axis=1).toarray().ravel()
+        # запас на округление float32 — лишний пересчёт безопаснее пропущенного
+        may_enter = (best > 0) & (best >= kth - 1e-6)
+
+        return np.union1d(changed, candidates[in_list | may_enter]).astype(np.int64)
+
+    def _recompute_rows(self, rows: np.ndarray):
+        """Точный kNN (Cosine) только для строк rows: Xn[rows] @ Xn.T блоками."""
+        k = self.indices.shape[1] - 1
+        for start in range(0, len(rows), self.chunk_size):
+            block = rows[start:start + self.chunk_size]
+            S = self._Xn[block] @ self._XnT
+            sim, idx = topk_sparse_rows(S, k, self_cols=block)
+            self.distances[block, 0] = 0.0
+            self.indices[block, 0] = block
+            self.distances[block, 1:] = 1.0 - sim
+            self.indices[block, 1:] = idx
+
+    def _new_rows(self, X_old: csr_matrix, added: pd.DataFrame, removed: pd.DataFrame):
+        """
+        Строки X, которые задевает дельта: (изменившиеся строки, их новые значения).
+        Считается только по строкам из дельты, вся матрица не сравнивается.
+        """
+        D = self._delta_matrix(added) if len(added) else None
+        R = self._delta_matrix(removed) if len(removed) else None
+        in_delta = np.zeros(X_old.shape[0], dtype=bool)
+        for M in (D, R):
+            if M is not None:
+                in_delta |= np.diff(M.indptr) > 0
+        rows = np.flatnonzero(in_delta)
+        old = X_old[rows]
+        new = old.maximum(D[rows]) if D is not None else old
+        if R is not None:
+            new = new - new.multiply(R[rows])
+        new = csr_matrix(new, dtype=X_old.dtype)
+        new.eliminate_zeros()
+        new.sort_indices()
+        diff = abs(new - old)
+        diff.eliminate_zeros()
+        local = np.flatnonzero(np.diff(diff.indptr) > 0)
+        return rows[local].astype(np.int64), new[local]
+
+    def _patch_index(self, changed: np.ndarray, X_old: csr_matrix):
+        """Xn — строки changed; Xn.T — только сообщества, где changed состояли до или после дельты."""
+        self._Xn = _replace_rows(self._Xn, changed, normalize_rows(self.X[changed]))
+        comms = np.union1d(X_old[changed].indices, self.X[changed].indices).astype(np.int64)
+        if comms.size == 0:
+            return
+        is_changed = np.zeros(self.X.shape[0], dtype=bool)
+        is_changed[changed] = True
+        old = self._XnT[comms].tocoo()
+        keep = ~is_changed[old.col]
+        fresh = self._Xn[changed].T.tocsr()[comms].tocoo()
+        block = csr_matrix(
+            (np.concatenate([old.data[keep], fresh.data]),
+             (np.concatenate([old.row[keep], fresh.row]), np.concatenate([old.col[keep], changed[fresh.col]]))),
+            shape=(len(comms), self.X.shape[0]),
+        )
+        block.sort_indices()
+        self._XnT = _replace_rows(self._XnT, comms, block)
+
+    def _patch_graph(self, affected: np.ndarray, changed: np.ndarray, X_old: csr_matrix) -> tuple[int, int]:
+        """
+        Строки смежности A для затронутых узлов и их соседей:
+          - к незатронутому соседу w ребро остаётся, только если его держит список соседей w
+            (он не менялся, как и схожесть пары);
+          - остальные рёбра затронутых узлов строятся заново из новых списков
+            (вес — максимум из двух направлений, как в knn_to_adjacency).
+        """
+        A, n, uid = self.A, self.X.shape[0], self.user_ids
+        is_aff = np.zeros(n, dtype=bool)
+        is_aff[affected] = True
+        row_nnz = np.diff(self.X.indptr)
+
+        old = A[affected].tocoo()
+        a_old, w_old = affected[old.row], old.col.astype(np.int64)
+
+        # входящие рёбра от незатронутых соседей
+        outside = ~is_aff[w_old]
+        w_out, a_out = w_old[outside], a_old[outside]
+        nb = self.indices[w_out, 1:]
+        sims = 1.0 - self.distances[w_out, 1:].astype(np.float64)
+        hit = (nb == a_out[:, None]) & (sims >= self.threshold)
+        held = hit.any(axis=1) & (row_nnz[a_out] > 0)
+        s_in = np.where(hit, sims, 0.0).max(axis=1)[held] if len(w_out) else np.empty(0)
+
+        # исходящие рёбра из пересчитанных списков
+        live = affected[row_nnz[affected] > 0]
+        rows = np.repeat(live, self.indices.shape[1] - 1)
+        cols = self.indices[live, 1:].ravel()
+        s_out = 1.0 - self.distances[live, 1:].astype(np.float64).ravel()
+        mask = (s_out >= self.threshold) & (cols >= 0) & (cols != rows)
+
+        P = coo_matrix(
+            (np.concatenate([s_out[mask], s_in]),
+             (np.concatenate([rows[mask], w_out[held]]), np.concatenate([cols[mask], a_out[held]]))),
+            shape=(n, n),
+        ).tocsr()
+        P = P.maximum(P.T).tocsr()
+
+        # строки A, где есть хоть одно ребро затронутого узла (до или после)
+        touched_rows = np.union1d(np.union1d(affected, w_old), np.flatnonzero(np.diff(P.indptr) > 0))
+        base = A[touched_rows].tocoo()
+        keep = ~(is_aff[touched_rows[base.row]] | is_aff[base.col])
+        block = csr_matrix(
+            (base.data[keep], (base.row[keep], base.col[keep])), shape=(len(touched_rows), n)
+        ) + P[touched_rows]
+        block.sort_indices()
+        self.A = _replace_rows(A, touched_rows, block)
+        self._G = None
+
+        # чистый итог: снятые и вновь добавленные с тем же весом рёбра изменением не считаются
+        k_old, w_before = _pair_keys(a_old, w_old, old.data, n)
+        P_up = sparse_triu(P, k=1).tocoo()
+        k_new, w_after = _pair_keys(P_up.row.astype(np.int64), P_up.col.astype(np.int64), P_up.data, n)
+        gone_keys = k_old[~np.isin(k_old, k_new)]
+        born_keys = k_new[~np.isin(k_new, k_old)]
+        common, i_old, i_new = np.intersect1d(k_old, k_new, return_indices=True)
+        reweighted = common[w_before[i_old] != w_after[i_new]]
+
+        was_live = np.diff(X_old.indptr)[changed] > 0
+        is_live = row_nnz[changed] > 0
+        nodes = np.concatenate([
+            changed[was_live != is_live],  # ушли из графа / появились в нём
+            *(np.concatenate([keys // n, keys % n]) for keys in (gone_keys, born_keys, reweighted)),
+        ])
+        self.last_touched = {uid[i] for i in np.unique(nodes).tolist()}
+        return int(gone_keys.size), int(born_keys.size)
+
+    def apply_delta(
+        self,
+        added: Optional[pd.DataFrame] = None,
+        removed: Optional[pd.DataFrame] = None,
+    ) -> DeltaStats:
+        """
+        Применяет суточную дельту и патчит граф на месте.
+        Стоимость пропорциональна числу затронутых пользователей и их сообществ, а не всей базе:
+        заменяются только изменившиеся строки X / Xn / Xn.T и строки смежности затронутых узлов.
+        """
+        t0 = time.perf_counter()
+        added = _normalize_delta(added)
+        removed = _normalize_delta(removed)
+
+        n_new_users, n_new_comms = self._grow(added["user_id"], added["community_id"])
+
+        X_old = self.X
+        changed, rows = self._new_rows(X_old, added, removed)
+
+        self.last_touched = set()
+        if changed.size == 0:
+            return DeltaStats(len(added), len(removed), n_new_users, n_new_comms, 0, 0, 0, 0, 0,
+                              round(time.perf_counter() - t0, 4))
+
+        self.X = _replace_rows(X_old, changed, rows)
+        self._patch_index(changed, X_old)
+
+        candidates = self._candidate_users(changed, X_old)
+        affected = self._affected_users(changed, candidates)
+        self._recompute_rows(affected)
+        g_removed, g_added = self._patch_graph(affected, changed, X_old)
+
+        return DeltaStats(
+            added_edges=len(added),
+            removed_edges=len(removed),
+            new_users=n_new_users,
+            new_communities=n_new_comms,
+            changed_users=int(changed.size),
+            candidate_users=int(candidates.size + changed.size),
+            affected_users=int(affected.size),
+            graph_edges_removed=g_removed,
+            graph_edges_added=g_added,
+            seconds=round(time.perf_counter() - t0, 4),
+        )
+
+    # ---------------------------
+    # Снимок / сохранение
+    # ---------------------------
+    def to_user_community_data(self) -> UserCommunityData:
+        """Снимок UserCommunityData (только пользователи с членствами, порядок сохраняется)."""
+        X = self.X
+        live = np.flatnonzero(np.diff(X.indptr) > 0)
+        csr = X[live] if live.size != X.shape[0] else X
+        user_ids = [self.user_ids[i] for i in live.tolist()]
+        coo = csr.tocoo()
+        edges_df = pd.DataFrame({
+            "user_id": np.asarray(user_ids, dtype=object)[coo.row],
+            "community_id": np.asarray(self.community_ids, dtype=object)[coo.col],
+        })
+        return UserCommunityData(
+            csr=csr,
+            user_ids=user_ids,
+            community_ids=list(self.community_ids),
+            user_index={u: i for i, u in enumerate(user_ids)},
+            comm_index=dict(self.comm_index),
+            edges_df=edges_df,
+        )
+
+    def save(self, state_dir: str | Path) -> Path:
+        """Состояние для следующего запуска: матрица, списки соседей, смежность графа, id и параметры."""
+        state_dir = Path(state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        save_npz(state_dir / "matrix.npz", self.X)
+        save_npz(state_dir / "graph.npz", self.A, compressed=False)
+        np.savez(state_dir / "knn.npz", distances=self.distances, indices=self.indices)
+        meta = {
+            "threshold": self.threshold,
+            "k_neighbors": self.k_neighbors,
+            "chunk_size": self.chunk_size,
+            "user_ids": self.user_ids,
+            "community_ids": self.community_ids,
+        }
+        (state_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return state_dir
+
+    @classmethod
+    def load(cls, state_dir: str | Path) -> IncrementalSimilarityGraph:
+        """Загрузка состояния без kNN и без nx: смежность — из graph.npz (в старых состояниях — из списков соседей)."""
+        state_dir = Path(state_dir)
+        if not (state_dir / "meta.json").exists():
+            raise FileNotFoundError(f"Нет сохранённого состояния в {state_dir.resolve()}")
+        meta = json.loads((state_dir / "meta.json").read_text(encoding="utf-8"))
+        X = load_npz(state_dir / "matrix.npz").tocsr()
+        knn = np.load(state_dir / "knn.npz")
+        distances, indices = knn["distances"], knn["indices"]
+        graph_path = state_dir / "graph.npz"
+        if graph_path.exists():
+            A = load_npz(graph_path).tocsr()
+        else:
+            A = knn_to_adjacency(distances, indices, threshold=meta["threshold"])
+        return cls(
+            X, meta["user_ids"], meta["community_ids"], distances, indices, A,
+            threshold=meta["threshold"], k_neighbors=meta["k_neighbors"], chunk_size=meta["chunk_size"],
+        )
@@ -0,0 +1,315 @@
+# louvain_levels.py
+# -------------------------------------------------
+# Иерархия скрытых сообществ для drill-down: Louvain считается один раз, хранятся все уровни.
+#
+#   уровни дендрограммы : community_louvain.generate_dendrogram — каждый проход Louvain даёт уровень,
+#                         последний (самый крупный) совпадает с best_partition при том же random_state
+#   уточнение           : (refine_depth > 0) если дендрограмма мелкая — Louvain внутри каждого сообщества
+#                         самого детального уровня; разбиение принимается, только если модулярность
+#                         подграфа >= refine_min_modularity (иначе сообщество остаётся целым);
+#                         refine_hierarchy добавляет эти уровни к уже построенной иерархии (UI — по запросу)
+#
+# Уровни хранятся от крупного к мелкому: levels[0] — макро-сообщества (= detect_hidden_communities),
+# parents[d][cid] — сообщество уровня d-1, в которое входит cid уровня d.
+# Для каждого уровня заранее посчитаны analyze_hidden_communities (summary_rows / cluster_info),
+# поэтому переключение уровня и поддерева в UI — только выборка из готовых данных.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from community import community_louvain
+
+from create_ug_matrix import UserCommunityData
+from e import analyze_hidden_communities
+from topic_profile import build_topic_profile
+
+LEVEL_SOURCES = ("dendrogram", "refine")
+
+
+@dataclass(frozen=True)
+class LouvainLevel:
+    """
+    depth        : 0 — макро-сообщества, дальше — мельче
+    source       : "dendrogram" (уровень generate_dendrogram) или "refine" (Louvain внутри сообществ)
+    partition    : user_id -> hidden_comm_id этого уровня
+    summary_rows : как analyze_hidden_communities (по убыванию score)
+    """
+    depth: int
+    source: str
+    partition: Dict[str, int]
+    modularity: float
+    summary_rows: List[dict]
+    cluster_info: dict
+
+    @property
+    def n_communities(self) -> int:
+        return len(self.cluster_info)
+
+    def sizes(self) -> Dict[int, int]:
+        return {cid: int(info["size"]) for cid, info in self.cluster_info.items()}
+
+
+@dataclass(frozen=True)
+class LouvainHierarchy:
+    levels: List[LouvainLevel]
+    parents: List[Dict[int, int]]
+    seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def n_levels(self) -> int:
+        return len(self.levels)
+
+    @property
+    def top(self) -> LouvainLevel:
+        return self.levels[0]
+
+    def _check_depth(self, depth: int):
+        if not 0 <= depth < self.n_levels:
+            raise ValueError(f"depth={depth} вне диапазона 0..{self.n_levels - 1}")
+
+    def children(self, depth: int, cid: int) -> List[int]:
+        """Сообщества уровня depth+1 внутри cid (уровень depth)."""
+        self._check_depth(depth)
+        if depth + 1 >= self.n_levels:
+            return []
+        return sorted(c for c, p in self.parents[depth + 1].items() if p == cid)
+
+    def ancestor(self, depth: int, cid: int, target_depth: int) -> int:
+        """Сообщество уровня target_depth (<= depth), в которое входит cid."""
+        self._check_depth(depth)
+        if target_depth > depth:
+            raise ValueError("target_depth должен быть не глубже depth.")
+        for d in range(depth, target_depth, -1):
+            cid = self.parents[d][cid]
+        return cid
+
+    def subtree(self, depth: int, within: Optional[Tuple[int, int]] = None) -> List[int]:
+        """
+        id сообществ уровня depth; within=(уровень, cid) — только потомки этого сообщества.
+        """
+        self._check_depth(depth)
+        cids = list(self.levels[depth].cluster_info)
+        if within is None:
+            return cids
+        parent_depth, parent_cid = within
+        return [c for c in cids if self.ancestor(depth, c, parent_depth) == parent_cid]
+
+    def members(self, depth: int, cids) -> List[str]:
+        keep = set(cids)
+        return [u for u, c in self.levels[depth].partition.items() if c in keep]
+
+    def view(self, depth: int, within: Optional[Tuple[int, int]] = None):
+        """
+        Срез для отрисовки: (узлы, partition, summary_rows, cluster_info) только по поддереву.
+        Ничего не пересчитывает — фильтрует готовые данные уровня.
+        """
+        level = self.levels[depth]
+        keep = set(self.subtree(depth, within))
+        partition = {u: c for u, c in level.partition.items() if c in keep}
+        summary_rows = [r for r in level.summary_rows if r["hidden_comm_id"] in keep]
+        cluster_info = {c: info for c, info in level.cluster_info.items() if c in keep}
+        return list(partition), partition, summary_rows, cluster_info
+
+    # ---------------------------
+    # Таблицы
+    # ---------------------------
+    def level_table(self) -> pd.DataFrame:
+        """Сводка по уровням: число сообществ, модулярность, размеры, score."""
+        rows = []
+        for level in self.levels:
+            sizes = np.array(list(level.sizes().values()), dtype=np.int64)
+            scores = np.array([r["score"] for r in level.summary_rows], dtype=np.float64)
+            rows.append({
+                "depth": level.depth,
+                "source": level.source,
+                "communities": level.n_communities,
+                "modularity": round(level.modularity, 4),
+                "largest": int(sizes.max()) if len(sizes) else 0,
+                "median_size": float(np.median(sizes)) if len(sizes) else 0.0,
+                "singletons": int((sizes == 1).sum()),
+                "max_score": round(float(scores.max()), 6) if len(scores) else 0.0,
+            })
+        return pd.DataFrame(rows)
+
+    def partition_table(self) -> pd.DataFrame:
+        """user_id и id сообщества на каждом уровне (level_0 — макро)."""
+        users = list(self.top.partition)
+        return pd.DataFrame({
+            "user_id": users,
+            **{f"level_{lv.depth}": [lv.partition[u] for u in users] for lv in self.levels},
+        })
+
+    def summary_table(self) -> pd.DataFrame:
+        """summary_rows всех уровней с колонками depth и parent_comm_id."""
+        frames = []
+        for level in self.levels:
+            df = pd.DataFrame(level.summary_rows)
+            if df.empty:
+                continue
+            parents = self.parents[level.depth]
+            df.insert(0, "depth", level.depth)
+            df.insert(2, "parent_comm_id", df["hidden_comm_id"].map(parents).astype("Int64"))
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+# ---------------------------
+# Построение
+# ---------------------------
+def _parent_map(fine: Dict[str, int], coarse: Dict[str, int]) -> Dict[int, int]:
+    """Каждое сообщество мелкого уровня целиком лежит в одном сообществе крупного."""
+    return {c: coarse[u] for u, c in fine.items()}
+
+
+def _refine(
+    G: nx.Graph,
+    partition: Dict[str, int],
+    weight: str,
+    random_state,
+    resolution: float,
+    min_size: int,
+    min_modularity: float,
+) -> Dict[str, int]:
+    """Louvain внутри каждого сообщества; слабое внутреннее разбиение не принимается."""
+    clusters = defaultdict(list)
+    for u, c in partition.items():
+        clusters[c].append(u)
+
+    refined: Dict[str, int] = {}
+    next_id = 0
+    # нумерация — по родителям в порядке размера, внутри родителя — как best_partition
+    for c in sorted(clusters, key=lambda c: (-len(clusters[c]), c)):
+        users = clusters[c]
+        sub = G.subgraph(users)
+        split = None
+        if len(users) >= min_size and sub.number_of_edges():
+            sub_part = community_louvain.best_partition(
+                sub, weight=weight, resolution=resolution, random_state=random_state
+            )
+            if len(set(sub_part.values())) > 1 and \
+                    community_louvain.modularity(sub_part, sub, weight=weight) >= min_modularity:
+                split = sub_part
+        if split is None:
+            for u in users:
+                refined[u] = next_id
+            next_id += 1
+            continue
+        labels = sorted(set(split.values()))
+        local = {lab: next_id + i for i, lab in enumerate(labels)}
+        for u in users:
+            refined[u] = local[split[u]]
+        next_id += len(labels)
+    return refined
+
+
+def _analyze_level(G, data, topic_lookup, partition, depth, source, weight, top_n_groups) -> LouvainLevel:
+    profile = build_topic_profile(data, partition, topic_lookup)
+    summary_rows, cluster_info = analyze_hidden_communities(
+        G, partition, {}, topic_lookup.topic_map(), topic_lookup.name_map(), top_n_groups=top_n_groups,
+        profile=profile,
+    )
+    return LouvainLevel(
+        depth=depth,
+        source=source,
+        partition=partition,
+        modularity=float(community_louvain.modularity(partition, G, weight=weight)),
+        summary_rows=summary_rows,
+        cluster_info=cluster_info,
+    )
+
+
+def build_louvain_hierarchy(
+    G: nx.Graph,
+    data: UserCommunityData,
+    topic_lookup,
+    weight: str = "weight",
+    random_state=None,
+    resolution: float = 1.0,
+    refine_depth: int = 0,
+    refine_min_size: int = 20,
+    refine_min_modularity: float = 0.1,
+    top_n_groups: int = 5,
+) -> LouvainHierarchy:
+    """
+    Все уровни Louvain одним вызовом generate_dendrogram (+ refine_depth уровней уточнения, см. refine_hierarchy)
+    и analyze_hidden_communities для каждого уровня.
+    levels[0].partition совпадает с detect_hidden_communities(G, random_state=...) .
+    """
+    if G.number_of_edges() == 0:
+        raise ValueError("Граф без рёбер: иерархию сообществ построить нельзя.")
+    seconds: Dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    dendrogram = community_louvain.generate_dendrogram(
+        G, weight=weight, resolution=resolution, random_state=random_state
+    )
+    top = len(dendrogram) - 1
+    partitions = [community_louvain.partition_at_level(dendrogram, top - i) for i in range(len(dendrogram))]
+    seconds["dendrogram"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    levels = [
+        _analyze_level(G, data, topic_lookup, partition, depth, LEVEL_SOURCES[0], weight, top_n_groups)
+        for depth, partition in enumerate(partitions)
+    ]
+    parents = [_parent_map(p, partitions[d - 1]) if d else {} for d, p in enumerate(partitions)]
+    seconds["analyze"] = time.perf_counter() - t0
+
+    hierarchy = LouvainHierarchy(levels=levels, parents=parents, seconds={k: round(v, 3) for k, v in seconds.items()})
+    if refine_depth > 0:
+        hierarchy = refine_hierarchy(
+            hierarchy, G, data, topic_lookup, refine_depth=refine_depth, weight=weight,
+            random_state=random_state, resolution=resolution, min_size=refine_min_size,
+            min_modularity=refine_min_modularity, top_n_groups=top_n_groups,
+        )
+    return hierarchy
+
+
+def refine_hierarchy(
+    hierarchy: LouvainHierarchy,
+    G: nx.Graph,
+    data: UserCommunityData,
+    topic_lookup,
+    refine_depth: int = 1,
+    weight: str = "weight",
+    random_state=None,
+    resolution: float = 1.0,
+    min_size: int = 20,
+    min_modularity: float = 0.1,
+    top_n_groups: int = 5,
+) -> LouvainHierarchy:
+    """
+    Новая иерархия: к уровням hierarchy добавлено до refine_depth уровней уточнения
+    (Louvain внутри каждого сообщества самого детального уровня). Отдельно от build_louvain_hierarchy,
+    чтобы UI считал уточнение (это Louvain на каждом сообществе) только по запросу.
+    """
+    levels, parents = list(hierarchy.levels), list(hierarchy.parents)
+    seconds = dict(hierarchy.seconds)
+
+    t0 = time.perf_counter()
+    partitions = []
+    last = levels[-1].partition
+    for _ in range(max(int(refine_depth), 0)):
+        refined = _refine(G, last, weight, random_state, resolution, min_size, min_modularity)
+        if len(set(refined.values())) == len(set(last.values())):
+            break  # ни одно сообщество не дробится — глубже уровней не будет
+        partitions.append(refined)
+        last = refined
+    seconds["refine"] = round(time.perf_counter() - t0, 3)
+
+    t0 = time.perf_counter()
+    for partition in partitions:
+        depth = len(levels)
+        levels.append(_analyze_level(G, data, topic_lookup, partition, depth, LEVEL_SOURCES[1], weight, top_n_groups))
+        parents.append(_parent_map(partition, levels[depth - 1].partition))
+    seconds["analyze"] = round(seconds.get("analyze", 0.0) + time.perf_counter() - t0, 3)
+
+    return LouvainHierarchy(levels=levels, parents=parents, seconds=seconds)
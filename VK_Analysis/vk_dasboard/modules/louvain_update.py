@@ -0,0 +1,240 @@
+# louvain_update.py
+# -------------------------------------------------
+# Louvain с тёплым стартом для медленно меняющегося графа:
+#   - предыдущее разбиение берётся как начальное (partition= в python-louvain)
+#   - пересобираются только окрестности изменившихся узлов:
+#       нетронутые узлы каждого старого сообщества склеиваются в один супер-узел,
+#       затронутые узлы стартуют синглтонами
+#   - id сообществ стабилизируются по максимальному пересечению с прошлым запуском,
+#     чтобы дашборды и история оставались сравнимыми
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+from community import community_louvain
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+@dataclass(frozen=True)
+class LouvainUpdateStats:
+    """Что пересчитывалось при тёплом старте."""
+    nodes: int
+    touched_nodes: int
+    reduced_nodes: int
+    reduced_edges: int
+    communities: int
+    modularity: float
+    seconds: float
+
+
+# больше ячеек — блок пересечений сопоставляется жадно, без плотной матрицы под linear_sum_assignment
+MAX_DENSE_BLOCK_CELLS = 4_000_000
+
+
+def _match_block(M: csr_matrix, rows: np.ndarray, cols: np.ndarray) -> Iterable[Tuple[int, int]]:
+    """Пары (new, prev) внутри одной связной компоненты пересечений."""
+    if len(rows) == 1 or len(cols) == 1 or len(rows) * len(cols) <= MAX_DENSE_BLOCK_CELLS:
+        block = M[rows][:, cols].toarray()
+        r, c = linear_sum_assignment(block, maximize=True)
+        keep = block[r, c] > 0
+        return zip(rows[r[keep]].tolist(), cols[c[keep]].tolist())
+    # жадно: по убыванию пересечения, пока оба сообщества свободны
+    sub = M[rows][:, cols].tocoo()
+    order = np.argsort(-sub.data, kind="stable")
+    used_r, used_c, pairs = set(), set(), []
+    for r, c in zip(sub.row[order].tolist(), sub.col[order].tolist()):
+        if r not in used_r and c not in used_c:
+            used_r.add(r)
+            used_c.add(c)
+            pairs.append((int(rows[r]), int(cols[c])))
+    return pairs
+
+
+def _match_overlaps(M: csr_matrix) -> Dict[int, int]:
+    """
+    Паросочетание максимального пересечения по разреженной матрице new × prev.
+    Компоненты двудольного графа ненулевых пересечений независимы: оптимум по каждой
+    из них — оптимум в целом. Компоненты 1×1 сопоставляются сразу, без linear_sum_assignment.
+    """
+    n_new, n_prev = M.shape
+    M = M.tocsr()
+    coo = M.tocoo()
+    bipartite = csr_matrix(
+        (np.ones(coo.nnz), (coo.row, coo.col + n_new)), shape=(n_new + n_prev, n_new + n_prev)
+    )
+    _, comp = connected_components(bipartite, directed=False)
+    row_comp, col_comp = comp[:n_new], comp[n_new:]
+
+    has_row = np.diff(M.indptr) > 0
+    has_col = np.bincount(coo.col, minlength=n_prev) > 0
+    n_rows = np.bincount(row_comp[has_row], minlength=len(comp))
+    n_cols = np.bincount(col_comp[has_col], minlength=len(comp))
+
+    mapping: Dict[int, int] = {}
+    single = (n_rows == 1) & (n_cols == 1)
+    one = single[row_comp[coo.row]]
+    mapping.update(zip(coo.row[one].tolist(), coo.col[one].tolist()))
+
+    rest_rows = np.flatnonzero(has_row & ~single[row_comp])
+    rest_cols = np.flatnonzero(has_col & ~single[col_comp])
+    if rest_rows.size:
+        r_order = rest_rows[np.argsort(row_comp[rest_rows], kind="stable")]
+        c_order = rest_cols[np.argsort(col_comp[rest_cols], kind="stable")]
+        r_split = np.flatnonzero(np.diff(row_comp[r_order])) + 1
+        c_split = np.flatnonzero(np.diff(col_comp[c_order])) + 1
+        for rows, cols in zip(np.split(r_order, r_split), np.split(c_order, c_split)):
+            mapping.update(_match_block(M, rows, cols))
+    return mapping
+
+
+def stabilize_labels(prev: Dict[Hashable, int], new: Dict[Hashable, int]) -> Dict[Hashable, int]:
+    """
+    Перенумерация new так, чтобы сообщество получало id того прошлого сообщества,
+    с которым у него больше всего общих узлов (оптимальное паросочетание по связным блокам
+    разреженной матрицы пересечений, см. _match_overlaps).
+    Сообщества без пары получают новые id после max(prev).
+    """
+    if not new:
+        return {}
+    nodes = list(new.keys())
+    new_codes, new_labels = _codes([new[n] for n in nodes])
+
+    prev_vals = [prev.get(n) for n in nodes]
+    common = np.array([v is not None for v in prev_vals])
+    mapping: Dict[int, int] = {}
+
+    if common.any() and prev:
+        prev_codes, prev_labels = _codes([v for v in prev_vals if v is not None])
+        M = csr_matrix(
+            (np.ones(int(common.sum())), (new_codes[common], prev_codes)),
+            shape=(len(new_labels), len(prev_labels)),
+        )
+        mapping = {r: int(prev_labels[c]) for r, c in _match_overlaps(M).items()}
+
+    next_id = (max(prev.values()) + 1) if prev else 0
+    # новые сообщества нумеруем по убыванию размера — как best_partition
+    sizes = np.bincount(new_codes, minlength=len(new_labels))
+    for r in np.argsort(-sizes, kind="stable").tolist():
+        if r not in mapping:
+            mapping[r] = next_id
+            next_id += 1
+
+    return {n: mapping[int(c)] for n, c in zip(nodes, new_codes.tolist())}
+
+
+def _codes(values) -> Tuple[np.ndarray, np.ndarray]:
+    labels, codes = np.unique(np.asarray(values, dtype=np.int64), return_inverse=True)
+    return codes.astype(np.int64), labels
+
+
+def _reduced_graph(
+    G: nx.Graph, blocks: Dict[Hashable, int], n_blocks: int, weight: str
+) -> nx.Graph:
+    """
+    Граф блоков B.T @ A @ B (sparse): вес ребра между блоками — сумма весов,
+    петля блока — сумма внутренних рёбер (как community_louvain.induced_graph).
+    """
+    nodelist = list(G.nodes())
+    A = nx.to_scipy_sparse_array(G, nodelist=nodelist, weight=weight, format="csr")
+    b = np.fromiter((blocks[n] for n in nodelist), dtype=np.int64, count=len(nodelist))
+    B = csr_matrix((np.ones(len(b)), (np.arange(len(b)), b)), shape=(len(b), n_blocks))
+
+    M = B.T @ A @ B
+    self_loops = np.bincount(b, weights=A.diagonal(), minlength=n_blocks)
+    return block_graph(M, self_loops, n_blocks, weight)
+
+
+def block_graph(M, self_loops: np.ndarray, n_blocks: int, weight: str = "weight") -> nx.Graph:
+    """
+    nx-граф блоков из M = B.T @ A @ B и суммы петель по блокам
+    (общая часть для графа в памяти и графа на диске — см. disk_graph.DiskGraph.induced_graph).
+    """
+    M = M.tocoo()
+    H = nx.Graph()
+    H.add_nodes_from(range(n_blocks))
+    upper = M.row < M.col
+    H.add_weighted_edges_from(
+        zip(M.row[upper].tolist(), M.col[upper].tolist(), M.data[upper].tolist()), weight=weight
+    )
+    diag = M.row == M.col
+    inner = (M.data[diag] + self_loops[M.row[diag]]) / 2.0
+    H.add_weighted_edges_from(
+        ((i, i, w) for i, w in zip(M.row[diag].tolist(), inner.tolist()) if w > 0), weight=weight
+    )
+    return H
+
+
+def update_partition(
+    G: nx.Graph,
+    prev_partition: Dict[Hashable, int],
+    touched: Optional[Iterable[Hashable]] = None,
+    weight: str = "weight",
+    random_state=None,
+    resolution: float = 1.0,
+    stabilize: bool = True,
+) -> Tuple[Dict[Hashable, int], float, LouvainUpdateStats]:
+    """
+    Louvain после обновления графа.
+
+    prev_partition : разбиение прошлого запуска (user_id -> hidden_comm_id)
+    touched        : узлы, у которых поменялись рёбра (например, IncrementalSimilarityGraph.last_touched);
+                     узлы, которых нет в prev_partition, считаются затронутыми всегда.
+
+    Нетронутые узлы одного старого сообщества двигаются вместе (один супер-узел),
+    поэтому Louvain работает на графе размера ~ (число сообществ + затронутые узлы).
+    Возвращает (partition, modularity, stats); modularity — на полном графе.
+    """
+    t0 = time.perf_counter()
+    touched_set = {n for n in (touched or ()) if n in G}
+    touched_set.update(n for n in G.nodes() if n not in prev_partition)
+
+    # блоки: старое сообщество (без затронутых узлов) или отдельный затронутый узел
+    blocks: Dict[Hashable, int] = {}
+    block_of_comm: Dict[int, int] = {}
+    init: Dict[int, int] = {}
+    for n in G.nodes():
+        if n in touched_set:
+            continue
+        c = prev_partition[n]
+        if c not in block_of_comm:
+            block_of_comm[c] = len(block_of_comm)
+            init[block_of_comm[c]] = block_of_comm[c]
+        blocks[n] = block_of_comm[c]
+    n_blocks = len(block_of_comm)
+    for n in G.nodes():  # порядок графа, а не множества — воспроизводимость при random_state
+        if n in touched_set:
+            blocks[n] = n_blocks
+            init[n_blocks] = n_blocks
+            n_blocks += 1
+
+    H = _reduced_graph(G, blocks, n_blocks, weight)
+    if H.number_of_edges() == 0:
+        block_part = dict(init)
+    else:
+        block_part = community_louvain.best_partition(
+            H, partition=init, weight=weight, resolution=resolution, random_state=random_state
+        )
+
+    partition = {n: block_part[b] for n, b in blocks.items()}
+    if stabilize:
+        partition = stabilize_labels(prev_partition, partition)
+
+    modularity = community_louvain.modularity(partition, G, weight=weight) if G.number_of_edges() else 0.0
+    stats = LouvainUpdateStats(
+        nodes=G.number_of_nodes(),
+        touched_nodes=len(touched_set),
+        reduced_nodes=H.number_of_nodes(),
+        reduced_edges=H.number_of_edges(),
+        communities=len(set(partition.values())),
+        modularity=round(float(modularity), 6),
+        seconds=round(time.perf_counter() - t0, 4),
+    )
+    return partition, modularity, stats
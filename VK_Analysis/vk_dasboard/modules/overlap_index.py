@@ -0,0 +1,136 @@
+# overlap_index.py
+# -------------------------------------------------
+# Быстрые запросы «кто ещё состоит в этих группах» без построения kNN-графа:
+#   X  : user × community (csr, 0/1)
+#   XT : community × user (csr == CSC-индекс X) — инвертированный индекс community → users
+#
+#   similar_users(u)      : X[u] @ XT → сколько общих групп у u с каждым, top-k через argpartition
+#   members_of(groups)    : объединение/пересечение строк XT
+#   co_membership(u, v)   : пересечение двух отсортированных строк X
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from create_ug_matrix import UserCommunityData
+from topic_profile import top_n_indices
+
+MEMBERS_MODES = ("any", "all")
+
+
+class CommunityOverlapIndex:
+    """
+    Индекс пересечений по членствам в сообществах поверх UserCommunityData.
+    Строится один раз (транспонирование csr), дальше запросы — миллисекунды.
+    """
+
+    def __init__(self, data: UserCommunityData):
+        X = csr_matrix(data.csr, dtype=np.int32, copy=True)
+        X.sum_duplicates()
+        X.data[:] = 1  # дубли строк в edge-list не должны удваивать пересечение
+        X.sort_indices()
+        XT = X.T.tocsr()
+        XT.sort_indices()
+        self._attach(data, X, XT)
+
+    @classmethod
+    def from_matrices(cls, data: UserCommunityData, X: csr_matrix, XT: csr_matrix) -> CommunityOverlapIndex:
+        """Индекс поверх уже готовых X / XT (например, из общей памяти) — без копий и транспонирования."""
+        index = cls.__new__(cls)
+        index._attach(data, X, XT)
+        return index
+
+    def _attach(self, data: UserCommunityData, X: csr_matrix, XT: csr_matrix):
+        self.data = data
+        self.X = X
+        self.XT = XT
+        self.degree = np.diff(X.indptr)  # число групп у пользователя
+        self.community_size = np.diff(self.XT.indptr)  # число участников группы
+        # массив id из общей памяти (shared_store.attach_user_data) используется как есть, без копии
+        self._user_ids = data.user_ids if isinstance(data.user_ids, np.ndarray) else np.asarray(data.user_ids, dtype=object)
+        self._community_ids = np.asarray(data.community_ids, dtype=object)
+
+    # ---------------------------
+    # Вспомогательное
+    # ---------------------------
+    def _user_row(self, user_id) -> int:
+        i = self.data.user_index.get(str(user_id).strip())
+        if i is None:
+            raise KeyError(f"Пользователь {user_id} не найден")
+        return i
+
+    def _community_cols(self, community_ids: Iterable) -> np.ndarray:
+        ids = [str(c).strip() for c in community_ids]
+        missing = [c for c in ids if c not in self.data.comm_index]
+        if missing:
+            raise KeyError(f"Сообщества не найдены: {', '.join(missing)}")
+        return np.asarray([self.data.comm_index[c] for c in ids], dtype=np.int64)
+
+    def groups_of(self, user_id) -> List[str]:
+        i = self._user_row(user_id)
+        return self._community_ids[self.X.indices[self.X.indptr[i]:self.X.indptr[i + 1]]].tolist()
+
+    # ---------------------------
+    # Запросы
+    # ---------------------------
+    def similar_users(self, user_id, min_shared: int = 2, top_k: int = 20) -> pd.DataFrame:
+        """
+        Пользователи, у которых с user_id не меньше min_shared общих групп.
+        Одна строка X на инвертированный индекс: X[u] @ XT (затрагиваются только группы u).
+        Колонки: user_id, shared_groups, jaccard.
+        """
+        i = self._user_row(user_id)
+        shared = (self.X[i] @ self.XT).tocsr()  # 1 × n_users, только ненулевые
+        shared.sort_indices()
+        cand, cnt = shared.indices, shared.data
+
+        keep = (cand != i) & (cnt >= max(int(min_shared), 1))
+        cand, cnt = cand[keep], cnt[keep]
+
+        if top_k is not None and len(cand) > top_k:
+            # по убыванию общих групп, при равенстве — меньший индекс (cand отсортирован)
+            order = top_n_indices(cnt, top_k)
+        else:
+            order = np.lexsort((cand, -cnt))
+        cand, cnt = cand[order], cnt[order]
+
+        union = self.degree[i] + self.degree[cand] - cnt
+        return pd.DataFrame({
+            "user_id": self._user_ids[cand],
+            "shared_groups": cnt.astype(np.int64),
+            "jaccard": np.round(cnt / np.maximum(union, 1), 4),
+        })
+
+    def members_of(self, community_ids: Iterable, mode: str = "any") -> pd.DataFrame:
+        """
+        Участники набора сообществ:
+          mode="any" — состоит хотя бы в одной, mode="all" — во всех сразу.
+        Неизвестный community_id — KeyError (опечатка не должна молча сужать набор).
+        Колонки: user_id, matched_groups (сколько групп из набора), отсортировано по убыванию.
+        """
+        if mode not in MEMBERS_MODES:
+            raise ValueError(f"Неизвестный mode={mode!r}. Доступно: {MEMBERS_MODES}")
+        cols = np.unique(self._community_cols(community_ids))
+        if cols.size == 0:
+            return pd.DataFrame({"user_id": pd.Series(dtype=object), "matched_groups": pd.Series(dtype=np.int64)})
+
+        sub = self.XT[cols]
+        users, counts = np.unique(sub.indices, return_counts=True)
+        if mode == "all":
+            keep = counts == len(cols)
+            users, counts = users[keep], counts[keep]
+        order = np.lexsort((users, -counts))
+        return pd.DataFrame({"user_id": self._user_ids[users[order]], "matched_groups": counts[order].astype(np.int64)})
+
+    def co_membership(self, user_a, user_b) -> Tuple[int, List[str]]:
+        """Число общих групп двух пользователей и их community_id."""
+        i, j = self._user_row(user_a), self._user_row(user_b)
+        a = self.X.indices[self.X.indptr[i]:self.X.indptr[i + 1]]
+        b = self.X.indices[self.X.indptr[j]:self.X.indptr[j + 1]]
+        common = np.intersect1d(a, b, assume_unique=True)
+        return int(common.size), self._community_ids[common].tolist()
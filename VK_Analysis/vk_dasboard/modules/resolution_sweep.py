@@ -0,0 +1,393 @@
+# resolution_sweep.py
+# -------------------------------------------------
+# Подбор детализации скрытых сообществ: Louvain по сетке resolution × random_state на одном графе.
+#
+#   - граф (csr) кладётся в shared memory один раз (shared_store), процессы пула собирают из него
+#     nx.Graph один раз в initializer; в задачу уходит только пара (resolution, seed)
+#   - по каждому запуску: модулярность (обычная, сравнима между resolution), число сообществ,
+#     распределение significance_score (как analyze_hidden_communities, но векторно по csr)
+#   - стабильность: ARI между запусками с разными seed при одном resolution
+#   - все разбиения хранятся (labels по узлам графа) — слайдер в UI только переключает готовое;
+#     save()/load() — тот же перебор между сессиями
+#
+# Пример:
+#   python resolution_sweep.py --edges users_communities_edges.csv --resolutions 0.5,1,1.5,2 \
+#                              --seeds 0,1,2 --jobs 4 --out-dir sweep_output
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from community import community_louvain
+from scipy.sparse import csr_matrix
+from sklearn.metrics import adjusted_rand_score
+
+from graph_analytics import graph_to_adjacency
+from shared_store import SharedHandle, attach, share_csr
+
+# resolution в python-louvain — «время» марковской модулярности (Lambiotte и др.), а не γ при нулевой модели;
+# на плотных тематических графах детализация меняется в обе стороны от 1, поэтому сетка широкая
+DEFAULT_RESOLUTIONS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+DEFAULT_SEEDS = (0, 1, 2)
+
+
+# ---------------------------
+# Метрики разбиения по csr (без подграфов networkx)
+# ---------------------------
+def _inner_parts(A: csr_matrix, labels: np.ndarray, n_comm: int):
+    coo = A.tocoo()
+    inner = labels[coo.row] == labels[coo.col]
+    row, col, w = coo.row[inner], coo.col[inner], coo.data[inner]
+    c = labels[row]
+    loop = row == col
+    # внутренний вес (каждое ребро один раз) и число внутренних рёбер — как sub.size() / number_of_edges()
+    weight = np.bincount(c[~loop], weights=w[~loop], minlength=n_comm) / 2.0 + \
+        np.bincount(c[loop], weights=w[loop], minlength=n_comm)
+    edges = np.bincount(c[~loop], minlength=n_comm) / 2.0 + np.bincount(c[loop], minlength=n_comm)
+    return weight, edges
+
+
+def partition_modularity(A: csr_matrix, labels: np.ndarray) -> float:
+    """Модулярность как community_louvain.modularity (петля входит в степень дважды)."""
+    labels = np.asarray(labels, dtype=np.int64)
+    n_comm = int(labels.max()) + 1 if len(labels) else 0
+    diag = A.diagonal()
+    degree = np.asarray(A.sum(axis=1)).ravel() + diag
+    m = degree.sum() / 2.0
+    if m == 0:
+        return 0.0
+    inner, _ = _inner_parts(A, labels, n_comm)
+    deg_c = np.bincount(labels, weights=degree, minlength=n_comm)
+    return float((inner / m - (deg_c / (2.0 * m)) ** 2).sum())
+
+
+def community_scores(A: csr_matrix, labels: np.ndarray) -> pd.DataFrame:
+    """
+    size / edges / density / avg_wdeg / score по сообществам — те же формулы,
+    что _community_subgraph_metrics в e.py, одним проходом по ненулевым элементам.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    n_comm = int(labels.max()) + 1 if len(labels) else 0
+    size = np.bincount(labels, minlength=n_comm).astype(np.float64)
+    inner, edges = _inner_parts(A, labels, n_comm)
+    max_edges = np.where(size > 1, size * (size - 1) / 2.0, 1.0)
+    density = edges / max_edges
+    avg_wdeg = np.divide(2.0 * inner, size, out=np.zeros(n_comm), where=size > 0)
+    return pd.DataFrame({
+        "hidden_comm_id": np.arange(n_comm),
+        "size": size.astype(np.int64),
+        "edges": edges.astype(np.int64),
+        "density": density,
+        "avg_wdeg": avg_wdeg,
+        "score": density * avg_wdeg * np.log(size + 1),
+    })
+
+
+def _relabel_by_size(labels: np.ndarray) -> np.ndarray:
+    """id сообществ по убыванию размера: 0 — самое крупное (сравнимо между запусками)."""
+    uniq, inv, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    rank = np.empty(len(uniq), dtype=np.int32)
+    rank[order] = np.arange(len(uniq), dtype=np.int32)
+    return rank[inv]
+
+
+# ---------------------------
+# Один запуск
+# ---------------------------
+@dataclass(frozen=True)
+class SweepRun:
+    resolution: float
+    seed: int
+    labels: np.ndarray
+    modularity: float
+    n_communities: int
+    score_median: float
+    score_p90: float
+    score_max: float
+    largest_share: float
+    seconds: float
+
+    def summary(self) -> dict:
+        row = asdict(self)
+        row.pop("labels")
+        return row
+
+
+def louvain_run(G: nx.Graph, A: csr_matrix, resolution: float, seed: int, weight: str = "weight") -> SweepRun:
+    """G — граф с узлами 0..n-1 (строки A)."""
+    t0 = time.perf_counter()
+    part = community_louvain.best_partition(G, weight=weight, resolution=resolution, random_state=seed)
+    labels = _relabel_by_size(np.fromiter((part[i] for i in range(A.shape[0])), dtype=np.int64, count=A.shape[0]))
+    scores = community_scores(A, labels)["score"].to_numpy()
+    sizes = np.bincount(labels)
+    return SweepRun(
+        resolution=float(resolution),
+        seed=int(seed),
+        labels=labels,
+        modularity=round(partition_modularity(A, labels), 6),
+        n_communities=len(sizes),
+        score_median=round(float(np.median(scores)), 6),
+        score_p90=round(float(np.quantile(scores, 0.9)), 6),
+        score_max=round(float(scores.max()), 6),
+        largest_share=round(float(sizes.max() / len(labels)), 4),
+        seconds=round(time.perf_counter() - t0, 3),
+    )
+
+
+def _index_graph(A: csr_matrix) -> nx.Graph:
+    return nx.from_scipy_sparse_array(A, edge_attribute="weight")
+
+
+_WORKER: dict = {}
+
+
+def _init_worker(handle: SharedHandle):
+    A = attach(handle).csr()
+    _WORKER.update(A=A, G=_index_graph(A))
+
+
+def _worker_run(task: Tuple[float, int]) -> SweepRun:
+    resolution, seed = task
+    return louvain_run(_WORKER["G"], _WORKER["A"], resolution, seed)
+
+
+# ---------------------------
+# Перебор
+# ---------------------------
+@dataclass(frozen=True)
+class ResolutionSweep:
+    """
+    nodes : user_id в порядке строк labels
+    runs  : все запуски (resolution × seed), labels — id сообщества по узлам
+    """
+    nodes: List[str]
+    runs: List[SweepRun]
+    seconds: float = 0.0
+    n_jobs: int = 1
+    stats: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def resolutions(self) -> List[float]:
+        return sorted({r.resolution for r in self.runs})
+
+    def runs_at(self, resolution: float) -> List[SweepRun]:
+        runs = [r for r in self.runs if np.isclose(r.resolution, resolution)]
+        if not runs:
+            raise KeyError(f"resolution={resolution} нет в переборе: {self.resolutions}")
+        return runs
+
+    def run(self, resolution: float, seed: Optional[int] = None) -> SweepRun:
+        """Запуск с данным seed; seed=None — запуск с наибольшей модулярностью."""
+        runs = self.runs_at(resolution)
+        if seed is None:
+            return max(runs, key=lambda r: r.modularity)
+        for r in runs:
+            if r.seed == seed:
+                return r
+        raise KeyError(f"seed={seed} нет в переборе для resolution={resolution}")
+
+    def partition(self, resolution: float, seed: Optional[int] = None) -> Dict[str, int]:
+        return dict(zip(self.nodes, self.run(resolution, seed).labels.tolist()))
+
+    def stability(self, resolution: float) -> Tuple[float, float]:
+        """Средний и минимальный ARI между парами seed (1.0 — разбиение не зависит от seed)."""
+        runs = self.runs_at(resolution)
+        if len(runs) < 2:
+            return 1.0, 1.0
+        ari = [adjusted_rand_score(a.labels, b.labels) for a, b in combinations(runs, 2)]
+        return float(np.mean(ari)), float(np.min(ari))
+
+    # ---------------------------
+    # Таблицы
+    # ---------------------------
+    def runs_table(self) -> pd.DataFrame:
+        return pd.DataFrame([r.summary() for r in self.runs]).sort_values(["resolution", "seed"], ignore_index=True)
+
+    def table(self) -> pd.DataFrame:
+        """По resolution: средние по seed, стабильность и лучший seed."""
+        runs = self.runs_table()
+        rows = []
+        for res, grp in runs.groupby("resolution", sort=True):
+            ari_mean, ari_min = self.stability(res)
+            best = self.run(res)
+            rows.append({
+                "resolution": res,
+                "runs": len(grp),
+                "communities": round(float(grp["n_communities"].mean()), 1),
+                "communities_min": int(grp["n_communities"].min()),
+                "communities_max": int(grp["n_communities"].max()),
+                "modularity": round(float(grp["modularity"].mean()), 4),
+                "modularity_std": round(float(grp["modularity"].std(ddof=0)), 4),
+                "score_median": round(float(grp["score_median"].mean()), 4),
+                "score_p90": round(float(grp["score_p90"].mean()), 4),
+                "score_max": round(float(grp["score_max"].mean()), 4),
+                "ari_mean": round(ari_mean, 4),
+                "ari_min": round(ari_min, 4),
+                "best_seed": best.seed,
+            })
+        return pd.DataFrame(rows)
+
+    def partition_table(self) -> pd.DataFrame:
+        """user_id и id сообщества в каждом запуске (колонки r<resolution>_s<seed>)."""
+        runs = sorted(self.runs, key=lambda r: (r.resolution, r.seed))
+        return pd.DataFrame({
+            "user_id": self.nodes,
+            **{f"r{r.resolution:g}_s{r.seed}": r.labels for r in runs},
+        })
+
+    # ---------------------------
+    # Кэш на диске
+    # ---------------------------
+    def save(self, directory: str | Path) -> Path:
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path / "sweep_labels.npz",
+            nodes=np.asarray(self.nodes, dtype=str),
+            labels=np.vstack([r.labels for r in self.runs]) if self.runs else np.zeros((0, len(self.nodes))),
+        )
+        meta = {"runs": [r.summary() for r in self.runs], "seconds": self.seconds,
+                "n_jobs": self.n_jobs, "stats": self.stats}
+        (path / "sweep_runs.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, directory: str | Path) -> ResolutionSweep:
+        path = Path(directory)
+        arrays = np.load(path / "sweep_labels.npz")
+        meta = json.loads((path / "sweep_runs.json").read_text(encoding="utf-8"))
+        runs = [SweepRun(labels=labels.astype(np.int32), **row) for row, labels in zip(meta["runs"], arrays["labels"])]
+        return cls(nodes=arrays["nodes"].tolist(), runs=runs, seconds=meta["seconds"],
+                   n_jobs=meta["n_jobs"], stats=meta.get("stats", {}))
+
+
+def run_resolution_sweep(
+    G: nx.Graph,
+    resolutions: Sequence[float] = DEFAULT_RESOLUTIONS,
+    seeds: Sequence[int] = DEFAULT_SEEDS,
+    n_jobs: int = -1,
+    weight: str = "weight",
+) -> ResolutionSweep:
+    """
+    Louvain для всех пар (resolution, seed). n_jobs=1 — в текущем процессе,
+    иначе пул процессов над одной копией csr в shared memory.
+    """
+    resolutions = sorted({float(r) for r in resolutions})
+    seeds = list(dict.fromkeys(int(s) for s in seeds))
+    if not resolutions or not seeds:
+        raise ValueError("Нужны хотя бы одно значение resolution и один seed.")
+    if any(r <= 0 for r in resolutions):
+        raise ValueError("resolution должно быть > 0.")
+    if G.number_of_edges() == 0:
+        raise ValueError("Граф без рёбер: перебор resolution не имеет смысла.")
+
+    A, nodes = graph_to_adjacency(G, weight=weight)
+    # крупные resolution дают больше сообществ и считаются дольше — отдаём их пулу первыми
+    tasks = [(r, s) for r in reversed(resolutions) for s in seeds]
+    workers = (os.cpu_count() or 1) if n_jobs is None or n_jobs < 1 else int(n_jobs)
+    workers = max(1, min(workers, len(tasks)))
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        H = _index_graph(A)
+        runs = [louvain_run(H, A, r, s) for r, s in tasks]
+    else:
+        with share_csr(A) as store:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store.handle,)) as ex:
+                runs = list(ex.map(_worker_run, tasks))
+    seconds = time.perf_counter() - t0
+
+    runs.sort(key=lambda r: (r.resolution, r.seed))
+    return ResolutionSweep(
+        nodes=[str(n) for n in nodes],
+        runs=runs,
+        seconds=round(seconds, 3),
+        n_jobs=workers,
+        stats={"nodes": A.shape[0], "edges": G.number_of_edges(), "runs": len(runs)},
+    )
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _floats(text: str) -> List[float]:
+    return [float(x) for x in text.replace(";", ",").split(",") if x.strip()]
+
+
+def run(args) -> dict:
+    from a import write_table
+    from build_grap_similarity import build_similarity_graph
+    from create_ug_matrix import UserCommunityData
+    from data_loader import PARSERS
+    from duplicate_users import build_dedup_similarity_graph
+
+    t0 = time.perf_counter()
+    data = UserCommunityData.from_edges_df(PARSERS["edges"](args.edges))
+    if args.dedup:
+        G, _ = build_dedup_similarity_graph(data, threshold=args.threshold, k_neighbors=args.k_neighbors)
+    else:
+        G = build_similarity_graph(data, threshold=args.threshold, k_neighbors=args.k_neighbors, show_progress=False)
+    t_graph = time.perf_counter() - t0
+    print(f"Граф: узлов={G.number_of_nodes()}, рёбер={G.number_of_edges()} ({t_graph:.2f} c)")
+
+    sweep = run_resolution_sweep(
+        G, resolutions=_floats(args.resolutions), seeds=[int(s) for s in _floats(args.seeds)], n_jobs=args.jobs,
+    )
+    out_dir = Path(args.out_dir)
+    sweep.save(out_dir)
+    outputs = {
+        "summary": str(write_table(sweep.table(), out_dir / "sweep_summary", args.format)),
+        "runs": str(write_table(sweep.runs_table(), out_dir / "sweep_runs", args.format)),
+        "partitions": str(write_table(sweep.partition_table(), out_dir / "sweep_partitions", args.format)),
+        "cache": str(out_dir),
+    }
+
+    table = sweep.table()
+    print(f"\nЗапусков: {len(sweep.runs)} за {sweep.seconds:.2f} c (процессов: {sweep.n_jobs})")
+    for r in table.itertuples(index=False):
+        print(
+            f"resolution={r.resolution:g}: сообществ {r.communities} [{r.communities_min}–{r.communities_max}] | "
+            f"Q={r.modularity:.4f} | score p90={r.score_p90} | ARI={r.ari_mean:.3f} (мин {r.ari_min:.3f})"
+        )
+    stats = {
+        **sweep.stats,
+        "graph_seconds": round(t_graph, 3),
+        "sweep_seconds": sweep.seconds,
+        "n_jobs": sweep.n_jobs,
+        "outputs": outputs,
+    }
+    (out_dir / "sweep_stats.json").write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Результаты: {out_dir.resolve()}")
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Перебор resolution × seed для Louvain на графе схожести (без Streamlit)")
+    ap.add_argument("--edges", default="users_communities_edges.csv", help="CSV user_id;community_id")
+    ap.add_argument("--out-dir", default="sweep_output")
+    ap.add_argument("--format", choices=("csv", "parquet"), default="csv", help="формат таблиц результатов")
+    ap.add_argument("--resolutions", default=",".join(f"{r:g}" for r in DEFAULT_RESOLUTIONS),
+                    help="значения resolution через запятую")
+    ap.add_argument("--seeds", default=",".join(str(s) for s in DEFAULT_SEEDS), help="random_state через запятую")
+    ap.add_argument("--jobs", type=int, default=-1, help="число процессов (-1 = все ядра)")
+    ap.add_argument("--threshold", type=float, default=0.15, help="минимальная схожесть ребра")
+    ap.add_argument("--k-neighbors", type=int, default=50)
+    ap.add_argument("--dedup", action="store_true", help="kNN только по уникальным наборам подписок (clique)")
+    return ap
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
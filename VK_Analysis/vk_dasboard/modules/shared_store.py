@@ -0,0 +1,275 @@
+# shared_store.py
+# -------------------------------------------------
+# Общая память для пулов процессов: массивы numpy (CSR data / indices / indptr, id строк и столбцов)
+# кладутся один раз, процессы подключаются к ним по лёгкому дескриптору без копирования.
+#
+#   backend="shm"    : multiprocessing.shared_memory (в RAM, живёт, пока владелец не вызовет unlink)
+#   backend="memmap" : .npy файлы в папке + np.load(mmap_mode="r") — страницы читает ОС по требованию,
+#                      подходит для матриц больше RAM и для переиспользования между запусками
+#
+#   store  = share_csr(X, row_ids=user_ids, col_ids=community_ids)   # владелец (родительский процесс)
+#   handle = store.handle                                            # pickle — сотни байт
+#   attach(handle).csr()                                             # в процессе пула, zero-copy
+#
+# Подключения кэшируются на процесс (attach с тем же дескриптором — те же буферы).
+# id строк ищутся searchsorted по порядку сортировки, посчитанному владельцем (row_order) —
+# процесс пула не строит ни dict user_id -> строка, ни списки id.
+# Подключённые массивы только для чтения.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import shutil
+import tempfile
+import uuid
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from create_ug_matrix import UserCommunityData
+
+SHARED_BACKENDS = ("shm", "memmap")
+_CSR_PARTS = ("indptr", "indices", "data")
+
+
+@dataclass(frozen=True)
+class ArraySpec:
+    """location — имя блока shared memory или путь к .npy файлу."""
+    location: str
+    shape: tuple
+    dtype: str
+
+
+@dataclass(frozen=True)
+class SharedHandle:
+    """Дескриптор набора массивов: всё, что нужно процессу пула для подключения."""
+    token: str
+    backend: str
+    arrays: Dict[str, ArraySpec]
+    meta: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(np.dtype(s.dtype).itemsize * int(np.prod(s.shape)) for s in self.arrays.values()))
+
+
+class SharedStore:
+    """
+    Набор именованных массивов в общей памяти.
+    Владелец (create) отвечает за unlink(); подключения (attach) — только close().
+    """
+
+    def __init__(self, handle: SharedHandle, arrays: Dict[str, np.ndarray], blocks: List, owner: bool, root=None):
+        self.handle = handle
+        self.arrays = arrays
+        self._blocks = blocks
+        self._owner = owner
+        self._root = root
+
+    # ---------------------------
+    # Создание / подключение
+    # ---------------------------
+    @classmethod
+    def create(
+        cls,
+        arrays: Dict[str, np.ndarray],
+        backend: str = "shm",
+        directory: Optional[str | Path] = None,
+        meta: Optional[Dict[str, object]] = None,
+    ) -> SharedStore:
+        """Копирует arrays в общую память (shm) или в .npy файлы папки directory (memmap)."""
+        if backend not in SHARED_BACKENDS:
+            raise ValueError(f"Неизвестный backend={backend!r}. Доступно: {SHARED_BACKENDS}")
+        token = uuid.uuid4().hex
+        specs, views, blocks, root = {}, {}, [], None
+
+        if backend == "memmap":
+            # своя временная папка удаляется в unlink(); переданная — остаётся (переиспользование файлов)
+            root = Path(directory) if directory is not None else Path(tempfile.mkdtemp(prefix="vk_shared_"))
+            root.mkdir(parents=True, exist_ok=True)
+
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            if backend == "shm":
+                shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+                view[...] = arr
+                blocks.append(shm)
+                location = shm.name
+            else:
+                path = root / f"{token[:12]}_{name}.npy"
+                mm = np.lib.format.open_memmap(path, mode="w+", dtype=arr.dtype, shape=arr.shape)
+                mm[...] = arr
+                mm.flush()
+                del mm
+                view = np.load(path, mmap_mode="r")
+                location = str(path)
+            specs[name] = ArraySpec(location=location, shape=tuple(arr.shape), dtype=arr.dtype.str)
+            views[name] = view
+
+        handle = SharedHandle(token=token, backend=backend, arrays=specs, meta=dict(meta or {}))
+        return cls(handle, views, blocks, owner=True, root=root if directory is None else None)
+
+    @classmethod
+    def _open(cls, handle: SharedHandle) -> SharedStore:
+        views, blocks = {}, []
+        for name, spec in handle.arrays.items():
+            if handle.backend == "shm":
+                shm = shared_memory.SharedMemory(name=spec.location)
+                view = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=shm.buf)
+                view.flags.writeable = False
+                blocks.append(shm)
+            else:
+                view = np.load(spec.location, mmap_mode="r")
+            views[name] = view
+        return cls(handle, views, blocks, owner=False)
+
+    # ---------------------------
+    # Доступ
+    # ---------------------------
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def csr(self, prefix: str = "") -> csr_matrix:
+        """csr_matrix поверх общих буферов (без копии); prefix — если в наборе несколько матриц."""
+        shape = tuple(self.handle.meta[f"{prefix}shape"])
+        parts = [self.arrays[f"{prefix}{p}"] for p in _CSR_PARTS]
+        X = csr_matrix((parts[2], parts[1], parts[0]), shape=shape, copy=False)
+        X.has_sorted_indices = bool(self.handle.meta.get(f"{prefix}sorted", False))
+        return X
+
+    def ids(self, name: str) -> List[str]:
+        return self.arrays[name].tolist() if name in self.arrays else []
+
+    # ---------------------------
+    # Жизненный цикл
+    # ---------------------------
+    def close(self):
+        """Отключиться от буферов (массивы этого объекта после close использовать нельзя)."""
+        self.arrays = {}
+        for shm in self._blocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # на буфер ещё есть ссылки (чужие view) — освободится вместе с ними
+        self._blocks = []
+
+    def unlink(self):
+        """Удалить общую память / файлы. Только владелец."""
+        if not self._owner:
+            return
+        blocks = list(self._blocks)
+        self.close()
+        for shm in blocks:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        if self._root is not None:
+            shutil.rmtree(self._root, ignore_errors=True)
+        attached = _ATTACHED.pop(self.handle.token, None)
+        if attached is not None:
+            attached.close()  # подключение в этом же процессе
+
+    def __enter__(self) -> SharedStore:
+        return self
+
+    def __exit__(self, *exc):
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
+
+_ATTACHED: Dict[str, SharedStore] = {}
+
+
+def attach(handle: SharedHandle) -> SharedStore:
+    """Подключение в процессе пула; повторный attach того же дескриптора — из кэша процесса."""
+    store = _ATTACHED.get(handle.token)
+    if store is None:
+        store = _ATTACHED[handle.token] = SharedStore._open(handle)
+    return store
+
+
+# ---------------------------
+# CSR и UserCommunityData
+# ---------------------------
+def csr_arrays(X: csr_matrix, prefix: str = "") -> tuple[Dict[str, np.ndarray], Dict[str, object]]:
+    X = csr_matrix(X)
+    arrays = {f"{prefix}{p}": getattr(X, p) for p in _CSR_PARTS}
+    meta = {f"{prefix}shape": tuple(X.shape), f"{prefix}sorted": bool(X.has_sorted_indices)}
+    return arrays, meta
+
+
+def share_csr(
+    X: csr_matrix,
+    row_ids: Optional[Sequence[str]] = None,
+    col_ids: Optional[Sequence[str]] = None,
+    backend: str = "shm",
+    directory: Optional[str | Path] = None,
+    extra: Optional[Dict[str, csr_matrix]] = None,
+) -> SharedStore:
+    """
+    CSR (+ id строк/столбцов как массивы фиксированной ширины) в общую память.
+    extra: дополнительные матрицы того же набора, например {"t_": XT} → store.csr("t_").
+    """
+    arrays, meta = csr_arrays(X)
+    for prefix, M in (extra or {}).items():
+        a, m = csr_arrays(M, prefix=prefix)
+        arrays.update(a)
+        meta.update(m)
+    if row_ids is not None:
+        arrays["row_ids"] = np.asarray(row_ids, dtype=str)
+        arrays["row_order"] = np.argsort(arrays["row_ids"], kind="stable").astype(np.int64)
+    if col_ids is not None:
+        arrays["col_ids"] = np.asarray(col_ids, dtype=str)
+    return SharedStore.create(arrays, backend=backend, directory=directory, meta=meta)
+
+
+def share_user_data(data: UserCommunityData, backend: str = "shm", directory=None, extra=None) -> SharedStore:
+    return share_csr(data.csr, data.user_ids, data.community_ids, backend=backend, directory=directory, extra=extra)
+
+
+class SortedIdIndex(Mapping):
+    """id -> номер строки поверх массива id и его порядка сортировки (searchsorted, без копий)."""
+
+    def __init__(self, ids: np.ndarray, order: np.ndarray):
+        self.ids = ids
+        self.order = order
+
+    def __getitem__(self, key) -> int:
+        if len(self.ids):
+            at = int(np.searchsorted(self.ids, str(key), sorter=self.order))
+            if at < len(self.ids) and self.ids[self.order[at]] == str(key):
+                return int(self.order[at])
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(u) for u in self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def attach_user_data(handle: SharedHandle) -> UserCommunityData:
+    """
+    UserCommunityData поверх общей памяти; edges_df пустой (матрица — единственный источник).
+    user_ids — общий массив id, user_index — SortedIdIndex (столбцы — обычные списки, их немного).
+    """
+    store = attach(handle)
+    community_ids = store.ids("col_ids")
+    return UserCommunityData(
+        csr=store.csr(),
+        user_ids=store["row_ids"],
+        community_ids=community_ids,
+        user_index=SortedIdIndex(store["row_ids"], store["row_order"]),
+        comm_index={c: j for j, c in enumerate(community_ids)},
+        edges_df=pd.DataFrame(columns=["user_id", "community_id"]),
+    )
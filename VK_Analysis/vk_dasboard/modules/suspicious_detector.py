@@ -0,0 +1,173 @@
+# suspicious_detector.py
+# -------------------------------------------------
+# Поиск деструктивных/радикальных сообществ без перебора членств:
+#   1) каждое уникальное сообщество классифицируется ОДИН раз
+#      (id + название + тематика из community_topics.csv) одним скомпилированным regex
+#   2) получается булева маска по столбцам UserCommunityData.csr
+#   3) подозрительные членства на пользователя = X @ mask, на кластер — bincount по меткам
+#
+# Ключевые слова расширяются во время работы: add_keywords(...) пересобирает regex.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from create_ug_matrix import UserCommunityData
+
+DEFAULT_SUSPICIOUS_KEYWORDS = (
+    "радикал", "экстремизм", "ненависть", "противостояние",
+    "революция", "сопротивление", "подполье", "анархия",
+    "независимость", "протест", "свержение",
+)
+
+
+class SuspiciousMatcher:
+    """Набор ключевых слов → один regex (подстроки, без учёта регистра)."""
+
+    def __init__(self, keywords: Iterable[str] = DEFAULT_SUSPICIOUS_KEYWORDS):
+        self._keywords: List[str] = []
+        self._pattern: Optional[re.Pattern] = None
+        self.add_keywords(*keywords)
+
+    @property
+    def keywords(self) -> List[str]:
+        return list(self._keywords)
+
+    def add_keywords(self, *keywords: str) -> SuspiciousMatcher:
+        for kw in keywords:
+            kw = str(kw).strip().lower()
+            if kw and kw not in self._keywords:
+                self._keywords.append(kw)
+        self._pattern = None
+        return self
+
+    def remove_keywords(self, *keywords: str) -> SuspiciousMatcher:
+        drop = {str(kw).strip().lower() for kw in keywords}
+        self._keywords = [kw for kw in self._keywords if kw not in drop]
+        self._pattern = None
+        return self
+
+    @property
+    def pattern(self) -> Optional[re.Pattern]:
+        if self._pattern is None and self._keywords:
+            # длинные слова первыми: в найденном ключе — самое специфичное совпадение
+            alts = sorted(self._keywords, key=len, reverse=True)
+            self._pattern = re.compile("|".join(re.escape(kw) for kw in alts), re.IGNORECASE)
+        return self._pattern
+
+    def match(self, texts: Sequence[str]) -> np.ndarray:
+        """Найденное ключевое слово для каждого текста ('' — нет совпадения)."""
+        out = np.full(len(texts), "", dtype=object)
+        pattern = self.pattern
+        if pattern is None:
+            return out
+        search = pattern.search
+        for i, text in enumerate(texts):
+            m = search(text)
+            if m is not None:
+                out[i] = m.group(0).lower()
+        return out
+
+
+def community_texts(
+    community_ids: Sequence[str], topics_df: Optional[pd.DataFrame] = None, topic_lookup=None
+) -> List[str]:
+    """
+    Текст для классификации: community_id + name + topic.
+    Источник названий/тематик — topic_lookup (e.TopicLookup, выровнен по community_ids) или topics_df.
+    """
+    ids = pd.Series(list(community_ids), dtype=object).astype(str)
+    if topic_lookup is not None:
+        topics = np.asarray(list(topic_lookup.topics) + [""], dtype=object)
+        names = pd.Series(topic_lookup.names, dtype=object).fillna("").astype(str)
+        topic_col = pd.Series(topics[topic_lookup.topic_codes], dtype=object)  # код -1 -> ""
+        return (ids + " " + names + " " + topic_col).tolist()
+    if topics_df is None or len(topics_df) == 0:
+        return ids.tolist()
+    t = topics_df.drop_duplicates("community_id").set_index("community_id")
+    parts = [ids]
+    for col in ("name", "topic"):
+        if col in t.columns:
+            parts.append(ids.map(t[col]).fillna("").astype(str))
+    return pd.concat(parts, axis=1).agg(" ".join, axis=1).tolist()
+
+
+@dataclass(frozen=True)
+class SuspiciousReport:
+    """
+    community_mask : bool по столбцам data.csr
+    matched        : найденное ключевое слово по столбцам ('' — нет)
+    user_counts    : подозрительных членств у пользователя (по строкам data.csr)
+    communities    : таблица подозрительных сообществ (community_id, keyword, members)
+    """
+    community_mask: np.ndarray
+    matched: np.ndarray
+    user_counts: np.ndarray
+    communities: pd.DataFrame
+    user_ids: List[str]
+
+    def counts(self) -> Counter:
+        """community_id -> число участников (как раньше возвращал f.detect_suspicious_patterns)."""
+        return Counter(dict(zip(self.communities["community_id"], self.communities["members"])))
+
+    def users(self, min_count: int = 1) -> pd.DataFrame:
+        idx = np.flatnonzero(self.user_counts >= min_count)
+        df = pd.DataFrame({
+            "user_id": np.asarray(self.user_ids, dtype=object)[idx],
+            "suspicious_memberships": self.user_counts[idx],
+        })
+        return df.sort_values("suspicious_memberships", ascending=False, kind="stable", ignore_index=True)
+
+    def by_cluster(self, partition: Dict[str, int]) -> pd.DataFrame:
+        """
+        Сводка по кластерам (partition: user_id -> cluster):
+        пользователей с подозрительными членствами и сумма таких членств.
+        """
+        labels = pd.Series(self.user_ids, dtype=object).map(partition)
+        has = labels.notna().to_numpy()
+        clusters, codes = np.unique(labels[has].astype(np.int64).to_numpy(), return_inverse=True)
+        counts = self.user_counts[has]
+        return pd.DataFrame({
+            "cluster": clusters,
+            "users": np.bincount(codes, minlength=len(clusters)),
+            "suspicious_users": np.bincount(codes, weights=counts > 0, minlength=len(clusters)).astype(np.int64),
+            "suspicious_memberships": np.bincount(codes, weights=counts, minlength=len(clusters)).astype(np.int64),
+        })
+
+
+def detect_suspicious(
+    data: UserCommunityData,
+    topics_df: Optional[pd.DataFrame] = None,
+    matcher: Optional[SuspiciousMatcher] = None,
+    topic_lookup=None,
+) -> SuspiciousReport:
+    """Классификация уникальных сообществ + одно sparse-произведение X @ mask."""
+    matcher = matcher or SuspiciousMatcher()
+    matched = matcher.match(community_texts(data.community_ids, topics_df, topic_lookup))
+    mask = matched != ""
+
+    X = data.csr
+    user_counts = np.asarray(X @ mask.astype(X.dtype)).ravel().astype(np.int64)
+    members = np.asarray(X.sum(axis=0)).ravel().astype(np.int64)
+
+    cols = np.flatnonzero(mask)
+    communities = pd.DataFrame({
+        "community_id": np.asarray(data.community_ids, dtype=object)[cols],
+        "keyword": matched[cols],
+        "members": members[cols],
+    }).sort_values("members", ascending=False, kind="stable", ignore_index=True)
+
+    return SuspiciousReport(
+        community_mask=mask,
+        matched=matched,
+        user_counts=user_counts,
+        communities=communities,
+        user_ids=list(data.user_ids),
+    )
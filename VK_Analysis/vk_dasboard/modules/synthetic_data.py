@@ -0,0 +1,386 @@
+# synthetic_data.py
+# -------------------------------------------------
+# Векторизованный генератор синтетики user -> community для нагрузочных тестов (1M–10M пользователей).
+# Та же модель, что в generate_vk_demo_data.generate_edges (сегменты, ядро сегмента, добор по тематикам + шум),
+# но без циклов по пользователям:
+#   - сегмент, k, размер ядра       : один вызов numpy.random.Generator на пачку пользователей
+#   - выбор из ядра без повторов    : случайные ключи (n × |ядро|) → ранги
+#   - добор по тематикам + шум      : тематика по CDF сегмента, сообщество — равномерно из пула тематики
+#   - уникальность в строке         : сортировка по (пользователь, сообщество), дубли отбрасываются
+#
+# Пачки независимы: сид пачки i = SeedSequence(seed).spawn(...)[i] → результат не зависит от числа процессов.
+# Запись CSV/Parquet потоково, по пачкам (через pyarrow).
+#
+# Запуск (из папки vk_dasboard):
+#   python modules/synthetic_data.py --users 1M --communities 20000 --out-dir data --jobs 8
+#   python modules/synthetic_data.py --users 10M --format parquet --chunk-size 200000
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from generate_vk_demo_data import SEGMENT_WEIGHTS, SEGMENTS, VK_TOPICS, generate_communities_catalog
+
+SYNTH_FORMATS = ("csv", "parquet")
+USER_ID_START = 100000000
+CORE_PER_TOPIC = 25
+CORE_SIZE = 50
+K_RANGE = (25, 60)           # сообществ у пользователя (включительно)
+CORE_TAKE_RANGE = (12, 25)   # из них из ядра сегмента
+
+
+@dataclass(frozen=True)
+class SyntheticCatalog:
+    """
+    Каталог в виде массивов (передаётся в процессы целиком, он маленький):
+      community_ids : строковые id сообществ (код = позиция)
+      topic_codes   : тематика сообщества (индекс в VK_TOPICS)
+      pool          : коды сообществ, сгруппированные по тематике; pool_start/pool_size — границы
+      core          : ядро каждого сегмента (n_segments × CORE_SIZE, -1 — пусто), core_size — длины
+      segment_p     : вероятности сегментов
+      topic_cdf     : CDF тематик добора для каждого сегмента (с учётом шума)
+    """
+    community_ids: np.ndarray
+    topic_codes: np.ndarray
+    pool: np.ndarray
+    pool_start: np.ndarray
+    pool_size: np.ndarray
+    core: np.ndarray
+    core_size: np.ndarray
+    segment_p: np.ndarray
+    topic_cdf: np.ndarray
+
+    @property
+    def n_communities(self) -> int:
+        return len(self.community_ids)
+
+
+def build_catalog(topics_df: pd.DataFrame, seed: int = 123) -> SyntheticCatalog:
+    """
+    Массивы каталога + ядра сегментов (как в generate_edges: до 25 групп на тематику, итог — до 50).
+    topics_df — результат generate_communities_catalog (community_id, topic, name).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0])
+    topic_index = {t: i for i, t in enumerate(VK_TOPICS)}
+    topic_codes = topics_df["topic"].map(topic_index).to_numpy()
+    if pd.isna(topic_codes).any():
+        raise ValueError("В каталоге есть тематики вне VK_TOPICS.")
+    topic_codes = topic_codes.astype(np.int64)
+
+    pool = np.argsort(topic_codes, kind="stable")
+    pool_size = np.bincount(topic_codes, minlength=len(VK_TOPICS))
+    pool_start = np.concatenate([[0], np.cumsum(pool_size)[:-1]])
+
+    n_seg = len(SEGMENT_WEIGHTS)
+    core = np.full((n_seg, CORE_SIZE), -1, dtype=np.int64)
+    core_size = np.zeros(n_seg, dtype=np.int64)
+    topic_cdf = np.zeros((n_seg, len(VK_TOPICS)))
+    for s, (seg_name, _) in enumerate(SEGMENT_WEIGHTS):
+        cfg = SEGMENTS[seg_name]
+        parts = []
+        for t in cfg["topics"]:
+            ti = topic_index[t]
+            members = pool[pool_start[ti]:pool_start[ti] + pool_size[ti]]
+            parts.append(rng.choice(members, size=min(CORE_PER_TOPIC, len(members)), replace=False))
+        core_pool = np.concatenate(parts)
+        take = rng.choice(core_pool, size=min(CORE_SIZE, len(core_pool)), replace=False)
+        core[s, :len(take)] = take
+        core_size[s] = len(take)
+
+        # смесь: с вероятностью noise — любая тематика, иначе — по весам сегмента
+        p = np.full(len(VK_TOPICS), cfg["noise"] / len(VK_TOPICS))
+        w = np.array([cfg["topics"].get(t, 0) for t in VK_TOPICS], dtype=np.float64)
+        p += (1.0 - cfg["noise"]) * w / w.sum()
+        p[pool_size == 0] = 0.0  # из пустых тематик выбирать нечего
+        if p.sum() == 0:
+            raise ValueError(f"Для сегмента {seg_name} в каталоге нет ни одного сообщества.")
+        topic_cdf[s] = np.cumsum(p / p.sum())
+        topic_cdf[s, -1] = 1.0
+
+    segment_p = np.array([w for _, w in SEGMENT_WEIGHTS], dtype=np.float64)
+    return SyntheticCatalog(
+        community_ids=topics_df["community_id"].astype(str).to_numpy(dtype=object),
+        topic_codes=topic_codes,
+        pool=pool,
+        pool_start=pool_start,
+        pool_size=pool_size,
+        core=core,
+        core_size=core_size,
+        segment_p=segment_p / segment_p.sum(),
+        topic_cdf=topic_cdf,
+    )
+
+
+# ---------------------------
+# Одна пачка пользователей
+# ---------------------------
+def _dedupe_rows(rows: np.ndarray, codes: np.ndarray, k: np.ndarray, n_codes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Уникальные сообщества в строке (остаётся первое по позиции вхождение), не больше k[row] на строку.
+    Позиция в массиве = порядок выбора. Возвращает (rows, codes), сгруппированные по строке в порядке выбора.
+    Только устойчивые сортировки по int64 (radix), без lexsort.
+    """
+    pair = rows.astype(np.int64) * n_codes + codes
+    by_pair = np.argsort(pair, kind="stable")
+    p = pair[by_pair]
+    first = np.ones(len(p), dtype=bool)
+    first[1:] = p[1:] != p[:-1]
+    kept = np.sort(by_pair[first])  # первые вхождения в исходном порядке
+
+    r, c = rows[kept], codes[kept]
+    by_row = np.argsort(r, kind="stable")
+    r, c = r[by_row], c[by_row]
+    rank = np.arange(len(r)) - np.searchsorted(r, r, side="left")
+    keep = rank < k[r]
+    return r[keep], c[keep]
+
+
+def generate_chunk(
+    catalog: SyntheticCatalog, n_users: int, seed_seq: np.random.SeedSequence, max_rounds: int = 20
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Рёбра пачки из n_users пользователей.
+    Возвращает (row — номер пользователя в пачке, code — код сообщества, segment на пользователя).
+    """
+    rng = np.random.default_rng(seed_seq)
+    n_seg, core_cap = catalog.core.shape
+
+    segment = rng.choice(n_seg, size=n_users, p=catalog.segment_p)
+    k = rng.integers(K_RANGE[0], K_RANGE[1] + 1, size=n_users)
+    k = np.minimum(k, catalog.n_communities)
+    core_take = np.minimum(rng.integers(CORE_TAKE_RANGE[0], CORE_TAKE_RANGE[1] + 1, size=n_users),
+                           catalog.core_size[segment])
+
+    # 1) ядро: случайная перестановка ядра сегмента, берём первые core_take
+    keys = rng.random((n_users, core_cap))
+    keys[np.arange(core_cap)[None, :] >= catalog.core_size[segment][:, None]] = np.inf
+    rank = np.argsort(np.argsort(keys, axis=1), axis=1)
+    ci, cj = np.nonzero(rank < core_take[:, None])
+    rows, codes = ci, catalog.core[segment[ci], cj]
+
+    # 2) добор по тематикам + шум; нехватку после дедупликации добираем повторно (только по недобравшим)
+    need_rows = np.arange(n_users)
+    need = k - core_take
+    for _ in range(max_rounds):
+        m = need[need_rows]
+        pos = need_rows[m > 0]
+        if len(pos) == 0:
+            break
+        m = need[pos]
+        draw = m + m // 2 + 2  # с запасом на повторы
+        r = np.repeat(pos, draw)
+        seg = segment[r]
+        u = rng.random(len(r))
+        topic = np.empty(len(r), dtype=np.int64)
+        for s in range(n_seg):  # по сегментам: searchsorted по CDF, без матрицы draws × тематики
+            mask = seg == s
+            topic[mask] = np.searchsorted(catalog.topic_cdf[s], u[mask], side="right")
+        topic = np.minimum(topic, catalog.topic_cdf.shape[1] - 1)
+        pick = (rng.random(len(r)) * catalog.pool_size[topic]).astype(np.int64)
+        c = catalog.pool[catalog.pool_start[topic] + pick]
+
+        # уже выбранные стоят раньше новых — при дедупликации выигрывают они (ядро не вытесняется)
+        rows, codes = _dedupe_rows(np.concatenate([rows, r]), np.concatenate([codes, c]), k, catalog.n_communities)
+        have = np.bincount(rows, minlength=n_users)
+        need = k - have
+        need_rows = np.flatnonzero(need > 0)
+
+    return rows, codes, segment
+
+
+def chunk_seeds(seed: int, n_chunks: int) -> list:
+    """Сиды пачек: независимы от числа процессов (одинаковые seed и chunk_size → одинаковые данные)."""
+    return np.random.SeedSequence([seed, 1]).spawn(n_chunks)
+
+
+def _chunk_table(catalog: SyntheticCatalog, user_start: int, n_users: int, rows: np.ndarray, codes: np.ndarray):
+    """Arrow-таблица пачки (user_id, community_id): строки id создаются по разу на пользователя/сообщество, дальше — take."""
+    import pyarrow as pa
+
+    users = pa.array((USER_ID_START + user_start + np.arange(n_users)).astype(str))
+    comms = pa.array(catalog.community_ids.astype(str))
+    return pa.table({
+        "user_id": users.take(pa.array(rows.astype(np.int32))),
+        "community_id": comms.take(pa.array(codes.astype(np.int32))),
+    })
+
+
+# ---------------------------
+# Пул процессов: каталог передаётся один раз (initializer)
+# ---------------------------
+_WORKER_CATALOG: Optional[SyntheticCatalog] = None
+
+
+def _init_worker(catalog: SyntheticCatalog):
+    global _WORKER_CATALOG
+    _WORKER_CATALOG = catalog
+
+
+def _worker_chunk(task: Tuple[int, int, np.random.SeedSequence]) -> Tuple[int, int, np.ndarray, np.ndarray]:
+    user_start, n, ss = task
+    rows, codes, _ = generate_chunk(_WORKER_CATALOG, n, ss)
+    return user_start, n, rows.astype(np.int32), codes.astype(np.int32)
+
+
+def iter_edge_chunks(
+    catalog: SyntheticCatalog, n_users: int, seed: int = 123, chunk_size: int = 100_000, n_jobs: int = 1
+) -> Iterator[Tuple[int, int, np.ndarray, np.ndarray]]:
+    """
+    (user_start, n_users, rows, codes) по пачкам, строго по порядку пользователей.
+    n_jobs > 1 (или -1) — пачки считаются в пуле процессов, в памяти не больше ~2·n_jobs пачек.
+    """
+    starts = list(range(0, n_users, chunk_size))
+    seeds = chunk_seeds(seed, len(starts))
+    tasks = [(s, min(chunk_size, n_users - s), ss) for s, ss in zip(starts, seeds)]
+    workers = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, int(n_jobs))
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        for s, n, ss in tasks:
+            rows, codes, _ = generate_chunk(catalog, n, ss)
+            yield s, n, rows, codes
+        return
+
+    window = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog,)) as ex:
+        for i in range(0, len(tasks), window):
+            yield from ex.map(_worker_chunk, tasks[i:i + window])
+
+
+def generate_edges_fast(
+    n_users: int, topics_df: pd.DataFrame, seed: int = 123, chunk_size: int = 100_000, n_jobs: int = 1
+) -> Tuple[pd.DataFrame, set]:
+    """
+    Замена generate_vk_demo_data.generate_edges для объёмов, которые помещаются в память:
+    (edges_df[user_id, community_id], used_ids).
+    """
+    import pyarrow as pa
+
+    catalog = build_catalog(topics_df, seed=seed)
+    tables = [_chunk_table(catalog, s, n, r, c) for s, n, r, c in iter_edge_chunks(catalog, n_users, seed, chunk_size, n_jobs)]
+    edges_df = pa.concat_tables(tables).to_pandas() if tables else pd.DataFrame(columns=["user_id", "community_id"])
+    return edges_df, set(edges_df["community_id"].unique())
+
+
+# ---------------------------
+# Потоковая запись на диск
+# ---------------------------
+def write_synthetic_dataset(
+    out_dir: str | Path,
+    n_users: int,
+    total_communities: int = 1200,
+    seed: int = 123,
+    fmt: str = "csv",
+    chunk_size: int = 100_000,
+    n_jobs: int = 1,
+    tag: Optional[str] = None,
+) -> dict:
+    """
+    Пишет edges_<tag>.<fmt> (user_id;community_id) и topics_<tag>.<fmt> (только использованные сообщества).
+    Рёбра пишутся по пачкам: память не зависит от n_users.
+    """
+    if fmt not in SYNTH_FORMATS:
+        raise ValueError(f"Неизвестный формат {fmt!r}. Доступно: {SYNTH_FORMATS}")
+    if n_users <= 0:
+        raise ValueError("n_users должно быть > 0.")
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tag = tag or f"{n_users}u_{total_communities}c_s{seed}"
+    edges_path = out_dir / f"edges_{tag}.{fmt}"
+    topics_path = out_dir / f"topics_{tag}.{fmt}"
+
+    t0 = time.perf_counter()
+    topics_df, _ = generate_communities_catalog(total_communities=total_communities, seed=42)
+    catalog = build_catalog(topics_df, seed=seed)
+    used = np.zeros(catalog.n_communities, dtype=np.int64)
+    n_edges = 0
+
+    tmp = edges_path.with_suffix(edges_path.suffix + ".part")
+    chunks = iter_edge_chunks(catalog, n_users, seed, chunk_size, n_jobs)
+    if fmt == "csv":
+        import pyarrow.csv as pa_csv
+
+        # тот же формат, что у generate_vk_demo_data: utf-8-sig, ';', без кавычек
+        opts = pa_csv.WriteOptions(include_header=False, delimiter=";", quoting_style="none")
+        with open(tmp, "wb") as f:
+            f.write("user_id;community_id\n".encode("utf-8-sig"))
+            for s, n, rows, codes in chunks:
+                pa_csv.write_csv(_chunk_table(catalog, s, n, rows, codes), f, opts)
+                used += np.bincount(codes, minlength=catalog.n_communities)
+                n_edges += len(rows)
+    else:
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for s, n, rows, codes in chunks:
+                table = _chunk_table(catalog, s, n, rows, codes)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+                used += np.bincount(codes, minlength=catalog.n_communities)
+                n_edges += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+    os.replace(tmp, edges_path)  # атомарно: недописанный файл не попадёт в кэш бенчмарков
+
+    topics_used = topics_df[used > 0]
+    if fmt == "csv":
+        topics_used.to_csv(topics_path, index=False, encoding="utf-8-sig", sep=";")
+    else:
+        topics_used.to_parquet(topics_path, index=False)
+
+    return {
+        "edges": edges_path,
+        "topics": topics_path,
+        "n_users": int(n_users),
+        "n_edges": int(n_edges),
+        "n_communities_used": int((used > 0).sum()),
+        "generate_seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def _parse_count(text: str) -> int:
+    mult = {"k": 1_000, "m": 1_000_000}
+    text = text.strip().lower()
+    return int(float(text[:-1]) * mult[text[-1]]) if text and text[-1] in mult else int(text)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Синтетика user -> community для нагрузочных тестов")
+    ap.add_argument("--users", default="1M", help="число пользователей (3000, 300k, 1M, 10M)")
+    ap.add_argument("--communities", type=int, default=20000, help="размер каталога сообществ")
+    ap.add_argument("--seed", type=int, default=123)
+    ap.add_argument("--format", choices=SYNTH_FORMATS, default="csv")
+    ap.add_argument("--chunk-size", type=int, default=100_000, help="пользователей в пачке")
+    ap.add_argument("--jobs", type=int, default=1, help="процессов (-1 — все ядра)")
+    ap.add_argument("--out-dir", default=".")
+    args = ap.parse_args()
+
+    info = write_synthetic_dataset(
+        args.out_dir, _parse_count(args.users), total_communities=args.communities, seed=args.seed,
+        fmt=args.format, chunk_size=args.chunk_size, n_jobs=args.jobs,
+    )
+    print("Готово:")
+    print(f"- {info['edges']}")
+    print(f"- {info['topics']}")
+    print(f"Пользователей: {info['n_users']}")
+    print(f"Всего ребер user->community: {info['n_edges']}")
+    print(f"Уникальных сообществ у пользователей: {info['n_communities_used']}")
+    print(f"Время: {info['generate_seconds']} c")
+
+
+if __name__ == "__main__":
+    main()
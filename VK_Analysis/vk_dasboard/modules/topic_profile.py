@@ -0,0 +1,148 @@
+# topic_profile.py
+# -------------------------------------------------
+# Тематический профиль скрытых сообществ через произведения sparse-матриц.
+#
+#   X : user × community    (UserCommunityData.csr, 0/1)
+#   P : user × cluster      (индикатор разбиения Louvain)
+#   T : community × topic   (из TopicLookup)
+#
+#   группы в кластере   = P.T @ X        (cluster × community)
+#   тематики в кластере = P.T @ X @ T    (cluster × topic)
+#
+# Вместо Counter по спискам членств (O(всех рёбер) на чистом Python)
+# — несколько sparse-произведений и argpartition для top-n.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from create_ug_matrix import UserCommunityData
+
+
+def top_n_indices(values: np.ndarray, n: int) -> np.ndarray:
+    """
+    Индексы n наибольших ненулевых значений (по убыванию; при равенстве — меньший индекс).
+    argpartition: O(len) вместо полной сортировки.
+    """
+    values = np.asarray(values).ravel()
+    nz = np.flatnonzero(values > 0)
+    if nz.size == 0 or n <= 0:
+        return nz[:0]
+    if nz.size > n:
+        part = np.argpartition(-values[nz], n - 1)[:n]
+        # граничные равные значения добираем целиком, чтобы порядок был детерминированным
+        kth = values[nz[part]].min()
+        nz = nz[values[nz] >= kth]
+    order = np.lexsort((nz, -values[nz]))
+    return nz[order][:n]
+
+
+def partition_indicator(partition: Dict[str, int], user_ids: List[str]) -> Tuple[csr_matrix, np.ndarray]:
+    """
+    P (n_users × n_clusters) — индикатор разбиения, строки в порядке user_ids.
+    Пользователи без кластера (нет в partition) дают пустую строку.
+    Возвращает (P, cluster_ids), cluster_ids[j] — hidden_comm_id столбца j.
+    """
+    labels = pd.Series(user_ids, dtype=object).map(partition)
+    has = labels.notna().to_numpy()
+    cluster_ids, codes = np.unique(labels[has].astype(np.int64).to_numpy(), return_inverse=True)
+
+    rows = np.flatnonzero(has)
+    P = csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, codes)),
+        shape=(len(user_ids), len(cluster_ids)),
+    )
+    return P, cluster_ids
+
+
+def topic_matrix(topic_codes: np.ndarray, n_topics: int) -> csr_matrix:
+    """T (n_communities × n_topics): 1, если у сообщества эта тематика (-1 = нет тематики)."""
+    topic_codes = np.asarray(topic_codes)
+    rows = np.flatnonzero(topic_codes >= 0)
+    return csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, topic_codes[rows])),
+        shape=(len(topic_codes), n_topics),
+    )
+
+
+@dataclass(frozen=True)
+class TopicProfile:
+    """
+    Полные распределения по кластерам:
+
+    cluster_ids  : hidden_comm_id по строкам
+    sizes        : число пользователей в кластере
+    group_counts : cluster × community (csr) — сколько участников кластера в группе
+    topic_counts : cluster × topic (dense) — членства участников по тематикам
+    """
+    cluster_ids: np.ndarray
+    sizes: np.ndarray
+    group_counts: csr_matrix
+    topic_counts: np.ndarray
+    community_ids: List[str]
+    topics: List[str]
+
+    def _row(self, cid: int) -> int:
+        pos = np.searchsorted(self.cluster_ids, cid)
+        if pos >= len(self.cluster_ids) or self.cluster_ids[pos] != cid:
+            raise KeyError(f"Нет кластера {cid}")
+        return int(pos)
+
+    def top_groups(self, cid: int, top_n: int = 5) -> List[Tuple[str, int]]:
+        """[(community_id, count), ...] — как Counter(...).most_common(top_n)."""
+        row = self.group_counts.getrow(self._row(cid))
+        vals = np.zeros(self.group_counts.shape[1])
+        vals[row.indices] = row.data
+        idx = top_n_indices(vals, top_n)
+        return [(self.community_ids[j], int(vals[j])) for j in idx]
+
+    def top_topics(self, cid: int, top_n: int = 5) -> List[Tuple[str, int]]:
+        vals = self.topic_counts[self._row(cid)]
+        idx = top_n_indices(vals, top_n)
+        return [(self.topics[j], int(vals[j])) for j in idx]
+
+    def topic_counts_dict(self, cid: int) -> Dict[str, int]:
+        """topic -> число членств участников кластера (только ненулевые)."""
+        vals = self.topic_counts[self._row(cid)]
+        return {self.topics[j]: int(vals[j]) for j in np.flatnonzero(vals)}
+
+    def topic_distribution(self, normalize: bool = True) -> pd.DataFrame:
+        """Таблица cluster × topic (доли по строке при normalize=True) — для drill-down."""
+        M = self.topic_counts.astype(float)
+        if normalize:
+            totals = M.sum(axis=1, keepdims=True)
+            M = np.divide(M, totals, out=np.zeros_like(M), where=totals > 0)
+        return pd.DataFrame(M, index=pd.Index(self.cluster_ids, name="hidden_comm_id"), columns=self.topics)
+
+
+def build_topic_profile(data: UserCommunityData, partition: Dict[str, int], topic_lookup) -> TopicProfile:
+    """
+    Считает P.T @ X и P.T @ X @ T один раз для всех кластеров.
+    topic_lookup — e.TopicLookup, выровненный по data.community_ids.
+    """
+    if list(topic_lookup.community_ids) != list(data.community_ids):
+        raise ValueError("topic_lookup должен быть построен по data.community_ids (тот же порядок столбцов).")
+
+    P, cluster_ids = partition_indicator(partition, data.user_ids)
+    X = data.csr.astype(np.float64)
+
+    group_counts = (P.T @ X).tocsr()
+    T = topic_matrix(topic_lookup.topic_codes, topic_lookup.n_topics)
+    topic_counts = np.asarray((group_counts @ T).todense())
+
+    sizes = np.asarray(P.sum(axis=0)).ravel().astype(np.int64)
+
+    return TopicProfile(
+        cluster_ids=cluster_ids,
+        sizes=sizes,
+        group_counts=group_counts,
+        topic_counts=topic_counts,
+        community_ids=list(data.community_ids),
+        topics=list(topic_lookup.topics),
+    )
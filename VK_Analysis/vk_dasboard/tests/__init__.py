@@ -0,0 +1,5 @@
+# tests
+# -------------------------------------------------
+# Тесты модулей дашборда (pytest). Запуск из папки vk_dasboard:
+#   python -m pytest -q tests
+# -------------------------------------------------
@@ -0,0 +1,30 @@
+# conftest.py
+# -------------------------------------------------
+# Общие фикстуры тестов: модули импортируются "плоско" (как в app.py),
+# данные — демо-выгрузка из modules/
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+MODULES_DIR = Path(__file__).resolve().parent.parent / "modules"
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+
+@pytest.fixture(scope="session")
+def edges_df() -> pd.DataFrame:
+    """users_communities_edges.csv: user_id;community_id (строки)."""
+    from a import load_edges_csv
+
+    return load_edges_csv(str(MODULES_DIR / "users_communities_edges.csv"))
+
+
+@pytest.fixture(scope="session")
+def topics_path() -> Path:
+    return MODULES_DIR / "community_topics.csv"
@@ -0,0 +1,57 @@
+# test_data_loader.py
+# -------------------------------------------------
+# DatasetRegistry.load: один разбор на отпечаток при одновременных запросах,
+# разные датасеты разбираются параллельно (общий замок не держится на разборе).
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import data_loader
+from data_loader import DatasetRegistry
+
+
+def _slow_parser(calls: list, delay: float = 0.3):
+    def parse(buf):
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return pd.read_csv(buf, sep=";", dtype=str)
+    return parse
+
+
+def _sources(tmp_path, registry: DatasetRegistry, n: int):
+    out = []
+    for i in range(n):
+        p = tmp_path / f"edges_{i}.csv"
+        p.write_text(f"user_id;community_id\nu{i};c{i}\n", encoding="utf-8")
+        out.append(registry.source_for_path("edges", p))
+    return out
+
+
+def test_same_source_parsed_once(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(data_loader.PARSERS, "edges", _slow_parser(calls))
+    registry = DatasetRegistry(search_dirs=[tmp_path], cache_dir=None)
+    (source,) = _sources(tmp_path, registry, 1)
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        frames = list(ex.map(lambda _: registry.load(source), range(4)))
+    assert len(calls) == 1
+    assert all(df is frames[0] for df in frames)
+    assert registry.stats["parsed"] == 1 and registry.stats["memory_hits"] == 3
+
+
+def test_different_sources_parse_concurrently(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(data_loader.PARSERS, "edges", _slow_parser(calls, delay=0.5))
+    registry = DatasetRegistry(search_dirs=[tmp_path], cache_dir=None)
+    sources = _sources(tmp_path, registry, 3)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        frames = list(ex.map(registry.load, sources))
+    assert time.perf_counter() - t0 < 1.2  # последовательно было бы >= 1.5 c
+    assert [df["user_id"].iloc[0] for df in frames] == ["u0", "u1", "u2"]
@@ -0,0 +1,55 @@
+# test_disk_graph.py
+# -------------------------------------------------
+# DiskGraph без nx.Graph всего графа: метрики сообществ и Louvain на графе блоков
+# совпадают с расчётом в памяти; блоки не пересекают прошлое разбиение.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import networkx as nx
+import numpy as np
+import pytest
+from community import community_louvain
+
+from disk_graph import write_disk_graph_from_networkx
+from e import _community_subgraph_metrics
+
+
+@pytest.fixture(scope="module")
+def disk(tmp_path_factory):
+    rng = np.random.default_rng(7)
+    G = nx.Graph()
+    for block in range(5):  # пять плотных групп и редкие связи между ними
+        nodes = [f"u{block}_{i}" for i in range(20)]
+        G.add_weighted_edges_from(
+            (a, b, float(rng.uniform(0.3, 1.0))) for i, a in enumerate(nodes) for b in nodes[i + 1:]
+            if rng.random() < 0.4
+        )
+    users = list(G.nodes)
+    G.add_weighted_edges_from(
+        (users[a], users[b], 0.1) for a, b in rng.integers(0, len(users), size=(30, 2)) if a != b
+    )
+    return G, write_disk_graph_from_networkx(G, tmp_path_factory.mktemp("graph"))
+
+
+def test_community_metrics_match_subgraph(disk):
+    G, dg = disk
+    partition = community_louvain.best_partition(G, random_state=42)
+    got = dg.community_metrics(partition)
+    for cid in set(partition.values()):
+        users = [u for u, c in partition.items() if c == cid]
+        want = _community_subgraph_metrics(G, users)
+        for key, value in want.items():
+            assert got[cid][key] == pytest.approx(value), (cid, key)
+
+
+def test_louvain_modularity_and_previous_blocks(disk):
+    G, dg = disk
+    labels, q = dg.louvain(random_state=42)
+    partition = dict(zip(dg.node_ids.tolist(), labels.tolist()))
+    assert q == pytest.approx(community_louvain.modularity(partition, G))
+
+    previous = {u: int(u[1]) for u in dg.node_ids.tolist()}
+    blocks = dg.coarse_blocks(previous)
+    for b in np.unique(blocks):
+        assert len({previous[u] for u in dg.node_ids[blocks == b].tolist()}) == 1
@@ -0,0 +1,101 @@
+# test_duplicate_users.py
+# -------------------------------------------------
+# --dedup supernode: метрики и перестановочный тест на графе групп совпадают
+# с развёрнутым графом, где дубликаты взаимозаменяемы (ребро w между каждой парой
+# участников двух групп, клика с весом 1.0 внутри группы); reduce — edge-list по строкам матрицы;
+# скелет графа групп сохраняет петли (клики групп) с исходным весом.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from collections import Counter
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from community_significance import permutation_test
+from create_ug_matrix import UserCommunityData
+from duplicate_users import build_dedup_similarity_graph
+from e import analyze_hidden_communities, detect_hidden_communities
+from graph_backbone import BACKBONE_METHODS, extract_backbone
+
+
+@pytest.fixture(scope="module")
+def supernode():
+    """Данные с группами одинаковых наборов, граф групп и развёрнутое разбиение."""
+    rng = np.random.default_rng(3)
+    rows = []
+    for u in range(120):
+        base = 10 * (u % 4)  # четыре тематических блока сообществ
+        comms = {base + int(c) for c in rng.integers(0, 10, size=4)}
+        rows += [(f"u{u}", str(c)) for c in comms]
+    for g in range(12):  # группы клонов
+        comms = [c for uid, c in rows if uid == f"u{g}"]
+        rows += [(f"clone{g}_{i}", c) for i in range(int(rng.integers(1, 6))) for c in comms]
+    data = UserCommunityData.from_edges_df(pd.DataFrame(rows, columns=["user_id", "community_id"]))
+
+    H, groups = build_dedup_similarity_graph(data, threshold=0.15, k_neighbors=20, mode="supernode", n_jobs=1)
+    reps, _ = detect_hidden_communities(H, random_state=42)
+    partition = groups.expand_partition(reps, data)
+    return data, groups, H, partition
+
+
+def _expanded(H: nx.Graph, groups, data) -> nx.Graph:
+    user_ids = np.asarray(data.user_ids, dtype=object)
+    members = {data.user_ids[r]: user_ids[groups.group_of == g].tolist() for g, r in enumerate(groups.rep_rows)}
+    G = nx.Graph()
+    G.add_nodes_from(data.user_ids)
+    for a, b, w in H.edges(data="weight"):
+        if a == b:
+            G.add_edges_from(nx.complete_graph(members[a]).edges(), weight=1.0)
+            continue
+        w = w / (len(members[a]) * len(members[b]))
+        G.add_weighted_edges_from((x, y, w) for x in members[a] for y in members[b])
+    return G
+
+
+def test_summary_sizes_count_all_users(supernode):
+    data, groups, H, partition = supernode
+    assert len(partition) == groups.n_users > groups.n_unique
+
+    summary_rows, _ = analyze_hidden_communities(H, partition, {}, {}, {})
+    counts = Counter(partition.values())
+    assert {r["hidden_comm_id"]: r["size_users"] for r in summary_rows} == dict(counts)
+    assert sum(r["size_users"] for r in summary_rows) == groups.n_users
+
+
+def test_metrics_match_expanded_graph(supernode):
+    data, groups, H, partition = supernode
+    G = _expanded(H, groups, data)
+
+    got = analyze_hidden_communities(H, partition, {}, {}, {})[1]
+    want = analyze_hidden_communities(G, partition, {}, {}, {})[1]
+    for cid, info in want.items():
+        for key in ("size", "edges", "density", "avg_internal_weighted_degree", "significance_score"):
+            assert got[cid][key] == pytest.approx(info[key]), (cid, key)
+
+    table = permutation_test(H, partition, n_permutations=20).table.set_index("hidden_comm_id")
+    assert table["size_users"].to_dict() == dict(Counter(partition.values()))
+    for cid, info in want.items():
+        assert table.loc[cid, "score"] == pytest.approx(info["significance_score"], abs=1e-6)
+
+
+def test_reduce_edges_from_rows(supernode):
+    data, groups, _, _ = supernode
+    reduced = groups.reduce(data)
+    keep = set(reduced.user_ids)
+    want = data.edges_df[data.edges_df["user_id"].isin(keep)]
+    assert set(map(tuple, reduced.edges_df.to_numpy())) == set(map(tuple, want.to_numpy()))
+    assert reduced.csr.shape == (groups.n_unique, data.csr.shape[1])
+
+
+@pytest.mark.parametrize("method", BACKBONE_METHODS)
+def test_backbone_keeps_group_loops(supernode, method):
+    _, _, H, _ = supernode
+    loops = {u: w for u, _, w in nx.selfloop_edges(H, data="weight")}
+    assert loops
+    B = extract_backbone(H, method=method)
+    assert {u: w for u, _, w in nx.selfloop_edges(B, data="weight")} == pytest.approx(loops)
+    assert B.number_of_edges() - len(loops) < H.number_of_edges() - len(loops)
@@ -0,0 +1,25 @@
+# test_ego_batch.py
+# -------------------------------------------------
+# export_batch: id из файла целей не становятся путями (../, /) — отчёты только в out_dir/reports.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import pandas as pd
+
+from ego_batch import RANK_COLUMNS, EgoBatchResult, export_batch
+
+
+def test_report_names_stay_inside_out_dir(tmp_path):
+    targets = ["../../escape", "/etc/passwd", "id 42", "..", "100000001"]
+    table = pd.DataFrame([{**{c: None for c in RANK_COLUMNS}, "target": t, "found": False} for t in targets])
+    result = EgoBatchResult(table=table, reports={t: f"ЦЕЛЬ: {t}" for t in targets}, seconds=1.0, n_jobs=1)
+
+    out = tmp_path / "out"
+    export_batch(result, out)
+    files = sorted((out / "reports").iterdir())
+    assert len(files) == len(targets)
+    assert {p.read_text(encoding="utf-8") for p in files} == set(result.reports.values())
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file()) == sorted(
+        ["out/ego_batch_ranked.csv", "out/ego_batch_report.txt"] + [f"out/reports/{p.name}" for p in files]
+    )
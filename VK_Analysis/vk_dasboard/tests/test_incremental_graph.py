@@ -0,0 +1,115 @@
+# test_incremental_graph.py
+# -------------------------------------------------
+# Дельта к IncrementalSimilarityGraph против полной пересборки на итоговых данных.
+# Списки соседей могут расходиться только на равных схожестях (ничьи на границе top-k),
+# поэтому сравниваются значения схожестей и рёбра вне таких ничьих.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+
+from build_grap_similarity import knn_to_adjacency, normalize_rows
+from create_ug_matrix import UserCommunityData
+from incremental_graph import IncrementalSimilarityGraph
+
+K = 10
+THRESHOLD = 0.15
+
+
+@pytest.fixture(scope="module")
+def delta(edges_df):
+    """База, дельта (новые пользователи/сообщества, пользователь без подписок) и итог."""
+    rng = np.random.default_rng(7)
+    users = edges_df["user_id"].unique()
+    emptied = users[:3]  # теряют все подписки
+    removed = pd.concat([
+        edges_df[edges_df["user_id"].isin(emptied)],
+        edges_df[~edges_df["user_id"].isin(emptied)].sample(150, random_state=1),
+    ])
+    base = edges_df.drop(removed.index)
+    donors = base.sample(120, random_state=2)
+    added = pd.DataFrame({
+        "user_id": np.concatenate([
+            rng.permutation(donors["user_id"].to_numpy()),
+            ["new_user_1", "new_user_1", "new_user_2"],
+            [users[10]],
+        ]),
+        "community_id": np.concatenate([
+            donors["community_id"].to_numpy(),
+            donors["community_id"].iloc[:3].to_numpy(),
+            ["new_community"],
+        ]),
+    })
+    final = pd.concat([base, added]).merge(removed, how="left", indicator=True)
+    final = final[final["_merge"] == "left_only"].drop(columns="_merge")
+    # строки, которые в дельте и добавлены, и удалены, остаются удалёнными (как в apply_delta)
+    final = final.drop_duplicates(ignore_index=True)
+    return base, added, removed, final
+
+
+def _knn_by_user(inc: IncrementalSimilarityGraph):
+    """user_id -> отсортированные схожести соседей (только пользователи с подписками)."""
+    live = np.flatnonzero(np.diff(inc.X.indptr) > 0)
+    sims = np.sort(1.0 - inc.distances[live, 1:].astype(np.float64), axis=1)
+    return {inc.user_ids[i]: sims[j] for j, i in enumerate(live.tolist())}
+
+
+def _kth(inc: IncrementalSimilarityGraph) -> dict:
+    """user_id -> схожесть k-го соседа (граница top-k)."""
+    sims = 1.0 - inc.distances[:, -1].astype(np.float64)
+    return {u: sims[i] if inc.indices[i, -1] >= 0 else 0.0 for i, u in enumerate(inc.user_ids)}
+
+
+def test_delta_matches_full_rebuild(delta, tmp_path):
+    base, added, removed, final = delta
+    inc = IncrementalSimilarityGraph.build(
+        UserCommunityData.from_edges_df(base), threshold=THRESHOLD, k_neighbors=K, n_jobs=1, chunk_size=500
+    )
+    inc.save(tmp_path)
+    inc = IncrementalSimilarityGraph.load(tmp_path)
+    stats = inc.apply_delta(added=added, removed=removed)
+    assert stats.new_users == 2 and stats.new_communities == 1
+
+    full = IncrementalSimilarityGraph.build(
+        UserCommunityData.from_edges_df(final), threshold=THRESHOLD, k_neighbors=K, n_jobs=1, chunk_size=500
+    )
+
+    # строки нормированной матрицы и инвертированного индекса патчатся без пересборки
+    Xn = normalize_rows(inc.X)
+    assert abs(inc._Xn - Xn).max() < 1e-6
+    assert abs(inc._XnT - csr_matrix(Xn.T)).max() < 1e-6
+    assert abs(inc.A - knn_to_adjacency(inc.distances, inc.indices, threshold=THRESHOLD)).max() < 1e-9
+
+    got, want = _knn_by_user(inc), _knn_by_user(full)
+    assert got.keys() == want.keys()
+    for u in want:
+        np.testing.assert_allclose(got[u], want[u], atol=1e-5)
+
+    G, H = inc.G, full.G
+    assert set(G.nodes()) == set(H.nodes())
+    kth = _kth(full)
+    g_edges = {frozenset(e): w for *e, w in G.edges(data="weight")}
+    h_edges = {frozenset(e): w for *e, w in H.edges(data="weight")}
+    for e in g_edges.keys() & h_edges.keys():
+        assert g_edges[e] == pytest.approx(h_edges[e], abs=1e-5)
+    for e in g_edges.keys() ^ h_edges.keys():
+        w = g_edges.get(e, h_edges.get(e))
+        assert any(abs(w - kth[u]) < 1e-5 for u in e), f"ребро {set(e)} расходится не из-за ничьей"
+    assert len(g_edges.keys() ^ h_edges.keys()) <= 0.01 * len(h_edges)
+
+
+def test_state_roundtrip_keeps_graph(delta, tmp_path):
+    base, added, removed, _ = delta
+    inc = IncrementalSimilarityGraph.build(
+        UserCommunityData.from_edges_df(base), threshold=THRESHOLD, k_neighbors=K, n_jobs=1, chunk_size=500
+    )
+    inc.apply_delta(added=added, removed=removed)
+    inc.save(tmp_path)
+    loaded = IncrementalSimilarityGraph.load(tmp_path)
+    assert abs(loaded.A - inc.A).max() == 0
+    assert set(loaded.G.edges()) == set(inc.G.edges())
+    assert set(loaded.G.nodes()) == set(inc.G.nodes())
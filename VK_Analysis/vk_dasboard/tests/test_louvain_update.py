@@ -0,0 +1,58 @@
+# test_louvain_update.py
+# -------------------------------------------------
+# stabilize_labels: разреженное паросочетание по блокам совпадает с оптимумом
+# плотного linear_sum_assignment, большие блоки сопоставляются жадно.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+from collections import Counter
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+import louvain_update
+from louvain_update import stabilize_labels
+
+
+def _kept(prev: dict, out: dict) -> int:
+    """Сколько узлов сохранили id прошлого сообщества."""
+    return sum(1 for n, c in out.items() if prev.get(n) == c)
+
+
+def _optimum(prev: dict, new: dict) -> int:
+    pairs = Counter((new[n], prev[n]) for n in new if n in prev)
+    rows = {c: i for i, c in enumerate(sorted({a for a, _ in pairs}))}
+    cols = {c: i for i, c in enumerate(sorted({b for _, b in pairs}))}
+    M = np.zeros((len(rows), len(cols)))
+    for (a, b), v in pairs.items():
+        M[rows[a], cols[b]] = v
+    r, c = linear_sum_assignment(M, maximize=True)
+    return int(M[r, c].sum())
+
+
+def test_matches_dense_optimum():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n = int(rng.integers(50, 2000))
+        prev = {i: int(rng.integers(0, 40)) + 100 for i in range(n) if rng.random() < 0.9}
+        new = {i: int(rng.integers(0, 30)) if rng.random() < 0.4 else prev.get(i, 7) % 30 for i in range(n)}
+        out = stabilize_labels(prev, new)
+        assert _kept(prev, out) == _optimum(prev, new)
+        assert len(set(out.values())) == len(set(new.values()))
+
+
+def test_unmatched_get_fresh_ids():
+    prev = {"a": 5, "b": 5, "c": 9}
+    new = {"a": 0, "b": 0, "c": 1, "d": 2, "e": 2}
+    out = stabilize_labels(prev, new)
+    assert out["a"] == out["b"] == 5 and out["c"] == 9
+    assert out["d"] == out["e"] == 10
+
+
+def test_large_block_greedy(monkeypatch):
+    monkeypatch.setattr(louvain_update, "MAX_DENSE_BLOCK_CELLS", 10)
+    prev = {i: i // 10 for i in range(2000)}
+    new = {i: (i + 3) // 10 for i in range(2000)}  # цепочка пересечений — одна большая компонента
+    out = stabilize_labels(prev, new)
+    assert _kept(prev, out) == _optimum(prev, new)
@@ -0,0 +1,31 @@
+# test_overlap_index.py
+# -------------------------------------------------
+# members_of: неизвестный community_id — KeyError, а не молча суженный набор групп.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import pytest
+
+from create_ug_matrix import UserCommunityData
+from overlap_index import CommunityOverlapIndex
+
+
+@pytest.fixture(scope="module")
+def index(edges_df):
+    return CommunityOverlapIndex(UserCommunityData.from_edges_df(edges_df))
+
+
+def test_members_of_unknown_group_raises(index):
+    known = index.data.community_ids[:2]
+    for mode in ("any", "all"):
+        with pytest.raises(KeyError, match="нет_такой"):
+            index.members_of([*known, "нет_такой"], mode=mode)
+
+
+def test_members_of_all_is_intersection(index):
+    a, b = index.data.community_ids[:2]
+    both = set(index.members_of([a, b], mode="all")["user_id"])
+    want = set(index.members_of([a])["user_id"]) & set(index.members_of([b])["user_id"])
+    assert both == want
+    assert index.members_of([]).empty
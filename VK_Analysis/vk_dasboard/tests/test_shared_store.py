@@ -0,0 +1,26 @@
+# test_shared_store.py
+# -------------------------------------------------
+# attach_user_data: id строк ищутся по общему массиву (SortedIdIndex), без dict в процессе пула.
+# -------------------------------------------------
+
+from __future__ import annotations
+
+import numpy as np
+
+from create_ug_matrix import UserCommunityData
+from shared_store import SortedIdIndex, attach_user_data, share_user_data
+
+
+def test_attached_index_matches_dict(edges_df):
+    data = UserCommunityData.from_edges_df(edges_df)
+    with share_user_data(data) as store:
+        attached = attach_user_data(store.handle)
+        assert isinstance(attached.user_index, SortedIdIndex)
+        assert len(attached.user_index) == len(data.user_index)
+        assert all(attached.user_index[u] == i for u, i in data.user_index.items())
+        assert attached.user_index.get("нет такого") is None
+
+        rows = np.array([5, 0, 17])
+        sub, want = attached.take_rows(rows), data.take_rows(rows)
+        assert sub.user_ids == want.user_ids
+        assert sub.edges_df.equals(want.edges_df)